@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+"""
+Benchmark the single-pass message scan against the previous per-method regexes
+
+Generates a corpus of WhatsApp-style customer messages (English, Hinglish,
+Hindi, prices, dates, emojis, links, promotional spam), then times what the
+webhook does per message -- parse, unsubscribe check, ban-risk analysis --
+with the legacy implementation against services.message_signals, and
+reports how often the two agree.
+
+Usage: python benchmark_message_signals.py [--messages 20000] [--repeat 3] [--seed 7]
+"""
+import os
+import re
+import sys
+import time
+import random
+import argparse
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.message_signals import scan_message
+from services.whatsapp_safety import WhatsAppSafety
+
+try:
+    from textblob import TextBlob
+except ImportError:  # legacy sentiment is skipped without it
+    TextBlob = None
+
+
+OPENERS = ["Hi", "Hello", "hey", "Namaste", "Hii team", "Good morning", "", "Sir,", "bhai"]
+BODIES = [
+    "how much is the {trek} trek for {n} people?",
+    "what is the price for {trek} in {month}? budget is ₹{price}",
+    "I want to book {trek} for {date}, {n} seats please",
+    "is it safe for beginners? my mom is worried about altitude sickness",
+    "can i do {trek} without any trekking experience? I'm not very fit",
+    "please cancel my booking and refund the money back to my account",
+    "when is the best time to visit {trek}? how long does it take",
+    "the trip was amazing!! great guides, loved the food 😍😍",
+    "terrible experience, the bus was late and the hotel was bad",
+    "STOP sending me messages",
+    "no more messages please, unsubscribe me",
+    "don't contact me again",
+    "Rs. {price} is too expensive, any discount?",
+    "ok thanks 👍",
+    "kya {trek} trek {month} mein possible hai? kitna {price} rupees lagega",
+    "मुझे {trek} ट्रेक बुक करना है",
+    "¿cuánto cuesta el trek de {trek}?",
+    "payment done {price}/- via UPI, please confirm",
+    "no problem, we will wait for the confirmation",
+    "LIMITED TIME offer!!! act now, don't miss this exclusive offer, click here www.example.com http://spam.example.com https://bit.ly/x",
+    "you won't believe this shocking deal 🔥🔥🔥🔥🔥🔥🔥🔥🔥🔥",
+    "is {trek} {n} days or {n2} days? joining from Pune on {date}",
+]
+TREKS = ["Everest", "Manali", "Kedarnath", "Dudhsagar", "Kumbhe", "Harishchandragad", "Rajmachi", "kalsubai"]
+MONTHS = ["December", "jan", "May", "october", "next month"]
+
+
+def build_corpus(n_messages, seed):
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(n_messages):
+        body = rng.choice(BODIES).format(
+            trek=rng.choice(TREKS),
+            month=rng.choice(MONTHS),
+            n=rng.randint(1, 12),
+            n2=rng.randint(2, 9),
+            price=rng.choice(["4999", "12,500", "40k", "8500", "2500"]),
+            date=f"{rng.randint(1, 28)}/{rng.randint(1, 12)}/2025",
+        )
+        message = f"{rng.choice(OPENERS)} {body}".strip()
+        if rng.random() < 0.1:
+            message = message.upper()
+        corpus.append(message)
+    return corpus
+
+
+# --- Previous implementation (one scan per method), kept as the reference ---
+
+LEGACY_INTENT_PATTERNS = {
+    "price_inquiry": r"(how much|price|cost|budget|expensive|₹|rupee|charge)",
+    "booking": r"(book|reserve|confirm|register|want|interested|keen)",
+    "objection": r"(but|however|afraid|worried|concerned|scared|risk|problem|issue|doubt)",
+    "timing": r"(when|date|month|time|best time|duration|how long|days needed)",
+    "refund": r"(cancel|refund|return|money back|compensation)",
+    "feedback": r"(review|feedback|experience|great|amazing|terrible|bad|good)",
+    "objection_safety": r"(safe|dangerous|risk|altitude|sickness|health|emergency)",
+    "objection_ability": r"(difficult|easy|can i|am i|fit|fitness|experience|beginner)",
+}
+LEGACY_INTENT_SCORES = {"price_inquiry": 3, "booking": 4, "objection_safety": 3, "objection_ability": 3, "refund": 5, "timing": 2}
+LEGACY_TREKS = ["everest", "manali", "kedarnath", "dudhsagar", "kumbhe", "maharashtra", "himalayas"]
+LEGACY_UNSUBSCRIBE = ["stop", "unsubscribe", "remove", "no more", "quit", "exit", "don't contact"]
+LEGACY_PROMOTIONAL = ["limited time", "act now", "don't miss", "urgent", "click here", "buy now",
+                      "exclusive offer", "sign up now", "limited offer"]
+LEGACY_CLICKBAIT = [r"you won't believe", r"shocking", r"unbelievable", r"doctors hate", r"this one trick", r"what happens next"]
+
+
+def legacy_language(text):
+    if re.search(r"[ऀ-ॿ]", text):
+        return "hi"
+    if re.search(r"[¿áéíóúñ¡]", text):
+        return "es"
+    if re.search(r"[àâäæçéèêëïîôùûüœ]", text):
+        return "fr"
+    return "en"
+
+
+def legacy_intent(text):
+    text_lower = text.lower()
+    detected = [intent for intent, pattern in LEGACY_INTENT_PATTERNS.items() if re.search(pattern, text_lower)]
+    if not detected:
+        return "general_inquiry"
+    return max(detected, key=lambda x: LEGACY_INTENT_SCORES.get(x, 1))
+
+
+def legacy_sentiment(text):
+    if TextBlob is None:
+        return None
+    polarity = TextBlob(text).sentiment.polarity
+    return "positive" if polarity > 0.1 else "negative" if polarity < -0.1 else "neutral"
+
+
+def legacy_entities(text):
+    text_lower = text.lower()
+    entities = {
+        "trek_names": [trek.capitalize() for trek in LEGACY_TREKS if trek in text_lower],
+        "numbers": re.findall(r"\b\d+\b", text),
+        "prices": re.findall(r"[₹Rs.]*\s*\d+[kK]?", text),
+        "dates": [],
+    }
+    for pattern in [
+        r"\b(january|february|march|april|may|june|july|august|september|october|november|december)\b",
+        r"\b(jan|feb|mar|apr|jun|jul|aug|sep|oct|nov|dec)\b",
+        r"(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})",
+    ]:
+        entities["dates"].extend(re.findall(pattern, text_lower))
+    return entities
+
+
+def legacy_unsubscribe(text):
+    text_lower = text.lower().strip()
+    return any(keyword in text_lower for keyword in LEGACY_UNSUBSCRIBE)
+
+
+def legacy_ban_risk(text):
+    text_lower = text.lower()
+    words = text_lower.split()
+    word_freq = {}
+    for word in words:
+        word_freq[word] = word_freq.get(word, 0) + 1
+    checks = [
+        (len(re.findall(r"[😀-🙏🌀-🗿]", text)) > 8, 15),
+        (len([c for c in text if c.isupper()]) / len(text) > 0.3 if text else False, 15),
+        (any(count > 3 for count in word_freq.values()), 12),
+        (len(re.findall(r"http[s]?://|www\.", text)) > 2, 18),
+        (sum(1 for keyword in LEGACY_PROMOTIONAL if keyword in text_lower) >= 3, 20),
+        (any(re.search(pattern, text_lower) for pattern in LEGACY_CLICKBAIT), 15),
+    ]
+    return min(sum(weight for triggered, weight in checks if triggered), 100)
+
+
+def legacy_pipeline(text):
+    return {
+        "language": legacy_language(text),
+        "intent": legacy_intent(text),
+        "sentiment": legacy_sentiment(text),
+        "entities": legacy_entities(text),
+        "unsubscribe": legacy_unsubscribe(text),
+        "risk_score": legacy_ban_risk(text),
+    }
+
+
+def single_pass_pipeline(text):
+    signals = scan_message(text)
+    risk_score = min(
+        sum(factor["weight"] for factor in WhatsAppSafety.BAN_RISK_FACTORS.values() if factor["check"](signals)),
+        100,
+    )
+    return {
+        "language": signals.language,
+        "intent": signals.intent()["primary_intent"],
+        "sentiment": signals.sentiment()["sentiment"],
+        "entities": signals.entities(),
+        "unsubscribe": bool(signals.unsubscribe_keywords),
+        "risk_score": risk_score,
+    }
+
+
+def time_pipeline(pipeline, corpus, repeat):
+    best = float("inf")
+    results = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [pipeline(text) for text in corpus]
+        best = min(best, time.perf_counter() - start)
+    return best, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.messages, args.seed)
+    print(f"Corpus: {len(corpus)} messages, {len(set(corpus))} distinct, "
+          f"avg {sum(map(len, corpus)) / len(corpus):.0f} chars")
+    if TextBlob is None:
+        print("textblob not installed: legacy timings exclude sentiment")
+
+    legacy_time, legacy = time_pipeline(legacy_pipeline, corpus, args.repeat)
+    single_time, single = time_pipeline(single_pass_pipeline, corpus, args.repeat)
+
+    n = len(corpus)
+    print(f"\nLegacy (per-method scans): {legacy_time:.3f}s  ({legacy_time / n * 1e6:.1f} µs/message)")
+    print(f"Single pass:               {single_time:.3f}s  ({single_time / n * 1e6:.1f} µs/message)")
+    print(f"Speedup:                   {legacy_time / single_time:.1f}x")
+
+    print("\nAgreement with legacy:")
+    for key in ("language", "intent", "unsubscribe", "risk_score"):
+        same = sum(1 for old, new in zip(legacy, single) if old[key] == new[key])
+        print(f"  {key:<12} {same / n:6.1%}")
+    same = sum(1 for old, new in zip(legacy, single) if old["entities"]["trek_names"] == new["entities"]["trek_names"])
+    print(f"  {'trek_names':<12} {same / n:6.1%}")
+    if TextBlob is not None:
+        same = sum(1 for old, new in zip(legacy, single) if old["sentiment"] == new["sentiment"])
+        print(f"  {'sentiment':<12} {same / n:6.1%}")
+
+    print("\nSample:")
+    for text, new in list(zip(corpus, single))[:5]:
+        print(f"  {text[:60]!r}\n    -> {new['intent']}, {new['sentiment']}, risk {new['risk_score']}, "
+              f"prices {new['entities']['prices']}, dates {new['entities']['dates']}")
+
+
+if __name__ == "__main__":
+    main()
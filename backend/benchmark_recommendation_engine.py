@@ -0,0 +1,354 @@
+#!/usr/bin/env python
+"""
+Benchmark vectorized hybrid scoring against per-user loops and the original engine
+
+Builds a synthetic engine in memory (no database rows needed) and times
+TripRecommendationEngine.score_users against two references:
+
+- the original DataFrame engine (dense users x users similarity, pandas
+  lookups), copied verbatim from before the sparse/vectorized rewrite. It
+  needs users^2 x 8 bytes, so it runs on the first --baseline-users users
+  only; its rankings are not compared because its scoring differs (all
+  users' similarities, no kNN cut-off).
+- a reimplementation of the per-user defaultdict loops on top of the
+  sparse matrices (not the original code: it also keeps only positively
+  similar neighbours, like the vectorized path), whose rankings are
+  compared with the batch path.
+
+Usage: python benchmark_recommendation_engine.py [--users 20000] [--trips 200] [--sample 500] [--baseline-users 2000]
+"""
+import os
+import sys
+import time
+import argparse
+from collections import defaultdict
+
+import django
+
+# Setup Django
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'travel_dashboard.settings')
+django.setup()
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.metrics.pairwise import cosine_similarity
+
+from ml_models.trip_recommendation_engine import TripRecommendationEngine
+
+
+def build_engine(n_users, n_trips, n_features=24, interactions_per_user=6, seed=42):
+    """Populate an engine with a random sparse interaction matrix and trip features"""
+    rng = np.random.default_rng(seed)
+    rows = np.repeat(np.arange(n_users), interactions_per_user)
+    cols = rng.integers(0, n_trips, size=rows.size)
+    values = rng.choice([1.0, 2.5, 3.0, 5.0], size=rows.size) * rng.uniform(0.5, 1.0, size=rows.size)
+
+    engine = TripRecommendationEngine()
+    engine.user_item_matrix = sparse.coo_matrix(
+        (values.astype(np.float32), (rows, cols)), shape=(n_users, n_trips)
+    ).tocsr()
+    engine.user_ids = np.arange(1, n_users + 1)
+    engine.trip_ids = np.arange(1, n_trips + 1)
+    engine.user_index = {user_id: idx for idx, user_id in enumerate(engine.user_ids.tolist())}
+    engine.trip_index = {trip_id: idx for idx, trip_id in enumerate(engine.trip_ids.tolist())}
+    engine.trip_features_matrix = rng.normal(size=(n_trips, n_features))
+    engine.compute_similarities()
+    return engine
+
+
+# --- Original engine (verbatim scoring code from before the rewrite) ---
+
+class BaselineEngine:
+    """The original pandas-backed engine's similarity and scoring methods"""
+
+    def __init__(self, engine, n_users):
+        self.user_item_matrix = pd.DataFrame(
+            engine.user_item_matrix[:n_users].toarray(), index=engine.user_ids[:n_users], columns=engine.trip_ids
+        )
+        self.trip_features_matrix = pd.DataFrame(engine.trip_features_matrix, index=engine.trip_ids)
+
+    def compute_similarities(self):
+        """Compute user-user and trip-trip similarity matrices"""
+        # User-user similarity (collaborative filtering)
+        if self.user_item_matrix.shape[0] > 1:
+            self.user_similarity_matrix = cosine_similarity(self.user_item_matrix)
+            self.user_similarity_matrix = pd.DataFrame(
+                self.user_similarity_matrix,
+                index=self.user_item_matrix.index,
+                columns=self.user_item_matrix.index
+            )
+        else:
+            self.user_similarity_matrix = pd.DataFrame()
+
+        # Trip-trip similarity (content-based + collaborative)
+        if self.trip_features_matrix.shape[0] > 1:
+            # Content-based similarity
+            content_similarity = cosine_similarity(self.trip_features_matrix)
+
+            # Collaborative similarity (if we have interaction data)
+            if self.user_item_matrix.shape[1] > 1:
+                collab_similarity = cosine_similarity(self.user_item_matrix.T)
+                # Combine content and collaborative similarity
+                self.trip_similarity_matrix = 0.7 * content_similarity + 0.3 * collab_similarity
+            else:
+                self.trip_similarity_matrix = content_similarity
+
+            self.trip_similarity_matrix = pd.DataFrame(
+                self.trip_similarity_matrix,
+                index=self.trip_features_matrix.index,
+                columns=self.trip_features_matrix.index
+            )
+        else:
+            self.trip_similarity_matrix = pd.DataFrame()
+
+    def get_user_based_recommendations(self, user_id, n_recommendations=5):
+        """Get user-based collaborative filtering recommendations"""
+        if self.user_similarity_matrix.empty or user_id not in self.user_similarity_matrix.index:
+            return []
+
+        # Find similar users
+        user_similarities = self.user_similarity_matrix.loc[user_id].sort_values(ascending=False)
+        similar_users = user_similarities.head(10).index.tolist()  # Top 10 similar users
+
+        # Get trips liked by similar users
+        user_trips = set()
+        if user_id in self.user_item_matrix.index:
+            user_trips = set(self.user_item_matrix.loc[user_id][self.user_item_matrix.loc[user_id] > 0].index)
+
+        recommendations = defaultdict(float)
+
+        for similar_user in similar_users:
+            if similar_user == user_id:
+                continue
+
+            similarity_score = user_similarities[similar_user]
+            user_ratings = self.user_item_matrix.loc[similar_user]
+
+            for trip_id, rating in user_ratings.items():
+                if rating > 0 and trip_id not in user_trips:
+                    recommendations[trip_id] += similarity_score * rating
+
+        # Sort and return top recommendations
+        sorted_recommendations = sorted(recommendations.items(), key=lambda x: x[1], reverse=True)
+        return [trip_id for trip_id, score in sorted_recommendations[:n_recommendations]]
+
+    def get_item_based_recommendations(self, user_id, n_recommendations=5):
+        """Get item-based collaborative filtering recommendations"""
+        if user_id not in self.user_item_matrix.index or self.trip_similarity_matrix.empty:
+            return []
+
+        # Get user's liked trips
+        user_ratings = self.user_item_matrix.loc[user_id]
+        liked_trips = user_ratings[user_ratings > 2].index.tolist()  # Trips with rating > 2
+
+        if not liked_trips:
+            return []
+
+        recommendations = defaultdict(float)
+
+        for liked_trip in liked_trips:
+            if liked_trip in self.trip_similarity_matrix.index:
+                similar_trips = self.trip_similarity_matrix.loc[liked_trip].sort_values(ascending=False)
+                user_rating = user_ratings[liked_trip]
+
+                for similar_trip, similarity in similar_trips.head(10).items():
+                    if similar_trip not in user_ratings.index or user_ratings[similar_trip] == 0:
+                        recommendations[similar_trip] += similarity * user_rating
+
+        # Sort and return top recommendations
+        sorted_recommendations = sorted(recommendations.items(), key=lambda x: x[1], reverse=True)
+        return [trip_id for trip_id, score in sorted_recommendations[:n_recommendations]]
+
+    def get_content_based_recommendations(self, user_id, n_recommendations=5):
+        """Get content-based recommendations"""
+        if user_id not in self.user_item_matrix.index or self.trip_features_matrix.empty:
+            return []
+
+        # Get user's preferred trip characteristics
+        user_ratings = self.user_item_matrix.loc[user_id]
+        liked_trips = user_ratings[user_ratings > 2].index.tolist()
+
+        if not liked_trips:
+            return []
+
+        # Average features of liked trips
+        liked_features = self.trip_features_matrix.loc[liked_trips]
+        user_profile = liked_features.mean()
+
+        # Find trips similar to user profile
+        all_trip_features = self.trip_features_matrix.copy()
+        user_trips = user_ratings[user_ratings > 0].index
+        all_trip_features = all_trip_features.drop(user_trips, errors='ignore')
+
+        if all_trip_features.empty:
+            return []
+
+        # Compute similarity to user profile
+        similarities = cosine_similarity([user_profile], all_trip_features)[0]
+        similar_indices = np.argsort(similarities)[::-1]
+
+        recommendations = []
+        for idx in similar_indices[:n_recommendations]:
+            trip_id = all_trip_features.index[idx]
+            recommendations.append(trip_id)
+
+        return recommendations
+
+    def get_hybrid_recommendations(self, user_id, n_recommendations=5, weights=None):
+        """Get hybrid recommendations combining multiple approaches"""
+        if weights is None:
+            weights = {
+                'user_based': 0.3,
+                'item_based': 0.3,
+                'content_based': 0.4
+            }
+
+        # Get recommendations from each method
+        user_based = self.get_user_based_recommendations(user_id, n_recommendations * 2)
+        item_based = self.get_item_based_recommendations(user_id, n_recommendations * 2)
+        content_based = self.get_content_based_recommendations(user_id, n_recommendations * 2)
+
+        # Combine with weights
+        recommendation_scores = defaultdict(float)
+
+        for i, trip_id in enumerate(user_based):
+            recommendation_scores[trip_id] += weights['user_based'] * (1 / (i + 1))
+
+        for i, trip_id in enumerate(item_based):
+            recommendation_scores[trip_id] += weights['item_based'] * (1 / (i + 1))
+
+        for i, trip_id in enumerate(content_based):
+            recommendation_scores[trip_id] += weights['content_based'] * (1 / (i + 1))
+
+        # Sort by combined score
+        sorted_recommendations = sorted(recommendation_scores.items(), key=lambda x: x[1], reverse=True)
+
+        # Return top recommendations
+        return [trip_id for trip_id, score in sorted_recommendations[:n_recommendations]]
+
+
+# --- Per-user loops on the sparse engine (a reimplementation, compared for ranking agreement) ---
+
+def legacy_user_based(engine, user_id, n_recommendations):
+    user_idx = engine.user_index[user_id]
+    user_vector = engine.user_item_matrix[user_idx].toarray().ravel()
+    norm = np.linalg.norm(user_vector)
+    k = min(engine.n_neighbors, engine.normalized_user_matrix.shape[0] - 1)
+    if k <= 0 or norm == 0:
+        return []
+    similarities = engine.normalized_user_matrix @ (user_vector / norm)
+    similarities[user_idx] = -np.inf
+    top = np.argpartition(-similarities, k - 1)[:k]
+    top = top[np.argsort(-similarities[top], kind='stable')]
+    top = top[similarities[top] > 0]
+
+    user_trips = set(np.flatnonzero(user_vector > 0).tolist())
+    recommendations = defaultdict(float)
+    for similar_user, similarity_score in zip(top, similarities[top]):
+        user_ratings = engine.user_item_matrix[similar_user]
+        for trip_idx, rating in zip(user_ratings.indices, user_ratings.data):
+            if rating > 0 and trip_idx not in user_trips:
+                recommendations[trip_idx] += similarity_score * rating
+    ranked = sorted(recommendations.items(), key=lambda x: x[1], reverse=True)
+    return engine.trip_ids_at([trip_idx for trip_idx, score in ranked[:n_recommendations]])
+
+
+def legacy_item_based(engine, user_id, n_recommendations):
+    user_ratings = engine.user_item_matrix[engine.user_index[user_id]].toarray().ravel()
+    liked_trips = np.flatnonzero(user_ratings > 2)
+    recommendations = defaultdict(float)
+    for liked_trip in liked_trips:
+        similarities = engine.trip_similarity_matrix[liked_trip]
+        for similar_trip in np.argsort(-similarities, kind='stable')[:10]:
+            if user_ratings[similar_trip] == 0:
+                recommendations[similar_trip] += similarities[similar_trip] * user_ratings[liked_trip]
+    ranked = sorted(recommendations.items(), key=lambda x: x[1], reverse=True)
+    return engine.trip_ids_at([trip_idx for trip_idx, score in ranked[:n_recommendations]])
+
+
+def legacy_content_based(engine, user_id, n_recommendations):
+    user_ratings = engine.user_item_matrix[engine.user_index[user_id]].toarray().ravel()
+    liked_trips = np.flatnonzero(user_ratings > 2)
+    candidate_trips = np.flatnonzero(user_ratings <= 0)
+    if liked_trips.size == 0 or candidate_trips.size == 0:
+        return []
+    user_profile = engine.trip_features_matrix[liked_trips].mean(axis=0)
+    similarities = cosine_similarity(user_profile[np.newaxis, :], engine.trip_features_matrix[candidate_trips])[0]
+    return engine.trip_ids_at(candidate_trips[np.argsort(similarities)[::-1][:n_recommendations]])
+
+
+def legacy_hybrid(engine, user_id, n_recommendations=5):
+    weights = {'user_based': 0.3, 'item_based': 0.3, 'content_based': 0.4}
+    recommendation_scores = defaultdict(float)
+    for method, recommender in (
+        ('user_based', legacy_user_based),
+        ('item_based', legacy_item_based),
+        ('content_based', legacy_content_based),
+    ):
+        for i, trip_id in enumerate(recommender(engine, user_id, n_recommendations * 2)):
+            recommendation_scores[trip_id] += weights[method] * (1 / (i + 1))
+    ranked = sorted(recommendation_scores.items(), key=lambda x: x[1], reverse=True)
+    return [trip_id for trip_id, score in ranked[:n_recommendations]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--trips', type=int, default=200)
+    parser.add_argument('--sample', type=int, default=500, help='Users scored by both implementations')
+    parser.add_argument('--baseline-users', type=int, default=2000,
+                        help='Users loaded into the original engine (dense users x users similarity; 0 to skip)')
+    args = parser.parse_args()
+
+    print("⏱️ Recommendation Engine Scoring Benchmark")
+    print("=" * 50)
+
+    engine = build_engine(args.users, args.trips)
+    sample = engine.user_ids[:args.sample].tolist()
+    print(f"📊 {args.users} users × {args.trips} trips, {engine.user_item_matrix.nnz} interactions, {len(sample)} users scored")
+
+    baseline_users = min(args.baseline_users, args.users)
+    if baseline_users:
+        baseline = BaselineEngine(engine, baseline_users)
+        start = time.perf_counter()
+        baseline.compute_similarities()
+        baseline_build_seconds = time.perf_counter() - start
+        baseline_sample = [user_id for user_id in sample if user_id <= baseline_users]
+        start = time.perf_counter()
+        for user_id in baseline_sample:
+            baseline.get_hybrid_recommendations(user_id)
+        baseline_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    legacy = [legacy_hybrid(engine, user_id) for user_id in sample]
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    single = [engine.get_hybrid_recommendations(user_id) for user_id in sample]
+    single_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = engine.score_users(sample)
+    batch_seconds = time.perf_counter() - start
+
+    agreement = np.mean([a == b for a, b in zip(legacy, batch)])
+    consistent = all(a == b for a, b in zip(single, batch))
+
+    if baseline_users:
+        print(f"🐌 Original engine ({baseline_users} users): similarities {baseline_build_seconds:.3f}s, "
+              f"{baseline_seconds / len(baseline_sample) * 1000:.2f} ms/user over {len(baseline_sample)} users")
+    print(f"🐢 Loops (reimpl.):    {legacy_seconds:8.3f}s ({legacy_seconds / len(sample) * 1000:.2f} ms/user)")
+    print(f"🔁 Vectorized, 1 user: {single_seconds:8.3f}s ({single_seconds / len(sample) * 1000:.2f} ms/user)")
+    print(f"🚀 Vectorized, batch:  {batch_seconds:8.3f}s ({batch_seconds / len(sample) * 1000:.2f} ms/user)")
+    if baseline_users:
+        print(f"⚡ Batch speedup vs original engine: "
+              f"{baseline_seconds / len(baseline_sample) / (batch_seconds / len(sample)):.1f}x per user")
+    print(f"⚡ Batch speedup vs loop reimplementation: {legacy_seconds / batch_seconds:.1f}x")
+    print(f"✅ Identical rankings to the loop reimplementation: {agreement * 100:.1f}% (differences are ties in score order)")
+    print(f"✅ Single-user and batch paths agree: {consistent}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Materialized admin dashboard statistics
+
+get_admin_dashboard_stats and AdminLeadViewSet.list read one
+AdminStatsSnapshot row instead of counting Lead, OutboundMessage, Payment
+and Task on every page load. The snapshot is rebuilt by
+
+    python manage.py refresh_admin_stats --loop
+
+every ADMIN_STATS_REFRESH_SECONDS, with one conditional-aggregation query
+per table. Responses carry the snapshot's age; it is flagged stale past
+ADMIN_STATS_MAX_AGE_SECONDS (e.g. the refresher is not running), and the
+first read on an empty table builds it inline.
+"""
+
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import AdminStatsSnapshot, Lead, OutboundMessage, Payment, Task
+
+logger = logging.getLogger(__name__)
+
+DASHBOARD_KEY = 'dashboard'
+
+
+def compute_admin_dashboard_stats(now=None):
+    """The full admin dashboard payload, four aggregate queries regardless of table size"""
+    now = now or timezone.now()
+    today = now.date()
+    week_ago = today - timedelta(days=7)
+
+    leads = Lead.objects.aggregate(
+        total=Count('id'),
+        new_today=Count('id', filter=Q(created_at__date=today)),
+        new_week=Count('id', filter=Q(created_at__date__gte=week_ago)),
+        hot=Count('id', filter=Q(qualification_score__qualification_status='hot')),
+        warm=Count('id', filter=Q(qualification_score__qualification_status='warm')),
+        cold=Count('id', filter=Q(qualification_score__qualification_status='cold')),
+        converted=Count('id', filter=Q(stage='completed')),
+        whatsapp=Count('id', filter=Q(is_whatsapp=True)),
+    )
+    messages_sent = OutboundMessage.objects.filter(created_at__date=today, status='sent').count()
+    payments = Payment.objects.filter(status='verified').aggregate(revenue=Sum('amount'), verified=Count('id'))
+    tasks = Task.objects.filter(status='open').aggregate(
+        open=Count('id'),
+        overdue=Count('id', filter=Q(due_at__lt=now)),
+    )
+
+    total_leads = leads['total']
+    conversion_rate = (leads['converted'] / total_leads * 100) if total_leads > 0 else 0
+    return {
+        'leads': {
+            'total': total_leads,
+            'new_today': leads['new_today'],
+            'new_week': leads['new_week'],
+            'hot': leads['hot'],
+            'warm': leads['warm'],
+            'cold': leads['cold'],
+            'converted': leads['converted'],
+            'conversion_rate': round(conversion_rate, 2),
+        },
+        'whatsapp': {
+            'total_leads': leads['whatsapp'],
+            'messages_sent_today': messages_sent,
+        },
+        'revenue': {
+            'total': float(payments['revenue'] or 0),
+            'verified_payments': payments['verified'],
+        },
+        'tasks': {
+            'open': tasks['open'],
+            'overdue': tasks['overdue'],
+        }
+    }
+
+
+def refresh_admin_stats_snapshot():
+    """Recompute the dashboard statistics and store them as the current snapshot"""
+    started = time.perf_counter()
+    computed_at = timezone.now()
+    stats = compute_admin_dashboard_stats(computed_at)
+    compute_ms = int((time.perf_counter() - started) * 1000)
+    snapshot, _ = AdminStatsSnapshot.objects.update_or_create(
+        key=DASHBOARD_KEY,
+        defaults={'stats': stats, 'computed_at': computed_at, 'compute_ms': compute_ms},
+    )
+    logger.info("Refreshed admin stats snapshot in %sms", compute_ms)
+    return snapshot
+
+
+def get_admin_stats_snapshot():
+    """The current snapshot (one row read), built inline only if none exists yet"""
+    snapshot = AdminStatsSnapshot.objects.filter(key=DASHBOARD_KEY).first()
+    if snapshot is None:
+        snapshot = refresh_admin_stats_snapshot()
+    return snapshot
+
+
+def snapshot_freshness(snapshot):
+    age = max(0.0, (timezone.now() - snapshot.computed_at).total_seconds())
+    return {
+        'computed_at': snapshot.computed_at.isoformat(),
+        'age_seconds': round(age, 1),
+        'stale': age > getattr(settings, 'ADMIN_STATS_MAX_AGE_SECONDS', 300),
+        'compute_ms': snapshot.compute_ms,
+    }
@@ -4,19 +4,49 @@ Simple file upload endpoint for non-technical users
 """
 from rest_framework import viewsets, status, serializers
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.pagination import CursorPagination
 from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 from django.utils.text import slugify
 from django.utils import timezone
-from django.db.models import Q, Count, Sum
+from django.db.models import Q, Count, Sum, OuterRef, Prefetch, Subquery
+from django.db.models.fields.json import KeyTextTransform
 from datetime import timedelta
 from core.models import Trip, Lead, LeadEvent, Task, OutboundMessage, Payment, Booking
+from core.admin_stats import get_admin_stats_snapshot, refresh_admin_stats_snapshot, snapshot_freshness
+from core.exports import ExportError, streaming_export_response
 from services.whatsapp_api import WhatsAppAPI
 import re
 
 
 # Admin API Serializers
+RECENT_LEAD_EVENTS = 20
+RECENT_LEAD_MESSAGES = 10
+
+
+def prefetch_lead_activity(queryset):
+    """
+    Load what AdminLeadSerializer nests in three queries for the whole page:
+    the latest RECENT_LEAD_EVENTS events and RECENT_LEAD_MESSAGES messages
+    per lead (sliced prefetches, ranked per lead in SQL) and all tasks
+    """
+    return queryset.prefetch_related(
+        Prefetch(
+            'events',
+            queryset=LeadEvent.objects.order_by('-created_at', '-id')[:RECENT_LEAD_EVENTS],
+            to_attr='recent_events',
+        ),
+        Prefetch('tasks', queryset=Task.objects.order_by('id'), to_attr='prefetched_tasks'),
+        Prefetch(
+            'outbound_messages',
+            queryset=OutboundMessage.objects.order_by('-created_at', '-id')[:RECENT_LEAD_MESSAGES],
+            to_attr='recent_messages',
+        ),
+    )
+
+
 class AdminLeadSerializer(serializers.ModelSerializer):
+    """Nested activity is read from prefetch_lead_activity(); unprefetched leads query it per lead"""
     events = serializers.SerializerMethodField()
     tasks = serializers.SerializerMethodField()
     messages = serializers.SerializerMethodField()
@@ -31,15 +61,21 @@ class AdminLeadSerializer(serializers.ModelSerializer):
         ]
 
     def get_events(self, obj):
-        events = obj.events.all()[:20]  # Last 20 events
+        events = getattr(obj, 'recent_events', None)
+        if events is None:
+            events = obj.events.order_by('-created_at', '-id')[:RECENT_LEAD_EVENTS]
         return AdminLeadEventSerializer(events, many=True).data
 
     def get_tasks(self, obj):
-        tasks = obj.tasks.all()
+        tasks = getattr(obj, 'prefetched_tasks', None)
+        if tasks is None:
+            tasks = obj.tasks.order_by('id')
         return AdminTaskSerializer(tasks, many=True).data
 
     def get_messages(self, obj):
-        messages = obj.outbound_messages.all()[:10]  # Last 10 messages
+        messages = getattr(obj, 'recent_messages', None)
+        if messages is None:
+            messages = obj.outbound_messages.order_by('-created_at', '-id')[:RECENT_LEAD_MESSAGES]
         return AdminOutboundMessageSerializer(messages, many=True).data
 
 
@@ -91,46 +127,33 @@ class AdminLeadViewSet(viewsets.ModelViewSet):
                 Q(phone__icontains=search)
             )
 
-        return queryset.order_by('-created_at')
+        return prefetch_lead_activity(queryset.order_by('-created_at'))
 
     def list(self, request, *args, **kwargs):
         """Get all leads with real-time stats"""
         response = super().list(request, *args, **kwargs)
 
-        # Add stats
-        total_leads = Lead.objects.count()
-        hot_leads = Lead.objects.filter(qualification_score__qualification_status='hot').count()
-        warm_leads = Lead.objects.filter(qualification_score__qualification_status='warm').count()
+        # Add stats (from the materialized snapshot, see core.admin_stats)
+        snapshot = get_admin_stats_snapshot()
+        lead_stats = snapshot.stats['leads']
 
         response.data = {
             'leads': response.data,
             'stats': {
-                'total': total_leads,
-                'hot': hot_leads,
-                'warm': warm_leads,
-                'cold': total_leads - hot_leads - warm_leads,
-            }
+                'total': lead_stats['total'],
+                'hot': lead_stats['hot'],
+                'warm': lead_stats['warm'],
+                'cold': lead_stats['total'] - lead_stats['hot'] - lead_stats['warm'],
+            },
+            'stats_freshness': snapshot_freshness(snapshot),
         }
         return response
 
     def retrieve(self, request, *args, **kwargs):
-        """Get single lead with full context"""
+        """Get single lead with full context (events, tasks and messages are prefetched)"""
         lead = self.get_object()
         serializer = self.get_serializer(lead)
-
-        # Add related data
-        data = serializer.data
-        data['events'] = AdminLeadEventSerializer(
-            lead.events.all()[:20], many=True
-        ).data
-        data['tasks'] = AdminTaskSerializer(
-            lead.tasks.all(), many=True
-        ).data
-        data['messages'] = AdminOutboundMessageSerializer(
-            lead.outbound_messages.all()[:10], many=True
-        ).data
-
-        return Response(data)
+        return Response(serializer.data)
 
     def update(self, request, *args, **kwargs):
         """Update lead and create audit trail"""
@@ -154,50 +177,76 @@ class AdminLeadViewSet(viewsets.ModelViewSet):
         return response
 
 
+class ConversationCursorPagination(CursorPagination):
+    ordering = ('-last_contact_at', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
 class AdminWhatsAppViewSet(viewsets.ViewSet):
     """WhatsApp conversation management for admin"""
     permission_classes = [IsAdminUser]
 
     @api_view(['GET'])
     def get_conversations(request):
-        """Get all active conversations"""
-        leads = Lead.objects.filter(is_whatsapp=True).order_by('-last_contact_at')
-
-        conversations = []
-        for lead in leads:
-            last_message = lead.events.filter(
-                type__in=['inbound_msg', 'outbound_msg']
-            ).order_by('-created_at').first()
-
-            conversations.append({
-                'lead_id': lead.id,
-                'name': lead.name,
-                'phone': lead.phone,
-                'last_message': last_message.payload.get('text') if last_message else '',
-                'last_contact': lead.last_contact_at.isoformat() if lead.last_contact_at else None,
-                'stage': lead.stage,
-                'unread_count': lead.events.filter(
-                    type='inbound_msg',
-                    payload__read=False
-                ).count()
-            })
+        """
+        Get active conversations, most recently contacted first
+
+        One query per page: the last message comes from a correlated subquery
+        on the (lead, -created_at) index and unread counts from
+        Lead.unread_count. Paginated with ?cursor= (next/previous links).
+        Every WhatsApp lead has a last_contact_at (backfilled in migration
+        0025 and defaulted on save); the null filter only guards rows
+        written by bulk paths, which have no cursor position.
+        """
+        last_message = (
+            LeadEvent.objects
+            .filter(lead=OuterRef('pk'), type__in=['inbound_msg', 'outbound_msg'])
+            .order_by('-created_at', '-id')
+            .annotate(text=KeyTextTransform('text', 'payload'))
+            .values('text')[:1]
+        )
+        leads = (
+            Lead.objects
+            .filter(is_whatsapp=True, last_contact_at__isnull=False)
+            .annotate(last_message=Subquery(last_message))
+            .only('id', 'name', 'phone', 'stage', 'last_contact_at', 'unread_count')
+        )
+        paginator = ConversationCursorPagination()
+        page = paginator.paginate_queryset(leads, request)
+
+        conversations = [{
+            'lead_id': lead.id,
+            'name': lead.name,
+            'phone': lead.phone,
+            'last_message': lead.last_message or '',
+            'last_contact': lead.last_contact_at.isoformat(),
+            'stage': lead.stage,
+            'unread_count': lead.unread_count,
+        } for lead in page]
 
         return Response({
             'conversations': conversations,
-            'total': len(conversations)
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
         })
 
     @api_view(['GET'])
     def get_conversation_messages(request, lead_id):
         """Get all messages for a conversation"""
         try:
-            lead = Lead.objects.get(id=lead_id)
+            lead = prefetch_lead_activity(Lead.objects).get(id=lead_id)
         except Lead.DoesNotExist:
             return Response({'error': 'Lead not found'}, status=404)
 
         events = lead.events.filter(
             type__in=['inbound_msg', 'outbound_msg']
         ).order_by('created_at')
+        # Opening the conversation reads it
+        if lead.unread_count:
+            Lead.objects.filter(id=lead.id).update(unread_count=0)
+            lead.unread_count = 0
 
         messages = []
         for event in events:
@@ -260,78 +309,26 @@ class AdminWhatsAppViewSet(viewsets.ViewSet):
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
 def get_admin_dashboard_stats(request):
-    """Get comprehensive admin dashboard statistics"""
-    from django.utils import timezone
-    from datetime import timedelta
-
-    # Time periods
-    today = timezone.now().date()
-    week_ago = today - timedelta(days=7)
-    month_ago = today - timedelta(days=30)
-
-    # Lead stats
-    total_leads = Lead.objects.count()
-    new_leads_today = Lead.objects.filter(created_at__date=today).count()
-    new_leads_week = Lead.objects.filter(created_at__date__gte=week_ago).count()
-
-    # Qualification stats
-    hot_leads = Lead.objects.filter(
-        qualification_score__qualification_status='hot'
-    ).count()
-    warm_leads = Lead.objects.filter(
-        qualification_score__qualification_status='warm'
-    ).count()
-    cold_leads = Lead.objects.filter(
-        qualification_score__qualification_status='cold'
-    ).count()
-
-    # Conversion stats
-    converted_leads = Lead.objects.filter(stage='completed').count()
-    conversion_rate = (converted_leads / total_leads * 100) if total_leads > 0 else 0
-
-    # WhatsApp stats
-    whatsapp_leads = Lead.objects.filter(is_whatsapp=True).count()
-    messages_sent = OutboundMessage.objects.filter(
-        created_at__date=today,
-        status='sent'
-    ).count()
-
-    # Payment stats
-    total_revenue = Payment.objects.filter(
-        status='verified'
-    ).aggregate(Sum('amount'))['amount__sum'] or 0
-
-    # Task stats
-    open_tasks = Task.objects.filter(status='open').count()
-    overdue_tasks = Task.objects.filter(
-        status='open',
-        due_at__lt=timezone.now()
-    ).count()
+    """
+    Get comprehensive admin dashboard statistics
 
-    return Response({
-        'leads': {
-            'total': total_leads,
-            'new_today': new_leads_today,
-            'new_week': new_leads_week,
-            'hot': hot_leads,
-            'warm': warm_leads,
-            'cold': cold_leads,
-            'converted': converted_leads,
-            'conversion_rate': round(conversion_rate, 2),
-        },
-        'whatsapp': {
-            'total_leads': whatsapp_leads,
-            'messages_sent_today': messages_sent,
-        },
-        'revenue': {
-            'total': float(total_revenue),
-            'verified_payments': Payment.objects.filter(status='verified').count(),
-        },
-        'tasks': {
-            'open': open_tasks,
-            'overdue': overdue_tasks,
-        }
-    })
+    Served from the materialized snapshot; ?refresh=true recomputes it first.
+    """
+    if request.query_params.get('refresh', '').lower() in ('1', 'true', 'yes'):
+        snapshot = refresh_admin_stats_snapshot()
+    else:
+        snapshot = get_admin_stats_snapshot()
+    return Response({**snapshot.stats, 'freshness': snapshot_freshness(snapshot)})
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def export_dataset(request, dataset):
+    """Stream leads, bookings, payments or lead events as CSV/JSONL (see core.exports)"""
+    try:
+        return streaming_export_response(dataset, request.query_params)
+    except ExportError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
 def parse_trip_text(content: str):
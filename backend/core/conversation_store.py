@@ -0,0 +1,377 @@
+"""
+Shared, bounded WhatsApp conversation store
+
+One store backs WhatsAppConversationManager, ConversationMemory and
+MultiLLMRAGService's conversation cache:
+
+- each phone keeps its last CONVERSATION_STORE_HISTORY messages in a ring
+  buffer (deque with maxlen), plus a small dialogue-state dict
+- at most CONVERSATION_STORE_MAX_CONVERSATIONS phones stay in memory; the
+  least recently used are evicted, as are conversations idle for longer
+  than CONVERSATION_STORE_IDLE_SECONDS
+- writes are buffered and flushed in bulk by a background thread
+  (write-behind) to WhatsAppMessage / WhatsAppConversation, so a cache
+  miss, a restart or another worker rebuilds the same history
+- a cached conversation is revalidated against its row's message_count at
+  most every CONVERSATION_STORE_REVALIDATE_SECONDS, so messages written by
+  other workers show up after their next flush
+
+Usage:
+    store = get_conversation_store()
+    store.append(phone, 'user', text)
+    history = store.history(phone, limit=10)
+"""
+
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import WhatsAppConversation, WhatsAppMessage
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL_SECONDS = 1.0
+FLUSH_BATCH_SIZE = 200
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+@dataclass
+class Conversation:
+    """In-memory view of one phone's conversation"""
+    phone: str
+    messages: deque
+    state: Dict[str, Any] = field(default_factory=dict)
+    persisted_count: int = 0
+    checked_at: float = 0.0
+    last_access: float = field(default_factory=time.monotonic)
+
+
+class ConversationStore:
+    """Ring-buffered conversations with LRU eviction and write-behind persistence"""
+
+    def __init__(self, history_size=None, max_conversations=None, idle_seconds=None):
+        self.history_size = history_size or _setting('CONVERSATION_STORE_HISTORY', 50)
+        self.max_conversations = max_conversations or _setting('CONVERSATION_STORE_MAX_CONVERSATIONS', 5000)
+        self.idle_seconds = idle_seconds or _setting('CONVERSATION_STORE_IDLE_SECONDS', 1800)
+        self.revalidate_seconds = _setting('CONVERSATION_STORE_REVALIDATE_SECONDS', 2)
+        self._conversations: 'OrderedDict[str, Conversation]' = OrderedDict()
+        self._pending_messages: List[Dict] = []
+        self._pending_state: Dict[str, Dict] = {}
+        # The batch a flush is writing, still visible to reloads until it commits
+        self._inflight_messages: List[Dict] = []
+        self._inflight_state: Dict[str, Dict] = {}
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._flusher = None
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def history(self, phone: str, limit: Optional[int] = None) -> List[Dict]:
+        """Most recent messages for ``phone``, oldest first"""
+        conversation = self._get(phone)
+        with self._lock:
+            messages = list(conversation.messages)
+        return messages[-limit:] if limit else messages
+
+    def state(self, phone: str) -> Dict[str, Any]:
+        conversation = self._get(phone)
+        with self._lock:
+            return dict(conversation.state)
+
+    def exists(self, phone: str) -> bool:
+        conversation = self._get(phone)
+        with self._lock:
+            return bool(conversation.messages or conversation.state)
+
+    # ------------------------------------------------------------------
+    # Writes (buffered, persisted by the flusher)
+    # ------------------------------------------------------------------
+
+    def append(self, phone: str, role: str, content: str, metadata: Optional[Dict] = None) -> Dict:
+        """Add a message to the conversation; returns the stored message"""
+        now = timezone.now()
+        message = {
+            'role': role,
+            'content': content,
+            'timestamp': now,
+            # Round-trip so the write-behind never meets a non-JSON value
+            'metadata': json.loads(json.dumps(metadata or {}, default=str)),
+        }
+        message_id = str(message['metadata'].get('message_id') or f"conv_{uuid.uuid4().hex}")[:100]
+        conversation = self._get(phone)
+        with self._lock:
+            # A concurrent reload may have replaced the cached object since _get returned
+            conversation = self._conversations.get(phone, conversation)
+            conversation.messages.append(message)
+            if 'conversation_id' not in conversation.state:
+                conversation.state['conversation_id'] = f"conv_{phone}_{now.timestamp()}"
+                self._pending_state.setdefault(phone, {})['conversation_id'] = conversation.state['conversation_id']
+            self._pending_messages.append({'phone': phone, 'message_id': message_id, **message})
+            pending = len(self._pending_messages)
+        self._schedule_flush(immediate=pending >= FLUSH_BATCH_SIZE)
+        return message
+
+    def update_state(self, phone: str, **changes) -> Dict[str, Any]:
+        """Merge ``changes`` into the conversation's dialogue state"""
+        changes = json.loads(json.dumps(changes, default=str))
+        conversation = self._get(phone)
+        with self._lock:
+            conversation = self._conversations.get(phone, conversation)
+            conversation.state.update(changes)
+            self._pending_state.setdefault(phone, {}).update(changes)
+            state = dict(conversation.state)
+        self._schedule_flush()
+        return state
+
+    def reset(self, phone: str):
+        """Start a fresh conversation: earlier messages stay logged but leave the history"""
+        self.flush()
+        state = {'started_at': timezone.now().isoformat()}
+        persisted_count = self._load_count(phone)
+        with self._lock:
+            self._conversations[phone] = Conversation(
+                phone, deque(maxlen=self.history_size), dict(state),
+                persisted_count=persisted_count, checked_at=time.monotonic(),
+            )
+            self._conversations.move_to_end(phone)
+        WhatsAppConversation.objects.filter(phone_number=phone).update(state=state, status='active', resolved_at=None)
+
+    # ------------------------------------------------------------------
+    # Cache management
+    # ------------------------------------------------------------------
+
+    def _get(self, phone: str) -> Conversation:
+        """
+        Cached conversation for ``phone``, loaded or revalidated as needed
+
+        Called without the lock held: the revalidation count and the reload
+        query run outside it, so one conversation's round-trip never blocks
+        the others.
+        """
+        now = time.monotonic()
+        revalidate = False
+        with self._lock:
+            conversation = self._conversations.get(phone)
+            if conversation is not None:
+                self._conversations.move_to_end(phone)
+                conversation.last_access = now
+                if now - conversation.checked_at >= self.revalidate_seconds:
+                    conversation.checked_at = now
+                    revalidate = True
+                    persisted_count = conversation.persisted_count
+        if conversation is not None and not (revalidate and self._load_count(phone) != persisted_count):
+            return conversation
+
+        loaded, persisted_ids = self._load(phone)
+        with self._lock:
+            current = self._conversations.get(phone)
+            if current is not None and current is not conversation:
+                # Another thread reloaded it meanwhile
+                return current
+            self._merge_unflushed(loaded, persisted_ids)
+            self._conversations[phone] = loaded
+            self._conversations.move_to_end(phone)
+            self._evict(now)
+        return loaded
+
+    def _evict(self, now: float):
+        while len(self._conversations) > self.max_conversations:
+            self._conversations.popitem(last=False)
+        while self._conversations:
+            oldest = next(iter(self._conversations.values()))
+            if now - oldest.last_access < self.idle_seconds:
+                break
+            self._conversations.popitem(last=False)
+
+    def _load_count(self, phone: str) -> int:
+        count = WhatsAppConversation.objects.filter(phone_number=phone).values_list('message_count', flat=True).first()
+        return count or 0
+
+    def _load(self, phone: str):
+        """
+        Rebuild the ring buffer from the message log (without the lock held)
+
+        Returns the conversation and the message ids read, which
+        ``_merge_unflushed`` uses to skip a batch that committed while this
+        query ran. The count is read first, so it never covers messages the
+        rows miss.
+        """
+        row = WhatsAppConversation.objects.filter(phone_number=phone).values('message_count', 'state').first() or {}
+        state = dict(row.get('state') or {})
+        rows = WhatsAppMessage.objects.filter(phone_number=phone)
+        if state.get('started_at'):
+            rows = rows.filter(created_at__gte=state['started_at'])
+        rows = (
+            rows.order_by('-created_at', '-id')
+            .values('message_id', 'direction', 'message_text', 'created_at', 'metadata')[:self.history_size]
+        )
+        messages = deque(maxlen=self.history_size)
+        persisted_ids = set()
+        for item in reversed(list(rows)):
+            metadata = dict(item['metadata'] or {})
+            role = metadata.pop('role', None) or ('user' if item['direction'] == 'incoming' else 'assistant')
+            persisted_ids.add(item['message_id'])
+            messages.append({
+                'role': role,
+                'content': item['message_text'],
+                'timestamp': item['created_at'],
+                'metadata': metadata,
+            })
+        conversation = Conversation(
+            phone, messages, state,
+            persisted_count=row.get('message_count') or 0, checked_at=time.monotonic(),
+        )
+        return conversation, persisted_ids
+
+    def _merge_unflushed(self, conversation: Conversation, persisted_ids: set):
+        """Add the batch being flushed and the pending writes to a freshly loaded conversation (call with lock held)"""
+        phone = conversation.phone
+        for pending in self._inflight_messages + self._pending_messages:
+            if pending['phone'] == phone and pending['message_id'] not in persisted_ids:
+                conversation.messages.append(
+                    {key: value for key, value in pending.items() if key not in ('phone', 'message_id')}
+                )
+        conversation.state.update(self._inflight_state.get(phone, {}))
+        conversation.state.update(self._pending_state.get(phone, {}))
+
+    # ------------------------------------------------------------------
+    # Write-behind
+    # ------------------------------------------------------------------
+
+    def _schedule_flush(self, immediate: bool = False):
+        with self._lock:
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(target=self._run_flusher, name='conversation-flush', daemon=True)
+                self._flusher.start()
+        if immediate:
+            self._wakeup.set()
+
+    def _run_flusher(self):
+        while True:
+            self._wakeup.wait(FLUSH_INTERVAL_SECONDS)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Conversation store flush failed: {e}")
+            finally:
+                # The flusher thread owns its DB connection
+                connection.close()
+
+    def flush(self) -> int:
+        """
+        Persist buffered messages and state changes. Returns messages written.
+
+        The batch stays visible to reloads (as in-flight) until it commits.
+        A cached conversation's persisted_count then moves to the committed
+        count only if it matched the count before this batch; otherwise it
+        already missed other writers' messages and the next revalidation
+        reloads it.
+        """
+        with self._flush_lock:
+            with self._lock:
+                messages, self._pending_messages = self._pending_messages, []
+                states, self._pending_state = self._pending_state, {}
+                self._inflight_messages, self._inflight_state = messages, states
+            if not messages and not states:
+                return 0
+            try:
+                counts = self._persist(messages, states)
+            except Exception:
+                # Put the batch back so the next flush retries it
+                with self._lock:
+                    self._pending_messages = messages + self._pending_messages
+                    for phone, changes in states.items():
+                        self._pending_state[phone] = {**changes, **self._pending_state.get(phone, {})}
+                    self._inflight_messages, self._inflight_state = [], {}
+                raise
+            with self._lock:
+                self._inflight_messages, self._inflight_state = [], {}
+                for phone, (before, after) in counts.items():
+                    conversation = self._conversations.get(phone)
+                    if conversation is not None and conversation.persisted_count == before:
+                        conversation.persisted_count = after
+            return len(messages)
+
+    def _persist(self, messages: List[Dict], states: Dict[str, Dict]) -> Dict[str, tuple]:
+        """Write one batch in a transaction; returns ``{phone: (message_count before, after)}``"""
+        by_phone: Dict[str, List[Dict]] = {}
+        for message in messages:
+            by_phone.setdefault(message['phone'], []).append(message)
+
+        counts = {}
+        with transaction.atomic():
+            WhatsAppMessage.objects.bulk_create([
+                WhatsAppMessage(
+                    message_id=message['message_id'],
+                    phone_number=message['phone'],
+                    message_text=message['content'],
+                    direction='incoming' if message['role'] == 'user' else 'outgoing',
+                    status='delivered' if message['role'] == 'user' else 'sent',
+                    intent_detected=(message['metadata'] or {}).get('intent'),
+                    metadata={'role': message['role'], **(message['metadata'] or {})},
+                )
+                for message in messages
+            ], ignore_conflicts=True)
+
+            # Row locks keep the before/after counts exact against other workers' flushes
+            existing = {
+                row.phone_number: row
+                for row in WhatsAppConversation.objects.select_for_update().filter(
+                    phone_number__in=set(by_phone) | set(states)
+                )
+            }
+            for phone in set(by_phone) | set(states):
+                phone_messages = by_phone.get(phone, [])
+                incoming = sum(1 for message in phone_messages if message['role'] == 'user')
+                row = existing.get(phone)
+                if row is None:
+                    row = WhatsAppConversation.objects.create(
+                        phone_number=phone,
+                        first_message_at=phone_messages[0]['timestamp'] if phone_messages else None,
+                    )
+                updates = {}
+                if phone_messages:
+                    updates.update(
+                        message_count=F('message_count') + len(phone_messages),
+                        customer_message_count=F('customer_message_count') + incoming,
+                        agent_message_count=F('agent_message_count') + len(phone_messages) - incoming,
+                        last_message_at=phone_messages[-1]['timestamp'],
+                    )
+                    counts[phone] = (row.message_count, row.message_count + len(phone_messages))
+                if phone in states:
+                    updates['state'] = {**(row.state or {}), **states[phone]}
+                    if 'closed_at' in states[phone]:
+                        updates['status'] = 'closed'
+                        updates['resolved_at'] = timezone.now()
+                WhatsAppConversation.objects.filter(id=row.id).update(**updates)
+        return counts
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_conversation_store() -> ConversationStore:
+    """Process-wide conversation store"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ConversationStore()
+        return _store
@@ -0,0 +1,114 @@
+"""
+Logged-in dashboard read path (dashboard_summary, BookingViewSet.dashboard_stats)
+
+The app loads these on every open, so each is built from one
+conditional-aggregation query (``Count(filter=Q(...))``) plus the recent
+lists, and cached per user for DASHBOARD_CACHE_SECONDS. Booking, Wishlist
+and UserProfile signals drop a user's entries once their write commits;
+writes that skip signals (queryset.update, bulk_create) show up when the
+entry expires.
+"""
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Booking, TripRecommendation, Wishlist
+from .serializers import BookingSerializer, WishlistSerializer
+
+BOOKING_STATUSES = ('pending', 'confirmed', 'cancelled', 'completed')
+
+
+def summary_cache_key(user_id):
+    return f'dashboard:summary:{user_id}'
+
+
+def booking_stats_cache_key(user_id):
+    return f'dashboard:booking_stats:{user_id}'
+
+
+def invalidate_user_dashboard(user_id):
+    cache.delete_many([summary_cache_key(user_id), booking_stats_cache_key(user_id)])
+
+
+def cached_dashboard(key, build):
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data, getattr(settings, 'DASHBOARD_CACHE_SECONDS', 60))
+    return data
+
+
+def _count_for_user(model):
+    """Correlated COUNT(*) of ``model`` rows owned by the outer user"""
+    counts = model.objects.filter(user=OuterRef('pk')).order_by().values('user').annotate(n=Count('id')).values('n')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def build_dashboard_summary(user):
+    """
+    Counts and profile figures in one query, then the two recent lists
+
+    Completed trips are the user's completed bookings and adventure points
+    their profile's reward_points (0 without a profile).
+    """
+    row = (
+        User.objects.filter(pk=user.pk)
+        .annotate(
+            bookings_total=Count('booking'),
+            bookings_pending=Count('booking', filter=Q(booking__status='pending')),
+            bookings_confirmed=Count('booking', filter=Q(booking__status='confirmed')),
+            completed_trips=Count('booking', filter=Q(booking__status='completed')),
+            wishlist_count=_count_for_user(Wishlist),
+            recommendations_count=_count_for_user(TripRecommendation),
+            adventure_points=F('userprofile__reward_points'),
+        )
+        .values(
+            'bookings_total', 'bookings_pending', 'bookings_confirmed', 'wishlist_count',
+            'recommendations_count', 'completed_trips', 'adventure_points',
+        )
+        .get()
+    )
+    completed_trips = row['completed_trips']
+    adventure_points = row['adventure_points'] or 0
+
+    recent_bookings = Booking.objects.filter(user=user).order_by('-created_at')[:3]
+    recent_wishlist = Wishlist.objects.filter(user=user).select_related('trip').order_by('-created_at')[:3]
+
+    return {
+        'user': {
+            'id': user.id,
+            'name': user.first_name or user.username,
+            'email': user.email,
+            'completedTrips': completed_trips,
+            'adventurePoints': adventure_points,
+        },
+        'stats': {
+            'totalBookings': row['bookings_total'],
+            'pendingBookings': row['bookings_pending'],
+            'confirmedBookings': row['bookings_confirmed'],
+            'wishlistCount': row['wishlist_count'],
+            'recommendationsCount': row['recommendations_count'],
+            'completedTrips': completed_trips,
+            'adventurePoints': adventure_points,
+        },
+        'recentActivity': {
+            'bookings': BookingSerializer(recent_bookings, many=True).data,
+            'wishlist': WishlistSerializer(recent_wishlist, many=True).data,
+        }
+    }
+
+
+def build_booking_stats(bookings):
+    """Per-status counts of ``bookings`` in one query, plus the five most recent"""
+    stats = bookings.aggregate(
+        total=Count('id'),
+        **{name: Count('id', filter=Q(status=name)) for name in BOOKING_STATUSES},
+    )
+    recent = bookings.order_by('-created_at')[:5]
+    return {
+        'stats': stats,
+        'recent_bookings': BookingSerializer(recent, many=True).data
+    }
@@ -0,0 +1,165 @@
+"""
+Streaming CSV/JSONL exports (GET /api/admin/export/<dataset>/)
+
+Datasets: leads, bookings, payments, lead_events. Rows are produced while
+the response is being sent, so memory stays flat whatever the export size:
+
+- the table is walked in primary-key order by keyset (``pk > last``) in
+  batches of EXPORT_BATCH_SIZE, so no query or transaction stays open while
+  a slow client downloads, and a batch never re-reads earlier rows
+- each batch is read with ``.values()`` (no model instances) and
+  ``.iterator(chunk_size=...)`` (no queryset result cache)
+- CSV is written through an echo buffer, JSONL one JSON object per line;
+  CSV text cells starting with = + - @ tab or CR get a leading ``'`` so
+  spreadsheets show them as text instead of running them as formulas
+
+Query params: ``output=csv|jsonl`` (``format`` is DRF's renderer override),
+``created_after`` / ``created_before`` (ISO date or datetime) on every
+dataset, plus the per-dataset filters in DATASETS.
+"""
+
+import csv
+import json
+from datetime import datetime, time
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import BooleanField
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Booking, Lead, LeadEvent, Payment
+
+EXPORT_BATCH_SIZE = 5000
+ITERATOR_CHUNK_SIZE = 1000
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+# dataset -> (model, query param -> lookup for exact-match filters)
+DATASETS = {
+    'leads': (Lead, {
+        'stage': 'stage', 'status': 'status', 'source': 'source',
+        'is_whatsapp': 'is_whatsapp', 'assigned_to': 'assigned_to_id',
+    }),
+    'bookings': (Booking, {'status': 'status', 'trip': 'trip_id', 'user': 'user_id'}),
+    'payments': (Payment, {
+        'status': 'status', 'verification_status': 'verification_status',
+        'risk_level': 'risk_level', 'booking': 'booking_id',
+    }),
+    'lead_events': (LeadEvent, {'lead': 'lead_id', 'type': 'type', 'channel': 'channel'}),
+}
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+BOOLEAN_VALUES = {'true': True, 'yes': True, '1': True, 'false': False, 'no': False, '0': False}
+
+
+class ExportError(ValueError):
+    """Unknown dataset/format or an unparseable filter value"""
+
+
+def export_columns(model):
+    """Every concrete column, foreign keys as their ``*_id`` value"""
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def _parse_moment(value, param):
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ExportError(f'{param} must be an ISO date or datetime')
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def export_queryset(dataset, params):
+    """The filtered, unordered queryset for ``dataset`` (ordering is the keyset walk's)"""
+    if dataset not in DATASETS:
+        raise ExportError(f"Unknown dataset '{dataset}', expected one of: {', '.join(DATASETS)}")
+    model, filters = DATASETS[dataset]
+    qs = model.objects.all()
+    for param, lookup in filters.items():
+        value = params.get(param)
+        if value in (None, ''):
+            continue
+        # Validate now: a bad value must fail before the response starts streaming
+        field = model._meta.get_field(lookup.removesuffix('_id'))
+        if isinstance(field, BooleanField):
+            value = BOOLEAN_VALUES.get(value.lower(), value)
+        try:
+            value = field.to_python(value)
+        except ValidationError:
+            raise ExportError(f'Invalid value for {param}: {value!r}')
+        qs = qs.filter(**{lookup: value})
+    if params.get('created_after'):
+        qs = qs.filter(created_at__gte=_parse_moment(params['created_after'], 'created_after'))
+    if params.get('created_before'):
+        qs = qs.filter(created_at__lt=_parse_moment(params['created_before'], 'created_before'))
+    return qs
+
+
+def iter_rows(queryset, columns, batch_size=EXPORT_BATCH_SIZE):
+    """``values()`` rows of ``queryset`` in pk order, one keyset batch at a time"""
+    pk_name = queryset.model._meta.pk.attname
+    if pk_name not in columns:
+        columns = [pk_name, *columns]
+    last_pk = None
+    while True:
+        batch = queryset.order_by('pk')
+        if last_pk is not None:
+            batch = batch.filter(pk__gt=last_pk)
+        count = 0
+        for row in batch.values(*columns)[:batch_size].iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+            count += 1
+            last_pk = row[pk_name]
+            yield row
+        if count < batch_size:
+            return
+
+
+class _Echo:
+    """File-like object whose write() returns the line for the streaming response"""
+
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value, cls=DjangoJSONEncoder, ensure_ascii=False)
+    # Names, messages and payloads come from WhatsApp and public forms: keep
+    # spreadsheets from evaluating a cell such as =HYPERLINK(...) as a formula
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def iter_csv(rows, columns):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([_csv_value(row[column]) for column in columns])
+
+
+def iter_jsonl(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def streaming_export_response(dataset, params):
+    fmt = (params.get('output') or 'csv').lower()
+    if fmt not in FORMATS:
+        raise ExportError(f"Unknown format '{fmt}', expected csv or jsonl")
+    queryset = export_queryset(dataset, params)
+    columns = export_columns(queryset.model)
+    rows = iter_rows(queryset, columns)
+    content = iter_csv(rows, columns) if fmt == 'csv' else iter_jsonl(rows)
+
+    response = StreamingHttpResponse(content, content_type=FORMATS[fmt])
+    filename = f"{dataset}-{timezone.now():%Y%m%d-%H%M%S}.{fmt}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
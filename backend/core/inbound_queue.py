@@ -0,0 +1,131 @@
+"""
+Durable inbound WhatsApp queue
+
+The webhook only persists the raw payload (``enqueue_inbound_message``) and
+acknowledges the provider; ``process_inbound_messages`` drains the queue
+with a pool of worker threads that run the lead upsert and intent handling.
+Webhook latency is therefore independent of the send gateway and LLMs.
+"""
+
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import InboundWhatsAppMessage
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+# A 'processing' row older than this belongs to a crashed worker and is reclaimed
+LOCK_TIMEOUT = timezone.timedelta(minutes=5)
+
+
+def enqueue_inbound_message(payload) -> InboundWhatsAppMessage:
+    """Persist a raw webhook payload for asynchronous processing"""
+    payload = payload if isinstance(payload, dict) else payload.dict()
+    return InboundWhatsAppMessage.objects.create(
+        payload=payload,
+        message_id=str(payload.get('id') or '')[:128],
+        from_number=str(payload.get('from') or '').replace('@c.us', '')[:32],
+    )
+
+
+def claim_inbound_batch(limit=50):
+    """
+    Claim up to ``limit`` due messages for this worker
+
+    Rows are locked with SKIP LOCKED so concurrent workers never claim the
+    same message; stale claims from crashed workers are picked up again.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            InboundWhatsAppMessage.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status='queued', available_at__lte=now)
+                | Q(status='processing', locked_at__lt=now - LOCK_TIMEOUT)
+            )
+            .order_by('id')
+            .values_list('id', flat=True)[:limit]
+        )
+        InboundWhatsAppMessage.objects.filter(id__in=ids).update(
+            status='processing', locked_at=now, attempts=F('attempts') + 1
+        )
+    return list(InboundWhatsAppMessage.objects.filter(id__in=ids).order_by('id'))
+
+
+def process_inbound_message(item: InboundWhatsAppMessage) -> bool:
+    """Run lead upsert and intent handling for one queued message. Returns True on success."""
+    from .views import create_or_update_lead_from_whatsapp, process_whatsapp_message
+
+    payload = item.payload
+    message_body = payload.get('body', '') or ''
+    try:
+        lead = item.lead
+        if lead is None:
+            with transaction.atomic():
+                lead = create_or_update_lead_from_whatsapp(
+                    phone=item.from_number,
+                    message=message_body,
+                    session_id=payload.get('sessionId'),
+                    message_id=item.message_id or None,
+                )
+            # Remember the upsert so a retry only repeats intent handling
+            item.lead = lead
+            item.save(update_fields=['lead'])
+        process_whatsapp_message(lead, message_body, payload.get('type'))
+    except Exception as e:
+        logger.error(f"Inbound WhatsApp message {item.id} failed (attempt {item.attempts}): {e}")
+        if item.attempts >= MAX_ATTEMPTS:
+            item.status = 'failed'
+        else:
+            # Exponential backoff: 30s, 60s, 120s, ...
+            item.status = 'queued'
+            item.available_at = timezone.now() + timezone.timedelta(seconds=30 * 2 ** (item.attempts - 1))
+        item.error = str(e)[:1000]
+        item.locked_at = None
+        item.save(update_fields=['status', 'available_at', 'error', 'locked_at'])
+        return False
+
+    item.status = 'processed'
+    item.error = ''
+    item.processed_at = timezone.now()
+    item.save(update_fields=['status', 'error', 'processed_at'])
+    return True
+
+
+def _process_sender_messages(items, close_connection):
+    try:
+        return sum(process_inbound_message(item) for item in items)
+    finally:
+        if close_connection:
+            # Worker threads own their DB connection
+            connection.close()
+
+
+def drain_inbound_queue(batch_size=50, workers=4):
+    """
+    Claim one batch and process it on a thread pool
+
+    Messages from the same sender are handled in order by a single worker,
+    so a conversation is never processed out of sequence. Returns
+    ``(claimed, processed)``.
+    """
+    batch = claim_inbound_batch(batch_size)
+    if not batch:
+        return 0, 0
+
+    by_sender = defaultdict(list)
+    for item in batch:
+        by_sender[item.from_number].append(item)
+
+    if workers <= 1:
+        processed = sum(_process_sender_messages(items, False) for items in by_sender.values())
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            processed = sum(pool.map(lambda items: _process_sender_messages(items, True), by_sender.values()))
+    return len(batch), processed
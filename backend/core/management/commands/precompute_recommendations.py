@@ -0,0 +1,52 @@
+"""
+Django management command to refresh the per-user recommendation cache
+Usage: python manage.py precompute_recommendations [--stale-only] [--batch-size=<size>]
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.utils import timezone
+from core.models import UserRecommendationCache
+from ml_models.trip_recommendation_engine import TripRecommendationEngine
+
+
+class Command(BaseCommand):
+    help = 'Precompute cached trip recommendations for active users'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stale-only',
+            action='store_true',
+            help='Only recompute cache rows that are stale or expired',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Users per batch (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        engine = TripRecommendationEngine()
+        if not engine.load_model():
+            raise CommandError(
+                '❌ Recommendation engine not found. Train it first using: '
+                'python manage.py train_trip_recommendation'
+            )
+
+        if options['stale_only']:
+            # Users with new interactions are recomputed from their live data
+            user_ids = list(
+                UserRecommendationCache.objects
+                .filter(Q(is_stale=True) | Q(expires_at__lte=timezone.now()))
+                .values_list('user_id', flat=True)
+            )
+            for user_id in user_ids:
+                engine.refresh_user_recommendations(user_id)
+            refreshed = len(user_ids)
+        else:
+            refreshed = engine.precompute_recommendations(batch_size=options['batch_size'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ Refreshed cached recommendations for {refreshed} users')
+        )
@@ -0,0 +1,51 @@
+"""
+Django management command to drain the inbound WhatsApp queue
+Usage: python manage.py process_inbound_messages [--loop] [--workers=4] [--batch-size=50]
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from core.inbound_queue import drain_inbound_queue
+from core.message_dedup import prune_processed_messages
+from core.outbound_coalescer import flush_pending
+
+PRUNE_INTERVAL_SECONDS = 3600
+
+
+class Command(BaseCommand):
+    help = 'Process queued inbound WhatsApp webhook messages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--workers', type=int, default=4, help='Worker threads per batch (default: 4)')
+        parser.add_argument('--loop', action='store_true', help='Keep polling instead of exiting when the queue is empty')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+
+    def handle(self, *args, **options):
+        total_claimed = total_processed = 0
+        last_prune = None
+        while True:
+            if last_prune is None or time.monotonic() - last_prune >= PRUNE_INTERVAL_SECONDS:
+                pruned = prune_processed_messages()
+                if pruned:
+                    self.stdout.write(f"Pruned {pruned} expired message-id dedup rows")
+                last_prune = time.monotonic()
+
+            claimed, processed = drain_inbound_queue(
+                batch_size=options['batch_size'], workers=options['workers']
+            )
+            total_claimed += claimed
+            total_processed += processed
+            if claimed:
+                self.stdout.write(f"Processed {processed}/{claimed} inbound messages")
+            elif options['loop']:
+                time.sleep(options['interval'])
+            else:
+                break
+
+        # Replies are buffered for the coalescing window; send them before exiting
+        flush_pending()
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ Processed {total_processed}/{total_claimed} inbound messages")
+        )
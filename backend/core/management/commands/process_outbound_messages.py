@@ -1,45 +1,62 @@
+"""
+Django management command to dispatch queued outbound WhatsApp messages
+Usage: python manage.py process_outbound_messages [--loop] [--workers=4] [--batch-size=50] [--rate=10]
+
+Safe to run as several processes at once: batches are claimed with SKIP LOCKED.
+With --loop the dispatcher sleeps until the next scheduled message is due or a
+new one is announced (see core.outbound_scheduler), instead of polling.
+"""
+
+import time
+
 from django.core.management.base import BaseCommand
-from django.utils import timezone
-from django.db import transaction, models
-from core.models import OutboundMessage, LeadEvent, Lead
-from core.services import enqueue_template_message
+from core.outbound_dispatcher import dispatch_outbound_batch, enqueue_balance_reminders, get_dispatch_provider
+from core.outbound_scheduler import DEFAULT_HORIZON_SECONDS, OutboundWakeup
+
+REMINDER_INTERVAL_SECONDS = 3600
+
 
 class Command(BaseCommand):
-    help = "Process queued outbound messages (Phase 1 custom WA sandbox)"
+    help = "Send queued outbound WhatsApp messages through the custom provider"
 
     def add_arguments(self, parser):
-        parser.add_argument('--limit', type=int, default=50)
+        parser.add_argument('--batch-size', '--limit', dest='batch_size', type=int, default=50)
+        parser.add_argument('--workers', type=int, default=4, help='Concurrent sends per batch (default: 4)')
+        parser.add_argument('--rate', type=float, default=None, help='Max messages per second for this process')
+        parser.add_argument('--loop', action='store_true', help='Keep running instead of exiting when the queue is empty')
+        parser.add_argument(
+            '--horizon', type=float, default=DEFAULT_HORIZON_SECONDS,
+            help='Seconds of upcoming schedule loaded per reload (default: 300)'
+        )
 
     def handle(self, *args, **options):
-        limit = options['limit']
-        now = timezone.now()
-        processed = 0
-        with transaction.atomic():
-            # Schedule balance reminders placeholder: leads in advance_paid older than 1 day -> enqueue balance reminder
-            older = timezone.now() - timezone.timedelta(days=1)
-            for lead in Lead.objects.filter(stage='advance_paid', last_contact_at__lte=older)[:20]:
-                enqueue_template_message(lead, lead.phone or lead.metadata.get('phone',''), 'balance_reminder', {
-                    'first_name': (lead.name.split()[0] if lead.name else 'Traveler'),
-                    'balance_amount': lead.metadata.get('balance_amount', ''),
-                    'trip_name': lead.trip.name if getattr(lead, 'trip', None) else '',
-                    'due_date': (timezone.now() + timezone.timedelta(days=2)).date(),
-                    'payment_link': lead.metadata.get('payment_link','')
-                })
-            qs = OutboundMessage.objects.select_for_update().filter(status='queued').filter(models.Q(scheduled_for__lte=now) | models.Q(scheduled_for__isnull=True))[:limit]
-            for msg in qs:
-                msg.status = 'sending'
-                msg.save(update_fields=['status'])
-                try:
-                    # Simulate send
-                    msg.status = 'sent'
-                    msg.sent_at = timezone.now()
-                    msg.save(update_fields=['status', 'sent_at'])
-                    if msg.lead:
-                        LeadEvent.objects.create(lead=msg.lead, type='outbound_msg', payload={'body': msg.rendered_body})
-                    processed += 1
-                except Exception as e:
-                    msg.status = 'failed'
-                    msg.error = str(e)[:250]
-                    msg.retries += 1
-                    msg.save(update_fields=['status', 'error', 'retries'])
-        self.stdout.write(self.style.SUCCESS(f"Processed {processed} messages"))
+        provider = get_dispatch_provider()
+        total_claimed = total_sent = 0
+        last_reminders = None
+        wakeup = OutboundWakeup(horizon=options['horizon']) if options['loop'] else None
+        while True:
+            if last_reminders is None or time.monotonic() - last_reminders >= REMINDER_INTERVAL_SECONDS:
+                queued = enqueue_balance_reminders()
+                if queued:
+                    self.stdout.write(f"Queued {queued} balance reminders")
+                last_reminders = time.monotonic()
+
+            claimed, sent = dispatch_outbound_batch(
+                provider,
+                batch_size=options['batch_size'],
+                workers=options['workers'],
+                rate_per_second=options['rate'],
+            )
+            total_claimed += claimed
+            total_sent += sent
+            if claimed:
+                self.stdout.write(f"Sent {sent}/{claimed} outbound messages")
+                if wakeup is not None:
+                    # Failed sends were rescheduled; pick up their new due times
+                    wakeup.reload()
+            elif wakeup is not None:
+                wakeup.wait(max_wait=max(0.0, last_reminders + REMINDER_INTERVAL_SECONDS - time.monotonic()))
+            else:
+                break
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Sent {total_sent}/{total_claimed} outbound messages"))
@@ -0,0 +1,58 @@
+"""
+Django management command to repair Trip.confirmed_seats drift
+Recounts seats of confirmed bookings per trip (one aggregate query) and fixes
+trips whose counter or status disagrees, e.g. after bulk updates or raw SQL
+that bypassed Booking.save.
+Usage: python manage.py reconcile_trip_seats [--dry-run]
+"""
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce
+from core.models import Trip
+from core.trip_catalogue import bump_catalogue_version
+
+
+class Command(BaseCommand):
+    help = 'Recount confirmed seats per trip and repair the denormalized counter'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report mismatched trips without changing them',
+        )
+
+    def handle(self, *args, **options):
+        trips = (
+            Trip.objects
+            .annotate(actual_seats=Coalesce(Sum('bookings__seats', filter=Q(bookings__status='confirmed')), 0))
+            .values('id', 'name', 'confirmed_seats', 'max_capacity', 'status', 'actual_seats')
+        )
+        repaired = skipped = 0
+        for trip in trips:
+            status = Trip.status_for(trip['actual_seats'], trip['max_capacity'])
+            if trip['confirmed_seats'] == trip['actual_seats'] and trip['status'] == status:
+                continue
+            self.stdout.write(
+                f"  {trip['name']} (#{trip['id']}): {trip['confirmed_seats']} -> {trip['actual_seats']} seats, "
+                f"{trip['status']} -> {status}"
+            )
+            if options['dry_run']:
+                repaired += 1
+                continue
+            # Only if no booking moved the counter since it was read; otherwise rerun
+            updated = Trip.objects.filter(id=trip['id'], confirmed_seats=trip['confirmed_seats']).update(
+                confirmed_seats=trip['actual_seats'], status=status
+            )
+            repaired += updated
+            skipped += 1 - updated
+
+        # Queryset updates skip the Trip signals that invalidate cached catalogue pages
+        if repaired and not options['dry_run']:
+            bump_catalogue_version()
+
+        verb = 'Would repair' if options['dry_run'] else 'Repaired'
+        self.stdout.write(self.style.SUCCESS(f'✅ {verb} {repaired} trips'))
+        if skipped:
+            self.stdout.write(self.style.WARNING(f'{skipped} trips changed while reconciling; run again'))
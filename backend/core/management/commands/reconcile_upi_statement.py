@@ -0,0 +1,51 @@
+"""
+Django management command to verify pending UPI payments from a bank/PSP statement
+Streams the CSV or OFX file and bulk-verifies payments matched by UPI txn id or
+TAS reference plus amount (see core.payment_reconciliation).
+Usage: python manage.py reconcile_upi_statement <statement.csv|.ofx> [--format=csv|ofx] [--user=<staff username>] [--dry-run]
+"""
+
+import os
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from core.payment_reconciliation import iter_statement, open_text_stream, reconcile_statement
+
+
+class Command(BaseCommand):
+    help = 'Verify pending payments against a bank/PSP statement file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('statement', help='Path to the CSV or OFX statement')
+        parser.add_argument('--format', choices=['csv', 'ofx'], default=None, help='Default: from the file extension')
+        parser.add_argument('--user', default=None, help='Staff username recorded as the verifier')
+        parser.add_argument('--dry-run', action='store_true', help='Report matches without verifying anything')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'], is_staff=True)
+            except User.DoesNotExist:
+                raise CommandError(f"No staff user named {options['user']}")
+
+        path = options['statement']
+        name = os.path.basename(path)
+        try:
+            with open(path, 'rb') as statement:
+                rows = iter_statement(open_text_stream(statement), fmt=options['format'], name=name)
+                report = reconcile_statement(rows, user=user, statement_name=name, dry_run=options['dry_run'])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for issue in report.issues:
+            self.stdout.write(
+                f"  line {issue['line']}: {issue['issue']} (txn {issue['txn_id'] or '-'}, "
+                f"ref {issue['reference'] or '-'}, amount {issue['amount']})"
+            )
+        verb = 'Would verify' if report.dry_run else 'Verified'
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {verb} {report.verified} payments from {report.rows} statement rows "
+            f"({report.unmatched} unmatched, {report.amount_mismatch} amount mismatches, "
+            f"{report.already_verified} already verified, {report.duplicates} duplicates, {report.skipped} skipped)"
+        ))
@@ -0,0 +1,36 @@
+"""
+Django management command to rebuild the admin dashboard stats snapshot
+Recounts leads, messages, payments and tasks (core.admin_stats) into the
+AdminStatsSnapshot row the admin endpoints read.
+Usage: python manage.py refresh_admin_stats [--loop] [--interval=60]
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from core.admin_stats import refresh_admin_stats_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Recompute the materialized admin dashboard statistics'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep refreshing instead of exiting after one pass')
+        parser.add_argument(
+            '--interval', type=float, default=None,
+            help='Seconds between refreshes with --loop (default: ADMIN_STATS_REFRESH_SECONDS)'
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval'] or getattr(settings, 'ADMIN_STATS_REFRESH_SECONDS', 60)
+        while True:
+            snapshot = refresh_admin_stats_snapshot()
+            if not options['loop']:
+                break
+            time.sleep(interval)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Admin stats refreshed in {snapshot.compute_ms}ms "
+            f"({snapshot.stats['leads']['total']} leads)"
+        ))
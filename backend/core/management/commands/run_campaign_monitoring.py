@@ -47,10 +47,9 @@ class Command(BaseCommand):
 
         for trip in all_campaign_trips:
             try:
-                # Calculate occupancy percentage based on confirmed bookings
+                # Calculate occupancy percentage based on confirmed seats
                 if trip.max_capacity and trip.max_capacity > 0:
-                    confirmed_bookings = trip.bookings.filter(status='confirmed').count()
-                    occupancy_rate = (confirmed_bookings / trip.max_capacity) * 100
+                    occupancy_rate = (trip.confirmed_seats / trip.max_capacity) * 100
 
                     # Determine if campaign should be triggered
                     should_trigger = False
@@ -0,0 +1,36 @@
+"""
+Django management command to expire abandoned seat locks
+Returns the seats of active SeatLocks past their expires_at to their trips
+(see core.seat_locks). Safe to run alongside the API and as several processes.
+Usage: python manage.py sweep_seat_locks [--loop] [--interval=30] [--batch-size=500]
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from core.seat_locks import sweep_expired_seat_locks
+
+
+class Command(BaseCommand):
+    help = 'Expire abandoned seat locks and return their seats to trips'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--loop', action='store_true', help='Keep sweeping instead of exiting after one pass')
+        parser.add_argument('--interval', type=float, default=30.0, help='Seconds between sweeps with --loop')
+
+    def handle(self, *args, **options):
+        total_expired = total_seats = 0
+        while True:
+            expired, seats = sweep_expired_seat_locks(batch_size=options['batch_size'])
+            total_expired += expired
+            total_seats += seats
+            if expired:
+                self.stdout.write(f"Expired {expired} seat locks, returned {seats} seats")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ Expired {total_expired} seat locks, returned {total_seats} seats")
+        )
@@ -0,0 +1,36 @@
+"""
+Train the lead scoring model and publish it as a model bundle
+Usage: python manage.py train_lead_scoring [--from-legacy]
+
+Run at deploy/train time: requests only ever read the published bundle.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from ml_models.lead_scoring_model import LeadScoringModel
+
+
+class Command(BaseCommand):
+    help = 'Train the lead scoring model and publish it as a model bundle'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--from-legacy',
+            action='store_true',
+            help='Publish the pre-bundle .pkl files as a bundle instead of retraining',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            self.style.SUCCESS('🚀 Publishing Lead Scoring Model')
+        )
+
+        model = LeadScoringModel()
+        if options['from_legacy']:
+            if not model.migrate_legacy_model():
+                raise CommandError('No legacy lead scoring model files found')
+        else:
+            model.retrain_model()
+
+        self.stdout.write(
+            self.style.SUCCESS('✅ Lead scoring model bundle published!')
+        )
@@ -4,15 +4,22 @@ from ml_models.trip_recommendation_engine import TripRecommendationEngine
 class Command(BaseCommand):
     help = 'Train the trip recommendation engine'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Only collect interactions newer than the saved model watermark',
+        )
+
     def handle(self, *args, **options):
         self.stdout.write(
             self.style.SUCCESS('🚀 Starting Trip Recommendation Engine Training')
         )
 
-        # Initialize and train the engine
+        # Initialize, train and persist the engine
         engine = TripRecommendationEngine()
-        engine.train_model()
+        engine.retrain_model(incremental=options['incremental'])
 
         self.stdout.write(
             self.style.SUCCESS('✅ Trip Recommendation Engine trained successfully!')
-        )
\ No newline at end of file
+        )
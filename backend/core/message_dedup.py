@@ -0,0 +1,115 @@
+"""
+Idempotent inbound message deduplication
+
+WhatsApp providers redeliver webhooks. Every inbound entry point calls
+``claim_message_id()`` before doing any expensive work (lead upsert, RAG,
+LLM calls). A unique-indexed ProcessedWhatsAppMessage row is the source of
+truth; a bounded in-process LRU of the ids this process claimed answers
+hot redeliveries without touching the database. Ids found by another
+process's claim are not cached, because that process may release the
+claim (``release_message_id()``) and only it can evict its own LRU. Rows
+older than WHATSAPP_DEDUP_RETENTION_DAYS are removed by
+``prune_processed_messages()``.
+"""
+
+import logging
+import threading
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import ProcessedWhatsAppMessage
+
+logger = logging.getLogger(__name__)
+
+_seen_ids = OrderedDict()
+_lock = threading.Lock()
+_stats = Counter()
+
+
+def _remember(message_id):
+    cache_size = getattr(settings, 'WHATSAPP_DEDUP_CACHE_SIZE', 10000)
+    with _lock:
+        _seen_ids[message_id] = True
+        _seen_ids.move_to_end(message_id)
+        while len(_seen_ids) > cache_size:
+            _seen_ids.popitem(last=False)
+
+
+def claim_message_id(message_id, source='') -> bool:
+    """
+    Claim a provider message id for processing
+
+    Returns True the first time an id is seen (the caller should process
+    it) and False for a redelivery. Messages without an id cannot be
+    deduplicated and are always claimed.
+    """
+    if not message_id:
+        return True
+    message_id = str(message_id)[:128]
+
+    with _lock:
+        _stats['checked'] += 1
+        if message_id in _seen_ids:
+            _seen_ids.move_to_end(message_id)
+            _stats['duplicates'] += 1
+            _stats['memory_hits'] += 1
+            return False
+
+    try:
+        with transaction.atomic():
+            ProcessedWhatsAppMessage.objects.create(message_id=message_id, source=source[:32])
+    except IntegrityError:
+        ProcessedWhatsAppMessage.objects.filter(message_id=message_id).update(
+            hit_count=F('hit_count') + 1, last_seen_at=timezone.now()
+        )
+        with _lock:
+            _stats['duplicates'] += 1
+            _stats['db_hits'] += 1
+        logger.info(f"Dropped redelivered WhatsApp message {message_id} ({source})")
+        return False
+
+    with _lock:
+        _stats['claimed'] += 1
+    # Only cache once the claim is durable (the caller may be inside a transaction)
+    transaction.on_commit(lambda: _remember(message_id))
+    return True
+
+
+def release_message_id(message_id):
+    """Forget a claim whose processing failed, so a provider retry is processed again"""
+    if not message_id:
+        return
+    message_id = str(message_id)[:128]
+    with _lock:
+        _seen_ids.pop(message_id, None)
+        _stats['released'] += 1
+    ProcessedWhatsAppMessage.objects.filter(message_id=message_id).delete()
+
+
+def prune_processed_messages(retention_days=None) -> int:
+    """Delete dedup rows older than the retention window. Returns rows deleted."""
+    if retention_days is None:
+        retention_days = getattr(settings, 'WHATSAPP_DEDUP_RETENTION_DAYS', 7)
+    cutoff = timezone.now() - timezone.timedelta(days=retention_days)
+    deleted, _ = ProcessedWhatsAppMessage.objects.filter(first_seen_at__lt=cutoff).delete()
+    return deleted
+
+
+def get_dedup_stats() -> dict:
+    """
+    Process-local hit counters plus durable totals from the dedup table
+
+    ``redeliveries_recorded`` only counts duplicates caught by the table;
+    ``memory_hits`` are answered by this process's LRU alone.
+    """
+    with _lock:
+        stats = {key: _stats[key] for key in ('checked', 'claimed', 'duplicates', 'memory_hits', 'db_hits', 'released')}
+        stats['cached_ids'] = len(_seen_ids)
+    totals = ProcessedWhatsAppMessage.objects.aggregate(redeliveries=Sum('hit_count'))
+    stats['tracked_ids'] = ProcessedWhatsAppMessage.objects.count()
+    stats['redeliveries_recorded'] = totals['redeliveries'] or 0
+    return stats
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:42
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_tripplan'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserRecommendationCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trip_ids', models.JSONField(default=list)),
+                ('source', models.CharField(choices=[('batch', 'Batch Precompute'), ('on_demand', 'On-Demand Refresh')], default='batch', max_length=20)),
+                ('is_stale', models.BooleanField(db_index=True, default=False)),
+                ('generated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='recommendation_cache', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
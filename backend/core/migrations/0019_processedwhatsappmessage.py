@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_inboundwhatsappmessage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessedWhatsAppMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('message_id', models.CharField(max_length=128, unique=True)),
+                ('source', models.CharField(blank=True, max_length=32)),
+                ('hit_count', models.PositiveIntegerField(default=0)),
+                ('first_seen_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('last_seen_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
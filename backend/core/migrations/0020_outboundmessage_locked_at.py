@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_processedwhatsappmessage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboundmessage',
+            name='locked_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
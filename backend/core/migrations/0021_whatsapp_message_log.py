@@ -0,0 +1,163 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_outboundmessage_locked_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WhatsAppAnalytics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(db_index=True, unique=True)),
+                ('total_incoming', models.IntegerField(default=0)),
+                ('total_outgoing', models.IntegerField(default=0)),
+                ('total_conversations', models.IntegerField(default=0)),
+                ('new_conversations', models.IntegerField(default=0)),
+                ('avg_response_time_ms', models.IntegerField(default=0)),
+                ('auto_reply_count', models.IntegerField(default=0)),
+                ('sent_count', models.IntegerField(default=0)),
+                ('delivered_count', models.IntegerField(default=0)),
+                ('failed_count', models.IntegerField(default=0)),
+                ('read_count', models.IntegerField(default=0)),
+                ('intent_distribution', models.JSONField(blank=True, default=dict)),
+                ('estimated_cost', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'WhatsApp Analytics',
+                'verbose_name_plural': 'WhatsApp Analytics',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='WhatsAppConversation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phone_number', models.CharField(db_index=True, max_length=20, unique=True)),
+                ('customer_name', models.CharField(blank=True, max_length=100, null=True)),
+                ('customer_id', models.CharField(blank=True, db_index=True, max_length=100, null=True)),
+                ('status', models.CharField(choices=[('active', 'Active'), ('closed', 'Closed'), ('archived', 'Archived')], default='active', max_length=20)),
+                ('message_count', models.IntegerField(default=0)),
+                ('customer_message_count', models.IntegerField(default=0)),
+                ('agent_message_count', models.IntegerField(default=0)),
+                ('primary_intent', models.CharField(blank=True, max_length=50, null=True)),
+                ('intents', models.JSONField(blank=True, default=dict)),
+                ('language', models.CharField(default='en', max_length=10)),
+                ('timezone', models.CharField(blank=True, max_length=50, null=True)),
+                ('preferences', models.JSONField(blank=True, default=dict)),
+                ('state', models.JSONField(blank=True, default=dict)),
+                ('first_message_at', models.DateTimeField(blank=True, null=True)),
+                ('last_message_at', models.DateTimeField(blank=True, null=True)),
+                ('resolved_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'WhatsApp Conversation',
+                'verbose_name_plural': 'WhatsApp Conversations',
+                'ordering': ['-last_message_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='WhatsAppTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('category', models.CharField(choices=[('greeting', 'Greeting'), ('faq', 'FAQ'), ('promotional', 'Promotional'), ('booking', 'Booking'), ('feedback', 'Feedback'), ('reminder', 'Reminder'), ('custom', 'Custom')], max_length=20)),
+                ('template_text', models.TextField()),
+                ('variables', models.JSONField(blank=True, default=list)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('use_count', models.IntegerField(default=0)),
+                ('success_rate', models.FloatField(default=0.0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'WhatsApp Template',
+                'verbose_name_plural': 'WhatsApp Templates',
+                'ordering': ['category', 'name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='WhatsAppMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('message_id', models.CharField(db_index=True, max_length=100, unique=True)),
+                ('phone_number', models.CharField(db_index=True, max_length=20)),
+                ('message_type', models.CharField(choices=[('text', 'Text'), ('image', 'Image'), ('document', 'Document'), ('video', 'Video'), ('audio', 'Audio')], default='text', max_length=20)),
+                ('message_text', models.TextField()),
+                ('media_url', models.URLField(blank=True, null=True)),
+                ('direction', models.CharField(choices=[('incoming', 'Incoming (Customer)'), ('outgoing', 'Outgoing (Agent)')], max_length=20)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('delivered', 'Delivered'), ('read', 'Read'), ('failed', 'Failed'), ('scheduled', 'Scheduled')], default='pending', max_length=20)),
+                ('intent_detected', models.CharField(blank=True, max_length=50, null=True)),
+                ('confidence_score', models.FloatField(default=0.0)),
+                ('processing_time_ms', models.IntegerField(blank=True, null=True)),
+                ('metadata', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('scheduled_for', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'WhatsApp Message',
+                'verbose_name_plural': 'WhatsApp Messages',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['phone_number', '-created_at'], name='core_whatsa_phone_n_e9b1a4_idx'), models.Index(fields=['status', 'created_at'], name='core_whatsa_status_8825a4_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='WhatsAppCampaign',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('campaign_id', models.CharField(db_index=True, max_length=100, unique=True)),
+                ('name', models.CharField(max_length=200)),
+                ('custom_message', models.TextField(blank=True, null=True)),
+                ('target_count', models.IntegerField()),
+                ('success_count', models.IntegerField(default=0)),
+                ('failed_count', models.IntegerField(default=0)),
+                ('status', models.CharField(choices=[('draft', 'Draft'), ('scheduled', 'Scheduled'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed'), ('paused', 'Paused')], default='draft', max_length=20)),
+                ('scheduled_for', models.DateTimeField(blank=True, null=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('delay_between_messages', models.IntegerField(default=3)),
+                ('metadata', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('template', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.whatsapptemplate')),
+            ],
+            options={
+                'verbose_name': 'WhatsApp Campaign',
+                'verbose_name_plural': 'WhatsApp Campaigns',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='WhatsAppWebhook',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('webhook_id', models.CharField(db_index=True, max_length=100, unique=True)),
+                ('event_type', models.CharField(choices=[('message_received', 'Message Received'), ('message_sent', 'Message Sent'), ('delivery_report', 'Delivery Report'), ('read_report', 'Read Report'), ('verification', 'Webhook Verification'), ('error', 'Error Event')], max_length=30)),
+                ('provider', models.CharField(max_length=50)),
+                ('raw_payload', models.JSONField()),
+                ('parsed_data', models.JSONField(blank=True, default=dict)),
+                ('processed', models.BooleanField(default=False)),
+                ('error_message', models.TextField(blank=True, null=True)),
+                ('received_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='webhooks', to='core.whatsappmessage')),
+            ],
+            options={
+                'verbose_name': 'WhatsApp Webhook',
+                'verbose_name_plural': 'WhatsApp Webhooks',
+                'ordering': ['-received_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:14
+
+from django.db import migrations, models
+from django.db.models import IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_confirmed_seats(apps, schema_editor):
+    Trip = apps.get_model('core', 'Trip')
+    Booking = apps.get_model('core', 'Booking')
+    confirmed = (
+        Booking.objects.filter(trip=OuterRef('pk'), status='confirmed')
+        .values('trip').annotate(total=Sum('seats')).values('total')
+    )
+    Trip.objects.update(confirmed_seats=Coalesce(Subquery(confirmed, output_field=IntegerField()), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_whatsapp_message_log'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trip',
+            name='confirmed_seats',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_confirmed_seats, migrations.RunPython.noop),
+    ]
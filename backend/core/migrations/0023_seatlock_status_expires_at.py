@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_trip_confirmed_seats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='seatlock',
+            index=models.Index(fields=['status', 'expires_at'], name='core_seatlo_status_d40c62_idx'),
+        ),
+    ]
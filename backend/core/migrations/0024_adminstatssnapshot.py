@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_seatlock_status_expires_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdminStatsSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(default='dashboard', max_length=50, unique=True)),
+                ('stats', models.JSONField(default=dict)),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('compute_ms', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
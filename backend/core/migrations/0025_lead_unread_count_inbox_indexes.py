@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:21
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_unread_count(apps, schema_editor):
+    Lead = apps.get_model('core', 'Lead')
+    LeadEvent = apps.get_model('core', 'LeadEvent')
+    # Same rule as core.signals.count_unread_inbound_message: 'read' missing, false or null
+    unread = (
+        LeadEvent.objects.filter(lead=OuterRef('pk'), type='inbound_msg')
+        .filter(Q(payload__read__isnull=True) | Q(payload__read=False) | Q(payload__read=None))
+        .order_by().values('lead').annotate(total=Count('id')).values('total')
+    )
+    Lead.objects.filter(is_whatsapp=True).update(
+        unread_count=Coalesce(Subquery(unread, output_field=IntegerField()), Value(0))
+    )
+
+
+def backfill_last_contact_at(apps, schema_editor):
+    # The inbox pages by last_contact_at; WhatsApp leads never contacted start at their creation
+    Lead = apps.get_model('core', 'Lead')
+    Lead.objects.filter(is_whatsapp=True, last_contact_at__isnull=True).update(last_contact_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_adminstatssnapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lead',
+            name='unread_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_unread_count, migrations.RunPython.noop),
+        migrations.RunPython(backfill_last_contact_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['is_whatsapp', '-last_contact_at', '-id'], name='core_lead_is_what_9e1019_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leadevent',
+            index=models.Index(fields=['lead', '-created_at'], name='core_leadev_lead_id_ced736_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0025_lead_unread_count_inbox_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['verification_status', '-risk_score', '-created_at'], name='core_paymen_verific_dd09f2_idx'),
+        ),
+    ]
@@ -1,4 +1,7 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Greatest
+from django.db.models.lookups import GreaterThanOrEqual
 from django.contrib.auth.models import User
 from django.utils import timezone
 
@@ -47,6 +50,13 @@ class Lead(models.Model):
     assigned_to = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name='assigned_leads')
     tags = models.JSONField(default=list, blank=True)
     metadata = models.JSONField(default=dict, blank=True)
+    # Inbound messages since an admin last opened the conversation (kept by LeadEvent post_save)
+    unread_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_whatsapp', '-last_contact_at', '-id']),
+        ]
 
     def touch_contact(self):
         self.last_contact_at = timezone.now()
@@ -57,6 +67,10 @@ class UserProfile(models.Model):
     reward_points = models.IntegerField(default=0)
     preferences = models.JSONField(default=dict, blank=True)
 
+# Marks a booking loaded without status/trip/seats: its share is read back before saving
+DEFERRED_SHARE = object()
+
+
 class Booking(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     destination = models.CharField(max_length=255)
@@ -70,26 +84,63 @@ class Booking(models.Model):
     balance_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # (trip_id, seats) this booking adds to its trip's confirmed_seats, as last saved
+    _counted_seats = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        loaded = instance.__dict__
+        if 'status' in loaded and 'trip_id' in loaded and 'seats' in loaded:
+            instance._counted_seats = instance._confirmed_seats_share()
+        else:
+            instance._counted_seats = DEFERRED_SHARE
+        return instance
+
+    def _confirmed_seats_share(self):
+        if self.status == 'confirmed' and self.trip_id:
+            return (self.trip_id, self.seats)
+        return None
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            self._load_counted_seats()
+            super().save(*args, **kwargs)
+            self.sync_confirmed_seats(self._confirmed_seats_share())
+
+    def _load_counted_seats(self):
+        if self._counted_seats is DEFERRED_SHARE:
+            row = Booking.objects.filter(pk=self.pk).values('status', 'trip_id', 'seats').first() or {}
+            confirmed = row.get('status') == 'confirmed' and row.get('trip_id')
+            self._counted_seats = (row['trip_id'], row['seats']) if confirmed else None
+
+    def sync_confirmed_seats(self, share):
+        """Move this booking's seats between trip counters when its confirmed share changes"""
+        self._load_counted_seats()
+        previous, self._counted_seats = self._counted_seats, share
+        if previous == share:
+            return
+        if previous:
+            Trip.objects.filter(id=previous[0]).update(**Trip.seat_counter_changes(-previous[1]))
+        if share:
+            Trip.objects.filter(id=share[0]).update(**Trip.seat_counter_changes(share[1]))
+        if Booking.trip.is_cached(self) and self.trip is not None:
+            self.trip.refresh_from_db(fields=['confirmed_seats', 'status'])
+
     def confirm_booking(self):
-        """Confirm a booking and update trip status"""
+        """Confirm a booking; the trip's seat counter and status follow on save"""
         if self.status != 'confirmed':
             self.status = 'confirmed'
             self.save(update_fields=['status'])
-            # Update trip status if this booking is linked to a trip
-            if self.trip:
-                self.trip.update_status()
             # Update user's booking limit
             booking_limit, created = BookingLimit.objects.get_or_create(user=self.user)
             booking_limit.increment_booking_count()
 
     def cancel_booking(self):
-        """Cancel a booking and update trip status"""
+        """Cancel a booking; the trip's seat counter and status follow on save"""
         if self.status == 'confirmed':
             self.status = 'cancelled'
             self.save(update_fields=['status'])
-            # Update trip status if this booking is linked to a trip
-            if self.trip:
-                self.trip.update_status()
             # Update user's booking limit
             try:
                 booking_limit = self.user.booking_limit
@@ -109,6 +160,22 @@ class TripRecommendation(models.Model):
     reason = models.CharField(max_length=255)
     trip = models.ForeignKey('Trip', on_delete=models.SET_NULL, null=True, blank=True, related_name='recommendations')
 
+class UserRecommendationCache(models.Model):
+    """Precomputed recommendation list per user, served without loading the ML engine"""
+    SOURCE_CHOICES = [
+        ('batch', 'Batch Precompute'),
+        ('on_demand', 'On-Demand Refresh'),
+    ]
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='recommendation_cache')
+    trip_ids = models.JSONField(default=list)  # Ordered, best first
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES, default='batch')
+    is_stale = models.BooleanField(default=False, db_index=True)  # Set when the user has new interactions
+    generated_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"Recommendations for user {self.user_id} ({len(self.trip_ids)} trips)"
+
 # Enhanced: Payment model for UPI with verification & risk tracking
 class Payment(models.Model):
     STATUS_CHOICES = [
@@ -175,6 +242,7 @@ class Payment(models.Model):
         indexes = [
             models.Index(fields=['-created_at']),
             models.Index(fields=['booking', 'status']),
+            models.Index(fields=['verification_status', '-risk_score', '-created_at']),  # Verification queue
         ]
 
     def __str__(self) -> str:
@@ -300,6 +368,8 @@ class Trip(models.Model):
     duration = models.CharField(max_length=120, blank=True)
     spots_available = models.PositiveIntegerField(default=0)
     max_capacity = models.PositiveIntegerField(default=5)  # 5-booking cap
+    # Seats of confirmed bookings, kept by Booking.save / post_delete (reconcile_trip_seats repairs drift)
+    confirmed_seats = models.PositiveIntegerField(default=0)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='available', db_index=True)
     next_departure = models.DateField(null=True, blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
@@ -313,25 +383,67 @@ class Trip(models.Model):
     def __str__(self) -> str:
         return self.name
 
+    @staticmethod
+    def status_for(confirmed_seats, max_capacity):
+        if confirmed_seats >= max_capacity:
+            return 'full'
+        if confirmed_seats >= max_capacity - 1:  # one seat left: promote
+            return 'promoted'
+        return 'available'
+
+    @staticmethod
+    def seat_counter_changes(delta):
+        """
+        update() kwargs that add ``delta`` confirmed seats and recompute status
+        in the same statement, so concurrent transitions never lose a change
+        """
+        seats = Greatest(F('confirmed_seats') + delta, Value(0))
+        return {
+            'confirmed_seats': seats,
+            'status': Case(
+                When(GreaterThanOrEqual(seats, F('max_capacity')), then=Value('full')),
+                When(GreaterThanOrEqual(seats, F('max_capacity') - 1), then=Value('promoted')),
+                default=Value('available'),
+            ),
+        }
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
+    def save(self, *args, **kwargs):
+        # confirmed_seats (and the status derived from it) move with F() updates;
+        # a full save of a possibly stale instance must not overwrite them
+        if self.pk and not self._state.adding and kwargs.get('update_fields') is None:
+            derived = {'confirmed_seats'}
+            if self.status == getattr(self, '_loaded_status', None):
+                derived.add('status')
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in derived
+            ]
+        super().save(*args, **kwargs)
+        self._loaded_status = self.status
+
     def update_status(self):
-        """Update trip status based on current bookings"""
-        confirmed_bookings = self.bookings.filter(status='confirmed').count()
-        if confirmed_bookings >= self.max_capacity:
-            self.status = 'full'
-        elif confirmed_bookings >= self.max_capacity - 1:  # 4 or more bookings
-            self.status = 'promoted'
-        else:
-            self.status = 'available'
-        self.save(update_fields=['status'])
+        """Update trip status from the confirmed-seat counter"""
+        self.refresh_from_db(fields=['confirmed_seats'])
+        status = self.status_for(self.confirmed_seats, self.max_capacity)
+        if status != self.status:
+            self.status = status
+            self.save(update_fields=['status'])
 
     def get_available_slots(self):
         """Get remaining available slots"""
-        confirmed_bookings = self.bookings.filter(status='confirmed').count()
-        return max(0, self.max_capacity - confirmed_bookings)
+        return max(0, self.max_capacity - self.confirmed_seats)
 
     def is_available_for_booking(self):
         """Check if trip can accept new bookings"""
         return self.get_available_slots() > 0
+
+
 class BookingLimit(models.Model):
     """Track per-user booking limits to prevent overbooking"""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='booking_limit')
@@ -377,21 +489,16 @@ class SeatLock(models.Model):
     class Meta:
         indexes = [
             models.Index(fields=['trip', 'status']),
+            models.Index(fields=['status', 'expires_at']),
         ]
 
     def is_expired(self):
         return timezone.now() >= self.expires_at or self.status == 'expired'
 
     def mark_expired(self):
-        if self.status == 'active' and timezone.now() >= self.expires_at:
-            self.status = 'expired'
-            self.save(update_fields=['status'])
-            # return seats to trip
-            try:
-                self.trip.spots_available = models.F('spots_available') + self.seats
-                self.trip.save(update_fields=['spots_available'])
-            except Exception:
-                pass
+        # Conditional flip, so a lock racing the sweeper returns its seats once
+        from .seat_locks import end_seat_lock
+        return end_seat_lock(self, 'expired', expired_only=True)
 
 class Review(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reviews')
@@ -570,6 +677,9 @@ class LeadEvent(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['lead', '-created_at']),
+        ]
 
 class OutboundMessage(models.Model):
     STATUS_CHOICES = [
@@ -586,6 +696,8 @@ class OutboundMessage(models.Model):
     retries = models.PositiveSmallIntegerField(default=0)
     scheduled_for = models.DateTimeField(null=True, blank=True, db_index=True)
     sent_at = models.DateTimeField(null=True, blank=True)
+    # Set while a dispatcher owns the row ('sending'); stale claims are reclaimed
+    locked_at = models.DateTimeField(null=True, blank=True)
     error = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -597,6 +709,48 @@ class OutboundMessage(models.Model):
     def __str__(self):
         return f"Msg {self.id} -> {self.to} [{self.status}]"
 
+
+class InboundWhatsAppMessage(models.Model):
+    """Durable queue of raw inbound webhook payloads, drained by process_inbound_messages"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('processing', 'Processing'),
+        ('processed', 'Processed'),
+        ('failed', 'Failed'),
+    ]
+    payload = models.JSONField(default=dict)
+    message_id = models.CharField(max_length=128, blank=True, db_index=True)
+    from_number = models.CharField(max_length=32, blank=True, db_index=True)
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default='queued', db_index=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    lead = models.ForeignKey(Lead, null=True, blank=True, on_delete=models.SET_NULL, related_name='inbound_messages')
+    error = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'available_at']),
+        ]
+
+    def __str__(self):
+        return f"Inbound {self.id} <- {self.from_number} [{self.status}]"
+
+
+class ProcessedWhatsAppMessage(models.Model):
+    """Provider message ids already accepted, so webhook redeliveries are dropped"""
+    message_id = models.CharField(max_length=128, unique=True)
+    source = models.CharField(max_length=32, blank=True)
+    hit_count = models.PositiveIntegerField(default=0)  # redeliveries dropped
+    first_seen_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    last_seen_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.message_id} ({self.source}, {self.hit_count} redeliveries)"
+
 # --- Phase B Task / lightweight CRM model ---
 class Task(models.Model):
     STATUS_CHOICES = [
@@ -636,6 +790,17 @@ class Task(models.Model):
         return f"Task {self.id} {self.type} ({self.status})"
 
 
+class AdminStatsSnapshot(models.Model):
+    """Precomputed admin dashboard statistics, refreshed by refresh_admin_stats"""
+    key = models.CharField(max_length=50, unique=True, default='dashboard')
+    stats = models.JSONField(default=dict)
+    computed_at = models.DateTimeField(default=timezone.now)
+    compute_ms = models.PositiveIntegerField(default=0)  # How long the refresh queries took
+
+    def __str__(self):
+        return f"Admin stats '{self.key}' as of {self.computed_at:%Y-%m-%d %H:%M:%S}"
+
+
 # ==============================
 # GAMIFICATION MODELS
 # ==============================
@@ -1219,3 +1384,10 @@ class CampaignLeadTracking(models.Model):
     
     def __str__(self):
         return f"{self.campaign.trip.name} -> {self.lead.name} ({self.status})"
+
+
+# WhatsApp message log and analytics models
+from .whatsapp_models import (  # noqa: E402,F401
+    WhatsAppMessage, WhatsAppConversation, WhatsAppWebhook,
+    WhatsAppTemplate, WhatsAppCampaign, WhatsAppAnalytics,
+)
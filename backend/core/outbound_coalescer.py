@@ -0,0 +1,247 @@
+"""
+Per-recipient WhatsApp outbound coalescer
+
+Stage-change nudges, intent replies and booking confirmations can all fire
+at the same number within seconds. ``queue_whatsapp_message()`` buffers
+messages per recipient for WHATSAPP_COALESCE_WINDOW_SECONDS; when the window
+closes the buffer is reduced by priority and sent as one message:
+
+- TRANSACTIONAL (booking/payment confirmations) are always kept
+- REPLY (answers to an inbound message) are kept, duplicates dropped
+- AUTOMATED (stage nudges) are dropped when anything more important is
+  pending, and only the latest one is kept otherwise
+
+Each number is also limited to WHATSAPP_PER_NUMBER_MAX_MESSAGES sends per
+WHATSAPP_PER_NUMBER_WINDOW_SECONDS, counted in the shared cache so every
+web and worker process enforces the same limit. Over the limit, automated
+messages are dropped and the rest wait for the next window.
+
+Every message is backed by an OutboundMessage row, written as 'sending'
+in the caller's transaction (so before an inbound queue row is marked
+processed) and buffered on commit, so a rolled-back request sends
+nothing. Buffers live in process memory, but the row stays in 'sending'
+until delivered, so the outbound dispatcher resends it if this process
+exits first; ``flush_pending()`` sends what is buffered before a
+short-lived process (e.g. one inbound queue drain) exits. The row's ``locked_at``
+is a lease: it is renewed each time the recipient's buffer is flushed
+(including after a rate-limit deferral or a failed send), and only if it
+still holds the value this process set. A row whose lease went stale and
+was reclaimed by the dispatcher is left to the dispatcher, never sent twice.
+"""
+
+import logging
+import operator
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import reduce
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+AUTOMATED = 1
+REPLY = 2
+TRANSACTIONAL = 3
+
+MAX_SEND_ATTEMPTS = 3
+
+
+@dataclass
+class BufferedMessage:
+    phone: str
+    body: str
+    priority: int
+    session_id: str
+    outbound_id: Optional[int] = None
+    leased_at: Optional[datetime] = None  # the row's locked_at while this process owns it
+    attempts: int = 0
+    queued_at: float = field(default_factory=time.time)
+
+
+_buffers = defaultdict(list)
+_scheduled = set()
+_lock = threading.Lock()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def normalize_phone(phone) -> str:
+    return ''.join(ch for ch in str(phone) if ch.isdigit())
+
+
+def queue_whatsapp_message(phone, message, priority=REPLY, session_id='customer_support', outbound=None):
+    """
+    Buffer a WhatsApp message for ``phone``; it is sent when the recipient's window closes
+
+    ``outbound`` is the OutboundMessage row backing the message, saved as
+    'sending' with ``locked_at`` set (the lease this process holds); one is
+    created when it is not given.
+    """
+    from .models import OutboundMessage
+
+    phone = normalize_phone(phone)
+    if not phone or not message:
+        return
+    if outbound is None:
+        outbound = OutboundMessage.objects.create(
+            to=phone, rendered_body=message, status='sending', locked_at=timezone.now()
+        )
+    item = BufferedMessage(phone, message, priority, session_id, outbound.id, outbound.locked_at)
+    transaction.on_commit(lambda: _buffer(item))
+
+
+def _buffer(item: BufferedMessage, delay: Optional[float] = None):
+    from services.retry_scheduler import get_retry_queue
+
+    with _lock:
+        _buffers[item.phone].append(item)
+        if item.phone in _scheduled:
+            return
+        _scheduled.add(item.phone)
+    if delay is None:
+        delay = _setting('WHATSAPP_COALESCE_WINDOW_SECONDS', 3)
+    get_retry_queue().schedule(delay, flush_recipient, item.phone)
+
+
+def reduce_messages(items):
+    """
+    Keep what is worth sending from one recipient's window
+
+    Returns ``(kept, dropped)``; kept messages are ordered by priority,
+    then arrival.
+    """
+    kept, dropped, seen = [], [], set()
+    top = max(item.priority for item in items)
+    automated = [item for item in items if item.priority == AUTOMATED]
+    latest_automated = automated[-1] if automated and top == AUTOMATED else None
+
+    for item in sorted(items, key=lambda i: (-i.priority, i.queued_at)):
+        redundant = item.body in seen or (item.priority == AUTOMATED and item is not latest_automated)
+        if redundant:
+            dropped.append(item)
+        else:
+            kept.append(item)
+            seen.add(item.body)
+    return kept, dropped
+
+
+def _take_send_slot(phone) -> float:
+    """
+    Reserve a send for ``phone``; returns 0, or seconds until the next window
+
+    Sends are counted per fixed window in the shared cache, one key per
+    number and window, so the limit holds across processes.
+    """
+    limit = _setting('WHATSAPP_PER_NUMBER_MAX_MESSAGES', 5)
+    window = _setting('WHATSAPP_PER_NUMBER_WINDOW_SECONDS', 60)
+    now = time.time()
+    slot = int(now // window)
+    key = f'whatsapp_sends:{phone}:{slot}'
+    cache.add(key, 0, window * 2)
+    try:
+        sent = cache.incr(key)
+    except ValueError:
+        # Evicted between add and incr
+        cache.set(key, 1, window * 2)
+        sent = 1
+    if sent > limit:
+        return (slot + 1) * window - now
+    return 0.0
+
+
+def _renew_leases(items):
+    """Renew the locked_at lease of rows behind ``items``; returns the items this process still owns"""
+    from .models import OutboundMessage
+
+    owned = []
+    now = timezone.now()
+    for item in items:
+        if item.outbound_id:
+            renewed = OutboundMessage.objects.filter(
+                id=item.outbound_id, status='sending', locked_at=item.leased_at
+            ).update(locked_at=now)
+            if not renewed:
+                logger.warning(f"Outbound message {item.outbound_id} was reclaimed by the dispatcher, not sending it here")
+                continue
+            item.leased_at = now
+        owned.append(item)
+    return owned
+
+
+def flush_recipient(phone):
+    """Send the coalesced buffer for one recipient (runs on the retry queue's pool)"""
+    with _lock:
+        items = _buffers.pop(phone, [])
+        _scheduled.discard(phone)
+    if not items:
+        return
+
+    try:
+        items = _renew_leases(items)
+        if not items:
+            return
+        kept, dropped = reduce_messages(items)
+        wait = _take_send_slot(phone)
+        if wait:
+            deferred = [item for item in kept if item.priority > AUTOMATED]
+            dropped += [item for item in kept if item.priority == AUTOMATED]
+            logger.warning(f"Rate limit for {phone}: deferring {len(deferred)}, dropping {len(kept) - len(deferred)}")
+            for item in deferred:
+                _buffer(item, delay=wait)
+            _mark_outbound(dropped, 'failed', 'Dropped by outbound coalescer')
+            return
+
+        if dropped:
+            logger.info(f"Coalesced {len(items)} messages to {phone} into 1, dropped {len(dropped)}")
+        _mark_outbound(dropped, 'failed', 'Dropped by outbound coalescer')
+        _send(phone, kept)
+    finally:
+        # Pool threads own their DB connection
+        connection.close()
+
+
+def flush_pending():
+    """Send every buffered recipient now, without waiting for its window (call before exiting)"""
+    with _lock:
+        phones = list(_buffers)
+    for phone in phones:
+        flush_recipient(phone)
+
+
+def _send(phone, kept):
+    from .views import send_whatsapp_message
+
+    body = '\n\n'.join(item.body for item in kept)
+    try:
+        send_whatsapp_message(phone, body, session_id=kept[0].session_id)
+    except Exception as e:
+        retry = [item for item in kept if item.priority > AUTOMATED and item.attempts + 1 < MAX_SEND_ATTEMPTS]
+        logger.error(f"Coalesced send to {phone} failed, retrying {len(retry)} of {len(kept)}: {e}")
+        for item in retry:
+            item.attempts += 1
+            _buffer(item, delay=30 * 2 ** (item.attempts - 1))
+        _mark_outbound([item for item in kept if item not in retry], 'failed', str(e))
+        return
+    _mark_outbound(kept, 'sent')
+
+
+def _mark_outbound(items, status, error=''):
+    from .models import OutboundMessage
+
+    leases = [Q(id=item.outbound_id, locked_at=item.leased_at) for item in items if item.outbound_id]
+    if not leases:
+        return
+    updates = {'status': status, 'locked_at': None, 'error': error[:250]}
+    if status == 'sent':
+        updates['sent_at'] = timezone.now()
+    OutboundMessage.objects.filter(reduce(operator.or_, leases), status='sending').update(**updates)
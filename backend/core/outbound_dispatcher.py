@@ -0,0 +1,167 @@
+"""
+Outbound WhatsApp dispatcher
+
+``process_outbound_messages`` drains the OutboundMessage queue: a batch of
+due rows is claimed with SKIP LOCKED and marked 'sending' in one short
+transaction, sent through CustomWhatsAppProvider on a rate-limited thread
+pool (no DB work in the send threads), then written back with one
+``bulk_update`` and one ``bulk_create`` of LeadEvents. Any number of
+dispatcher processes can run side by side; a row is only ever owned by
+the dispatcher that claimed it.
+
+The provider message id is derived from the row id, so a row reclaimed
+after a crash mid-send is re-sent under the same id and the gateway can
+drop the duplicate.
+"""
+
+import logging
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from .models import Lead, LeadEvent, OutboundMessage
+from .services import enqueue_template_message
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRIES = 5
+# A 'sending' row older than this belongs to a crashed dispatcher and is reclaimed
+LOCK_TIMEOUT = timezone.timedelta(minutes=5)
+PERMANENT_ERRORS = ('Invalid phone number format',)
+
+
+def provider_message_id(message: OutboundMessage) -> str:
+    return f"outbound_{message.id}"
+
+
+def get_dispatch_provider():
+    """
+    Provider used by the dispatcher
+
+    In-process retries are disabled: a failed row goes back to the queue
+    with a backoff, so retries survive restarts and any dispatcher can
+    pick them up.
+    """
+    from django.conf import settings
+    from services.custom_whatsapp_provider import CustomWhatsAppProvider
+
+    return CustomWhatsAppProvider(
+        api_endpoint=settings.CUSTOM_WHATSAPP_API_ENDPOINT,
+        api_key=settings.CUSTOM_WHATSAPP_API_KEY,
+        webhook_secret=settings.CUSTOM_WHATSAPP_WEBHOOK_SECRET,
+        timeout=settings.CUSTOM_WHATSAPP_TIMEOUT,
+        retry_count=0,
+    )
+
+
+def claim_outbound_batch(limit=50):
+    """
+    Claim up to ``limit`` due messages for this dispatcher
+
+    Rows are locked with SKIP LOCKED so concurrent dispatchers never claim
+    the same message; stale claims from crashed dispatchers are picked up
+    again.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            OutboundMessage.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status='queued') & (Q(scheduled_for__lte=now) | Q(scheduled_for__isnull=True))
+                | Q(status='sending', locked_at__lt=now - LOCK_TIMEOUT)
+            )
+            .order_by('id')
+            .values_list('id', flat=True)[:limit]
+        )
+        OutboundMessage.objects.filter(id__in=ids).update(status='sending', locked_at=now)
+    return list(OutboundMessage.objects.filter(id__in=ids).order_by('id'))
+
+
+def send_outbound_batch(messages, provider, workers=4, rate_per_second=None):
+    """Send claimed messages concurrently. Returns provider responses in the same order."""
+    from services.bulk_sender import BulkSender
+
+    sender = BulkSender(
+        send=lambda message: provider.send_message(
+            phone_number=message.to,
+            message_text=message.rendered_body,
+            message_id=provider_message_id(message),
+            metadata={'outbound_id': message.id, 'lead_id': message.lead_id},
+        ),
+        is_success=lambda response: response.success,
+        rate_per_second=rate_per_second,
+        max_workers=workers,
+        max_retries=0,
+    )
+    return sender.run(messages)
+
+
+def record_outbound_results(messages, responses):
+    """Write back statuses in one bulk_update and log sends in one bulk_create. Returns sent count."""
+    now = timezone.now()
+    events = []
+    sent = 0
+    for message, response in zip(messages, responses):
+        message.locked_at = None
+        if response.success:
+            message.status = 'sent'
+            message.sent_at = now
+            message.error = ''
+            sent += 1
+            if message.lead_id:
+                events.append(LeadEvent(
+                    lead_id=message.lead_id,
+                    type='outbound_msg',
+                    payload={'body': message.rendered_body, 'outbound_id': message.id},
+                ))
+            continue
+
+        message.retries += 1
+        message.error = (response.error or 'Unknown error')[:250]
+        if response.error in PERMANENT_ERRORS or message.retries >= MAX_RETRIES:
+            message.status = 'failed'
+        else:
+            # Exponential backoff: 30s, 60s, 120s, ...
+            message.status = 'queued'
+            message.scheduled_for = now + timezone.timedelta(seconds=30 * 2 ** (message.retries - 1))
+
+    with transaction.atomic():
+        OutboundMessage.objects.bulk_update(
+            messages, ['status', 'sent_at', 'error', 'retries', 'scheduled_for', 'locked_at']
+        )
+        LeadEvent.objects.bulk_create(events)
+    return sent
+
+
+def dispatch_outbound_batch(provider, batch_size=50, workers=4, rate_per_second=None):
+    """Claim, send and record one batch. Returns ``(claimed, sent)``."""
+    batch = claim_outbound_batch(batch_size)
+    if not batch:
+        return 0, 0
+    responses = send_outbound_batch(batch, provider, workers=workers, rate_per_second=rate_per_second)
+    return len(batch), record_outbound_results(batch, responses)
+
+
+def enqueue_balance_reminders(limit=20) -> int:
+    """Queue a balance reminder for advance-paid leads idle for a day, at most once per day each"""
+    older = timezone.now() - timezone.timedelta(days=1)
+    recent_reminder = OutboundMessage.objects.filter(
+        lead=OuterRef('pk'), template__name='balance_reminder', created_at__gte=older
+    )
+    leads = (
+        Lead.objects.filter(stage='advance_paid', last_contact_at__lte=older)
+        .exclude(Exists(recent_reminder))
+        .select_related('trip')[:limit]
+    )
+    queued = 0
+    for lead in leads:
+        message = enqueue_template_message(lead, lead.phone or lead.metadata.get('phone', ''), 'balance_reminder', {
+            'first_name': (lead.name.split()[0] if lead.name else 'Traveler'),
+            'balance_amount': lead.metadata.get('balance_amount', ''),
+            'trip_name': lead.trip.name if getattr(lead, 'trip', None) else '',
+            'due_date': (timezone.now() + timezone.timedelta(days=2)).date(),
+            'payment_link': lead.metadata.get('payment_link', '')
+        })
+        queued += message is not None
+    return queued
@@ -0,0 +1,149 @@
+"""
+Wake-up scheduler for the outbound dispatcher
+
+Instead of polling OutboundMessage every interval, the dispatcher blocks in
+``OutboundWakeup.wait()`` until the next ``scheduled_for`` is due or a new
+message is announced. Upcoming due times are loaded into a min-heap from the
+(status, scheduled_for) index, one query per horizon; new rows are pushed in
+through a notification sent on commit (``notify_outbound_message``):
+
+- PostgreSQL: ``pg_notify`` on OUTBOUND_CHANNEL, received by every
+  dispatcher process through a dedicated LISTEN connection
+- other databases: an in-process event, so only dispatchers in the same
+  process wake early; others pick the row up at their next reload
+
+Claiming stays in ``claim_outbound_batch`` (SKIP LOCKED), so a wake-up that
+finds nothing to do is harmless.
+"""
+
+import heapq
+import logging
+import select
+import threading
+import time
+
+from django.db import connection
+from django.utils import timezone
+
+from .models import OutboundMessage
+
+logger = logging.getLogger(__name__)
+
+OUTBOUND_CHANNEL = 'outbound_message'
+DEFAULT_HORIZON_SECONDS = 300
+MAX_LOADED = 1000
+
+_local_wakeups = []
+_local_lock = threading.Lock()
+
+
+def notify_outbound_message(message: OutboundMessage):
+    """Announce a queued message to waiting dispatchers (call after commit)"""
+    due = message.scheduled_for.timestamp() if message.scheduled_for else time.time()
+    with _local_lock:
+        wakeups = list(_local_wakeups)
+    for wakeup in wakeups:
+        wakeup.push(due)
+    if connection.vendor == 'postgresql':
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_notify(%s, %s)", [OUTBOUND_CHANNEL, str(due)])
+        except Exception as e:
+            logger.warning(f"Outbound notify failed: {e}")
+
+
+class OutboundWakeup:
+    """Min-heap of upcoming due times plus a notification listener"""
+
+    def __init__(self, horizon: float = DEFAULT_HORIZON_SECONDS):
+        self.horizon = horizon
+        self._heap = []
+        self._lock = threading.Lock()
+        self._event = threading.Event()
+        self._reload_at = 0.0
+        self._listener = self._open_listener()
+        with _local_lock:
+            _local_wakeups.append(self)
+
+    def _open_listener(self):
+        if connection.vendor != 'postgresql':
+            return None
+        try:
+            import psycopg2
+            listener = psycopg2.connect(**connection.get_connection_params())
+            listener.set_session(autocommit=True)
+            with listener.cursor() as cursor:
+                cursor.execute(f"LISTEN {OUTBOUND_CHANNEL}")
+            return listener
+        except Exception as e:
+            logger.warning(f"Outbound LISTEN unavailable, falling back to reloads: {e}")
+            return None
+
+    def close(self):
+        with _local_lock:
+            if self in _local_wakeups:
+                _local_wakeups.remove(self)
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+
+    def push(self, due: float):
+        with self._lock:
+            heapq.heappush(self._heap, due)
+        self._event.set()
+
+    def reload(self):
+        """Load due times of queued messages within the horizon from the index"""
+        now = time.time()
+        upcoming = list(
+            OutboundMessage.objects.filter(
+                status='queued',
+                scheduled_for__gt=timezone.now(),
+                scheduled_for__lte=timezone.now() + timezone.timedelta(seconds=self.horizon),
+            )
+            .order_by('scheduled_for')
+            .values_list('scheduled_for', flat=True)[:MAX_LOADED]
+        )
+        heap = [due.timestamp() for due in upcoming]
+        with self._lock:
+            self._heap = heap  # already sorted, so a valid heap
+        # A truncated load is only trusted up to its last entry
+        self._reload_at = heap[-1] if len(heap) == MAX_LOADED else now + self.horizon
+
+    def next_due(self) -> float:
+        with self._lock:
+            head = self._heap[0] if self._heap else self._reload_at
+        return min(head, self._reload_at)
+
+    def wait(self, max_wait: float = None) -> bool:
+        """
+        Block until a message is due, a new one is announced or ``max_wait`` passes
+
+        Returns True when something is (probably) ready to claim.
+        """
+        self._event.clear()
+        if time.time() >= self._reload_at:
+            self.reload()
+        timeout = max(0.0, self.next_due() - time.time())
+        if max_wait is not None:
+            timeout = min(timeout, max_wait)
+
+        if self._listener is not None:
+            if select.select([self._listener], [], [], timeout)[0]:
+                self._listener.poll()
+                while self._listener.notifies:
+                    payload = self._listener.notifies.pop(0).payload
+                    try:
+                        self.push(float(payload))
+                    except ValueError:
+                        self.push(time.time())
+        else:
+            self._event.wait(timeout)
+
+        now = time.time()
+        ready = False
+        with self._lock:
+            while self._heap and self._heap[0] <= now:
+                heapq.heappop(self._heap)
+                ready = True
+        return ready or now >= self._reload_at
@@ -0,0 +1,293 @@
+"""
+Bulk UPI reconciliation against a bank/PSP statement
+
+Staff upload the statement (CSV or OFX) instead of verifying payments one
+by one. The file is read as a stream of credit rows; every CHUNK_SIZE rows
+are matched to pending Payments with two indexed ``__in`` lookups:
+
+- ``upi_txn_id`` (the UTR the customer submitted with their proof), else
+- ``reference_number`` (our TAS… reference, found in the narration/memo)
+
+and the statement amount must equal the payment amount. Matches in a chunk
+are verified together: one UPDATE of the payments (plus a ``bulk_update``
+for those whose UTR/VPA is filled in from the statement) and one
+``bulk_create`` each of PaymentVerificationLog and TransactionAudit rows,
+inside a transaction that locks the matched payments. Their
+payment-received emails are queued in bulk for after the commit, since
+the queryset update skips post_save. Rows that match nothing, match a
+payment whose amount differs, or repeat an earlier row are reported and
+left for manual review.
+
+Entry points: ``python manage.py reconcile_upi_statement <file>`` and
+POST /api/payments/reconcile/ (staff, multipart ``statement`` file).
+"""
+
+import csv
+import io
+import logging
+import re
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from typing import Iterator, List, Optional
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Payment, PaymentVerificationLog, TransactionAudit
+from .signals import queue_payment_confirmation_emails
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 500
+MAX_REPORTED_ISSUES = 200
+REFERENCE_RE = re.compile(r'\bTAS\d{6,}\b', re.IGNORECASE)
+
+# Normalized CSV header -> statement field; banks and PSPs name these differently
+CSV_COLUMNS = {
+    'upi_txn_id': 'txn_id', 'utr': 'txn_id', 'utr_no': 'txn_id', 'utr_number': 'txn_id',
+    'rrn': 'txn_id', 'transaction_id': 'txn_id', 'txn_id': 'txn_id', 'upi_ref_no': 'txn_id',
+    'reference_number': 'reference', 'reference': 'reference', 'ref_no': 'reference',
+    'narration': 'narration', 'description': 'narration', 'remarks': 'narration', 'particulars': 'narration',
+    'amount': 'amount', 'credit': 'amount', 'credit_amount': 'amount', 'cr_amount': 'amount', 'deposit': 'amount',
+    'payer_vpa': 'vpa', 'vpa': 'vpa', 'customer_vpa': 'vpa', 'from_vpa': 'vpa',
+}
+HEADER_SEARCH_ROWS = 50  # statements often start with account details above the header
+
+
+@dataclass
+class StatementRow:
+    line: int
+    txn_id: str
+    reference: str
+    amount: Optional[Decimal]
+    vpa: str = ''
+
+
+@dataclass
+class ReconciliationReport:
+    rows: int = 0
+    verified: int = 0
+    already_verified: int = 0
+    amount_mismatch: int = 0
+    unmatched: int = 0
+    duplicates: int = 0
+    skipped: int = 0  # debit or unparseable rows
+    dry_run: bool = False
+    issues: List[dict] = field(default_factory=list)
+
+    def add_issue(self, kind, row: StatementRow, **details):
+        setattr(self, kind, getattr(self, kind) + 1)
+        if len(self.issues) < MAX_REPORTED_ISSUES:
+            self.issues.append({
+                'issue': kind, 'line': row.line, 'txn_id': row.txn_id,
+                'reference': row.reference, 'amount': str(row.amount), **details,
+            })
+
+    def as_dict(self):
+        return {
+            'rows': self.rows, 'verified': self.verified, 'already_verified': self.already_verified,
+            'amount_mismatch': self.amount_mismatch, 'unmatched': self.unmatched,
+            'duplicates': self.duplicates, 'skipped': self.skipped,
+            'dry_run': self.dry_run, 'issues': self.issues,
+        }
+
+
+# ============================================================
+# Statement readers (streaming, one row at a time)
+# ============================================================
+
+def _parse_amount(value) -> Optional[Decimal]:
+    cleaned = re.sub(r'[^\d.\-]', '', str(value or ''))
+    if not cleaned:
+        return None
+    try:
+        return Decimal(cleaned).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        return None
+
+
+def _find_reference(*texts) -> str:
+    for text in texts:
+        match = REFERENCE_RE.search(text or '')
+        if match:
+            return match.group(0).upper()
+    return ''
+
+
+def _normalize_header(name) -> str:
+    return re.sub(r'[^a-z0-9]+', '_', (name or '').strip().lower()).strip('_')
+
+
+def iter_csv_statement(stream) -> Iterator[StatementRow]:
+    reader = csv.reader(stream)
+    columns = None
+    for line, values in enumerate(reader, start=1):
+        if columns is None:
+            mapped = {i: CSV_COLUMNS.get(_normalize_header(name)) for i, name in enumerate(values)}
+            if 'amount' in mapped.values() and ({'txn_id', 'reference', 'narration'} & set(mapped.values())):
+                columns = {i: name for i, name in mapped.items() if name}
+            elif line >= HEADER_SEARCH_ROWS:
+                raise ValueError('No header with an amount and a transaction/reference column found')
+            continue
+        record = {}
+        for i, name in columns.items():
+            if i < len(values) and values[i].strip() and name not in record:
+                record[name] = values[i].strip()
+        if not record:
+            continue
+        yield StatementRow(
+            line=line,
+            txn_id=record.get('txn_id', ''),
+            reference=_find_reference(record.get('reference'), record.get('narration')),
+            amount=_parse_amount(record.get('amount')),
+            vpa=record.get('vpa', ''),
+        )
+    if columns is None:
+        raise ValueError('No header with an amount and a transaction/reference column found')
+
+
+OFX_TAG_RE = re.compile(r'<(/?)([A-Z0-9.]+)>([^<\r\n]*)', re.IGNORECASE)
+
+
+def iter_ofx_statement(stream) -> Iterator[StatementRow]:
+    """OFX 1.x (SGML, unclosed tags) and 2.x (XML) <STMTTRN> blocks"""
+    current = None
+    for line, text in enumerate(stream, start=1):
+        for closing, tag, value in OFX_TAG_RE.findall(text):
+            tag = tag.upper()
+            if tag == 'STMTTRN':
+                if closing and current is not None:
+                    yield StatementRow(
+                        line=current['line'],
+                        txn_id=current.get('FITID') or current.get('REFNUM', ''),
+                        reference=_find_reference(current.get('REFNUM'), current.get('MEMO'), current.get('NAME')),
+                        amount=_parse_amount(current.get('TRNAMT')),
+                        vpa=current.get('PAYEEID', ''),
+                    )
+                    current = None
+                elif not closing:
+                    current = {'line': line}
+            elif current is not None and not closing and value.strip():
+                current[tag] = value.strip()
+
+
+def iter_statement(stream, fmt=None, name='') -> Iterator[StatementRow]:
+    """Rows of a text statement stream; ``fmt`` is 'csv' or 'ofx' (default: from the file name)"""
+    fmt = (fmt or ('ofx' if name.lower().endswith(('.ofx', '.qfx')) else 'csv')).lower()
+    if fmt == 'ofx':
+        return iter_ofx_statement(stream)
+    if fmt == 'csv':
+        return iter_csv_statement(stream)
+    raise ValueError(f'Unsupported statement format: {fmt}')
+
+
+def open_text_stream(binary_file):
+    """Decode an uploaded/opened binary file lazily (BOM-tolerant UTF-8)"""
+    return io.TextIOWrapper(binary_file, encoding='utf-8-sig', errors='replace', newline='')
+
+
+# ============================================================
+# Matching and bulk verification
+# ============================================================
+
+def _reconcile_chunk(chunk: List[StatementRow], report, user, statement_name, dry_run, seen_txn_ids, verified_ids):
+    txn_ids = {row.txn_id for row in chunk if row.txn_id}
+    references = {row.reference for row in chunk if row.reference}
+
+    with transaction.atomic():
+        by_txn, by_reference = {}, {}
+        if txn_ids:
+            for payment in Payment.objects.select_for_update().filter(upi_txn_id__in=txn_ids):
+                by_txn.setdefault(payment.upi_txn_id, []).append(payment)
+        if references:
+            for payment in Payment.objects.select_for_update().filter(reference_number__in=references):
+                by_reference[payment.reference_number] = payment
+
+        now = timezone.now()
+        verified, completed, logs, audits = {}, [], [], []
+        for row in chunk:
+            if row.txn_id and row.txn_id in seen_txn_ids:
+                report.add_issue('duplicates', row)
+                continue
+            if row.txn_id:
+                seen_txn_ids.add(row.txn_id)
+
+            candidates = list(by_txn.get(row.txn_id, ()))
+            if row.reference in by_reference and by_reference[row.reference] not in candidates:
+                candidates.append(by_reference[row.reference])
+            if not candidates:
+                report.add_issue('unmatched', row)
+                continue
+
+            payment = next((p for p in candidates if p.amount == row.amount), None)
+            if payment is None:
+                report.add_issue('amount_mismatch', row, payment_id=candidates[0].id,
+                                 expected=str(candidates[0].amount))
+                continue
+            if payment.verification_status != 'pending' or payment.id in verified_ids:
+                report.add_issue('already_verified', row, payment_id=payment.id)
+                continue
+
+            old_status = payment.status
+            note = f"Reconciled from {statement_name or 'statement'} line {row.line}: UPI TXN {row.txn_id or '-'}"
+            verified[payment.id] = payment
+            verified_ids.add(payment.id)
+            # The customer may not have submitted their UTR/VPA; keep the statement's
+            if (row.txn_id and not payment.upi_txn_id) or (row.vpa and not payment.customer_vpa):
+                payment.upi_txn_id = payment.upi_txn_id or row.txn_id
+                payment.customer_vpa = payment.customer_vpa or row.vpa
+                completed.append(payment)
+            logs.append(PaymentVerificationLog(
+                payment=payment, method='bank_api', status='verified', verified_by=user, notes=note,
+            ))
+            audits.append(TransactionAudit(
+                payment=payment, event_type='verified', old_value=old_status, new_value='verified',
+                details={'source': 'statement', 'statement': statement_name, 'line': row.line,
+                         'upi_txn_id': row.txn_id, 'amount': str(row.amount)},
+                created_by=user,
+            ))
+            report.verified += 1
+
+        if verified and not dry_run:
+            Payment.objects.filter(id__in=verified).update(
+                verification_status='verified',
+                status='verified',
+                verified_by=user,
+                verification_timestamp=now,
+                verification_notes=f"Reconciled from {statement_name or 'statement'}",
+            )
+            if completed:
+                Payment.objects.bulk_update(completed, ['upi_txn_id', 'customer_vpa'])
+            PaymentVerificationLog.objects.bulk_create(logs)
+            TransactionAudit.objects.bulk_create(audits)
+            queue_payment_confirmation_emails(verified)
+
+
+def reconcile_statement(rows, user=None, statement_name='', dry_run=False, chunk_size=CHUNK_SIZE):
+    """
+    Verify the pending payments matched by ``rows`` (an iterable of StatementRow)
+
+    Only credit rows with an amount are considered. With ``dry_run`` the
+    report is produced without writing anything.
+    """
+    report = ReconciliationReport(dry_run=dry_run)
+    seen_txn_ids, verified_ids = set(), set()
+    chunk = []
+    for row in rows:
+        report.rows += 1
+        if row.amount is None or row.amount <= 0 or not (row.txn_id or row.reference):
+            report.skipped += 1
+            continue
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            _reconcile_chunk(chunk, report, user, statement_name, dry_run, seen_txn_ids, verified_ids)
+            chunk = []
+    if chunk:
+        _reconcile_chunk(chunk, report, user, statement_name, dry_run, seen_txn_ids, verified_ids)
+
+    logger.info(
+        "Statement %s reconciled: %s rows, %s verified, %s unmatched, %s amount mismatches%s",
+        statement_name, report.rows, report.verified, report.unmatched, report.amount_mismatch,
+        ' (dry run)' if dry_run else '',
+    )
+    return report
@@ -0,0 +1,131 @@
+"""
+Seat locks without row locks on the trip
+
+Checkout holds seats with a SeatLock for SEAT_LOCK_MINUTES. Seats move
+between Trip.spots_available and the lock only through single conditional
+UPDATEs, so concurrent buyers never wait on each other's transactions:
+
+- acquire: ``UPDATE trip SET spots_available = spots_available - n
+  WHERE id = ? AND spots_available >= n``; zero rows means sold out
+- refresh: ``expires_at`` is pushed out only ``WHERE status = 'active' AND
+  expires_at > now``, so a lock the sweeper has already expired stays expired
+- release / expire: the lock's status flips active -> released/expired with
+  ``WHERE status = 'active'``, and only the caller whose flip succeeded
+  returns the seats, so a lock never gives its seats back twice
+- sweep: abandoned locks are expired in batches by (status, expires_at) and
+  their seats returned with one F() update per trip, then the trip
+  catalogue version is bumped once; run it in the background with ``python manage.py sweep_seat_locks --loop``
+"""
+
+import logging
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import SeatLock, Trip
+from .trip_catalogue import bump_catalogue_version
+
+logger = logging.getLogger(__name__)
+
+SEAT_LOCK_MINUTES = 5
+
+
+class SeatsUnavailable(Exception):
+    """The trip does not have enough spots left for the lock"""
+
+
+def acquire_seat_lock(trip_id, user, seats):
+    """
+    Take ``seats`` spots off the trip and hold them in a new active SeatLock
+
+    Raises Trip.DoesNotExist for an unknown trip and SeatsUnavailable when
+    fewer than ``seats`` spots are left.
+    """
+    with transaction.atomic():
+        taken = Trip.objects.filter(id=trip_id, spots_available__gte=seats).update(
+            spots_available=F('spots_available') - seats
+        )
+        if not taken:
+            if not Trip.objects.filter(id=trip_id).exists():
+                raise Trip.DoesNotExist(f'Trip {trip_id} not found')
+            raise SeatsUnavailable(f'Not enough spots available on trip {trip_id}')
+        return SeatLock.objects.create(
+            trip_id=trip_id,
+            user=user,
+            seats=seats,
+            expires_at=timezone.now() + timedelta(minutes=SEAT_LOCK_MINUTES),
+        )
+
+
+def refresh_seat_lock(lock):
+    """
+    Extend an active, unexpired lock by SEAT_LOCK_MINUTES from now
+
+    Returns False when the lock was released, consumed or already past its
+    expiry (the sweeper may have returned its seats), leaving it unchanged.
+    """
+    now = timezone.now()
+    expires_at = now + timedelta(minutes=SEAT_LOCK_MINUTES)
+    if not SeatLock.objects.filter(id=lock.id, status='active', expires_at__gt=now).update(expires_at=expires_at):
+        return False
+    lock.expires_at = expires_at
+    return True
+
+
+def end_seat_lock(lock, status, expired_only=False):
+    """
+    Move an active lock to ``status`` ('released' or 'expired') and return its seats
+
+    Returns False when the lock was no longer active (already released,
+    expired, consumed by a booking or swept), in which case nothing changes.
+    """
+    locks = SeatLock.objects.filter(id=lock.id, status='active')
+    if expired_only:
+        locks = locks.filter(expires_at__lte=timezone.now())
+    with transaction.atomic():
+        if not locks.update(status=status):
+            return False
+        Trip.objects.filter(id=lock.trip_id).update(spots_available=F('spots_available') + lock.seats)
+    lock.status = status
+    return True
+
+
+def sweep_expired_seat_locks(batch_size=500, now=None):
+    """
+    Expire active locks past their expires_at and return their seats
+
+    Each batch claims locks with SKIP LOCKED (a booking consuming a lock holds
+    its row), flips them to expired and issues one F() update per trip.
+    Returns (locks expired, seats returned).
+    """
+    now = now or timezone.now()
+    expired = returned = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                SeatLock.objects
+                .select_for_update(skip_locked=True)
+                .filter(status='active', expires_at__lte=now)
+                .order_by('expires_at')
+                .values_list('id', 'trip_id', 'seats')[:batch_size]
+            )
+            if not batch:
+                break
+            SeatLock.objects.filter(id__in=[lock_id for lock_id, _, _ in batch], status='active').update(status='expired')
+            seats_by_trip = Counter()
+            for _, trip_id, seats in batch:
+                seats_by_trip[trip_id] += seats
+            for trip_id, seats in seats_by_trip.items():
+                Trip.objects.filter(id=trip_id).update(spots_available=F('spots_available') + seats)
+        expired += len(batch)
+        returned += sum(seats_by_trip.values())
+        if len(batch) < batch_size:
+            break
+    if expired:
+        # The F() updates skip the Trip signals that invalidate cached catalogue pages
+        bump_catalogue_version()
+        logger.info("Expired %s seat locks, returned %s seats", expired, returned)
+    return expired, returned
@@ -37,6 +37,8 @@ class SeatLockSerializer(serializers.ModelSerializer):
         fields = ['id', 'trip', 'trip_name', 'user', 'seats', 'expires_at', 'status', 'created_at']
         read_only_fields = ['status', 'created_at', 'user']
 
+RECENT_VERIFICATION_LOGS = 5  # Newest logs nested in each payment
+
 class PaymentSerializer(serializers.ModelSerializer):
     booking_destination = serializers.CharField(source='booking.destination', read_only=True)
     verified_by_username = serializers.CharField(source='verified_by.username', read_only=True, allow_null=True)
@@ -56,7 +58,10 @@ class PaymentSerializer(serializers.ModelSerializer):
         read_only_fields = ['status', 'created_at', 'reference_number', 'risk_level', 'risk_score', 'risk_flags']
     
     def get_verification_logs(self, obj):
-        logs = obj.verification_logs.all().order_by('-created_at')[:5]  # Last 5 logs
+        # Prefetched by views.pending_payments_queryset; otherwise queried per payment
+        logs = getattr(obj, 'recent_verification_logs', None)
+        if logs is None:
+            logs = obj.verification_logs.select_related('verified_by').order_by('-created_at')[:RECENT_VERIFICATION_LOGS]
         return PaymentVerificationLogSerializer(logs, many=True).data
 
 class TripHistorySerializer(serializers.ModelSerializer):
@@ -92,15 +97,38 @@ class TripSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Trip
-        fields = ['id', 'name', 'description', 'images', 'location', 'duration', 'spots_available', 'max_capacity', 'status', 'next_departure', 'price', 'safety_record', 'highlights', 'equipment', 'essentials', 'guide', 'guide_id', 'created_at', 'available_slots', 'is_available']
-        read_only_fields = ['created_at', 'guide', 'available_slots', 'is_available']
+        fields = ['id', 'name', 'description', 'images', 'location', 'duration', 'spots_available', 'max_capacity', 'confirmed_seats', 'status', 'next_departure', 'price', 'safety_record', 'highlights', 'equipment', 'essentials', 'guide', 'guide_id', 'created_at', 'available_slots', 'is_available']
+        read_only_fields = ['created_at', 'guide', 'confirmed_seats', 'available_slots', 'is_available']
 
+    # Both read the trip's maintained confirmed_seats counter, no per-trip query
     def get_available_slots(self, obj):
         return obj.get_available_slots()
 
     def get_is_available(self, obj):
         return obj.is_available_for_booking()
 
+class TripCatalogueSerializer(serializers.ModelSerializer):
+    """
+    Read-only trip card for the catalogue; ``fields=[...]`` keeps a subset.
+    cover_image, available_slots and is_available come from SQL annotations
+    (see core.trip_catalogue.catalogue_queryset).
+    """
+    guide = GuideSerializer(read_only=True)
+    cover_image = serializers.CharField(read_only=True, allow_null=True)
+    available_slots = serializers.IntegerField(read_only=True)
+    is_available = serializers.BooleanField(read_only=True)
+
+    class Meta:
+        model = Trip
+        fields = ['id', 'name', 'description', 'location', 'duration', 'price', 'status', 'next_departure', 'max_capacity', 'safety_record', 'images', 'highlights', 'equipment', 'essentials', 'guide', 'created_at', 'cover_image', 'available_slots', 'is_available']
+        read_only_fields = fields
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
 class ReviewSerializer(serializers.ModelSerializer):
     user_name = serializers.CharField(source='user.username', read_only=True)
 
@@ -1,7 +1,8 @@
+from django.conf import settings
 from django.utils import timezone
 from django.db import transaction
-from .models import Lead, LeadEvent, MessageTemplate, OutboundMessage, Task
-from typing import Optional
+from .models import Lead, LeadEvent, MessageTemplate, OutboundMessage, Task, UserRecommendationCache
+from typing import Dict, List, Optional
 import logging
 
 logger = logging.getLogger(__name__)
@@ -46,7 +47,7 @@ def change_lead_stage(lead: Lead, new_stage: str, reason: str = '') -> bool:
             logger.warning(f"Failed to create initial_contact task for lead {lead.id}: {e}")
     
     # WhatsApp automation based on stage changes
-    if lead.whatsapp_number:
+    if lead.is_whatsapp and lead.phone:
         whatsapp_stage_messages = {
             'interested': "Thanks for your interest! 🌟 I'll send you detailed information about our amazing travel packages shortly.",
             'qualified': "Great! You're all set. ✅ I'll prepare a custom quote tailored just for you.",
@@ -59,17 +60,19 @@ def change_lead_stage(lead: Lead, new_stage: str, reason: str = '') -> bool:
         
         if new_stage in whatsapp_stage_messages:
             try:
-                from .views import send_whatsapp_message  # Import here to avoid circular imports
-                send_whatsapp_message(
-                    lead.whatsapp_number,
+                from .outbound_coalescer import AUTOMATED, queue_whatsapp_message
+                # Coalesced per recipient: dropped if a reply or confirmation is pending
+                queue_whatsapp_message(
+                    lead.phone,
                     whatsapp_stage_messages[new_stage],
+                    priority=AUTOMATED,
                     session_id='sales'
                 )
                 # Log the automated message
                 LeadEvent.objects.create(
                     lead=lead,
-                    event_type='whatsapp_message_sent',
-                    metadata={
+                    type='outbound_msg',
+                    payload={
                         'message': whatsapp_stage_messages[new_stage],
                         'trigger': f'stage_change_to_{new_stage}',
                         'automated': True,
@@ -220,3 +223,40 @@ def run_abandoned_scan(now=None, cutoff_minutes: int = 20) -> int:
         except Exception:
             continue
     return created_tasks
+
+def get_cached_recommendations(user_id: int) -> Optional[List[int]]:
+    """Return a user's precomputed trip ids, or None when missing, stale or expired."""
+    return (
+        UserRecommendationCache.objects
+        .filter(user_id=user_id, is_stale=False, expires_at__gt=timezone.now())
+        .values_list('trip_ids', flat=True)
+        .first()
+    )
+
+def store_user_recommendations(recommendations: Dict[int, List[int]], source: str = 'batch') -> int:
+    """Upsert cached recommendation lists ({user_id: [trip_id, ...]}). Returns rows written."""
+    now = timezone.now()
+    expires_at = now + timezone.timedelta(hours=getattr(settings, 'RECOMMENDATION_CACHE_TTL_HOURS', 24))
+    rows = [
+        UserRecommendationCache(
+            user_id=user_id,
+            trip_ids=list(trip_ids),
+            source=source,
+            is_stale=False,
+            generated_at=now,
+            expires_at=expires_at,
+        )
+        for user_id, trip_ids in recommendations.items()
+    ]
+    UserRecommendationCache.objects.bulk_create(
+        rows,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=['trip_ids', 'source', 'is_stale', 'generated_at', 'expires_at'],
+    )
+    return len(rows)
+
+def invalidate_user_recommendations(user_id: int) -> None:
+    """Flag a user's cached recommendations for on-demand recompute after a new interaction."""
+    UserRecommendationCache.objects.filter(user_id=user_id, is_stale=False).update(is_stale=True)
@@ -3,12 +3,18 @@ Django signals for triggering emails on key events
 Handles automatic email sending when bookings and payments occur
 """
 
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
 from django.dispatch import receiver
 from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
 import logging
 
-from core.models import Booking, Payment, UserProgress, Badge, Lead
+from core.models import Booking, Payment, UserProgress, Badge, Lead, LeadEvent, Wishlist, Review, OutboundMessage, Trip, Guide, UserProfile
+from core.services import invalidate_user_recommendations
+from core.trip_catalogue import bump_catalogue_version
+from core.dashboard import invalidate_user_dashboard
 from services.email_service import get_email_service
 
 logger = logging.getLogger(__name__)
@@ -32,23 +38,21 @@ def send_booking_confirmation_email(sender, instance, created, **kwargs):
             logger.warning(f"No email for user {user.id}, skipping booking confirmation")
             return
         
+        departure = (trip.next_departure if trip else None) or instance.date
         booking_data = {
             'user_name': user.first_name or user.username,
-            'trip_title': trip.name,
-            'trip_dates': f"{trip.start_date.strftime('%B %d')} - {trip.end_date.strftime('%B %d, %Y')}",
-            'total_price': instance.total_amount or trip.price * instance.seats,
+            'trip_title': trip.name if trip else instance.destination,
+            'trip_dates': departure.strftime('%B %d, %Y') if departure else 'TBD',
+            'total_price': f"₹{instance.amount:,.2f}",
             'booking_id': f"TREK{instance.id:06d}",
             'seats_booked': instance.seats,
-            'trip_details_url': f"https://trekandstay.com/trips/{trip.slug}",
+            'trip_details_url': f"https://trekandstay.com/trips/{trip.id}" if trip else 'https://trekandstay.com/trips',
         }
         
-        email_service.send_booking_confirmation(user.email, booking_data)
+        # Sent by the email worker after commit
+        email_service.send_booking_confirmation(user.email, booking_data, queue=True)
         
-        # Update booking confirmation flag
-        instance.confirmation_email_sent = True
-        instance.save(update_fields=['confirmation_email_sent'])
-        
-        logger.info(f"Booking confirmation email sent to {user.email}")
+        logger.info(f"Booking confirmation email queued for {user.email}")
         
     except Exception as e:
         logger.error(f"Error sending booking confirmation email: {str(e)}", exc_info=True)
@@ -88,11 +92,12 @@ Safe travels! 🏔️✨
 
 - Team Trek & Stay"""
         
-        # Import and send WhatsApp message
-        from .views import send_whatsapp_message
-        send_whatsapp_message(
-            phone=user.username,
-            message=message,
+        # Coalesced with any other message to this number in the same window
+        from .outbound_coalescer import TRANSACTIONAL, queue_whatsapp_message
+        queue_whatsapp_message(
+            user.username,
+            message,
+            priority=TRANSACTIONAL,
             session_id='booking_confirmations'
         )
         
@@ -106,41 +111,77 @@ Safe travels! 🏔️✨
         logger.error(f"Error sending booking confirmation WhatsApp: {str(e)}", exc_info=True)
 
 
+def payment_confirmation_data(payment):
+    """Template data for a payment's confirmation email"""
+    booking = payment.booking
+    user = booking.user
+    trip = booking.trip
+    return {
+        'user_name': user.first_name or user.username,
+        'amount': f"₹{payment.amount:,.2f}",
+        'payment_date': (payment.payment_confirmed_at or payment.created_at).strftime('%d %B %Y at %I:%M %p'),
+        'payment_method': 'UPI',
+        'transaction_id': payment.upi_txn_id or payment.reference_number or 'N/A',
+        'trip_title': trip.name if trip else booking.destination,
+    }
+
+
 @receiver(post_save, sender=Payment)
 def send_payment_confirmation_email(sender, instance, created, **kwargs):
     """
-    Send payment confirmation email when payment is completed
-    Triggered: When payment status changes to completed
+    Send payment confirmation email when payment is verified
+    Triggered: When a payment is saved as verified and has not been emailed yet
     """
-    if not created or instance.status != 'completed':
+    if instance.verification_status not in ('verified', 'auto_verified') or instance.confirmation_email_sent:
         return
     
     try:
-        booking = instance.booking
-        user = booking.user
-        trip = booking.trip
+        user = instance.booking.user
         
         if not user.email:
             logger.warning(f"No email for user {user.id}, skipping payment confirmation")
             return
         
-        payment_data = {
-            'user_name': user.first_name or user.username,
-            'amount': f"₹{instance.amount:,.2f}",
-            'payment_date': instance.created_at.strftime('%d %B %Y at %I:%M %p'),
-            'payment_method': instance.payment_method or 'UPI',
-            'transaction_id': instance.transaction_id or 'N/A',
-            'trip_title': trip.name,
-        }
+        payment_data = payment_confirmation_data(instance)
+        
+        # Claim the email before queuing it, so repeated saves queue it only once
+        if not Payment.objects.filter(id=instance.id, confirmation_email_sent=False).update(confirmation_email_sent=True):
+            return
+        instance.confirmation_email_sent = True
         
-        email_service.send_payment_received(user.email, payment_data)
+        # Sent by the email worker after commit
+        email_service.send_payment_received(user.email, payment_data, queue=True)
         
-        logger.info(f"Payment confirmation email sent to {user.email}")
+        logger.info(f"Payment confirmation email queued for {user.email}")
         
     except Exception as e:
         logger.error(f"Error sending payment confirmation email: {str(e)}", exc_info=True)
 
 
+def queue_payment_confirmation_emails(payment_ids):
+    """
+    Queue confirmation emails for payments verified by a queryset update
+    
+    Bulk verification (statement reconciliation) bypasses post_save; call
+    this inside the same transaction. The emails are claimed with one
+    conditional update and sent by the email worker after commit.
+    Returns the number queued.
+    """
+    payments = [
+        payment for payment in Payment.objects.filter(
+            id__in=list(payment_ids), confirmation_email_sent=False
+        ).select_related('booking__user', 'booking__trip')
+        if payment.booking.user.email
+    ]
+    if not payments:
+        return 0
+    Payment.objects.filter(id__in=[payment.id for payment in payments]).update(confirmation_email_sent=True)
+    for payment in payments:
+        email_service.send_payment_received(payment.booking.user.email, payment_confirmation_data(payment), queue=True)
+    logger.info(f"Queued {len(payments)} payment confirmation emails")
+    return len(payments)
+
+
 @receiver(post_save, sender=UserProgress)
 def send_achievement_unlocked_email(sender, instance, **kwargs):
     """
@@ -214,15 +255,108 @@ def send_lead_response_email(sender, instance, created, **kwargs):
 # BOOKING AUTO-PROMOTION SIGNALS
 # ==============================
 
+@receiver(pre_delete, sender=Booking)
+def release_confirmed_seats_on_delete(sender, instance, **kwargs):
+    """
+    Give a deleted booking's confirmed seats back to its trip, inside the
+    delete's transaction (saves keep the counter and trip status in step themselves)
+    """
+    instance.sync_confirmed_seats(None)
+
+
+# ==============================
+# OUTBOUND DISPATCH SIGNALS
+# ==============================
+
+@receiver(post_save, sender=OutboundMessage)
+def wake_outbound_dispatcher(sender, instance, created, **kwargs):
+    """
+    Wake waiting dispatchers once a newly queued message is committed,
+    so it is sent at its scheduled time rather than at the next reload
+    """
+    if created and instance.status == 'queued':
+        from core.outbound_scheduler import notify_outbound_message
+        transaction.on_commit(lambda: notify_outbound_message(instance))
+
+
+# ==============================
+# RECOMMENDATION CACHE SIGNALS
+# ==============================
+
+@receiver(post_save, sender=Booking)
+@receiver(post_save, sender=Wishlist)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Booking)
+@receiver(post_delete, sender=Wishlist)
+@receiver(post_delete, sender=Review)
+def invalidate_recommendations_on_interaction(sender, instance, **kwargs):
+    """
+    Mark the user's cached recommendations stale so the next request
+    recomputes them from live interactions
+    """
+    if instance.user_id:
+        invalidate_user_recommendations(instance.user_id)
+
+
+# ==============================
+# TRIP CATALOGUE CACHE SIGNALS
+# ==============================
+
+@receiver(post_save, sender=Trip)
+@receiver(post_delete, sender=Trip)
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+@receiver(post_save, sender=Guide)
+@receiver(post_delete, sender=Guide)
+def invalidate_trip_catalogue(sender, instance, **kwargs):
+    """
+    Bump the catalogue version once the write commits, so cached catalogue
+    pages and their ETags are replaced on the next request
+    """
+    transaction.on_commit(bump_catalogue_version)
+
+
+# ==============================
+# USER DASHBOARD CACHE SIGNALS
+# ==============================
+
 @receiver(post_save, sender=Booking)
-def update_trip_status_on_booking_change(sender, instance, **kwargs):
+@receiver(post_delete, sender=Booking)
+@receiver(post_save, sender=Wishlist)
+@receiver(post_delete, sender=Wishlist)
+@receiver(post_save, sender=UserProfile)
+def invalidate_dashboard_on_change(sender, instance, **kwargs):
+    """
+    Drop the owner's cached dashboard summary and booking stats once the
+    write commits
+    """
+    user_id = instance.user_id
+    if user_id:
+        transaction.on_commit(lambda: invalidate_user_dashboard(user_id))
+
+
+# ==============================
+# ADMIN INBOX SIGNALS
+# ==============================
+
+@receiver(post_save, sender=LeadEvent)
+def count_unread_inbound_message(sender, instance, created, **kwargs):
     """
-    Update trip status when booking status changes
-    Auto-promotes trips at 4 bookings, removes promotion at 5 bookings
+    Bump the lead's unread counter for each new inbound message; the admin
+    inbox resets it when the conversation is opened
+
+    A message is unread when its payload's 'read' is missing, false or null
+    (the rule migration 0025 backfilled with).
     """
-    if instance.trip:
-        instance.trip.update_status()
-        logger.info(f"Trip {instance.trip.name} status updated due to booking change")
+    if created and instance.type == 'inbound_msg' and instance.payload.get('read') in (None, False):
+        Lead.objects.filter(id=instance.lead_id).update(unread_count=F('unread_count') + 1)
+
+
+@receiver(pre_save, sender=Lead)
+def default_whatsapp_last_contact(sender, instance, **kwargs):
+    """The inbox pages WhatsApp leads by last_contact_at, so a new one starts at its creation time"""
+    if instance.is_whatsapp and instance.last_contact_at is None:
+        instance.last_contact_at = timezone.now()
 
 
 # ==============================
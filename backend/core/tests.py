@@ -1,3 +1,1435 @@
-from django.test import TestCase
+import importlib
+import csv
+import io
+import json
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock, skipIf
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from . import outbound_coalescer
+from .admin_stats import compute_admin_dashboard_stats, refresh_admin_stats_snapshot
+from .admin_views import (
+    RECENT_LEAD_EVENTS, RECENT_LEAD_MESSAGES, AdminLeadViewSet, AdminWhatsAppViewSet, export_dataset,
+    get_admin_dashboard_stats,
+)
+from .conversation_store import ConversationStore
+from .dashboard import build_dashboard_summary
+from .exports import iter_rows
+from .inbound_queue import (
+    LOCK_TIMEOUT, MAX_ATTEMPTS, claim_inbound_batch, drain_inbound_queue, enqueue_inbound_message,
+    process_inbound_message,
+)
+from .message_dedup import claim_message_id, release_message_id
+from .models import (
+    AdminStatsSnapshot, Booking, InboundWhatsAppMessage, Lead, LeadEvent, OutboundMessage, Payment,
+    ProcessedWhatsAppMessage, Review, SeatLock, Task, Trip, UserProfile, Wishlist,
+)
+from .outbound_dispatcher import MAX_RETRIES, claim_outbound_batch, dispatch_outbound_batch
+from .outbound_scheduler import OutboundWakeup
+from .payment_reconciliation import iter_csv_statement, iter_ofx_statement, reconcile_statement
+from .seat_locks import (
+    SeatsUnavailable, acquire_seat_lock, end_seat_lock, refresh_seat_lock, sweep_expired_seat_locks
+)
+from .services import get_cached_recommendations, store_user_recommendations
+from .trip_catalogue import catalogue_version
+from .views import BookingViewSet, TripViewSet, dashboard_summary, get_pending_payments
+from ml_models.trip_recommendation_engine import TripRecommendationEngine
+from services.bulk_sender import BulkSendCheckpoint, BulkSender, TokenBucket
+from services.custom_whatsapp_provider import CustomWhatsAppProvider
+from services.email_service import EmailJob, StubEmailBackend, get_email_service
+from services.retry_scheduler import DelayedRetryQueue, backoff_delay, parse_retry_after
+
+
+class FlashSaleSeatLockTests(TransactionTestCase):
+    """Many buyers racing for the last seats of a trip, with real concurrent connections"""
+
+    SPOTS = 10
+    BUYERS = 40
+
+    def setUp(self):
+        self.trip = Trip.objects.create(name='Kalsubai Night Trek', location='Maharashtra', price=1499,
+                                        spots_available=self.SPOTS, max_capacity=self.SPOTS)
+        self.users = [User.objects.create(username=f'buyer{i}') for i in range(self.BUYERS)]
+
+    def flash_sale(self, seats=1):
+        start = threading.Barrier(self.BUYERS)
+        outcomes = []
+
+        def buy(user):
+            try:
+                start.wait()
+                acquire_seat_lock(self.trip.id, user, seats)
+                outcomes.append('locked')
+            except SeatsUnavailable:
+                outcomes.append('sold_out')
+            except Exception as exc:
+                outcomes.append(repr(exc))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buy, args=(user,)) for user in self.users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    @skipIf(connection.vendor == 'sqlite', 'the SQLite test database does not allow concurrent writers')
+    def test_flash_sale_never_oversells(self):
+        outcomes = self.flash_sale()
+
+        self.assertEqual(outcomes.count('locked'), self.SPOTS, outcomes)
+        self.assertEqual(outcomes.count('sold_out'), self.BUYERS - self.SPOTS, outcomes)
+        self.trip.refresh_from_db()
+        self.assertEqual(self.trip.spots_available, 0)
+        self.assertEqual(SeatLock.objects.filter(trip=self.trip, status='active').count(), self.SPOTS)
+
+    def test_sweeper_returns_abandoned_seats_once(self):
+        for user in self.users[:self.SPOTS]:
+            acquire_seat_lock(self.trip.id, user, 1)
+        with self.assertRaises(SeatsUnavailable):
+            acquire_seat_lock(self.trip.id, self.users[-1], 1)
+        locks = list(SeatLock.objects.filter(trip=self.trip))
+        end_seat_lock(locks[0], 'released')
+        SeatLock.objects.filter(trip=self.trip).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(sweep_expired_seat_locks(batch_size=3), (self.SPOTS - 1, self.SPOTS - 1))
+        self.assertEqual(sweep_expired_seat_locks(), (0, 0))
+        self.assertFalse(locks[1].mark_expired())
+        self.trip.refresh_from_db()
+        self.assertEqual(self.trip.spots_available, self.SPOTS)
+        self.assertEqual(SeatLock.objects.filter(trip=self.trip, status='expired').count(), self.SPOTS - 1)
+
+    def test_refresh_does_not_revive_a_swept_lock(self):
+        lock = acquire_seat_lock(self.trip.id, self.users[0], 1)
+        self.assertTrue(refresh_seat_lock(lock))
+        SeatLock.objects.filter(id=lock.id).update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(sweep_expired_seat_locks(), (1, 1))
+
+        self.assertFalse(refresh_seat_lock(lock))
+        lock.refresh_from_db()
+        self.assertEqual(lock.status, 'expired')
+        self.assertLess(lock.expires_at, timezone.now())
+
+    def on_other_connection(self, func):
+        """Run ``func`` to completion on another thread, i.e. another DB connection"""
+        result = {}
+
+        def run():
+            try:
+                result['value'] = func()
+            except Exception as exc:
+                result['error'] = exc
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+        if 'error' in result:
+            raise result['error']
+        return result.get('value')
+
+    def test_conditional_update_beats_a_stale_read(self):
+        Trip.objects.filter(id=self.trip.id).update(spots_available=1)
+        # Both buyers read one spot left before either writes
+        stale = self.on_other_connection(lambda: Trip.objects.get(id=self.trip.id))
+        self.assertEqual(Trip.objects.get(id=self.trip.id).spots_available, 1)
+
+        self.on_other_connection(lambda: acquire_seat_lock(stale.id, self.users[0], 1))
+        self.assertEqual(stale.spots_available, 1)
+        with self.assertRaises(SeatsUnavailable):
+            acquire_seat_lock(stale.id, self.users[1], 1)
+
+        self.trip.refresh_from_db()
+        self.assertEqual(self.trip.spots_available, 0)
+        self.assertEqual(SeatLock.objects.filter(trip=self.trip, status='active').count(), 1)
+
+    def test_release_racing_the_sweeper_returns_seats_once(self):
+        lock = acquire_seat_lock(self.trip.id, self.users[0], 2)
+        SeatLock.objects.filter(id=lock.id).update(expires_at=timezone.now() - timedelta(seconds=1))
+        # The buyer's copy still says 'active' when the sweeper expires the lock elsewhere
+        self.assertEqual(self.on_other_connection(sweep_expired_seat_locks), (1, 2))
+
+        self.assertEqual(lock.status, 'active')
+        self.assertFalse(end_seat_lock(lock, 'released'))
+        self.assertFalse(refresh_seat_lock(lock))
+        self.trip.refresh_from_db()
+        self.assertEqual(self.trip.spots_available, self.SPOTS)
+
+    def test_acquire_unknown_trip(self):
+        with self.assertRaises(Trip.DoesNotExist):
+            acquire_seat_lock(self.trip.id + 1000, self.users[0], 1)
+
+
+class AdminLeadListQueryCountTests(TestCase):
+    """The admin lead list must not query per lead for its nested activity"""
+
+    def setUp(self):
+        self.admin = User.objects.create(username='admin', is_staff=True)
+        refresh_admin_stats_snapshot()
+
+    def add_leads(self, count, events=3, messages=2, tasks=1):
+        leads = Lead.objects.bulk_create([Lead(name=f'Lead {i}', phone=f'98{i:08d}') for i in range(count)])
+        LeadEvent.objects.bulk_create([
+            LeadEvent(lead=lead, type='note', payload={'n': n}) for lead in leads for n in range(events)
+        ])
+        OutboundMessage.objects.bulk_create([
+            OutboundMessage(lead=lead, to=lead.phone, rendered_body=f'msg {n}') for lead in leads for n in range(messages)
+        ])
+        Task.objects.bulk_create([Task(lead=lead, title=f'task {n}') for lead in leads for n in range(tasks)])
+        return leads
+
+    def list_leads(self):
+        request = APIRequestFactory(SERVER_NAME='localhost').get('/admin/leads/')
+        force_authenticate(request, user=self.admin)
+        return AdminLeadViewSet.as_view({'get': 'list'})(request)
+
+    def test_query_count_does_not_grow_with_leads(self):
+        # leads, events, tasks, messages, stats snapshot
+        self.add_leads(3)
+        with self.assertNumQueries(5):
+            response = self.list_leads()
+        self.assertEqual(len(response.data['leads']), 3)
+
+        self.add_leads(30)
+        with self.assertNumQueries(5):
+            response = self.list_leads()
+        self.assertEqual(len(response.data['leads']), 33)
+
+    def test_nested_activity_is_bounded_to_latest_rows(self):
+        lead = self.add_leads(1, events=RECENT_LEAD_EVENTS + 5, messages=RECENT_LEAD_MESSAGES + 5, tasks=3)[0]
+        newest_event = LeadEvent.objects.filter(lead=lead).order_by('-created_at', '-id').first()
+
+        data = self.list_leads().data['leads'][0]
+        self.assertEqual(len(data['events']), RECENT_LEAD_EVENTS)
+        self.assertEqual(data['events'][0]['id'], newest_event.id)
+        self.assertEqual(len(data['messages']), RECENT_LEAD_MESSAGES)
+        self.assertEqual(len(data['tasks']), 3)
+
+
+class RejectingEmailBackend(StubEmailBackend):
+    """Stub backend that refuses any request addressed to a rejected address"""
+
+    rejected = {'bounce@example.com'}
+
+    def send(self, message):
+        if any(item['to'] in self.rejected for item in message['personalizations']):
+            return False
+        return super().send(message)
+
+
+class TransactionalEmailTests(TransactionTestCase):
+    """Booking and payment emails go through the queued worker to the stub backend"""
+
+    def setUp(self):
+        self.service = get_email_service()
+        self.saved_backend = self.service.backend, self.service.enabled
+        self.service.backend, self.service.enabled = StubEmailBackend(), True
+        StubEmailBackend.outbox.clear()
+        self.user = User.objects.create(username='9876543210', first_name='Asha', email='asha@example.com')
+        self.trip = Trip.objects.create(name='Harishchandragad Trek', location='Maharashtra', price=1899,
+                                        spots_available=20, next_departure=date(2026, 11, 14))
+
+    def tearDown(self):
+        self.service.backend, self.service.enabled = self.saved_backend
+        StubEmailBackend.outbox.clear()
+
+    def wait_for_outbox(self, count, timeout=5):
+        deadline = time.monotonic() + timeout
+        while len(StubEmailBackend.outbox) < count and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return [item for message in StubEmailBackend.outbox for item in message['personalizations']]
+
+    def test_booking_and_verified_payment_emails_are_sent(self):
+        booking = Booking.objects.create(user=self.user, trip=self.trip, destination=self.trip.name,
+                                         date=date(2026, 11, 14), status='pending', amount=3798, seats=2)
+        payment = Payment.objects.create(booking=booking, amount=1000, upi_txn_id='412345678901')
+        sent = self.wait_for_outbox(1)
+        self.assertEqual(len(sent), 1)
+        self.assertEqual(sent[0]['to'], 'asha@example.com')
+        self.assertEqual(sent[0]['dynamic_template_data']['trip_title'], 'Harishchandragad Trek')
+        self.assertEqual(sent[0]['dynamic_template_data']['trip_dates'], 'November 14, 2026')
+        self.assertEqual(sent[0]['dynamic_template_data']['trip_details_url'],
+                         f'https://trekandstay.com/trips/{self.trip.id}')
+        self.assertEqual(sent[0]['dynamic_template_data']['total_price'], '₹3,798.00')
+        # The SendGrid client JSON-encodes the whole request body
+        json.dumps(StubEmailBackend.outbox[0])
+
+        # Saved twice (and once more from a stale copy) before the worker runs: one email
+        stale = Payment.objects.get(id=payment.id)
+        payment.verification_status = 'verified'
+        payment.save()
+        payment.save()
+        stale.verification_status = 'verified'
+        stale.save()
+        self.assertTrue(Payment.objects.get(id=payment.id).confirmation_email_sent)
+        sent = self.wait_for_outbox(2)
+        self.assertEqual(StubEmailBackend.outbox[-1]['template_id'], 'd-payment-received-v1')
+        self.assertEqual(sent[-1]['dynamic_template_data']['transaction_id'], '412345678901')
+        self.assertEqual(sent[-1]['dynamic_template_data']['amount'], '₹1,000.00')
+
+        time.sleep(1)
+        self.assertEqual(len(StubEmailBackend.outbox), 2)
+
+    def test_rejected_address_does_not_fail_its_batch(self):
+        self.service.backend = RejectingEmailBackend()
+        jobs = [EmailJob('booking_confirmation', f'guest{i}@example.com', {}) for i in range(9)]
+        jobs.insert(4, EmailJob('booking_confirmation', 'bounce@example.com', {}))
+
+        failed = self.service.worker._deliver_jobs('booking_confirmation', jobs)
+
+        self.assertEqual([job.recipient_email for job in failed], ['bounce@example.com'])
+        sent = [item['to'] for message in StubEmailBackend.outbox for item in message['personalizations']]
+        self.assertEqual(sorted(sent), sorted(f'guest{i}@example.com' for i in range(9)))
+
+    def test_bulk_send_is_queued_to_the_worker(self):
+        self.service.backend = RejectingEmailBackend()
+        recipients = [{'email': f'guest{i}@example.com', 'dynamic_data': {'n': i}} for i in range(9)]
+        recipients.insert(4, {'email': 'bounce@example.com', 'dynamic_data': {}})
+
+        started = time.monotonic()
+        results = self.service.send_bulk_emails('promotion', recipients)
+
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(results, {'queued': 10, 'failed': 0})
+        sent = [item['to'] for item in self.wait_for_outbox(1)]
+        deadline = time.monotonic() + 5
+        while len(sent) < 9 and time.monotonic() < deadline:
+            time.sleep(0.05)
+            sent = [item['to'] for message in StubEmailBackend.outbox for item in message['personalizations']]
+        self.assertEqual(sorted(sent), sorted(f'guest{i}@example.com' for i in range(9)))
+
+
+class PendingPaymentPaginationTests(TestCase):
+    """The verification queue pages through a month-end backlog where most risk scores tie"""
+
+    def setUp(self):
+        self.admin = User.objects.create(username='verifier', is_staff=True)
+        booking = Booking.objects.create(user=self.admin, destination='Rajmachi', date=date(2026, 11, 1),
+                                         status='pending', amount=1200)
+        payments = Payment.objects.bulk_create([
+            Payment(booking=booking, amount=1200, risk_score=0 if i % 10 else 60, risk_level='low')
+            for i in range(1500)
+        ])
+        # Several payments per timestamp, so ties reach past risk_score into created_at
+        stamp = timezone.now()
+        for i in range(0, len(payments), 3):
+            Payment.objects.filter(id__in=[p.id for p in payments[i:i + 3]]).update(created_at=stamp - timedelta(seconds=i))
+
+    def fetch(self, url):
+        request = APIRequestFactory(SERVER_NAME='localhost').get(url)
+        force_authenticate(request, user=self.admin)
+        response = get_pending_payments(request)
+        self.assertEqual(response.status_code, 200, response.data)
+        data = response.data
+        return [p['id'] for key in ('high_risk', 'medium_risk', 'low_risk') for p in data[key]], data
+
+    def test_pages_reach_every_pending_payment_once(self):
+        seen, url, pages = [], '/api/payments/pending/?page_size=100', 0
+        while url:
+            ids, data = self.fetch(url)
+            seen.extend(ids)
+            url, pages = data['next'], pages + 1
+            self.assertLess(pages, 20)
+        self.assertEqual(len(seen), 1500)
+        self.assertEqual(len(set(seen)), 1500)
+
+        ids, data = self.fetch(data['previous'])
+        self.assertEqual(len(ids), 100)
+        self.assertEqual(set(ids), set(seen[1300:1400]))
+
+    def test_verifying_between_pages_skips_nobody(self):
+        first, data = self.fetch('/api/payments/pending/?page_size=100')
+        Payment.objects.filter(id__in=first[:50]).update(verification_status='verified')
+        seen, url = [], data['next']
+        while url:
+            ids, data = self.fetch(url)
+            seen.extend(ids)
+            url = data['next']
+            self.assertLess(len(seen), 3000)
+        self.assertEqual(len(set(seen)), 1400)
+        self.assertFalse(set(seen) & set(first))
+
+    def test_invalid_cursor_is_not_found(self):
+        request = APIRequestFactory(SERVER_NAME='localhost').get('/api/payments/pending/?cursor=cD1ub3BlCg==')
+        force_authenticate(request, user=self.admin)
+        self.assertEqual(get_pending_payments(request).status_code, 404)
+
+
+@override_settings(WHATSAPP_COALESCE_WINDOW_SECONDS=60)
+class OutboundCoalescerTests(TransactionTestCase):
+    """Coalesced replies are durable before the inbound message is acknowledged"""
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch('core.views.send_whatsapp_message')
+        self.send = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reply_is_stored_before_the_inbound_row_is_processed(self):
+        item = enqueue_inbound_message({'id': 'wamid.1', 'from': '919800000001@c.us', 'body': 'hello', 'type': 'chat'})
+
+        self.assertEqual(drain_inbound_queue(workers=1), (1, 1))
+
+        item.refresh_from_db()
+        self.assertEqual(item.status, 'processed')
+        reply = OutboundMessage.objects.get(to='919800000001')
+        self.assertEqual(reply.status, 'sending')
+        self.assertIsNotNone(reply.locked_at)
+        self.send.assert_not_called()
+
+        outbound_coalescer.flush_pending()
+        self.send.assert_called_once()
+        reply.refresh_from_db()
+        self.assertEqual(reply.status, 'sent')
+
+    def test_messages_in_one_window_are_sent_once(self):
+        outbound_coalescer.queue_whatsapp_message('98000 00002', 'Stage nudge', priority=outbound_coalescer.AUTOMATED)
+        outbound_coalescer.queue_whatsapp_message('9800000002', 'Your booking is confirmed',
+                                                  priority=outbound_coalescer.TRANSACTIONAL)
+        outbound_coalescer.flush_pending()
+
+        self.send.assert_called_once()
+        self.assertEqual(self.send.call_args.args[1], 'Your booking is confirmed')
+        statuses = dict(OutboundMessage.objects.values_list('rendered_body', 'status'))
+        self.assertEqual(statuses, {'Stage nudge': 'failed', 'Your booking is confirmed': 'sent'})
+
+    @override_settings(WHATSAPP_PER_NUMBER_MAX_MESSAGES=2, WHATSAPP_PER_NUMBER_WINDOW_SECONDS=60)
+    def test_rate_limit_is_counted_in_the_shared_cache(self):
+        self.assertEqual(outbound_coalescer._take_send_slot('9800000003'), 0)
+        # Another process sends to the same number
+        slot = int(time.time() // 60)
+        cache.incr(f'whatsapp_sends:9800000003:{slot}')
+
+        self.assertGreater(outbound_coalescer._take_send_slot('9800000003'), 0)
+        self.assertEqual(outbound_coalescer._take_send_slot('9800000004'), 0)
+
+
+class MessageDedupTests(TestCase):
+    """The dedup table stays authoritative when a claim made elsewhere is released"""
+
+    def test_retry_after_another_process_releases_its_claim(self):
+        # Another worker claimed the id; this one sees the redelivery
+        ProcessedWhatsAppMessage.objects.create(message_id='wamid.retry', source='webhook')
+        self.assertFalse(claim_message_id('wamid.retry', 'webhook'))
+
+        # That worker's processing failed and it released the claim
+        ProcessedWhatsAppMessage.objects.filter(message_id='wamid.retry').delete()
+
+        self.assertTrue(claim_message_id('wamid.retry', 'webhook'))
+        self.assertFalse(claim_message_id('wamid.retry', 'webhook'))
+
+    def test_released_claim_is_processed_again(self):
+        self.assertTrue(claim_message_id('wamid.failed', 'webhook'))
+        release_message_id('wamid.failed')
+        self.assertTrue(claim_message_id('wamid.failed', 'webhook'))
+
+
+class ConversationStoreTests(TestCase):
+    """Write-behind batches stay visible to reloads and counts track the committed log"""
+
+    PHONE = '919800000010'
+
+    def setUp(self):
+        patcher = mock.patch.object(ConversationStore, '_schedule_flush')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.store = self.new_store()
+
+    def new_store(self):
+        store = ConversationStore(history_size=10)
+        store.revalidate_seconds = 0
+        return store
+
+    def contents(self, store=None):
+        return [message['content'] for message in (store or self.store).history(self.PHONE)]
+
+    def test_reload_while_a_batch_is_being_written(self):
+        self.store.append(self.PHONE, 'user', 'Is Rajmachi open?')
+        self.store.append(self.PHONE, 'assistant', 'Yes, every weekend')
+        persist = self.store._persist
+        seen = {}
+
+        def persist_with_reloads(messages, states):
+            self.store._conversations.clear()
+            seen['before_commit'] = self.contents()
+            counts = persist(messages, states)
+            self.store._conversations.clear()
+            seen['after_commit'] = self.contents()
+            return counts
+
+        with mock.patch.object(self.store, '_persist', side_effect=persist_with_reloads):
+            self.assertEqual(self.store.flush(), 2)
+
+        expected = ['Is Rajmachi open?', 'Yes, every weekend']
+        self.assertEqual(seen, {'before_commit': expected, 'after_commit': expected})
+        self.assertEqual(self.store._conversations[self.PHONE].persisted_count, 2)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.contents(), expected)
+
+    def test_count_moves_to_the_committed_count(self):
+        self.store.append(self.PHONE, 'user', 'Hi')
+        self.store.flush()
+        self.store.append(self.PHONE, 'user', 'Any seats left?')
+        self.store.flush()
+
+        self.assertEqual(self.store._conversations[self.PHONE].persisted_count, 2)
+        # Revalidation finds the count unchanged and keeps the cached buffer
+        with self.assertNumQueries(1):
+            self.assertEqual(self.contents(), ['Hi', 'Any seats left?'])
+
+    def test_messages_from_another_worker_are_picked_up(self):
+        other = self.new_store()
+        self.store.append(self.PHONE, 'user', 'Hi')
+        self.store.flush()
+        self.assertEqual(self.contents(other), ['Hi'])
+
+        other.append(self.PHONE, 'assistant', 'Hello from the other worker')
+        other.flush()
+
+        self.assertEqual(self.contents(), ['Hi', 'Hello from the other worker'])
+
+
+class StatementReconciliationTests(TestCase):
+    """Bank/PSP statement parsing and the rules for matching rows to pending payments"""
+
+    CSV = (
+        'Account Statement,HDFC Bank\n'
+        'Account No,XXXX1234\n'
+        '\n'
+        'Txn Date,Narration,UTR No.,Debit,Credit Amount,Payer VPA\n'
+        '01/11/2026,UPI/412345678901/asha,412345678901,,"1,200.00",asha@okhdfc\n'
+        '01/11/2026,UPI/ref TAS20261101001 rohan,999999999999,,800.00,\n'
+        '02/11/2026,ATM withdrawal,,500.00,,\n'
+    )
+    OFX = (
+        'OFXHEADER:100\n<OFX><BANKTRANLIST>\n'
+        '<STMTTRN>\n<TRNTYPE>CREDIT\n<TRNAMT>1200.00\n<FITID>412345678901\n<MEMO>UPI asha\n</STMTTRN>\n'
+        '<STMTTRN>\n<TRNTYPE>CREDIT\n<TRNAMT>800.00\n<FITID>555\n<MEMO>ref tas20261101001\n</STMTTRN>\n'
+        '</BANKTRANLIST></OFX>\n'
+    )
+
+    def setUp(self):
+        self.staff = User.objects.create(username='accounts', is_staff=True)
+        customer = User.objects.create(username='9800000020', first_name='Asha', email='asha@example.com')
+        booking = Booking.objects.create(user=customer, destination='Rajmachi', date=date(2026, 11, 14),
+                                         status='pending', amount=4000)
+        self.by_utr = Payment.objects.create(booking=booking, amount=1200, upi_txn_id='412345678901')
+        self.by_reference = Payment.objects.create(booking=booking, amount=800, reference_number='TAS20261101001')
+
+    def parse_csv(self, text):
+        return list(iter_csv_statement(io.StringIO(text)))
+
+    def test_csv_finds_the_header_below_account_details(self):
+        rows = self.parse_csv(self.CSV)
+
+        self.assertEqual([row.line for row in rows], [5, 6, 7])
+        self.assertEqual(rows[0].txn_id, '412345678901')
+        self.assertEqual(rows[0].amount, Decimal('1200.00'))
+        self.assertEqual(rows[0].vpa, 'asha@okhdfc')
+        self.assertEqual(rows[1].reference, 'TAS20261101001')
+        self.assertIsNone(rows[2].amount)
+
+    def test_csv_without_a_usable_header_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.parse_csv('Date,Balance\n01/11/2026,100\n')
+
+    def test_ofx_transactions(self):
+        rows = list(iter_ofx_statement(io.StringIO(self.OFX)))
+
+        self.assertEqual([(row.txn_id, row.amount) for row in rows],
+                         [('412345678901', Decimal('1200.00')), ('555', Decimal('800.00'))])
+        self.assertEqual(rows[1].reference, 'TAS20261101001')
+
+    def test_matches_by_utr_or_reference_and_queues_emails(self):
+        with mock.patch('core.signals.email_service.send_payment_received') as send:
+            report = reconcile_statement(self.parse_csv(self.CSV), user=self.staff, statement_name='nov.csv')
+
+        self.assertEqual((report.rows, report.verified, report.skipped), (3, 2, 1))
+        for payment in (self.by_utr, self.by_reference):
+            payment.refresh_from_db()
+            self.assertEqual(payment.verification_status, 'verified')
+            self.assertEqual(payment.verified_by, self.staff)
+            self.assertTrue(payment.confirmation_email_sent)
+        self.assertEqual(self.by_reference.upi_txn_id, '999999999999')
+        self.assertEqual(self.by_utr.customer_vpa, 'asha@okhdfc')
+        self.assertEqual(send.call_count, 2)
+        self.assertEqual(send.call_args.kwargs, {'queue': True})
+
+    def test_mismatches_duplicates_and_reruns_are_reported(self):
+        statement = self.CSV + '03/11/2026,UPI/412345678901/asha,412345678901,,"1,200.00",\n'
+        statement += '03/11/2026,UPI/000000000001,000000000001,,99.00,\n'
+        statement = statement.replace('800.00', '850.00')
+
+        report = reconcile_statement(self.parse_csv(statement), user=self.staff)
+
+        self.assertEqual(
+            (report.verified, report.amount_mismatch, report.duplicates, report.unmatched),
+            (1, 1, 1, 1),
+        )
+        self.by_reference.refresh_from_db()
+        self.assertEqual(self.by_reference.verification_status, 'pending')
+
+        rerun = reconcile_statement(self.parse_csv(self.CSV), user=self.staff)
+        self.assertEqual((rerun.verified, rerun.already_verified), (1, 1))
+
+    def test_dry_run_writes_nothing(self):
+        report = reconcile_statement(self.parse_csv(self.CSV), dry_run=True)
+
+        self.assertEqual(report.verified, 2)
+        self.assertFalse(Payment.objects.exclude(verification_status='pending').exists())
+        self.assertFalse(Payment.objects.filter(confirmation_email_sent=True).exists())
+
+
+class WhatsAppInboxTests(TestCase):
+    """Unread counters and inbox membership agree between the backfill and live signals"""
+
+    def setUp(self):
+        self.admin = User.objects.create(username='inbox-admin', is_staff=True)
+
+    def conversations(self):
+        request = APIRequestFactory(SERVER_NAME='localhost').get('/admin/whatsapp/conversations/')
+        force_authenticate(request, user=self.admin)
+        return {item['lead_id']: item for item in AdminWhatsAppViewSet.get_conversations(request).data['conversations']}
+
+    def test_unread_rule_matches_the_backfill(self):
+        lead = Lead.objects.create(name='Asha', phone='9800000030', is_whatsapp=True)
+        for payload in ({'text': 'hi'}, {'text': 'seats?', 'read': False}, {'text': 'ok', 'read': True},
+                        {'text': 'price?', 'read': None}):
+            LeadEvent.objects.create(lead=lead, type='inbound_msg', payload=payload)
+        LeadEvent.objects.create(lead=lead, type='outbound_msg', payload={'text': 'Hello!'})
+        lead.refresh_from_db()
+        self.assertEqual(lead.unread_count, 3)
+
+        Lead.objects.filter(id=lead.id).update(unread_count=0)
+        migration = importlib.import_module('core.migrations.0025_lead_unread_count_inbox_indexes')
+        migration.backfill_unread_count(apps, None)
+        lead.refresh_from_db()
+        self.assertEqual(lead.unread_count, 3)
+
+    def test_leads_never_contacted_are_listed(self):
+        created = Lead.objects.create(name='New', phone='9800000031', is_whatsapp=True)
+        self.assertIsNotNone(created.last_contact_at)
+        Lead.objects.bulk_create([Lead(name='Imported', phone='9800000032', is_whatsapp=True)])
+        imported = Lead.objects.get(phone='9800000032')
+        self.assertIsNone(imported.last_contact_at)
+
+        migration = importlib.import_module('core.migrations.0025_lead_unread_count_inbox_indexes')
+        migration.backfill_last_contact_at(apps, None)
+
+        self.assertEqual(set(self.conversations()), {created.id, imported.id})
+
+
+class TripCatalogueCacheTests(TestCase):
+    """Catalogue responses are revalidated by ETag and replaced after every kind of trip write"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='traveller')
+        self.trip = Trip.objects.create(name='Harishchandragad', location='Maharashtra', price=1999,
+                                        spots_available=5, max_capacity=5)
+
+    def get_catalogue(self, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        request = APIRequestFactory(SERVER_NAME='localhost').get('/api/trips/catalogue/', **headers)
+        force_authenticate(request, user=self.user)
+        return TripViewSet.as_view({'get': 'catalogue'})(request)
+
+    def available_slots(self, response):
+        return {trip['id']: trip['available_slots'] for trip in response.data['results']}[self.trip.id]
+
+    def test_matching_etag_is_answered_without_the_database(self):
+        etag = self.get_catalogue()['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.get_catalogue(etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_trip_write_replaces_cached_pages(self):
+        etag = self.get_catalogue()['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.trip.name = 'Harishchandragad via Nalichi Vaat'
+            self.trip.save()
+
+        response = self.get_catalogue(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['results'][0]['name'], 'Harishchandragad via Nalichi Vaat')
+
+    def test_reconcile_trip_seats_replaces_cached_pages(self):
+        self.assertEqual(self.available_slots(self.get_catalogue()), 5)
+        # bulk_create skips Booking.save, so the counter drifts and nothing invalidates the cache
+        Booking.objects.bulk_create([Booking(user=self.user, trip=self.trip, destination=self.trip.name,
+                                             date=date.today(), status='confirmed', amount=3998, seats=2)])
+        self.assertEqual(self.available_slots(self.get_catalogue()), 5)
+
+        call_command('reconcile_trip_seats', stdout=io.StringIO())
+
+        self.assertEqual(self.available_slots(self.get_catalogue()), 3)
+
+    def test_seat_lock_sweep_bumps_the_version(self):
+        lock = acquire_seat_lock(self.trip.id, self.user, 2)
+        SeatLock.objects.filter(id=lock.id).update(expires_at=timezone.now() - timedelta(minutes=1))
+        version = catalogue_version()
+
+        self.assertEqual(sweep_expired_seat_locks(), (1, 2))
+        self.assertNotEqual(catalogue_version(), version)
+
+        # Nothing to expire, nothing to invalidate
+        version = catalogue_version()
+        sweep_expired_seat_locks()
+        self.assertEqual(catalogue_version(), version)
+
+
+class InboundQueueTests(TestCase):
+    """Queued webhooks are claimed once, and failures come back with backoff"""
+
+    def setUp(self):
+        patcher = mock.patch('core.views.process_whatsapp_message')
+        self.handle = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def enqueue(self, n, **fields):
+        item = enqueue_inbound_message({'id': f'wamid.{n}', 'from': f'91980000{n:04d}@c.us', 'body': 'hi', 'type': 'chat'})
+        if fields:
+            InboundWhatsAppMessage.objects.filter(id=item.id).update(**fields)
+        return item
+
+    def test_claim_takes_due_rows_once(self):
+        due = self.enqueue(1)
+        self.enqueue(2, available_at=timezone.now() + timedelta(minutes=1))
+
+        claimed = claim_inbound_batch()
+        self.assertEqual([item.id for item in claimed], [due.id])
+        self.assertEqual((claimed[0].status, claimed[0].attempts), ('processing', 1))
+        self.assertEqual(claim_inbound_batch(), [])
+
+    def test_stale_claim_of_a_crashed_worker_is_reclaimed(self):
+        stale = self.enqueue(1, status='processing', attempts=1, locked_at=timezone.now() - LOCK_TIMEOUT * 2)
+        self.enqueue(2, status='processing', attempts=1, locked_at=timezone.now())
+
+        claimed = claim_inbound_batch()
+        self.assertEqual([item.id for item in claimed], [stale.id])
+        self.assertEqual(claimed[0].attempts, 2)
+
+    def test_failure_is_requeued_with_exponential_backoff(self):
+        self.handle.side_effect = RuntimeError('LLM timeout')
+        self.enqueue(1)
+
+        for attempt in (1, 2):
+            InboundWhatsAppMessage.objects.update(available_at=timezone.now())
+            item = claim_inbound_batch()[0]
+            before = timezone.now()
+            self.assertFalse(process_inbound_message(item))
+            item.refresh_from_db()
+            self.assertEqual((item.status, item.attempts, item.error), ('queued', attempt, 'LLM timeout'))
+            self.assertIsNone(item.locked_at)
+            delay = (item.available_at - before).total_seconds()
+            self.assertAlmostEqual(delay, 30 * 2 ** (attempt - 1), delta=5)
+        # The lead upsert is remembered, so retries only repeat intent handling
+        self.assertEqual(Lead.objects.count(), 1)
+        self.assertIsNotNone(item.lead_id)
+
+    def test_last_attempt_is_marked_failed(self):
+        self.handle.side_effect = RuntimeError('LLM timeout')
+        self.enqueue(1, attempts=MAX_ATTEMPTS - 1)
+
+        self.assertEqual(drain_inbound_queue(workers=1), (1, 0))
+        self.assertEqual(InboundWhatsAppMessage.objects.get().status, 'failed')
+        self.assertEqual(claim_inbound_batch(), [])
+
+    def test_success_marks_the_row_processed(self):
+        self.enqueue(1)
+
+        self.assertEqual(drain_inbound_queue(workers=1), (1, 1))
+        item = InboundWhatsAppMessage.objects.get()
+        self.assertEqual(item.status, 'processed')
+        self.assertIsNotNone(item.processed_at)
+        self.handle.assert_called_once_with(item.lead, 'hi', 'chat')
+
+
+class FakeWhatsAppProvider:
+    """Answers sends from a phone -> error map (no entry means success) and records message ids"""
+
+    def __init__(self, errors=None):
+        self.errors = errors or {}
+        self.message_ids = []
+
+    def send_message(self, phone_number, message_text, message_id, metadata):
+        self.message_ids.append(message_id)
+        error = self.errors.get(phone_number)
+        return SimpleNamespace(success=error is None, error=error)
+
+
+class OutboundDispatcherTests(TestCase):
+    """Due outbound rows are claimed once, sent, and failures requeued with backoff"""
+
+    def setUp(self):
+        self.lead = Lead.objects.create(name='Asha', phone='919800000001')
+
+    def queue(self, to='919800000001', **fields):
+        return OutboundMessage.objects.create(lead=self.lead, to=to, rendered_body=f'Hello {to}', **fields)
+
+    def test_claim_takes_due_and_stale_rows_once(self):
+        due = self.queue()
+        scheduled = self.queue(scheduled_for=timezone.now() - timedelta(seconds=1))
+        self.queue(scheduled_for=timezone.now() + timedelta(minutes=1))
+        self.queue(status='sending', locked_at=timezone.now())
+        stale = self.queue(status='sending', locked_at=timezone.now() - timedelta(minutes=10))
+
+        claimed = claim_outbound_batch()
+        self.assertEqual([message.id for message in claimed], [due.id, scheduled.id, stale.id])
+        self.assertTrue(all(message.status == 'sending' and message.locked_at for message in claimed))
+        self.assertEqual(claim_outbound_batch(), [])
+
+    def test_results_are_written_back(self):
+        sent = self.queue()
+        transient = self.queue(to='919800000002')
+        invalid = self.queue(to='12')
+        provider = FakeWhatsAppProvider({'919800000002': 'Gateway timeout', '12': 'Invalid phone number format'})
+
+        before = timezone.now()
+        self.assertEqual(dispatch_outbound_batch(provider, workers=2), (3, 1))
+
+        self.assertEqual(sorted(provider.message_ids), sorted(f'outbound_{m.id}' for m in (sent, transient, invalid)))
+        for message in (sent, transient, invalid):
+            message.refresh_from_db()
+            self.assertIsNone(message.locked_at)
+        self.assertEqual(sent.status, 'sent')
+        self.assertEqual(LeadEvent.objects.get(type='outbound_msg').payload['outbound_id'], sent.id)
+        self.assertEqual((transient.status, transient.retries, transient.error), ('queued', 1, 'Gateway timeout'))
+        self.assertAlmostEqual((transient.scheduled_for - before).total_seconds(), 30, delta=5)
+        self.assertEqual((invalid.status, invalid.retries), ('failed', 1))
+
+    def test_requeued_row_waits_for_its_backoff_then_fails_after_max_retries(self):
+        message = self.queue()
+        provider = FakeWhatsAppProvider({message.to: 'Gateway timeout'})
+
+        for retries in range(1, MAX_RETRIES + 1):
+            self.assertEqual(dispatch_outbound_batch(provider), (1, 0))
+            message.refresh_from_db()
+            self.assertEqual(message.retries, retries)
+            if retries < MAX_RETRIES:
+                self.assertEqual(message.status, 'queued')
+                self.assertEqual(dispatch_outbound_batch(provider), (0, 0))
+                OutboundMessage.objects.filter(id=message.id).update(scheduled_for=timezone.now())
+        self.assertEqual(message.status, 'failed')
+        self.assertEqual(len(provider.message_ids), MAX_RETRIES)
+
+
+class TripSeatCounterTests(TestCase):
+    """Trip.confirmed_seats follows every confirmed-booking transition, and reconcile repairs drift"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='traveller')
+        self.trip = self.create_trip('Rajmachi')
+
+    def create_trip(self, name, max_capacity=3):
+        return Trip.objects.create(name=name, location='Maharashtra', price=999, max_capacity=max_capacity,
+                                   spots_available=max_capacity)
+
+    def book(self, status='confirmed', seats=1, trip=None):
+        return Booking.objects.create(user=self.user, trip=trip or self.trip, destination='Rajmachi',
+                                      date=date.today(), status=status, amount=999 * seats, seats=seats)
+
+    def assertSeats(self, trip, seats, status):
+        trip.refresh_from_db()
+        self.assertEqual((trip.confirmed_seats, trip.status), (seats, status))
+
+    def test_confirm_cancel_and_delete_move_the_counter(self):
+        booking = self.book(status='pending', seats=2)
+        self.assertSeats(self.trip, 0, 'available')
+
+        booking.confirm_booking()
+        self.assertSeats(self.trip, 2, 'promoted')
+        self.book()
+        self.assertSeats(self.trip, 3, 'full')
+
+        booking.cancel_booking()
+        self.assertSeats(self.trip, 1, 'available')
+        booking.cancel_booking()
+        self.assertSeats(self.trip, 1, 'available')
+
+        Booking.objects.get(status='confirmed').delete()
+        self.assertSeats(self.trip, 0, 'available')
+
+    def test_seat_and_trip_changes_move_seats_between_counters(self):
+        other = self.create_trip('Visapur')
+        booking = self.book(seats=1)
+
+        booking.seats = 2
+        booking.save()
+        self.assertSeats(self.trip, 2, 'promoted')
+
+        booking.trip = other
+        booking.save()
+        self.assertSeats(self.trip, 0, 'available')
+        self.assertSeats(other, 2, 'promoted')
+
+    def test_deferred_booking_still_releases_its_seats(self):
+        booking = self.book(seats=2)
+
+        deferred = Booking.objects.only('id').get(id=booking.id)
+        deferred.status = 'cancelled'
+        deferred.save(update_fields=['status'])
+        self.assertSeats(self.trip, 0, 'available')
+
+    def test_stale_trip_save_keeps_the_counter(self):
+        stale = Trip.objects.get(id=self.trip.id)
+        self.book(seats=3)
+
+        stale.name = 'Rajmachi Fireflies'
+        stale.save()
+        self.assertSeats(self.trip, 3, 'full')
+        self.assertEqual(self.trip.name, 'Rajmachi Fireflies')
+
+    def test_reconcile_trip_seats_repairs_drift(self):
+        self.book(seats=2)
+        Trip.objects.filter(id=self.trip.id).update(confirmed_seats=0, status='available')
+
+        out = io.StringIO()
+        call_command('reconcile_trip_seats', '--dry-run', stdout=out)
+        self.assertIn('Would repair 1 trips', out.getvalue())
+        self.assertSeats(self.trip, 0, 'available')
+
+        call_command('reconcile_trip_seats', stdout=io.StringIO())
+        self.assertSeats(self.trip, 2, 'promoted')
+
+
+class RecommendationTrainingTests(TestCase):
+    """Incremental training reproduces a full retrain; placeholder data is never published"""
+
+    def setUp(self):
+        artifacts = tempfile.TemporaryDirectory()
+        self.addCleanup(artifacts.cleanup)
+        patcher = mock.patch('ml_models.model_bundle.ARTIFACT_ROOT', artifacts.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def seed(self):
+        trips = [Trip.objects.create(name=f'Trek {i}', location=['Goa', 'Himachal', 'Maharashtra'][i % 3],
+                                     price=2000 + 500 * i, duration=f'{i % 4 + 1}D', max_capacity=10,
+                                     spots_available=10) for i in range(6)]
+        users = [User.objects.create(username=f'hiker{i}') for i in range(8)]
+        for i, user in enumerate(users):
+            Booking.objects.create(user=user, trip=trips[i % 6], destination=trips[i % 6].location,
+                                   date=date.today(), status='confirmed', amount=trips[i % 6].price)
+            Wishlist.objects.create(user=user, trip=trips[(i + 1) % 6])
+            Review.objects.create(user=user, trip=trips[(i + 2) % 6], rating=i % 5 + 1)
+        return users, trips
+
+    def train(self, incremental=False):
+        engine = TripRecommendationEngine()
+        if incremental:
+            self.assertTrue(engine.load_model())
+        with mock.patch('builtins.print'):
+            engine.train_model(incremental=incremental)
+        return engine
+
+    def test_incremental_training_matches_a_full_retrain(self):
+        users, trips = self.seed()
+        self.assertIsNotNone(self.train().save_model())
+
+        Review.objects.create(user=users[0], trip=trips[5], rating=5)
+        Booking.objects.create(user=users[1], trip=trips[1], destination=trips[1].location,
+                               date=date.today(), status='confirmed', amount=trips[1].price)
+        Wishlist.objects.create(user=User.objects.create(username='newcomer'), trip=trips[3])
+
+        incremental = self.train(incremental=True)
+        full = self.train()
+
+        self.assertEqual(incremental.user_ids.tolist(), full.user_ids.tolist())
+        self.assertEqual(incremental.trip_ids.tolist(), full.trip_ids.tolist())
+        self.assertEqual(incremental.reference_timestamp, full.reference_timestamp)
+        for name in ('user_item_matrix', 'pair_weight_matrix', 'pair_timestamp_matrix'):
+            difference = abs(getattr(incremental, name) - getattr(full, name))
+            self.assertLess(difference.max() if difference.nnz else 0, 1e-9, name)
+
+    def test_placeholder_model_is_not_published(self):
+        engine = self.train()
+
+        self.assertTrue(engine.placeholder_ids)
+        with mock.patch('builtins.print'):
+            self.assertIsNone(engine.save_model())
+            self.assertFalse(TripRecommendationEngine().load_model())
+
+
+class RecommendationCacheInvalidationTests(TestCase):
+    """Adding or removing an interaction marks only that user's cached recommendations stale"""
+
+    def setUp(self):
+        self.user, self.other = User.objects.create(username='hiker'), User.objects.create(username='other')
+        self.trip = Trip.objects.create(name='Sandhan Valley', location='Maharashtra', price=2499,
+                                        max_capacity=10, spots_available=10)
+
+    def cache_recommendations(self):
+        store_user_recommendations({self.user.id: [self.trip.id], self.other.id: [self.trip.id]})
+        self.assertEqual(get_cached_recommendations(self.user.id), [self.trip.id])
+
+    def assertInvalidated(self):
+        self.assertIsNone(get_cached_recommendations(self.user.id))
+        self.assertEqual(get_cached_recommendations(self.other.id), [self.trip.id])
+
+    def test_new_review_invalidates(self):
+        self.cache_recommendations()
+        Review.objects.create(user=self.user, trip=self.trip, rating=4)
+        self.assertInvalidated()
+
+    def test_deleted_review_invalidates(self):
+        review = Review.objects.create(user=self.user, trip=self.trip, rating=4)
+        self.cache_recommendations()
+        review.delete()
+        self.assertInvalidated()
+
+    def test_deleted_wishlist_entry_invalidates(self):
+        entry = Wishlist.objects.create(user=self.user, trip=self.trip)
+        self.cache_recommendations()
+        entry.delete()
+        self.assertInvalidated()
+
+    def test_deleted_booking_invalidates(self):
+        booking = Booking.objects.create(user=self.user, trip=self.trip, destination='Sandhan Valley',
+                                         date=date.today(), status='pending', amount=2499)
+        self.cache_recommendations()
+        booking.delete()
+        self.assertInvalidated()
+
+
+class StreamingExportTests(TestCase):
+    """Exports walk the table by keyset in bounded batches and never emit live spreadsheet formulas"""
+
+    def setUp(self):
+        self.admin = User.objects.create(username='admin', is_staff=True)
+
+    def export(self, dataset, **params):
+        request = APIRequestFactory(SERVER_NAME='localhost').get(f'/api/admin/export/{dataset}/', params)
+        force_authenticate(request, user=self.admin)
+        return export_dataset(request, dataset=dataset)
+
+    def content(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_keyset_walk_returns_every_row_once_in_pk_order(self):
+        leads = Lead.objects.bulk_create([Lead(name=f'Lead {i}', phone=f'98{i:08d}') for i in range(7)])
+
+        # Batches of 3, 3 and 1: the short batch ends the walk
+        with self.assertNumQueries(3):
+            rows = list(iter_rows(Lead.objects.all(), ['name'], batch_size=3))
+        self.assertEqual([row['id'] for row in rows], [lead.id for lead in leads])
+
+        # A full last batch needs one more (empty) query
+        with self.assertNumQueries(2):
+            self.assertEqual(len(list(iter_rows(Lead.objects.all(), ['name'], batch_size=7))), 7)
+
+    def test_csv_cells_that_look_like_formulas_are_escaped(self):
+        names = ['=HYPERLINK("http://evil.example","Click")', '+919800000001', '-1', '@SUM(A1)', 'Asha']
+        Lead.objects.bulk_create([Lead(name=name) for name in names])
+
+        response = self.export('leads')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/csv'))
+        rows = list(csv.DictReader(io.StringIO(self.content(response))))
+        self.assertEqual([row['name'] for row in rows], ["'" + name for name in names[:4]] + ['Asha'])
+
+    def test_jsonl_keeps_raw_values_and_applies_filters(self):
+        Lead.objects.create(name='=1+1', stage='new', is_whatsapp=True)
+        Lead.objects.create(name='Ravi', stage='new', is_whatsapp=False)
+
+        response = self.export('leads', output='jsonl', is_whatsapp='yes')
+        rows = [json.loads(line) for line in self.content(response).splitlines()]
+        self.assertEqual([row['name'] for row in rows], ['=1+1'])
+
+    def test_bad_requests_fail_before_streaming(self):
+        self.assertEqual(self.export('leads', created_after='last week').status_code, 400)
+        self.assertEqual(self.export('bookings', trip='abc').status_code, 400)
+        self.assertEqual(self.export('users').status_code, 400)
+        self.assertEqual(self.export('leads', output='xlsx').status_code, 400)
+
+
+class BulkSenderTests(TestCase):
+    """Bulk sends are concurrent but rate limited, retried, ordered and resumable from a checkpoint"""
+
+    def setUp(self):
+        cache.clear()
+        self.sent = []
+        self.failures = {}  # recipient -> failing attempts left
+
+    def send(self, recipient):
+        self.sent.append(recipient)
+        if self.failures.get(recipient):
+            self.failures[recipient] -= 1
+            return {'to': recipient, 'ok': False}
+        return {'to': recipient, 'ok': recipient != 'bad'}
+
+    def sender(self, **options):
+        return BulkSender(send=self.send, is_success=lambda result: result['ok'], retry_backoff=0, **options)
+
+    def test_results_keep_input_order_and_failures_are_retried(self):
+        recipients = [f'9198000000{i:02d}' for i in range(20)] + ['bad']
+        self.failures = {recipients[3]: 2, recipients[7]: 1}
+
+        results = self.sender(max_workers=6, should_retry=lambda result: result['to'] != 'bad').run(recipients)
+
+        self.assertEqual([result['to'] for result in results], recipients)
+        self.assertEqual([result['ok'] for result in results], [True] * 20 + [False])
+        self.assertEqual(self.sent.count(recipients[3]), 3)
+        self.assertEqual(self.sent.count('bad'), 1)
+
+    def test_rate_limit_is_shared_by_all_workers(self):
+        bucket = TokenBucket(rate=50)
+        start = time.monotonic()
+        for _ in range(6):
+            bucket.acquire()
+        # The first token is the burst; the other five wait 1/50 s each
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+        start = time.monotonic()
+        self.sender(rate_per_second=50, max_workers=8).run(['a', 'b', 'c', 'd', 'e', 'f'])
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+    def test_resume_skips_sent_and_pending_recipients(self):
+        recipients = ['a', 'b', 'c', 'd']
+        self.failures = {'b': 99, 'c': 99}  # b's retry is queued elsewhere, c simply fails
+        options = dict(
+            checkpoint=BulkSendCheckpoint('test_job'),
+            is_pending=lambda result: result['to'] == 'b',
+            max_retries=0,
+            to_record=lambda result: {'to': result['to'], 'ok': result['ok']},
+        )
+        self.sender(**options).run(recipients)
+
+        self.sent, self.failures = [], {}
+        results = self.sender(resume=True, **options).run(recipients)
+        self.assertEqual(self.sent, ['c'])
+        self.assertEqual([result['ok'] for result in results], [True, False, True, True])
+
+        # Without resume the same job is sent to everyone again
+        self.sent = []
+        self.sender(**options).run(recipients)
+        self.assertEqual(sorted(self.sent), recipients)
+
+    def test_checkpoint_records_expire(self):
+        checkpoint = BulkSendCheckpoint('expiring_job', ttl=1)
+        checkpoint.record(0, 'sent', {})
+        self.assertEqual(checkpoint.load(1)[0]['state'], 'sent')
+
+        with mock.patch('django.core.cache.backends.locmem.time.time', return_value=time.time() + 2):
+            self.assertEqual(checkpoint.load(1), {})
+
+
+class DelayedRetryTests(TestCase):
+    """Provider retries are queued with backoff and run later, never slept through in the caller"""
+
+    def setUp(self):
+        self.queue = DelayedRetryQueue(max_workers=2)
+        patcher = mock.patch('services.custom_whatsapp_provider.get_retry_queue', return_value=self.queue)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_backoff_honours_retry_after_and_caps_the_window(self):
+        self.assertEqual(parse_retry_after('7'), 7.0)
+        self.assertEqual(parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT'), 0.0)
+        self.assertIsNone(parse_retry_after('soon'))
+
+        self.assertEqual(backoff_delay(4, retry_after=2.5), 2.5)
+        for _ in range(50):
+            self.assertTrue(4 <= backoff_delay(3) <= 8)
+            self.assertTrue(30 <= backoff_delay(20) <= 60)
+
+    def test_jobs_run_in_due_order_without_blocking_the_caller(self):
+        ran, done = [], threading.Event()
+
+        def job(name):
+            ran.append(name)
+            if len(ran) == 2:
+                done.set()
+
+        start = time.monotonic()
+        self.queue.schedule(0.2, job, 'later')
+        self.queue.schedule(0.05, job, 'sooner')
+        self.assertLess(time.monotonic() - start, 0.05)
+
+        self.assertTrue(done.wait(2))
+        self.assertEqual(ran, ['sooner', 'later'])
+        self.assertEqual(self.queue.pending(), 0)
+
+    def provider(self, *responses):
+        results, finished = [], threading.Event()
+
+        def on_retry_result(success, response_data, payload):
+            results.append((success, response_data))
+            finished.set()
+
+        provider = CustomWhatsAppProvider(api_endpoint='http://gateway.test', retry_count=2,
+                                          on_retry_result=on_retry_result)
+        replies = [mock.Mock(status_code=code, headers={'Retry-After': '0'}, text=str(code),
+                             json=mock.Mock(return_value={'message_id': 'm1'})) for code in responses]
+        provider.session = mock.Mock(post=mock.Mock(side_effect=replies), get=mock.Mock(side_effect=replies))
+        return provider, results, finished
+
+    def test_failed_write_returns_pending_and_retries_in_the_background(self):
+        provider, results, finished = self.provider(503, 429, 200)
+
+        success, response = provider._make_request('POST', '/messages', {'to': '919800000001'})
+        self.assertFalse(success)
+        self.assertEqual((response['status'], response['attempt']), ('pending', 1))
+
+        self.assertTrue(finished.wait(2))
+        self.assertEqual(results, [(True, {'message_id': 'm1'})])
+        self.assertEqual(provider.session.post.call_count, 3)
+
+    def test_retries_give_up_after_retry_count(self):
+        provider, results, finished = self.provider(503, 503, 503)
+
+        provider._make_request('POST', '/messages', {'to': '919800000001'})
+
+        self.assertTrue(finished.wait(2))
+        self.assertFalse(results[0][0])
+        self.assertEqual(provider.session.post.call_count, 3)
+
+    def test_reads_fail_fast_with_a_hint(self):
+        provider, results, finished = self.provider(503)
+
+        success, response = provider._make_request('GET', '/status')
+        self.assertFalse(success)
+        self.assertEqual(response['retry_after'], 0)
+        self.assertEqual(self.queue.pending(), 0)
+
+
+class OutboundWakeupTests(TestCase):
+    """The dispatcher sleeps until the next scheduled message is due or a new one is committed"""
+
+    def wakeup(self, horizon=60):
+        wakeup = OutboundWakeup(horizon=horizon)
+        self.addCleanup(wakeup.close)
+        return wakeup
+
+    def queue(self, seconds):
+        return OutboundMessage.objects.create(to='919800000001', rendered_body='Reminder',
+                                              scheduled_for=timezone.now() + timedelta(seconds=seconds))
+
+    def test_reload_reads_due_times_within_the_horizon(self):
+        soon, _ = self.queue(30), self.queue(600)
+        wakeup = self.wakeup()
+
+        wakeup.reload()
+        self.assertAlmostEqual(wakeup.next_due(), soon.scheduled_for.timestamp(), places=3)
+        self.assertEqual(len(wakeup._heap), 1)
+
+    def test_wait_returns_when_a_scheduled_message_falls_due(self):
+        self.queue(0.2)
+        wakeup = self.wakeup()
+
+        start = time.monotonic()
+        self.assertTrue(wakeup.wait(max_wait=5))
+        self.assertLess(time.monotonic() - start, 2)
+
+    def test_committed_message_wakes_a_waiting_dispatcher(self):
+        wakeup = self.wakeup()
+        wakeup.reload()  # nothing queued: the waiter would sleep for the whole horizon
+        woke = []
+        waiter = threading.Thread(target=lambda: woke.append(wakeup.wait(max_wait=5)))
+        waiter.start()
+
+        start = time.monotonic()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.queue(0)
+        waiter.join(5)
+        self.assertEqual(woke, [True])
+        self.assertLess(time.monotonic() - start, 2)
+
+    def test_nothing_due_waits_out_max_wait(self):
+        self.queue(600)
+        wakeup = self.wakeup()
+
+        self.assertFalse(wakeup.wait(max_wait=0.05))
+
+
+class DashboardTests(TestCase):
+    """Dashboard figures come from one aggregate query, cached per user until their next write"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='hiker', first_name='Asha')
+        self.other = User.objects.create(username='other')
+        self.trips = [Trip.objects.create(name=f'Trek {i}', location='Goa', price=1000, max_capacity=10,
+                                          spots_available=10) for i in range(3)]
+        UserProfile.objects.create(user=self.user, reward_points=120)
+        for status in ('pending', 'pending', 'confirmed', 'completed', 'cancelled'):
+            self.book(self.user, status)
+        self.book(self.other, 'confirmed')
+        Wishlist.objects.create(user=self.user, trip=self.trips[0])
+        Wishlist.objects.create(user=self.other, trip=self.trips[1])
+
+    def book(self, user, status):
+        return Booking.objects.create(user=user, trip=self.trips[0], destination='Goa', date=date.today(),
+                                      status=status, amount=1000)
+
+    def get(self, view, path):
+        request = APIRequestFactory(SERVER_NAME='localhost').get(path)
+        force_authenticate(request, user=self.user)
+        return view(request)
+
+    def summary(self):
+        return self.get(dashboard_summary, '/api/dashboard/summary/').data
+
+    def booking_stats(self):
+        return self.get(BookingViewSet.as_view({'get': 'dashboard_stats'}), '/api/bookings/dashboard_stats/').data
+
+    def test_summary_counts_only_the_users_rows(self):
+        # counts, recent bookings, recent wishlist (trip joined)
+        with self.assertNumQueries(3):
+            data = build_dashboard_summary(self.user)
+        self.assertEqual(data['stats'], {
+            'totalBookings': 5, 'pendingBookings': 2, 'confirmedBookings': 1, 'wishlistCount': 1,
+            'recommendationsCount': 0, 'completedTrips': 1, 'adventurePoints': 120,
+        })
+        self.assertEqual(len(data['recentActivity']['bookings']), 3)
+        self.assertEqual(build_dashboard_summary(self.other)['user']['adventurePoints'], 0)
+
+    def test_booking_stats_per_status(self):
+        stats = self.booking_stats()['stats']
+        self.assertEqual(stats, {'total': 5, 'pending': 2, 'confirmed': 1, 'cancelled': 1, 'completed': 1})
+
+    def test_cached_until_the_users_next_write_commits(self):
+        self.summary(), self.booking_stats()
+        with self.assertNumQueries(0):
+            self.summary()
+            self.booking_stats()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book(self.user, 'pending')
+        self.assertEqual(self.summary()['stats']['pendingBookings'], 3)
+        self.assertEqual(self.booking_stats()['stats']['pending'], 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Wishlist.objects.create(user=self.user, trip=self.trips[2])
+        self.assertEqual(self.summary()['stats']['wishlistCount'], 2)
+
+
+class AdminStatsSnapshotTests(TestCase):
+    """Admin stats are computed in four aggregate queries and served from one snapshot row"""
+
+    def setUp(self):
+        self.admin = User.objects.create(username='admin', is_staff=True)
+        leads = Lead.objects.bulk_create([
+            Lead(name='Asha', stage='completed', is_whatsapp=True),
+            Lead(name='Ravi', is_whatsapp=True),
+            Lead(name='Meera'),
+            Lead(name='Kabir'),
+        ])
+        OutboundMessage.objects.bulk_create([
+            OutboundMessage(lead=leads[0], to='919800000001', rendered_body='Hi', status='sent'),
+            OutboundMessage(lead=leads[1], to='919800000002', rendered_body='Hi', status='failed'),
+        ])
+        booking = Booking.objects.create(user=self.admin, destination='Goa', date=date.today(), status='confirmed',
+                                         amount=3000)
+        Payment.objects.bulk_create([
+            Payment(booking=booking, amount=1000, status='verified'),
+            Payment(booking=booking, amount=2000, status='verified'),
+            Payment(booking=booking, amount=500, status='pending'),
+        ])
+        Task.objects.bulk_create([
+            Task(lead=leads[0], title='Call back', due_at=timezone.now() - timedelta(hours=1)),
+            Task(lead=leads[1], title='Send itinerary', due_at=timezone.now() + timedelta(hours=1)),
+            Task(lead=leads[2], title='Done', status='done'),
+        ])
+
+    def get_stats(self, **params):
+        request = APIRequestFactory(SERVER_NAME='localhost').get('/api/admin/dashboard/stats/', params)
+        force_authenticate(request, user=self.admin)
+        return get_admin_dashboard_stats(request).data
+
+    def test_compute_counts_everything_in_four_queries(self):
+        with self.assertNumQueries(4):
+            stats = compute_admin_dashboard_stats()
+
+        self.assertEqual((stats['leads']['total'], stats['leads']['new_today']), (4, 4))
+        self.assertEqual((stats['leads']['converted'], stats['leads']['conversion_rate']), (1, 25.0))
+        self.assertEqual(stats['whatsapp'], {'total_leads': 2, 'messages_sent_today': 1})
+        self.assertEqual(stats['revenue'], {'total': 3000.0, 'verified_payments': 2})
+        self.assertEqual(stats['tasks'], {'open': 2, 'overdue': 1})
+
+    def test_endpoint_reads_the_snapshot_until_it_is_refreshed(self):
+        # The first read on an empty table builds the snapshot inline
+        self.assertEqual(self.get_stats()['leads']['total'], 4)
+        Lead.objects.create(name='Nikhil')
+
+        with self.assertNumQueries(1):
+            data = self.get_stats()
+        self.assertEqual(data['leads']['total'], 4)
+        self.assertFalse(data['freshness']['stale'])
+
+        self.assertEqual(self.get_stats(refresh='true')['leads']['total'], 5)
+        call_command('refresh_admin_stats', stdout=io.StringIO())
+        self.assertEqual(AdminStatsSnapshot.objects.get().stats['leads']['total'], 5)
+
+    @override_settings(ADMIN_STATS_MAX_AGE_SECONDS=60)
+    def test_old_snapshot_is_flagged_stale(self):
+        refresh_admin_stats_snapshot()
+        AdminStatsSnapshot.objects.update(computed_at=timezone.now() - timedelta(minutes=5))
+
+        freshness = self.get_stats()['freshness']
+        self.assertTrue(freshness['stale'])
+        self.assertGreaterEqual(freshness['age_seconds'], 300)
+
+
+class VectorizedRecommendationTests(TestCase):
+    """Batch scoring agrees with per-user scoring and never recommends what a user already has"""
+
+    def setUp(self):
+        self.trips = [Trip.objects.create(name=f'Trek {i}', location=['Goa', 'Himachal', 'Maharashtra'][i % 3],
+                                          price=1500 + 700 * i, duration=f'{i % 3 + 1}D', max_capacity=10,
+                                          spots_available=10) for i in range(8)]
+        self.users = [User.objects.create(username=f'hiker{i}') for i in range(12)]
+
+    def wishlist(self, user, *trip_numbers):
+        for number in trip_numbers:
+            Wishlist.objects.create(user=user, trip=self.trips[number])
+
+    def train(self):
+        engine = TripRecommendationEngine()
+        with mock.patch('builtins.print'):
+            engine.train_model()
+        return engine
+
+    def test_user_based_follows_the_most_similar_user(self):
+        self.wishlist(self.users[0], 0, 1)
+        self.wishlist(self.users[1], 0, 1, 2)
+        self.wishlist(self.users[2], 5)
+
+        engine = self.train()
+        self.assertEqual(engine.get_user_based_recommendations(self.users[0].id), [self.trips[2].id])
+
+    def test_batch_matches_single_users_in_any_chunk_size(self):
+        for i, user in enumerate(self.users):
+            self.wishlist(user, *{i % 8, (i * 3 + 1) % 8, (i * 5 + 2) % 8})
+        engine = self.train()
+        user_ids = [user.id for user in self.users] + [10 ** 6]
+
+        batch = engine.score_users(user_ids)
+        self.assertEqual(batch, engine.score_users(user_ids, max_cells=1))
+        self.assertEqual(batch[:-1], [engine.get_hybrid_recommendations(user.id) for user in self.users])
+        self.assertEqual(batch[-1], [])
+
+        for user, recommendations in zip(self.users, batch):
+            owned = set(Wishlist.objects.filter(user=user).values_list('trip_id', flat=True))
+            self.assertTrue(recommendations)
+            self.assertLessEqual(len(recommendations), 5)
+            self.assertFalse(owned & set(recommendations))
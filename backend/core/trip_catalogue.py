@@ -0,0 +1,159 @@
+"""
+Trip catalogue read path (GET /api/trips/catalogue/)
+
+The homepage and trip listing read this instead of the full TripViewSet list:
+
+- availability (available_slots, is_available) and the cover image are
+  computed in SQL from Trip.confirmed_seats and images[0]
+- sparse fieldsets: ``?fields=id,name,price`` selects only the columns the
+  requested fields need; the default leaves out the heavy JSON columns
+- cursor pagination on (-created_at, -id), ``?page_size=`` up to 100
+- filters: ``location`` (contains), ``status``, ``available=true``
+- responses are cached under a catalogue version that is bumped on commit
+  of any Trip, Booking or Guide write, and carry an ETag derived from that
+  version; a matching If-None-Match gets a 304 without touching the database
+
+The version lives in the default cache, so invalidation reaches every
+worker only with a shared backend (Redis via REDIS_URL); with the local
+memory fallback each process sees its own writes immediately and other
+processes' writes after TRIP_CATALOGUE_CACHE_SECONDS.
+"""
+
+import hashlib
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import BooleanField, ExpressionWrapper, F, Q, Value
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.functions import Greatest
+from rest_framework import status
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+from .models import Trip
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'trip_catalogue:version'
+
+# Serializer field -> columns it reads (annotated fields read none)
+FIELD_COLUMNS = {
+    'id': ['id'],
+    'name': ['name'],
+    'description': ['description'],
+    'location': ['location'],
+    'duration': ['duration'],
+    'price': ['price'],
+    'status': ['status'],
+    'next_departure': ['next_departure'],
+    'max_capacity': ['max_capacity'],
+    'safety_record': ['safety_record'],
+    'images': ['images'],
+    'highlights': ['highlights'],
+    'equipment': ['equipment'],
+    'essentials': ['essentials'],
+    'guide': ['guide'],
+    'created_at': ['created_at'],
+    'cover_image': [],
+    'available_slots': [],
+    'is_available': [],
+}
+DEFAULT_FIELDS = [
+    'id', 'name', 'location', 'duration', 'price', 'status', 'next_departure',
+    'cover_image', 'available_slots', 'is_available', 'guide',
+]
+
+
+class CatalogueCursorPagination(CursorPagination):
+    ordering = ('-created_at', '-id')
+    page_size = 24
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+def requested_fields(request):
+    """Fields named in ``?fields=`` (unknown names ignored), or the default summary set"""
+    raw = request.query_params.get('fields')
+    if not raw:
+        return list(DEFAULT_FIELDS)
+    fields = [name for name in (part.strip() for part in raw.split(',')) if name in FIELD_COLUMNS]
+    return fields or list(DEFAULT_FIELDS)
+
+
+def catalogue_queryset(request, fields):
+    """Trips for the catalogue with only the needed columns and SQL-computed availability"""
+    available_slots = Greatest(F('max_capacity') - F('confirmed_seats'), Value(0))
+    qs = Trip.objects.annotate(
+        available_slots=available_slots,
+        is_available=ExpressionWrapper(Q(max_capacity__gt=F('confirmed_seats')), output_field=BooleanField()),
+    )
+    if 'cover_image' in fields:
+        qs = qs.annotate(cover_image=KeyTextTransform('0', 'images'))
+    if 'guide' in fields:
+        qs = qs.select_related('guide')
+
+    columns = {'id', 'created_at'}  # the cursor reads the ordering columns
+    for name in fields:
+        columns.update(FIELD_COLUMNS[name])
+    qs = qs.only(*columns)
+
+    params = request.query_params
+    if params.get('location'):
+        qs = qs.filter(location__icontains=params['location'])
+    if params.get('status'):
+        qs = qs.filter(status=params['status'])
+    if params.get('available', '').lower() in ('1', 'true', 'yes'):
+        qs = qs.filter(max_capacity__gt=F('confirmed_seats'))
+    return qs
+
+
+# ============================================================
+# Versioned response cache
+# ============================================================
+
+def catalogue_version() -> int:
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Time-based start, so a flushed cache never reissues an old version's ETags
+        cache.add(VERSION_KEY, int(time.time() * 1000))
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_catalogue_version():
+    """Invalidate every cached catalogue response (call after commit)"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, int(time.time() * 1000), None)
+
+
+def _etag_matches(request, etag) -> bool:
+    header = request.headers.get('If-None-Match', '')
+    candidates = [tag.strip() for tag in header.split(',') if tag.strip()]
+    return '*' in candidates or etag in candidates or f'W/{etag}' in candidates
+
+
+def cached_catalogue_response(request, build):
+    """
+    Serve ``build()`` (the response data) through the versioned cache
+
+    The cache key and ETag cover the catalogue version and the full request
+    URI, so every filter, fieldset and cursor gets its own entry.
+    """
+    version = catalogue_version()
+    digest = hashlib.sha1(f'{version}:{request.build_absolute_uri()}'.encode()).hexdigest()
+    etag = f'"{digest}"'
+    headers = {'ETag': etag, 'Cache-Control': 'public, max-age=0, must-revalidate'}
+
+    if _etag_matches(request, etag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    key = f'trip_catalogue:{digest}'
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data, getattr(settings, 'TRIP_CATALOGUE_CACHE_SECONDS', 300))
+    return Response(data, headers=headers)
@@ -40,6 +40,7 @@ from .views import (
     verify_payment,
     confirm_booking_after_payment,
     get_pending_payments,
+    reconcile_payments,
     get_payment_status,
     send_whatsapp_otp,
     verify_whatsapp_otp,
@@ -53,7 +54,7 @@ from .views import (
     record_user_interaction,
 )
 from core.views import chat_retrieve, chat_complete, auth_google, capture_lead
-from core.admin_views import upload_trips, list_trips_admin, delete_trip, AdminLeadViewSet, AdminWhatsAppViewSet, get_admin_dashboard_stats
+from core.admin_views import upload_trips, list_trips_admin, delete_trip, AdminLeadViewSet, AdminWhatsAppViewSet, get_admin_dashboard_stats, export_dataset
 from services.whatsapp_ai_webhook import (
     whatsapp_ai_webhook,
     whatsapp_ai_send_test,
@@ -143,11 +144,13 @@ urlpatterns = [
     path('payments/<int:payment_id>/verify/', verify_payment, name='verify_payment'),
     path('payments/<int:payment_id>/confirm-booking/', confirm_booking_after_payment, name='confirm_booking_after_payment'),
     path('payments/pending/', get_pending_payments, name='get_pending_payments'),
+    path('payments/reconcile/', reconcile_payments, name='reconcile_payments'),
     path('payments/status/', get_payment_status, name='get_payment_status'),
     # Admin Trip Management API
     path('admin/upload-trips/', upload_trips, name='upload_trips'),
     path('admin/trips/', list_trips_admin, name='list_trips_admin'),
     path('admin/trips/<int:trip_id>/', delete_trip, name='delete_trip'),
+    path('admin/export/<str:dataset>/', export_dataset, name='export_dataset'),
     # WhatsApp AI Agent Endpoints (NEW - Phase 2)
     path('whatsapp/ai-webhook/', whatsapp_ai_webhook, name='whatsapp_ai_webhook'),
     path('whatsapp/ai-test/', whatsapp_ai_send_test, name='whatsapp_ai_test'),
@@ -1,10 +1,13 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from django.db import transaction, models
-from django.db.models import Avg, Count
+from django.db.models import Avg, Count, Prefetch
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 import cloudinary.uploader as cloud_uploader
 from .models import UserProfile, Booking, TripHistory, TripRecommendation, Lead, Author, Story, StoryImage, StoryAudio, StoryRating, Trip, Guide, Review, Wishlist, TripPlan, Payment, ChatFAQ, SeatLock, MessageTemplate, LeadEvent, OutboundMessage, Task, PaymentVerificationLog, TransactionAudit, UserProgress, PointTransaction, Badge, BadgeUnlock, GamificationEvent, Challenge, UserChallengeProgress, LeadQualificationScore, LeadQualificationRule, LeadPrioritizationQueue, BookingLimit, OTPVerification
 from .serializers import (
@@ -30,6 +33,8 @@ from .serializers import (
     LeadEventSerializer,
     OutboundMessageSerializer,
     TaskSerializer,
+    TripCatalogueSerializer,
+    RECENT_VERIFICATION_LOGS,
 )
 from django.views.decorators.csrf import csrf_exempt
 import os, re, math, json, requests
@@ -42,7 +47,14 @@ try:
     from google.auth.transport import requests as google_requests
 except Exception:
     google_id_token = None
-from .services import enqueue_template_message, change_lead_stage, merge_leads, run_abandoned_scan
+from .services import enqueue_template_message, change_lead_stage, merge_leads, run_abandoned_scan, get_cached_recommendations
+from .inbound_queue import enqueue_inbound_message
+from .message_dedup import claim_message_id
+from .outbound_coalescer import TRANSACTIONAL, queue_whatsapp_message
+from .trip_catalogue import CatalogueCursorPagination, cached_catalogue_response, catalogue_queryset, requested_fields
+from .seat_locks import SeatsUnavailable, acquire_seat_lock, end_seat_lock, refresh_seat_lock
+from .payment_reconciliation import iter_statement, open_text_stream, reconcile_statement
+from .dashboard import booking_stats_cache_key, build_booking_stats, build_dashboard_summary, cached_dashboard, summary_cache_key
 from django.conf import settings
 from django.db.models import Q
 from datetime import timedelta
@@ -117,7 +129,15 @@ class BookingViewSet(viewsets.ModelViewSet):
                 if user and user.username:
                     template = MessageTemplate.objects.filter(name='payment_confirmation').first()
                     body = f"Payment link generated for booking #{booking.id} advance ₹{advance_amount}" if not template else template.body.replace('{{amount}}', str(advance_amount)).replace('{{booking_id}}', str(booking.id)).replace('{{trip_name}}', trip.name if trip else booking.destination)
-                    OutboundMessage.objects.create(lead=None, to=user.username, template=template, rendered_body=body)
+                    # Delivered through the coalescer; 'sending' lets the dispatcher resend it if this process dies
+                    outbound = OutboundMessage.objects.create(
+                        lead=None, to=user.username, template=template, rendered_body=body,
+                        status='sending', locked_at=timezone.now()
+                    )
+                    queue_whatsapp_message(
+                        user.username, body, priority=TRANSACTIONAL,
+                        session_id='booking_confirmations', outbound=outbound
+                    )
             except Exception:
                 pass
             # mark seat lock released (kept but status)
@@ -153,24 +173,11 @@ class BookingViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def dashboard_stats(self, request):
         """Get booking statistics for dashboard"""
-        user = request.user
         bookings = self.get_queryset()
-        
-        stats = {
-            'total': bookings.count(),
-            'pending': bookings.filter(status='pending').count(),
-            'confirmed': bookings.filter(status='confirmed').count(),
-            'cancelled': bookings.filter(status='cancelled').count(),
-            'completed': bookings.filter(status='completed').count(),
-        }
-        
-        # Recent bookings
-        recent = bookings.order_by('-created_at')[:5]
-        
-        return Response({
-            'stats': stats,
-            'recent_bookings': BookingSerializer(recent, many=True).data
-        })
+        data = cached_dashboard(
+            booking_stats_cache_key(request.user.id), lambda: build_booking_stats(bookings)
+        )
+        return Response(data)
 
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
@@ -286,9 +293,25 @@ class GuideViewSet(viewsets.ModelViewSet):
     serializer_class = GuideSerializer
 
 class TripViewSet(viewsets.ModelViewSet):
-    queryset = Trip.objects.all().order_by('-created_at')
+    queryset = Trip.objects.select_related('guide').order_by('-created_at')
     serializer_class = TripSerializer
 
+    @action(detail=False, methods=['get'])
+    def catalogue(self, request):
+        """Paginated, cacheable trip cards for the homepage and listing (see core.trip_catalogue)"""
+        fields = requested_fields(request)
+
+        def build():
+            paginator = CatalogueCursorPagination()
+            page = paginator.paginate_queryset(catalogue_queryset(request, fields), request, view=self)
+            return {
+                'next': paginator.get_next_link(),
+                'previous': paginator.get_previous_link(),
+                'results': list(TripCatalogueSerializer(page, many=True, fields=fields).data),
+            }
+
+        return cached_catalogue_response(request, build)
+
 class ReviewViewSet(viewsets.ModelViewSet):
     queryset = Review.objects.all().order_by('-created_at')
     serializer_class = ReviewSerializer
@@ -1043,49 +1066,7 @@ def dashboard_summary(request):
     Dashboard summary endpoint providing aggregated user data
     """
     user = request.user
-    
-    # Get user profile data
-    try:
-        profile = UserProfile.objects.get(user=user)
-        completed_trips = profile.completed_trips or 0
-        adventure_points = profile.adventure_points or 0
-    except UserProfile.DoesNotExist:
-        completed_trips = 0
-        adventure_points = 0
-    
-    # Get counts
-    bookings_count = Booking.objects.filter(user=user).count()
-    pending_bookings = Booking.objects.filter(user=user, status='pending').count()
-    confirmed_bookings = Booking.objects.filter(user=user, status='confirmed').count()
-    wishlist_count = Wishlist.objects.filter(user=user).count()
-    recommendations_count = TripRecommendation.objects.filter(user=user).count()
-    
-    # Recent activity
-    recent_bookings = Booking.objects.filter(user=user).order_by('-created_at')[:3]
-    recent_wishlist = Wishlist.objects.filter(user=user).order_by('-created_at')[:3]
-    
-    return Response({
-        'user': {
-            'id': user.id,
-            'name': user.first_name or user.username,
-            'email': user.email,
-            'completedTrips': completed_trips,
-            'adventurePoints': adventure_points,
-        },
-        'stats': {
-            'totalBookings': bookings_count,
-            'pendingBookings': pending_bookings,
-            'confirmedBookings': confirmed_bookings,
-            'wishlistCount': wishlist_count,
-            'recommendationsCount': recommendations_count,
-            'completedTrips': completed_trips,
-            'adventurePoints': adventure_points,
-        },
-        'recentActivity': {
-            'bookings': BookingSerializer(recent_bookings, many=True).data,
-            'wishlist': WishlistSerializer(recent_wishlist, many=True).data,
-        }
-    })
+    return Response(cached_dashboard(summary_cache_key(user.id), lambda: build_dashboard_summary(user)))
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
@@ -1129,22 +1110,13 @@ class SeatLockViewSet(viewsets.ModelViewSet):
             return Response({'detail': 'trip is required'}, status=status.HTTP_400_BAD_REQUEST)
         if seats < 1:
             return Response({'detail': 'seats must be >=1'}, status=status.HTTP_400_BAD_REQUEST)
-        with transaction.atomic():
-            try:
-                trip = Trip.objects.select_for_update().get(id=trip_id)
-            except Trip.DoesNotExist:
-                return Response({'detail': 'Trip not found'}, status=status.HTTP_404_NOT_FOUND)
-            if trip.spots_available < seats:
-                return Response({'detail': 'Not enough spots available'}, status=status.HTTP_409_CONFLICT)
-            trip.spots_available -= seats
-            trip.save(update_fields=['spots_available'])
-            lock = SeatLock.objects.create(
-                trip=trip,
-                user=request.user,
-                seats=seats,
-                expires_at=timezone.now() + timezone.timedelta(minutes=5)
-            )
-            return Response(SeatLockSerializer(lock).data, status=status.HTTP_201_CREATED)
+        try:
+            lock = acquire_seat_lock(trip_id, request.user, seats)
+        except Trip.DoesNotExist:
+            return Response({'detail': 'Trip not found'}, status=status.HTTP_404_NOT_FOUND)
+        except SeatsUnavailable:
+            return Response({'detail': 'Not enough spots available'}, status=status.HTTP_409_CONFLICT)
+        return Response(SeatLockSerializer(lock).data, status=status.HTTP_201_CREATED)
 
     @action(detail=True, methods=['post'], url_path='refresh')
     def refresh(self, request, pk=None):
@@ -1152,24 +1124,18 @@ class SeatLockViewSet(viewsets.ModelViewSet):
             lock = SeatLock.objects.get(id=pk, user=request.user)
         except SeatLock.DoesNotExist:
             return Response({'detail': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
-        if lock.status != 'active' or lock.expires_at <= timezone.now():
+        if not refresh_seat_lock(lock):
             return Response({'detail': 'Cannot refresh expired/released lock'}, status=status.HTTP_410_GONE)
-        lock.expires_at = timezone.now() + timezone.timedelta(minutes=5)
-        lock.save(update_fields=['expires_at'])
         return Response(SeatLockSerializer(lock).data)
 
     @action(detail=True, methods=['post'], url_path='release')
     def release(self, request, pk=None):
         try:
-            lock = SeatLock.objects.select_for_update().get(id=pk, user=request.user)
+            lock = SeatLock.objects.get(id=pk, user=request.user)
         except SeatLock.DoesNotExist:
             return Response({'detail': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
-        with transaction.atomic():
-            if lock.status == 'active':
-                lock.status = 'released'
-                lock.save(update_fields=['status'])
-                lock.trip.spots_available = models.F('spots_available') + lock.seats
-                lock.trip.save(update_fields=['spots_available'])
+        if not end_seat_lock(lock, 'released'):
+            lock.refresh_from_db(fields=['status'])
         return Response({'status': lock.status})
 
 
@@ -1191,29 +1157,16 @@ def whatsapp_incoming_webhook(request):
         return Response({'error': 'Unauthorized'}, status=401)
     
     try:
-        payload = request.data
-        session_id = payload.get('sessionId')
-        from_number = payload.get('from', '').replace('@c.us', '')
-        message_body = payload.get('body', '')
-        message_type = payload.get('type')
-        timestamp = payload.get('timestamp')
-        message_id = payload.get('id')
-        
-        logger.info(f"WhatsApp message from {from_number}: {message_body}")
-        
-        # Create or get existing lead
-        lead = create_or_update_lead_from_whatsapp(
-            phone=from_number,
-            message=message_body,
-            session_id=session_id,
-            message_id=message_id
-        )
-        
-        # Process the message and trigger automation
-        process_whatsapp_message(lead, message_body, message_type)
-        
-        return Response({'status': 'processed', 'lead_id': lead.id})
-        
+        # Acknowledge first: lead upsert, intent handling and replies run in
+        # the process_inbound_messages worker pool
+        with transaction.atomic():
+            if not claim_message_id(request.data.get('id'), source='incoming_webhook'):
+                return Response({'status': 'duplicate'})
+            inbound = enqueue_inbound_message(request.data)
+        logger.info(f"Queued WhatsApp message {inbound.id} from {inbound.from_number}")
+
+        return Response({'status': 'queued', 'inbound_id': inbound.id})
+
     except Exception as e:
         logger.error(f"WhatsApp webhook error: {str(e)}")
         return Response({'error': 'Processing failed'}, status=500)
@@ -1226,21 +1179,19 @@ def create_or_update_lead_from_whatsapp(phone, message, session_id, message_id=N
     # Clean phone number
     clean_phone = re.sub(r'\D', '', phone)  # Remove non-digits
     
-    # Try to find existing lead by phone or WhatsApp number
-    lead = Lead.objects.filter(
-        Q(phone=clean_phone) | 
-        Q(whatsapp_number=clean_phone) | 
-        Q(phone=phone) | 
-        Q(whatsapp_number=phone)
-    ).first()
+    # Try to find existing lead by phone number
+    lead = Lead.objects.filter(Q(phone=clean_phone) | Q(phone=phone)).first()
     
     if not lead:
         # Create new lead
         lead = Lead.objects.create(
+            name=clean_phone,
             phone=clean_phone,
-            whatsapp_number=clean_phone,
+            is_whatsapp=True,
+            message=message,
             source='whatsapp',
-            stage='inquiry',
+            stage='new',
+            last_contact_at=timezone.now(),
             metadata={
                 'first_message': message,
                 'whatsapp_session': session_id,
@@ -1253,9 +1204,9 @@ def create_or_update_lead_from_whatsapp(phone, message, session_id, message_id=N
         Task.objects.create(
             lead=lead,
             type='initial_contact',
-            status='pending',
+            title='Reply to WhatsApp inquiry',
             due_at=timezone.now() + timedelta(hours=1),
-            description=f'Follow up on WhatsApp inquiry: "{message[:50]}..."'
+            notes=f'Follow up on WhatsApp inquiry: "{message[:50]}..."'
         )
         
         logger.info(f"Created new lead from WhatsApp: {lead.id}")
@@ -1265,16 +1216,17 @@ def create_or_update_lead_from_whatsapp(phone, message, session_id, message_id=N
         lead.metadata = lead.metadata or {}
         lead.metadata['last_whatsapp_message'] = message
         lead.metadata['last_whatsapp_contact'] = timezone.now().isoformat()
-        lead.whatsapp_number = clean_phone  # Ensure WhatsApp number is set
-        lead.save()
+        lead.is_whatsapp = True
+        lead.last_contact_at = timezone.now()
+        lead.save(update_fields=['metadata', 'is_whatsapp', 'last_contact_at', 'updated_at'])
         
         logger.info(f"Updated existing lead from WhatsApp: {lead.id}")
     
     # Log the interaction
     LeadEvent.objects.create(
         lead=lead,
-        event_type='whatsapp_message_received',
-        metadata={
+        type='inbound_msg',
+        payload={
             'message': message,
             'session_id': session_id,
             'message_id': message_id,
@@ -1289,36 +1241,39 @@ def create_or_update_lead_from_whatsapp(phone, message, session_id, message_id=N
 def process_whatsapp_message(lead, message, message_type):
     """
     Analyze message and trigger appropriate responses
+
+    Replies go through the outbound coalescer, so a burst of inbound
+    messages (and any stage-change nudge they trigger) becomes one send.
     """
     message_lower = message.lower()
     
     # Intent detection (simple keyword-based)
     if any(keyword in message_lower for keyword in ['book', 'booking', 'reserve', 'trip']):
         # Booking intent
-        send_whatsapp_message(
-            lead.whatsapp_number,
+        queue_whatsapp_message(
+            lead.phone,
             "🏔️ Great! I'd love to help you with your booking. Which destination interests you?\n\n" +
             "Reply with:\n1️⃣ Mountain Adventures\n2️⃣ Beach Escapes\n3️⃣ Cultural Tours\n4️⃣ Wildlife Safari",
             session_id='customer_support'
         )
-        if lead.stage == 'inquiry':
-            change_lead_stage(lead, 'interested', 'Expressed booking interest via WhatsApp')
+        if lead.stage == 'new':
+            change_lead_stage(lead, 'engaged', 'Expressed booking interest via WhatsApp')
         
     elif any(keyword in message_lower for keyword in ['price', 'cost', 'how much', 'pricing']):
         # Pricing inquiry
-        send_whatsapp_message(
-            lead.whatsapp_number, 
+        queue_whatsapp_message(
+            lead.phone, 
             "💰 I'll send you our latest pricing! What type of experience and dates are you considering?\n\n" +
             "Our packages typically range from $299-$1999 depending on duration and destination.",
             session_id='customer_support'
         )
-        if lead.stage == 'inquiry':
-            change_lead_stage(lead, 'interested', 'Requested pricing via WhatsApp')
+        if lead.stage == 'new':
+            change_lead_stage(lead, 'engaged', 'Requested pricing via WhatsApp')
         
     elif any(keyword in message_lower for keyword in ['help', 'support', 'question', 'info']):
         # Support request
-        send_whatsapp_message(
-            lead.whatsapp_number,
+        queue_whatsapp_message(
+            lead.phone,
             "🤝 I'm here to help! What can I assist you with today?\n\n" +
             "I can help with:\n• Trip bookings\n• Pricing information\n• Destination details\n• Payment options",
             session_id='customer_support'
@@ -1326,9 +1281,9 @@ def process_whatsapp_message(lead, message, message_type):
         
     elif any(keyword in message_lower for keyword in ['hi', 'hello', 'hey', 'good morning', 'good evening']):
         # Greeting
-        if lead.stage == 'inquiry' or not lead.metadata.get('welcomed'):
-            send_whatsapp_message(
-                lead.whatsapp_number,
+        if lead.stage == 'new' or not lead.metadata.get('welcomed'):
+            queue_whatsapp_message(
+                lead.phone,
                 f"👋 Hello! Welcome to our travel adventure service!\n\n" +
                 "We specialize in creating unforgettable travel experiences. How can I help you explore the world today?",
                 session_id='customer_support'
@@ -1339,9 +1294,9 @@ def process_whatsapp_message(lead, message, message_type):
         
     else:
         # Generic acknowledgment for other messages
-        if lead.stage == 'inquiry' and not lead.metadata.get('first_response_sent'):
-            send_whatsapp_message(
-                lead.whatsapp_number,
+        if lead.stage == 'new' and not lead.metadata.get('first_response_sent'):
+            queue_whatsapp_message(
+                lead.phone,
                 "🌟 Thanks for reaching out! We create amazing travel experiences and adventures.\n\n" +
                 "How can I help you today? Feel free to ask about destinations, pricing, or bookings!",
                 session_id='customer_support'
@@ -1979,6 +1934,44 @@ def verify_payment(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def reconcile_payments(request):
+    """
+    Admin endpoint to bulk-verify pending payments from a bank/PSP statement.
+    Only staff can reconcile.
+    
+    POST /api/payments/reconcile/  (multipart)
+    statement: <CSV or OFX file>
+    format: csv/ofx  (optional, default from the file name)
+    dry_run: true/false  (optional)
+    """
+    if not request.user.is_staff:
+        return Response({
+            'error': 'Only staff can reconcile payments'
+        }, status=status.HTTP_403_FORBIDDEN)
+    
+    statement = request.FILES.get('statement')
+    if not statement:
+        return Response({
+            'error': 'statement file is required'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+    
+    try:
+        rows = iter_statement(open_text_stream(statement.file), fmt=request.data.get('format'), name=statement.name)
+        report = reconcile_statement(rows, user=request.user, statement_name=statement.name, dry_run=dry_run)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        logger.error(f"Payment reconciliation error: {str(e)}")
+        return Response({
+            'error': 'Failed to reconcile statement'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    return Response(report.as_dict(), status=status.HTTP_200_OK)
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def confirm_booking_after_payment(request):
@@ -2054,6 +2047,93 @@ def confirm_booking_after_payment(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class PendingPaymentCursorPagination(CursorPagination):
+    """
+    Keyset pagination on (-risk_score, -created_at, -id)
+
+    DRF's CursorPagination positions on the first ordering field only and
+    resolves ties with an offset capped at offset_cutoff, so a backlog where
+    most payments share a risk score pages in circles. This cursor carries
+    all three keys: each page starts strictly after the last row shown, however
+    many rows tie and whatever was verified in the meantime.
+    """
+    ordering = ('-risk_score', '-created_at', '-id')
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor.reverse)
+        position = self._decode_position(cursor.position) if cursor else None
+
+        if position is not None:
+            queryset = queryset.filter(self._beyond(position, reverse))
+        ordering = [key.lstrip('-') for key in self.ordering] if reverse else self.ordering
+        page = list(queryset.order_by(*ordering)[:page_size + 1])
+        has_more = len(page) > page_size
+        page = page[:page_size]
+        if reverse:
+            page.reverse()
+
+        self.page = page
+        self.has_next = has_more if not reverse else position is not None
+        self.has_previous = has_more if reverse else position is not None
+        return page
+
+    @staticmethod
+    def _beyond(position, reverse):
+        """Rows after ``position`` in page order (before it when paging back)"""
+        risk_score, created_at, pk = position
+        op = 'gt' if reverse else 'lt'
+        return (
+            Q(**{f'risk_score__{op}': risk_score})
+            | Q(risk_score=risk_score, **{f'created_at__{op}': created_at})
+            | Q(risk_score=risk_score, created_at=created_at, **{f'id__{op}': pk})
+        )
+
+    @staticmethod
+    def _encode_position(payment):
+        return f'{payment.risk_score}|{payment.created_at.isoformat()}|{payment.id}'
+
+    def _decode_position(self, value):
+        try:
+            risk_score, created_at, pk = (value or '').split('|')
+            created_at = parse_datetime(created_at)
+            if created_at is None:
+                raise ValueError(value)
+            return int(risk_score), created_at, int(pk)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self._encode_position(self.page[-1])))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self._encode_position(self.page[0])))
+
+
+def pending_payments_queryset():
+    """Pending payments with what PaymentSerializer reads joined or prefetched"""
+    return (
+        Payment.objects.filter(verification_status='pending')
+        .select_related('booking', 'verified_by')
+        .prefetch_related(Prefetch(
+            'verification_logs',
+            queryset=PaymentVerificationLog.objects.select_related('verified_by')
+            .order_by('-created_at', '-id')[:RECENT_VERIFICATION_LOGS],
+            to_attr='recent_verification_logs',
+        ))
+    )
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_pending_payments(request):
@@ -2069,25 +2149,38 @@ def get_pending_payments(request):
                 'error': 'Only staff can access this endpoint'
             }, status=status.HTTP_403_FORBIDDEN)
         
-        # Get pending payments sorted by risk level
-        payments = Payment.objects.filter(
-            verification_status='pending'
-        ).select_related('booking').order_by('-risk_score', '-created_at')
-        
-        # Group by risk level
-        high_risk = payments.filter(risk_level__in=['high', 'fraud'])
-        medium_risk = payments.filter(risk_level='medium')
-        low_risk = payments.filter(risk_level='low')
-        
+        # One page of pending payments, highest risk first, with their latest logs
+        paginator = PendingPaymentCursorPagination()
+        page = paginator.paginate_queryset(pending_payments_queryset(), request)
+
+        # Group by risk level in a single pass over the page
+        buckets = {'high': [], 'medium': [], 'low': []}
+        for payment in page:
+            level = 'high' if payment.risk_level in ('high', 'fraud') else payment.risk_level
+            buckets.setdefault(level, []).append(payment)
+
+        # Backlog totals in one aggregate query
+        totals = Payment.objects.filter(verification_status='pending').aggregate(
+            total=models.Count('id'),
+            high_risk=models.Count('id', filter=Q(risk_level__in=['high', 'fraud'])),
+            amount=models.Sum('amount'),
+        )
+
         return Response({
-            'high_risk': PaymentSerializer(high_risk, many=True).data,
-            'medium_risk': PaymentSerializer(medium_risk, many=True).data,
-            'low_risk': PaymentSerializer(low_risk, many=True).data,
-            'total_pending': payments.count(),
-            'high_risk_count': high_risk.count(),
-            'total_amount_pending': float(payments.aggregate(total=models.Sum('amount'))['total'] or 0)
+            'high_risk': PaymentSerializer(buckets['high'], many=True).data,
+            'medium_risk': PaymentSerializer(buckets['medium'], many=True).data,
+            'low_risk': PaymentSerializer(buckets['low'], many=True).data,
+            'total_pending': totals['total'],
+            'high_risk_count': totals['high_risk'],
+            'total_amount_pending': float(totals['amount'] or 0),
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
         }, status=status.HTTP_200_OK)
         
+    except NotFound as e:
+        return Response({
+            'error': str(e.detail)
+        }, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
         logger.error(f"Get pending payments error: {str(e)}")
         return Response({
@@ -2543,60 +2636,66 @@ def get_lead_scoring_stats(request):
 def get_trip_recommendations(request, user_id=None):
     """
     Get personalized trip recommendations for a user
+
+    Served from the precomputed per-user cache; the engine is only loaded
+    when the cached list is missing, expired or stale after new interactions.
     """
     try:
-        import sys
-        import os
-        sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
-        from ml_models.trip_recommendation_engine import TripRecommendationEngine
-
         # Use request user if no user_id provided
         target_user_id = user_id or request.user.id
 
-        # Initialize recommendation engine
-        engine = TripRecommendationEngine()
-        engine_loaded = engine.load_model()
-
-        if not engine_loaded:
-            # If no saved model, return popular trips
-            popular_trips = Trip.objects.annotate(
-                booking_count=Count('bookings')
-            ).order_by('-booking_count')[:5]
+        recommended_trip_ids = get_cached_recommendations(target_user_id)
+        from_cache = recommended_trip_ids is not None
+
+        if not from_cache:
+            import sys
+            import os
+            sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+            from ml_models.trip_recommendation_engine import get_shared_engine
+
+            # Process-wide engine, memory-mapped from the published model bundle
+            engine = get_shared_engine()
+
+            if engine is None:
+                # If no saved model, return popular trips
+                popular_trips = Trip.objects.annotate(
+                    booking_count=Count('bookings')
+                ).order_by('-booking_count')[:5]
+
+                recommendations = []
+                for trip in popular_trips:
+                    recommendations.append({
+                        'id': trip.id,
+                        'name': trip.name,
+                        'location': trip.location,
+                        'price': float(trip.price),
+                        'duration': trip.duration,
+                        'image': trip.images[0] if trip.images else None,
+                        'reason': 'Popular trip',
+                        'confidence': 'low'
+                    })
 
-            recommendations = []
-            for trip in popular_trips:
-                recommendations.append({
-                    'id': trip.id,
-                    'name': trip.name,
-                    'location': trip.location,
-                    'price': float(trip.price),
-                    'duration': trip.duration,
-                    'image': trip.images[0] if trip.images else None,
-                    'reason': 'Popular trip',
-                    'confidence': 'low'
+                return Response({
+                    'user_id': target_user_id,
+                    'recommendations': recommendations,
+                    'model_status': 'not_trained',
+                    'message': 'Using popular trips as fallback'
                 })
 
-            return Response({
-                'user_id': target_user_id,
-                'recommendations': recommendations,
-                'model_status': 'not_trained',
-                'message': 'Using popular trips as fallback'
-            })
-
-        # Get user preferences from request (optional)
-        user_preferences = request.GET.get('preferences', None)
-        if user_preferences:
-            try:
-                user_preferences = json.loads(user_preferences)
-            except:
-                user_preferences = None
-
-        # Get recommendations
-        recommended_trip_ids = engine.get_personalized_recommendations(
-            target_user_id,
-            user_preferences=user_preferences,
-            n_recommendations=5
-        )
+            # Get user preferences from request (optional)
+            user_preferences = request.GET.get('preferences', None)
+            if user_preferences:
+                try:
+                    user_preferences = json.loads(user_preferences)
+                except:
+                    user_preferences = None
+
+            # Recompute from live interactions and refresh the cache
+            recommended_trip_ids = engine.refresh_user_recommendations(
+                target_user_id,
+                user_preferences=user_preferences,
+                n_recommendations=5
+            )
 
         # Fetch trip details
         recommended_trips = Trip.objects.filter(id__in=recommended_trip_ids)
@@ -2624,6 +2723,7 @@ def get_trip_recommendations(request, user_id=None):
             'user_id': target_user_id,
             'recommendations': recommendations,
             'model_status': 'active',
+            'cached': from_cache,
             'total_recommendations': len(recommendations),
             'generated_at': timezone.now().isoformat()
         })
@@ -2674,12 +2774,11 @@ def get_recommendation_stats(request):
         import sys
         import os
         sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
-        from ml_models.trip_recommendation_engine import TripRecommendationEngine
+        from ml_models.trip_recommendation_engine import get_shared_engine
 
-        engine = TripRecommendationEngine()
-        engine_loaded = engine.load_model()
+        engine = get_shared_engine()
 
-        if not engine_loaded:
+        if engine is None:
             return Response({
                 'model_status': 'not_trained',
                 'message': 'Recommendation engine not yet trained'
@@ -2690,8 +2789,9 @@ def get_recommendation_stats(request):
             'model_status': 'active',
             'users_in_matrix': engine.user_item_matrix.shape[0] if engine.user_item_matrix is not None else 0,
             'trips_in_matrix': engine.trip_features_matrix.shape[0] if engine.trip_features_matrix is not None else 0,
-            'total_interactions': engine.user_item_matrix.sum().sum() if engine.user_item_matrix is not None else 0,
+            'total_interactions': float(engine.user_item_matrix.sum()) if engine.user_item_matrix is not None else 0,
             'features_used': len(engine.feature_columns) if engine.feature_columns else 0,
+            'model_version': engine.bundle_version,
             'last_updated': timezone.now().isoformat()
         }
 
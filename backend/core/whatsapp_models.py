@@ -2,9 +2,8 @@
 WhatsApp Database Models
 Track messages, conversations, and webhooks for analytics
 
-Add these to your Django models and run:
-    python manage.py makemigrations
-    python manage.py migrate
+Registered through core.models (migration 0021). WhatsAppConversation and
+WhatsAppMessage back the shared conversation store (core.conversation_store).
 """
 
 from django.db import models
@@ -109,6 +108,9 @@ class WhatsAppConversation(models.Model):
     timezone = models.CharField(max_length=50, null=True, blank=True)
     preferences = models.JSONField(default=dict, blank=True)
     
+    # Dialogue state kept by the conversation store (stage, sentiment, review flags)
+    state = models.JSONField(default=dict, blank=True)
+    
     # Metadata
     first_message_at = models.DateTimeField(null=True, blank=True)
     last_message_at = models.DateTimeField(null=True, blank=True)
@@ -14,6 +14,7 @@ from django.conf import settings
 
 from services.smart_whatsapp_agent import SmartWhatsAppAgent
 from services.custom_whatsapp_service import CustomWhatsAppService
+from .message_dedup import claim_message_id, release_message_id, get_dedup_stats
 
 logger = logging.getLogger(__name__)
 
@@ -129,8 +130,21 @@ def whatsapp_webhook_receive(request):
         # Get agent
         agent = get_agent()
         
-        # Handle with agent (auto-replies to customer)
-        result = agent.handle_webhook(payload)
+        # Drop provider redeliveries before the agent runs RAG/LLM calls
+        incoming = agent.whatsapp.parse_incoming_webhook(payload)
+        message_id = incoming.message_id if incoming else None
+        if not claim_message_id(message_id, source='smart_agent'):
+            return JsonResponse({"success": True, "duplicate": True, "message_id": message_id}, status=200)
+        
+        # Handle with agent (auto-replies to customer); a failed or crashed
+        # run releases the claim so the provider's redelivery is processed
+        try:
+            result = agent.handle_webhook(payload)
+        except Exception:
+            release_message_id(message_id)
+            raise
+        if not result.get('success'):
+            release_message_id(message_id)
         
         logger.info(f"Webhook processed: {result}")
         
@@ -236,7 +250,8 @@ def send_bulk_whatsapp_messages(request):
             {"phone": "919876543211", "name": "Priya"}
         ],
         "message": "Hi {name}! 🏔️ Special Everest trek offer!",
-        "delay_between_messages": 3
+        "delay_between_messages": 3,
+        "resume": false  // true: finish an interrupted run, skipping customers already sent
     }
     
     Returns:
@@ -265,6 +280,7 @@ def send_bulk_whatsapp_messages(request):
         customers = payload.get('customers', [])
         message = payload.get('message', '')
         delay = payload.get('delay_between_messages', 3)
+        resume = bool(payload.get('resume', False))
         
         if not customers or not message:
             return JsonResponse({
@@ -277,7 +293,8 @@ def send_bulk_whatsapp_messages(request):
         results = agent.auto_reply_campaign(
             customers=customers,
             message_template=message,
-            delay_between_messages=delay
+            delay_between_messages=delay,
+            resume=resume
         )
         
         success_count = sum(1 for r in results if r.get('status') == 'sent')
@@ -361,6 +378,7 @@ def whatsapp_health_check(request):
             "mode": agent.mode,
             "whatsapp_provider": agent.whatsapp.provider,
             "rag_available": agent.services_ready,
+            "dedup": get_dedup_stats(),
             "timestamp": str(__import__('datetime').datetime.now())
         }, status=200)
     
@@ -32,6 +32,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'travel_dashboard.settings')
 django.setup()
 
+from ml_models.model_bundle import save_bundle, load_bundle, scaler_to_arrays, arrays_to_scaler
 from core.models import Lead, LeadEvent, Booking, Trip, UserProfile
 from django.utils import timezone
 from django.db.models import Count, Q, Avg, Max, Min
@@ -40,14 +41,18 @@ from django.db.models import Count, Q, Avg, Max, Min
 class LeadScoringModel:
     """Machine Learning model for predicting lead conversion probability"""
 
+    BUNDLE_NAME = 'lead_scoring'
+
     def __init__(self):
         self.model = None
         self.scaler = None
         self.label_encoders = {}
         self.feature_columns = []
-        self.model_path = 'ml_models/lead_scoring_model.pkl'
-        self.scaler_path = 'ml_models/scaler.pkl'
-        self.encoders_path = 'ml_models/label_encoders.pkl'
+        # Pre-bundle artifacts, read only while no bundle has been published
+        legacy_dir = os.path.dirname(os.path.abspath(__file__))
+        self.legacy_model_path = os.path.join(legacy_dir, 'lead_scoring_model.pkl')
+        self.legacy_scaler_path = os.path.join(legacy_dir, 'scaler.pkl')
+        self.legacy_encoders_path = os.path.join(legacy_dir, 'label_encoders.pkl')
 
     def collect_training_data(self, days_back=180):
         """
@@ -385,39 +390,63 @@ class LeadScoringModel:
         return score
 
     def save_model(self):
-        """Save model and preprocessing objects"""
+        """Save model and preprocessing objects as a single versioned artifact bundle"""
         print("💾 Saving model...")
 
-        os.makedirs('ml_models', exist_ok=True)
-
-        joblib.dump(self.model, self.model_path)
-        joblib.dump(self.scaler, self.scaler_path)
-
-        # Save label encoders
-        with open(self.encoders_path, 'w') as f:
-            encoders_dict = {k: v.classes_.tolist() for k, v in self.label_encoders.items()}
-            json.dump(encoders_dict, f)
+        version = save_bundle(
+            self.BUNDLE_NAME,
+            scaler_to_arrays('scaler', self.scaler) if self.scaler is not None else {},
+            metadata={
+                'feature_columns': list(self.feature_columns),
+                'label_encoders': {k: v.classes_.tolist() for k, v in self.label_encoders.items()},
+            },
+            objects={'model': self.model},
+        )
 
-        print("✅ Model saved successfully")
+        print(f"✅ Model saved successfully (version {version})")
 
     def load_model(self):
-        """Load saved model"""
+        """Load the published model bundle (read-only: falls back to the legacy files, never writes)"""
+        bundle = load_bundle(self.BUNDLE_NAME, mmap_mode=None)
+        if bundle is None:
+            return self.load_legacy_model()
+
+        self.model = bundle.objects['model']
+        self.scaler = arrays_to_scaler(bundle.arrays, 'scaler')
+        self.feature_columns = bundle.metadata.get('feature_columns', [])
+        for col, classes in bundle.metadata.get('label_encoders', {}).items():
+            self.label_encoders[col] = LabelEncoder()
+            self.label_encoders[col].classes_ = np.array(classes)
+
+        print(f"✅ Model loaded successfully (version {bundle.version})")
+        return True
+
+    def load_legacy_model(self):
+        """Load the pre-bundle loose files"""
         try:
-            self.model = joblib.load(self.model_path)
-            self.scaler = joblib.load(self.scaler_path)
+            self.model = joblib.load(self.legacy_model_path)
+            self.scaler = joblib.load(self.legacy_scaler_path)
 
-            with open(self.encoders_path, 'r') as f:
+            with open(self.legacy_encoders_path, 'r') as f:
                 encoders_dict = json.load(f)
                 for col, classes in encoders_dict.items():
                     self.label_encoders[col] = LabelEncoder()
                     self.label_encoders[col].classes_ = np.array(classes)
-
-            print("✅ Model loaded successfully")
-            return True
         except FileNotFoundError:
             print("❌ No saved model found")
             return False
 
+        print("✅ Legacy model files loaded (publish them with: python manage.py train_lead_scoring --from-legacy)")
+        return True
+
+    def migrate_legacy_model(self):
+        """Republish the pre-bundle loose files as a bundle (deploy/train time, not in requests)"""
+        if not self.load_legacy_model():
+            return False
+        self.save_model()
+        print("✅ Legacy model files migrated to a model bundle")
+        return True
+
     def retrain_model(self):
         """Retrain model with latest data"""
         print("🔄 Retraining model with latest data...")
@@ -0,0 +1,232 @@
+"""
+Versioned Model Artifact Bundles
+================================
+
+A bundle is one directory per trained model version holding:
+- ``manifest.json``: bundle name, version, creation time, array index and
+  free-form JSON metadata (watermarks, feature columns, ...)
+- one ``.npy`` file per NumPy array, loadable with ``mmap_mode`` so every
+  worker process shares the same pages instead of unpickling its own copy
+- optional ``.joblib`` files for estimators that have no array form
+
+Layout::
+
+    ml_models/artifacts/<name>/CURRENT         -> name of the live version
+    ml_models/artifacts/<name>/<version>/...   -> complete, immutable bundle
+
+A bundle is written to a staging directory, renamed into place and only
+then published by atomically replacing ``CURRENT``, so readers always see
+either the previous or the new version, never a half-written one.
+"""
+
+import os
+import json
+import shutil
+import uuid
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+import numpy as np
+import joblib
+from scipy import sparse
+from sklearn.preprocessing import StandardScaler
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'artifacts')
+MANIFEST_FILE = 'manifest.json'
+CURRENT_FILE = 'CURRENT'
+
+
+@dataclass
+class ModelBundle:
+    """A loaded bundle: arrays (possibly memory-mapped), objects and metadata"""
+    name: str
+    version: str
+    path: str
+    manifest: dict
+    arrays: dict = field(default_factory=dict)
+    objects: dict = field(default_factory=dict)
+
+    @property
+    def metadata(self):
+        return self.manifest.get('metadata', {})
+
+
+def _bundle_root(name, root=None):
+    return os.path.join(root or ARTIFACT_ROOT, name)
+
+
+def _fsync_file(path):
+    with open(path, 'rb') as f:
+        os.fsync(f.fileno())
+
+
+def sparse_to_arrays(prefix, matrix):
+    """Flatten a CSR matrix into plain arrays for storage in a bundle"""
+    matrix = matrix.tocsr()
+    return {
+        f'{prefix}_data': matrix.data,
+        f'{prefix}_indices': matrix.indices,
+        f'{prefix}_indptr': matrix.indptr,
+        f'{prefix}_shape': np.asarray(matrix.shape, dtype=np.int64),
+    }
+
+
+def arrays_to_sparse(arrays, prefix):
+    """Rebuild a CSR matrix from bundle arrays without copying them"""
+    shape = tuple(int(dim) for dim in arrays[f'{prefix}_shape'])
+    return sparse.csr_matrix(
+        (arrays[f'{prefix}_data'], arrays[f'{prefix}_indices'], arrays[f'{prefix}_indptr']),
+        shape=shape,
+        copy=False,
+    )
+
+
+def scaler_to_arrays(prefix, scaler):
+    """Flatten a fitted StandardScaler into plain arrays for storage in a bundle"""
+    arrays = {
+        f'{prefix}_mean': scaler.mean_,
+        f'{prefix}_scale': scaler.scale_,
+        f'{prefix}_var': scaler.var_,
+        f'{prefix}_n_samples_seen': np.asarray(scaler.n_samples_seen_),
+    }
+    if hasattr(scaler, 'feature_names_in_'):
+        arrays[f'{prefix}_feature_names'] = np.asarray(scaler.feature_names_in_, dtype=str)
+    return arrays
+
+
+def arrays_to_scaler(arrays, prefix):
+    """Rebuild a fitted StandardScaler from bundle arrays, or None if absent"""
+    if f'{prefix}_mean' not in arrays:
+        return None
+    scaler = StandardScaler()
+    scaler.mean_ = np.asarray(arrays[f'{prefix}_mean'])
+    scaler.scale_ = np.asarray(arrays[f'{prefix}_scale'])
+    scaler.var_ = np.asarray(arrays[f'{prefix}_var'])
+    n_samples_seen = np.asarray(arrays[f'{prefix}_n_samples_seen'])
+    scaler.n_samples_seen_ = n_samples_seen.item() if n_samples_seen.ndim == 0 else n_samples_seen
+    scaler.n_features_in_ = scaler.mean_.shape[0]
+    if f'{prefix}_feature_names' in arrays:
+        scaler.feature_names_in_ = np.asarray(arrays[f'{prefix}_feature_names'], dtype=object)
+    return scaler
+
+
+def current_version(name, root=None):
+    """Version currently published for a bundle, or None if none exists"""
+    try:
+        with open(os.path.join(_bundle_root(name, root), CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def save_bundle(name, arrays, metadata=None, objects=None, keep=2, root=None):
+    """
+    Write and atomically publish a new bundle version
+
+    ``arrays`` maps names to NumPy arrays (object dtypes are rejected so no
+    array ever needs unpickling); ``metadata`` must be JSON-serialisable;
+    ``objects`` are dumped with joblib. Returns the new version string.
+    Only the ``keep`` most recent versions are retained on disk.
+    """
+    bundle_root = _bundle_root(name, root)
+    os.makedirs(bundle_root, exist_ok=True)
+
+    version = f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')}-{uuid.uuid4().hex[:8]}"
+    staging = os.path.join(bundle_root, f'.staging-{version}')
+    os.makedirs(staging)
+
+    try:
+        array_index = {}
+        for array_name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            filename = f'{array_name}.npy'
+            np.save(os.path.join(staging, filename), array, allow_pickle=False)
+            _fsync_file(os.path.join(staging, filename))
+            array_index[array_name] = {
+                'file': filename,
+                'dtype': array.dtype.str,
+                'shape': list(array.shape),
+            }
+
+        object_index = {}
+        for object_name, obj in (objects or {}).items():
+            filename = f'{object_name}.joblib'
+            joblib.dump(obj, os.path.join(staging, filename))
+            _fsync_file(os.path.join(staging, filename))
+            object_index[object_name] = {'file': filename}
+
+        manifest = {
+            'name': name,
+            'version': version,
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'arrays': array_index,
+            'objects': object_index,
+            'metadata': metadata or {},
+        }
+        with open(os.path.join(staging, MANIFEST_FILE), 'w') as f:
+            json.dump(manifest, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.rename(staging, os.path.join(bundle_root, version))
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    # Publish: readers switch to the new version in a single rename
+    pointer_tmp = os.path.join(bundle_root, f'.{CURRENT_FILE}-{version}')
+    with open(pointer_tmp, 'w') as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(pointer_tmp, os.path.join(bundle_root, CURRENT_FILE))
+
+    _prune_versions(bundle_root, version, keep)
+    return version
+
+
+def _prune_versions(bundle_root, current, keep):
+    """Remove superseded versions, keeping the newest ``keep`` (incl. current)"""
+    versions = sorted(
+        entry for entry in os.listdir(bundle_root)
+        if not entry.startswith('.') and entry != CURRENT_FILE
+        and os.path.isdir(os.path.join(bundle_root, entry))
+    )
+    for version in versions[:-keep] if keep > 0 else versions:
+        if version == current:
+            continue
+        try:
+            shutil.rmtree(os.path.join(bundle_root, version))
+        except OSError as e:
+            # Another process may still have the files mapped (Windows)
+            logger.warning(f"Could not remove old model bundle {version}: {e}")
+
+
+def load_bundle(name, mmap_mode='r', root=None):
+    """
+    Load the published version of a bundle, or None if there is none
+
+    Arrays are memory-mapped read-only by default; pass ``mmap_mode=None``
+    to read them fully into memory.
+    """
+    version = current_version(name, root)
+    if version is None:
+        return None
+
+    path = os.path.join(_bundle_root(name, root), version)
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+
+    arrays = {}
+    for array_name, entry in manifest['arrays'].items():
+        # Empty files cannot be memory-mapped
+        array_mode = mmap_mode if all(entry['shape']) else None
+        arrays[array_name] = np.load(os.path.join(path, entry['file']), mmap_mode=array_mode, allow_pickle=False)
+    objects = {
+        object_name: joblib.load(os.path.join(path, entry['file']))
+        for object_name, entry in manifest.get('objects', {}).items()
+    }
+    return ModelBundle(name=name, version=version, path=path, manifest=manifest, arrays=arrays, objects=objects)
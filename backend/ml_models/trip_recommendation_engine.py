@@ -20,116 +20,126 @@ import sys
 import django
 import pandas as pd
 import numpy as np
+from scipy import sparse
 from datetime import datetime, timedelta
 from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.preprocessing import StandardScaler, MultiLabelBinarizer
+from sklearn.preprocessing import StandardScaler, MultiLabelBinarizer, normalize
 from sklearn.decomposition import TruncatedSVD
-import joblib
 import json
-from collections import defaultdict
 import logging
+import threading
 
 # Setup Django
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'travel_dashboard.settings')
 django.setup()
 
+from ml_models.model_bundle import (
+    save_bundle, load_bundle, current_version, sparse_to_arrays, arrays_to_sparse,
+    scaler_to_arrays, arrays_to_scaler,
+)
 from core.models import Trip, User, Booking, TripHistory, Wishlist, Review, Lead
 from django.utils import timezone
-from django.db.models import Count, Q, Avg, Case, When, IntegerField
+from django.db.models import Count, Q, Avg, Max, Case, When, IntegerField
 from django.contrib.auth.models import User as DjangoUser
 
 logger = logging.getLogger(__name__)
 
+# One row per raw interaction; timestamps are UTC epoch seconds
+INTERACTION_DTYPE = np.dtype([
+    ('user_id', np.int64),
+    ('trip_id', np.int64),
+    ('weight', np.float32),
+    ('timestamp', np.int64),
+])
+
+SECONDS_PER_DAY = 86400
+EPOCH_ORDINAL = datetime(1970, 1, 1).toordinal()
+
 
 class TripRecommendationEngine:
-    """Hybrid trip recommendation system"""
+    """Hybrid trip recommendation system
+
+    The user-item matrix is a sparse CSR matrix (users × trips) indexed by
+    position; ``user_ids``/``trip_ids`` map positions back to database ids and
+    ``user_index``/``trip_index`` map ids to positions. User-user similarity
+    is never materialised: neighbours are found on the fly from the
+    row-normalised matrix, so memory scales with interactions, not users².
+
+    Alongside the recency-weighted matrix the model keeps each pair's raw
+    weight sum and latest timestamp (``pair_weight_matrix`` /
+    ``pair_timestamp_matrix``), so an incremental run re-aggregates old and
+    new interactions exactly as a full retrain would.
+    """
+
+    MODEL_FORMAT_VERSION = 4
+    BUNDLE_NAME = 'trip_recommendation'
 
     def __init__(self):
         self.user_item_matrix = None
+        self.pair_weight_matrix = None
+        self.pair_timestamp_matrix = None
+        self.normalized_user_matrix = None
         self.trip_features_matrix = None
-        self.user_similarity_matrix = None
         self.trip_similarity_matrix = None
+        self.trip_user_matrix = None
+        self.rated_matrix = None
+        self.item_neighbourhood = None
+        self.item_neighbour_similarity = None
+        self.user_ids = np.array([])
+        self.trip_ids = np.array([])
+        self.user_index = {}
+        self.trip_index = {}
+        self.n_neighbors = 10
+        self.chunk_size = 2000
+        self.watermark = {}
+        self.reference_timestamp = None
+        self.live_user_vectors = {}
         self.scaler = None
         self.feature_columns = []
-        self.model_path = 'ml_models/recommendation_engine.pkl'
-        self.matrix_path = 'ml_models/user_item_matrix.pkl'
-        self.features_path = 'ml_models/trip_features.pkl'
+        self.bundle_version = None
+        self.placeholder_ids = False
 
-    def collect_training_data(self):
+    def collect_training_data(self, since=None, previous=None):
         """
         Collect user-trip interaction data for training
+
+        Each interaction source is read with a single ``values_list()`` query
+        streamed through ``iterator()`` into a NumPy table. ``since`` is a
+        watermark dict (source -> last primary key seen) as stored in
+        ``self.watermark``; when given, only newer rows are pulled.
+        ``previous`` holds the earlier run's per-pair raw weights and latest
+        timestamps, which are aggregated together with the new rows.
         """
         print("🔍 Collecting user-trip interaction data...")
 
-        # Get all users with interactions
-        users = DjangoUser.objects.all()
-        trips = Trip.objects.all()
+        since = since or {}
+        previous_reference = self.reference_timestamp if since else None
+        self.watermark = dict(since)
+        self.placeholder_ids = False
 
-        # Create user-item interaction matrix
-        interactions = []
+        interactions = self.collect_interactions(since=since)
 
-        for user in users:
-            # Bookings (strong positive signal)
-            bookings = Booking.objects.filter(user=user).select_related('trip')
-            for booking in bookings:
-                interactions.append({
-                    'user_id': user.id,
-                    'trip_id': booking.trip.id,
-                    'interaction_type': 'booking',
-                    'weight': 5.0,  # Highest weight
-                    'timestamp': booking.created_at
-                })
-
-            # Wishlist (medium positive signal)
-            wishlists = Wishlist.objects.filter(user=user).select_related('trip')
-            for wishlist in wishlists:
-                interactions.append({
-                    'user_id': user.id,
-                    'trip_id': wishlist.trip.id,
-                    'interaction_type': 'wishlist',
-                    'weight': 3.0,
-                    'timestamp': wishlist.created_at
-                })
-
-            # Reviews (positive/negative signal)
-            reviews = Review.objects.filter(user=user).select_related('trip')
-            for review in reviews:
-                sentiment_weight = (review.rating - 3) * 0.5  # -1.5 to +1.5
-                interactions.append({
-                    'user_id': user.id,
-                    'trip_id': review.trip.id,
-                    'interaction_type': 'review',
-                    'weight': 2.0 + sentiment_weight,  # 0.5 to 3.5
-                    'timestamp': review.created_at
-                })
-
-            # Trip views (weak positive signal) - from TripHistory
-            trip_histories = TripHistory.objects.filter(user=user)
-            for history in trip_histories:
-                # Try to match by destination (approximate)
-                matching_trips = Trip.objects.filter(
-                    Q(location__icontains=history.destination) |
-                    Q(name__icontains=history.destination)
-                )
-                for trip in matching_trips:
-                    interactions.append({
-                        'user_id': user.id,
-                        'trip_id': trip.id,
-                        'interaction_type': 'view',
-                        'weight': 1.0,
-                        'timestamp': history.date  # Approximate
-                    })
-
-        # Convert to DataFrame
-        df = pd.DataFrame(interactions)
-
-        if df.empty:
+        if interactions.size == 0 and not since:
             print("⚠️ No interaction data found, generating synthetic data...")
             df = self.generate_synthetic_interactions()
+        else:
+            df = pd.DataFrame(interactions)
+        if previous is not None:
+            df = pd.concat([previous, df[['user_id', 'trip_id', 'weight', 'timestamp']]], ignore_index=True)
 
         print(f"📊 Collected {len(df)} interactions from {df['user_id'].nunique()} users and {df['trip_id'].nunique()} trips")
 
+        # Recency is measured against the newest interaction seen so far
+        max_timestamp = df['timestamp'].max() if not df.empty else previous_reference
+        if previous_reference is not None:
+            max_timestamp = max(max_timestamp, previous_reference)
+        self.reference_timestamp = int(max_timestamp) if max_timestamp is not None else None
+
+        return self.aggregate_interactions(df, max_timestamp)
+
+    def aggregate_interactions(self, df, reference_timestamp):
+        """Sum raw interactions per user-trip pair and apply recency weighting"""
         # Aggregate interactions by user-trip pairs
         interaction_matrix = df.groupby(['user_id', 'trip_id']).agg({
             'weight': 'sum',
@@ -137,13 +147,116 @@ class TripRecommendationEngine:
         }).reset_index()
 
         # Recency weighting (more recent interactions get higher weight)
-        max_timestamp = interaction_matrix['timestamp'].max()
-        interaction_matrix['days_since'] = (max_timestamp - interaction_matrix['timestamp']).dt.days
+        interaction_matrix['days_since'] = ((reference_timestamp - interaction_matrix['timestamp']) // SECONDS_PER_DAY).clip(lower=0)
         interaction_matrix['recency_weight'] = np.exp(-interaction_matrix['days_since'] / 30)  # 30-day half-life
         interaction_matrix['final_weight'] = interaction_matrix['weight'] * interaction_matrix['recency_weight']
 
         return interaction_matrix
 
+    def collect_interactions(self, since=None, user_id=None):
+        """
+        Read every interaction source into one ``INTERACTION_DTYPE`` array
+
+        ``user_id`` restricts collection to a single user (used for on-demand
+        refreshes) and leaves the training watermark untouched.
+        """
+        track = user_id is None
+
+        def scoped(queryset):
+            return queryset if user_id is None else queryset.filter(user_id=user_id)
+
+        # Bookings (strong positive signal)
+        bookings = self.stream_interactions(
+            'booking', scoped(Booking.objects.filter(trip__isnull=False)), since, track,
+            ('user_id', 'trip_id', 'created_at'),
+            lambda user_id, trip_id, created_at: ((user_id, trip_id, 5.0, created_at.timestamp()),)  # Highest weight
+        )
+
+        # Wishlist (medium positive signal)
+        wishlists = self.stream_interactions(
+            'wishlist', scoped(Wishlist.objects.all()), since, track,
+            ('user_id', 'trip_id', 'created_at'),
+            lambda user_id, trip_id, created_at: ((user_id, trip_id, 3.0, created_at.timestamp()),)
+        )
+
+        # Reviews (positive/negative signal)
+        # sentiment weight -1.5 to +1.5, final weight 0.5 to 3.5
+        reviews = self.stream_interactions(
+            'review', scoped(Review.objects.all()), since, track,
+            ('user_id', 'trip_id', 'rating', 'created_at'),
+            lambda user_id, trip_id, rating, created_at: (
+                (user_id, trip_id, 2.0 + (rating - 3) * 0.5, created_at.timestamp()),
+            )
+        )
+
+        # Trip views (weak positive signal) - from TripHistory
+        # Try to match by destination (approximate); each distinct destination
+        # is matched once against the trip catalogue instead of one query per row
+        trip_catalogue = []
+        destination_matches = {}
+
+        def match_destination(destination):
+            if not trip_catalogue:
+                trip_catalogue.extend(
+                    (trip_id, (name or '').lower(), (location or '').lower())
+                    for trip_id, name, location in Trip.objects.values_list('id', 'name', 'location')
+                )
+            key = (destination or '').lower()
+            if key not in destination_matches:
+                destination_matches[key] = [
+                    trip_id for trip_id, name, location in trip_catalogue
+                    if key in location or key in name
+                ]
+            return destination_matches[key]
+
+        views = self.stream_interactions(
+            'trip_history', scoped(TripHistory.objects.all()), since, track,
+            ('user_id', 'destination', 'date'),
+            lambda user_id, destination, date: [
+                (user_id, trip_id, 1.0, (date.toordinal() - EPOCH_ORDINAL) * SECONDS_PER_DAY)  # Approximate
+                for trip_id in match_destination(destination)
+            ]
+        )
+
+        return np.concatenate([bookings, wishlists, reviews, views])
+
+    def stream_interactions(self, source, queryset, since, track, fields, to_rows):
+        """
+        Stream one interaction source into an ``INTERACTION_DTYPE`` array
+
+        When ``track`` is set, rows are bounded by the source's current max
+        primary key, which is recorded in ``self.watermark`` so the next
+        incremental run starts exactly where this one stopped.
+        """
+        since = since or {}
+        if track:
+            upper = queryset.aggregate(max_id=Max('id'))['max_id']
+            if upper is None:
+                return np.empty(0, dtype=INTERACTION_DTYPE)
+            queryset = queryset.filter(id__lte=upper)
+        if since.get(source):
+            queryset = queryset.filter(id__gt=since[source])
+
+        rows = queryset.values_list(*fields).iterator(chunk_size=self.chunk_size)
+        interactions = np.fromiter(
+            (interaction for row in rows for interaction in to_rows(*row)),
+            dtype=INTERACTION_DTYPE
+        )
+        if track:
+            self.watermark[source] = upper
+        return interactions
+
+    def interactions_from_matrix(self):
+        """Expand the stored pair aggregates back into (user_id, trip_id, weight, timestamp) rows"""
+        coo = self.pair_weight_matrix.tocoo()
+        timestamps = np.asarray(self.pair_timestamp_matrix[coo.row, coo.col]).ravel()
+        return pd.DataFrame({
+            'user_id': self.user_ids[coo.row],
+            'trip_id': self.trip_ids[coo.col],
+            'weight': coo.data,
+            'timestamp': timestamps.astype(np.int64),
+        })
+
     def generate_synthetic_interactions(self, n_interactions=1000):
         """Generate synthetic user-trip interactions for testing"""
         print("🎭 Generating synthetic interaction data...")
@@ -151,6 +264,8 @@ class TripRecommendationEngine:
         users = list(DjangoUser.objects.values_list('id', flat=True))
         trips = list(Trip.objects.values_list('id', flat=True))
 
+        # Placeholder ids are not database ids: such a model is never published
+        self.placeholder_ids = not users or not trips
         if not users:
             users = [f'user_{i}' for i in range(50)]
         if not trips:
@@ -182,7 +297,7 @@ class TripRecommendationEngine:
 
             # Random timestamp in last 6 months
             days_ago = np.random.randint(0, 180)
-            timestamp = timezone.now() - timedelta(days=days_ago)
+            timestamp = (timezone.now() - timedelta(days=int(days_ago))).timestamp()
 
             interactions.append({
                 'user_id': user_id,
@@ -195,23 +310,45 @@ class TripRecommendationEngine:
         return pd.DataFrame(interactions)
 
     def build_user_item_matrix(self, interactions_df):
-        """Build user-item interaction matrix"""
+        """Build sparse user-item interaction matrix"""
         print("🔢 Building user-item interaction matrix...")
 
-        # Create pivot table
-        user_item_matrix = interactions_df.pivot_table(
-            index='user_id',
-            columns='trip_id',
-            values='final_weight',
-            aggfunc='sum',
-            fill_value=0
-        )
+        user_codes, user_ids = pd.factorize(interactions_df['user_id'], sort=True)
+
+        if self.trip_index:
+            # Align columns with the trip features matrix, dropping unknown trips
+            trip_codes = interactions_df['trip_id'].map(self.trip_index).to_numpy()
+            known = ~pd.isna(trip_codes)
+            user_codes = user_codes[known]
+            trip_codes = trip_codes[known].astype(np.int64)
+            trip_ids = self.trip_ids
+        else:
+            trip_codes, trip_ids = pd.factorize(interactions_df['trip_id'], sort=True)
+            known = slice(None)
+            trip_ids = np.asarray(trip_ids)
+            self.trip_ids = trip_ids
+            self.trip_index = {trip_id: idx for idx, trip_id in enumerate(trip_ids.tolist())}
+
+        # Duplicate (user, trip) pairs are summed when converting to CSR
+        shape = (len(user_ids), len(trip_ids))
+
+        def pair_matrix(column, dtype):
+            values = interactions_df[column].to_numpy()[known].astype(dtype)
+            return sparse.coo_matrix((values, (user_codes, trip_codes)), shape=shape).tocsr()
+
+        user_item_matrix = pair_matrix('final_weight', np.float32)
+        user_item_matrix.eliminate_zeros()
+        self.pair_weight_matrix = pair_matrix('weight', np.float64)
+        self.pair_timestamp_matrix = pair_matrix('timestamp', np.float64)
 
         # Normalize by user (optional - helps with different activity levels)
-        # user_item_matrix = user_item_matrix.div(user_item_matrix.sum(axis=1), axis=0)
+        # user_item_matrix = normalize(user_item_matrix, norm='l1', axis=1)
 
+        self.user_ids = np.asarray(user_ids)
+        self.user_index = {user_id: idx for idx, user_id in enumerate(self.user_ids.tolist())}
         self.user_item_matrix = user_item_matrix
-        print(f"📊 User-item matrix: {user_item_matrix.shape[0]} users × {user_item_matrix.shape[1]} trips")
+        print(f"📊 User-item matrix: {user_item_matrix.shape[0]} users × {user_item_matrix.shape[1]} trips "
+              f"({user_item_matrix.nnz} interactions)")
 
         return user_item_matrix
 
@@ -279,6 +416,12 @@ class TripRecommendationEngine:
 
             features_list.append(features)
 
+        if not features_list:
+            self.trip_features_matrix = np.empty((0, 0))
+            self.feature_columns = []
+            print("⚠️ No trips found, skipping trip features matrix")
+            return self.trip_features_matrix
+
         features_df = pd.DataFrame(features_list)
         features_df.set_index('trip_id', inplace=True)
 
@@ -290,12 +433,15 @@ class TripRecommendationEngine:
         else:
             features_df[numerical_cols] = self.scaler.transform(features_df[numerical_cols])
 
-        self.trip_features_matrix = features_df
+        # Rows of the features matrix define the trip axis of every other matrix
+        self.trip_ids = features_df.index.to_numpy()
+        self.trip_index = {trip_id: idx for idx, trip_id in enumerate(self.trip_ids.tolist())}
+        self.trip_features_matrix = features_df.to_numpy(dtype=np.float64)
         self.feature_columns = features_df.columns.tolist()
 
         print(f"🏔️ Trip features matrix: {features_df.shape[0]} trips × {features_df.shape[1]} features")
 
-        return features_df
+        return self.trip_features_matrix
 
     def extract_duration_days(self, duration_str):
         """Extract number of days from duration string"""
@@ -315,138 +461,238 @@ class TripRecommendationEngine:
         return 3  # Default fallback
 
     def compute_similarities(self):
-        """Compute user-user and trip-trip similarity matrices"""
+        """Prepare user neighbour lookups and compute the trip-trip similarity matrix"""
         print("🔗 Computing similarity matrices...")
 
-        # User-user similarity (collaborative filtering)
-        if self.user_item_matrix.shape[0] > 1:
-            self.user_similarity_matrix = cosine_similarity(self.user_item_matrix)
-            self.user_similarity_matrix = pd.DataFrame(
-                self.user_similarity_matrix,
-                index=self.user_item_matrix.index,
-                columns=self.user_item_matrix.index
-            )
-        else:
-            self.user_similarity_matrix = pd.DataFrame()
-
-        # Trip-trip similarity (content-based + collaborative)
-        if self.trip_features_matrix.shape[0] > 1:
-            # Content-based similarity
-            content_similarity = cosine_similarity(self.trip_features_matrix)
-
-            # Collaborative similarity (if we have interaction data)
-            if self.user_item_matrix.shape[1] > 1:
-                collab_similarity = cosine_similarity(self.user_item_matrix.T)
-                # Combine content and collaborative similarity
-                self.trip_similarity_matrix = 0.7 * content_similarity + 0.3 * collab_similarity
+        # User-user similarity (collaborative filtering) is computed on the fly
+        # from L2-normalised rows; only the normalised sparse matrix is kept.
+        self.normalized_user_matrix = normalize(self.user_item_matrix, norm='l2', axis=1).tocsr()
+
+        # Trip-trip similarity (content-based + collaborative), n_trips × n_trips
+        n_trips = len(self.trip_ids)
+        has_content = self.trip_features_matrix is not None and self.trip_features_matrix.shape[0] == n_trips
+
+        if n_trips > 1:
+            collab_similarity = cosine_similarity(self.user_item_matrix.T) if self.user_item_matrix.nnz else None
+            if has_content:
+                # Content-based similarity
+                content_similarity = cosine_similarity(self.trip_features_matrix)
+                if collab_similarity is not None:
+                    # Combine content and collaborative similarity
+                    self.trip_similarity_matrix = 0.7 * content_similarity + 0.3 * collab_similarity
+                else:
+                    self.trip_similarity_matrix = content_similarity
+            elif collab_similarity is not None:
+                self.trip_similarity_matrix = collab_similarity
             else:
-                self.trip_similarity_matrix = content_similarity
-
-            self.trip_similarity_matrix = pd.DataFrame(
-                self.trip_similarity_matrix,
-                index=self.trip_features_matrix.index,
-                columns=self.trip_features_matrix.index
-            )
+                self.trip_similarity_matrix = np.empty((0, 0))
         else:
-            self.trip_similarity_matrix = pd.DataFrame()
+            self.trip_similarity_matrix = np.empty((0, 0))
 
+        self.prepare_scoring()
         print("✅ Similarity matrices computed")
 
-    def get_user_based_recommendations(self, user_id, n_recommendations=5):
-        """Get user-based collaborative filtering recommendations"""
-        if self.user_similarity_matrix.empty or user_id not in self.user_similarity_matrix.index:
-            return []
-
-        # Find similar users
-        user_similarities = self.user_similarity_matrix.loc[user_id].sort_values(ascending=False)
-        similar_users = user_similarities.head(10).index.tolist()  # Top 10 similar users
-
-        # Get trips liked by similar users
-        user_trips = set()
-        if user_id in self.user_item_matrix.index:
-            user_trips = set(self.user_item_matrix.loc[user_id][self.user_item_matrix.loc[user_id] > 0].index)
-
-        recommendations = defaultdict(float)
-
-        for similar_user in similar_users:
-            if similar_user == user_id:
-                continue
-
-            similarity_score = user_similarities[similar_user]
-            user_ratings = self.user_item_matrix.loc[similar_user]
-
-            for trip_id, rating in user_ratings.items():
-                if rating > 0 and trip_id not in user_trips:
-                    recommendations[trip_id] += similarity_score * rating
-
-        # Sort and return top recommendations
-        sorted_recommendations = sorted(recommendations.items(), key=lambda x: x[1], reverse=True)
-        return [trip_id for trip_id, score in sorted_recommendations[:n_recommendations]]
-
-    def get_item_based_recommendations(self, user_id, n_recommendations=5):
-        """Get item-based collaborative filtering recommendations"""
-        if user_id not in self.user_item_matrix.index or self.trip_similarity_matrix.empty:
-            return []
-
-        # Get user's liked trips
-        user_ratings = self.user_item_matrix.loc[user_id]
-        liked_trips = user_ratings[user_ratings > 2].index.tolist()  # Trips with rating > 2
-
-        if not liked_trips:
-            return []
-
-        recommendations = defaultdict(float)
-
-        for liked_trip in liked_trips:
-            if liked_trip in self.trip_similarity_matrix.index:
-                similar_trips = self.trip_similarity_matrix.loc[liked_trip].sort_values(ascending=False)
-                user_rating = user_ratings[liked_trip]
-
-                for similar_trip, similarity in similar_trips.head(10).items():
-                    if similar_trip not in user_ratings.index or user_ratings[similar_trip] == 0:
-                        recommendations[similar_trip] += similarity * user_rating
-
-        # Sort and return top recommendations
-        sorted_recommendations = sorted(recommendations.items(), key=lambda x: x[1], reverse=True)
-        return [trip_id for trip_id, score in sorted_recommendations[:n_recommendations]]
-
-    def get_content_based_recommendations(self, user_id, n_recommendations=5):
-        """Get content-based recommendations"""
-        if user_id not in self.user_item_matrix.index or self.trip_features_matrix.empty:
-            return []
+    def prepare_scoring(self, transpose=True):
+        """Derive the structures shared by every scoring call from the trained matrices"""
+        # Trips × users view of the normalised rows for on-the-fly cosine similarity
+        if transpose:
+            self.trip_user_matrix = self.normalized_user_matrix.T.tocsr()
+
+        # Binary "has rated" matrix for neighbour candidate masks (shares the index arrays)
+        self.rated_matrix = sparse.csr_matrix(
+            (
+                (self.user_item_matrix.data > 0).astype(np.float64),
+                self.user_item_matrix.indices,
+                self.user_item_matrix.indptr,
+            ),
+            shape=self.user_item_matrix.shape,
+            copy=False,
+        )
 
-        # Get user's preferred trip characteristics
-        user_ratings = self.user_item_matrix.loc[user_id]
-        liked_trips = user_ratings[user_ratings > 2].index.tolist()
+        # Each trip's 10 most similar trips, for item-based scoring
+        if self.trip_similarity_matrix is not None and self.trip_similarity_matrix.size:
+            n_trips = self.trip_similarity_matrix.shape[0]
+            top_similar = np.argsort(-self.trip_similarity_matrix, axis=1, kind='stable')[:, :10]
+            self.item_neighbourhood = np.zeros((n_trips, n_trips), dtype=bool)
+            np.put_along_axis(self.item_neighbourhood, top_similar, True, axis=1)
+            self.item_neighbour_similarity = np.where(self.item_neighbourhood, self.trip_similarity_matrix, 0.0)
+        else:
+            self.item_neighbourhood = None
+            self.item_neighbour_similarity = None
+
+    def trip_ids_at(self, trip_indices):
+        """Map trip positions back to database ids as plain Python values"""
+        return self.trip_ids[np.asarray(trip_indices, dtype=np.int64)].tolist()
+
+    def get_user_vector(self, user_id):
+        """Dense trip-indexed rating vector for a user, preferring live interactions when loaded"""
+        if user_id in self.live_user_vectors:
+            return self.live_user_vectors[user_id]
+        user_idx = self.user_index.get(user_id)
+        if user_idx is None:
+            return None
+        return self.user_item_matrix[user_idx].toarray().ravel()
+
+    def load_live_user_vector(self, user_id):
+        """Rebuild a user's rating vector from their current interactions (a few indexed queries)"""
+        interactions = self.collect_interactions(user_id=user_id)
+        vector = np.zeros(len(self.trip_ids))
+        if interactions.size:
+            reference = self.reference_timestamp or int(timezone.now().timestamp())
+            aggregated = self.aggregate_interactions(pd.DataFrame(interactions), reference)
+            trip_positions = aggregated['trip_id'].map(self.trip_index)
+            known = trip_positions.notna().to_numpy()
+            np.add.at(vector, trip_positions[known].astype(np.int64).to_numpy(), aggregated['final_weight'].to_numpy()[known])
+        self.live_user_vectors[user_id] = vector
+        return vector
+
+    def get_user_vectors(self, user_ids):
+        """
+        Stack rating vectors for a batch of users
 
-        if not liked_trips:
-            return []
+        Returns (vectors users × trips, matrix positions or -1, known mask).
+        Live vectors loaded by ``load_live_user_vector`` take precedence.
+        """
+        vectors = np.zeros((len(user_ids), len(self.trip_ids)))
+        positions = np.full(len(user_ids), -1, dtype=np.int64)
+        known = np.zeros(len(user_ids), dtype=bool)
+
+        from_matrix = []
+        for row, user_id in enumerate(user_ids):
+            user_idx = self.user_index.get(user_id)
+            if user_idx is not None:
+                positions[row] = user_idx
+                known[row] = True
+            if user_id in self.live_user_vectors:
+                vectors[row] = self.live_user_vectors[user_id]
+                known[row] = True
+            elif user_idx is not None:
+                from_matrix.append(row)
+
+        if from_matrix:
+            vectors[from_matrix] = self.user_item_matrix[positions[from_matrix]].toarray()
+
+        return vectors, positions, known
+
+    def score_user_based(self, vectors, positions):
+        """
+        User-based scores: top-k neighbour similarity rows × interaction matrix
 
-        # Average features of liked trips
-        liked_features = self.trip_features_matrix.loc[liked_trips]
-        user_profile = liked_features.mean()
+        Neighbours are the k users with the highest positive cosine
+        similarity. Returns (scores, candidates), both users × trips;
+        candidates are trips rated by at least one neighbour and not yet
+        rated by the user.
+        """
+        n_batch, n_users = vectors.shape[0], self.normalized_user_matrix.shape[0]
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        queries = sparse.csr_matrix(np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0))
+
+        # Only users sharing at least one trip get a non-zero similarity
+        similarities = (queries @ self.trip_user_matrix).tocsr()
+
+        neighbour_rows, neighbours, neighbour_scores = [], [], []
+        for row in range(n_batch):
+            start, end = similarities.indptr[row], similarities.indptr[row + 1]
+            users, scores = similarities.indices[start:end], similarities.data[start:end]
+            keep = (users != positions[row]) & (scores > 0)
+            users, scores = users[keep], scores[keep]
+            if users.size > self.n_neighbors:
+                top = np.argpartition(-scores, self.n_neighbors - 1)[:self.n_neighbors]
+                users, scores = users[top], scores[top]
+            neighbour_rows.append(np.full(users.size, row))
+            neighbours.append(users)
+            neighbour_scores.append(scores)
+
+        neighbour_rows = np.concatenate(neighbour_rows) if neighbour_rows else np.empty(0, dtype=np.int64)
+        neighbours = np.concatenate(neighbours) if neighbours else np.empty(0, dtype=np.int64)
+        neighbour_scores = np.concatenate(neighbour_scores) if neighbour_scores else np.empty(0)
+
+        weights = sparse.csr_matrix((neighbour_scores, (neighbour_rows, neighbours)), shape=(n_batch, n_users))
+        links = sparse.csr_matrix(
+            (np.ones(neighbours.size), (neighbour_rows, neighbours)), shape=(n_batch, n_users)
+        )
 
-        # Find trips similar to user profile
-        all_trip_features = self.trip_features_matrix.copy()
-        user_trips = user_ratings[user_ratings > 0].index
-        all_trip_features = all_trip_features.drop(user_trips, errors='ignore')
+        scores = (weights @ self.user_item_matrix).toarray()
+        candidates = ((links @ self.rated_matrix).toarray() > 0) & (vectors <= 0)
+        return scores, candidates
 
-        if all_trip_features.empty:
-            return []
+    def score_item_based(self, vectors):
+        """
+        Item-based scores: liked-trip rows of the top-10 item similarity matrix,
+        weighted by the user's rating of each liked trip (rating > 2)
+        """
+        if self.item_neighbourhood is None:
+            return np.zeros_like(vectors), np.zeros(vectors.shape, dtype=bool)
+
+        liked = vectors > 2
+        scores = np.where(liked, vectors, 0.0) @ self.item_neighbour_similarity
+        candidates = ((liked.astype(np.float64) @ self.item_neighbourhood) > 0) & (vectors == 0)
+        return scores, candidates
+
+    def score_content_based(self, vectors):
+        """Content-based scores: cosine similarity of each trip to the mean profile of liked trips"""
+        if self.trip_features_matrix is None or self.trip_features_matrix.shape[0] != len(self.trip_ids):
+            return np.zeros_like(vectors), np.zeros(vectors.shape, dtype=bool)
+
+        liked = (vectors > 2).astype(np.float64)
+        liked_counts = liked.sum(axis=1, keepdims=True)
+        profiles = np.divide(liked @ self.trip_features_matrix, liked_counts,
+                             out=np.zeros((vectors.shape[0], self.trip_features_matrix.shape[1])),
+                             where=liked_counts > 0)
+
+        scores = cosine_similarity(profiles, self.trip_features_matrix)
+        candidates = (vectors <= 0) & (liked_counts > 0)
+        return scores, candidates
+
+    @staticmethod
+    def rank_trips(scores, candidates, limit, reverse_ties=False):
+        """
+        Top ``limit`` candidate trip positions per row, best first
 
-        # Compute similarity to user profile
-        similarities = cosine_similarity([user_profile], all_trip_features)[0]
-        similar_indices = np.argsort(similarities)[::-1]
+        Returns (order, valid) where ``valid`` marks real candidates (rows
+        with fewer candidates than ``limit`` are padded). ``reverse_ties``
+        orders equal scores by descending position instead of ascending.
+        """
+        masked = np.where(candidates, scores, -np.inf)
+        if reverse_ties:
+            order = np.argsort(masked, axis=1, kind='stable')[:, ::-1][:, :limit]
+        else:
+            order = np.argsort(-masked, axis=1, kind='stable')[:, :limit]
+        return order, np.take_along_axis(candidates, order, axis=1)
 
-        recommendations = []
-        for idx in similar_indices[:n_recommendations]:
-            trip_id = all_trip_features.index[idx]
-            recommendations.append(trip_id)
+    def fuse_rankings(self, rankings, weights, n_recommendations):
+        """
+        Weighted reciprocal-rank fusion of several (order, valid) rankings
 
-        return recommendations
+        Equal fused scores keep the order in which trips were first seen,
+        method by method.
+        """
+        n_batch, n_trips = rankings[0][0].shape[0], len(self.trip_ids)
+        fused = np.zeros((n_batch, n_trips))
+        first_seen = np.full((n_batch, n_trips), np.iinfo(np.int64).max)
+        rows = np.arange(n_batch)[:, np.newaxis]
+
+        offset = 0
+        for (order, valid), weight in zip(rankings, weights):
+            ranks = np.broadcast_to(np.arange(order.shape[1]), order.shape)
+            row_idx = np.broadcast_to(rows, order.shape)[valid]
+            col_idx = order[valid]
+            fused[row_idx, col_idx] += weight / (ranks[valid] + 1)
+            first_seen[row_idx, col_idx] = np.minimum(first_seen[row_idx, col_idx], offset + ranks[valid])
+            offset += order.shape[1]
+
+        order = np.lexsort((first_seen, -fused), axis=1)[:, :n_recommendations]
+        valid = np.take_along_axis(first_seen, order, axis=1) < np.iinfo(np.int64).max
+        return order, valid
+
+    def score_users(self, user_ids, n_recommendations=5, weights=None, max_cells=4_000_000):
+        """
+        Hybrid recommendations for many users at once
 
-    def get_hybrid_recommendations(self, user_id, n_recommendations=5, weights=None):
-        """Get hybrid recommendations combining multiple approaches"""
+        Users are scored in chunks sized so the batch × users similarity
+        block stays under ``max_cells`` even when every user overlaps.
+        Users without history get [].
+        """
         if weights is None:
             weights = {
                 'user_based': 0.3,
@@ -454,28 +700,64 @@ class TripRecommendationEngine:
                 'content_based': 0.4
             }
 
-        # Get recommendations from each method
-        user_based = self.get_user_based_recommendations(user_id, n_recommendations * 2)
-        item_based = self.get_item_based_recommendations(user_id, n_recommendations * 2)
-        content_based = self.get_content_based_recommendations(user_id, n_recommendations * 2)
+        n_users = max(self.normalized_user_matrix.shape[0], 1)
+        chunk_size = max(1, max_cells // n_users)
+        results = []
+
+        for start in range(0, len(user_ids), chunk_size):
+            chunk = user_ids[start:start + chunk_size]
+            vectors, positions, known = self.get_user_vectors(chunk)
+            candidates_per_method = n_recommendations * 2
+
+            user_scores, user_candidates = self.score_user_based(vectors, positions)
+            item_scores, item_candidates = self.score_item_based(vectors)
+            content_scores, content_candidates = self.score_content_based(vectors)
+
+            order, valid = self.fuse_rankings(
+                [
+                    self.rank_trips(user_scores, user_candidates, candidates_per_method),
+                    self.rank_trips(item_scores, item_candidates, candidates_per_method),
+                    self.rank_trips(content_scores, content_candidates, candidates_per_method, reverse_ties=True),
+                ],
+                [weights['user_based'], weights['item_based'], weights['content_based']],
+                n_recommendations
+            )
+            valid &= known[:, np.newaxis]
+            results.extend(self.trip_ids_at(row[mask]) for row, mask in zip(order, valid))
 
-        # Combine with weights
-        recommendation_scores = defaultdict(float)
+        return results
 
-        for i, trip_id in enumerate(user_based):
-            recommendation_scores[trip_id] += weights['user_based'] * (1 / (i + 1))
+    def _single_user_ranking(self, user_id, scorer, n_recommendations, reverse_ties=False):
+        """Rank one user's trips with a batch scorer; [] for unknown users"""
+        vectors, positions, known = self.get_user_vectors([user_id])
+        if not known[0]:
+            return []
+        scores, candidates = scorer(vectors, positions)
+        order, valid = self.rank_trips(scores, candidates, n_recommendations, reverse_ties=reverse_ties)
+        return self.trip_ids_at(order[0][valid[0]])
 
-        for i, trip_id in enumerate(item_based):
-            recommendation_scores[trip_id] += weights['item_based'] * (1 / (i + 1))
+    def get_user_based_recommendations(self, user_id, n_recommendations=5):
+        """Get user-based collaborative filtering recommendations"""
+        if self.normalized_user_matrix is None:
+            return []
+        return self._single_user_ranking(user_id, self.score_user_based, n_recommendations)
 
-        for i, trip_id in enumerate(content_based):
-            recommendation_scores[trip_id] += weights['content_based'] * (1 / (i + 1))
+    def get_item_based_recommendations(self, user_id, n_recommendations=5):
+        """Get item-based collaborative filtering recommendations"""
+        return self._single_user_ranking(
+            user_id, lambda vectors, positions: self.score_item_based(vectors), n_recommendations
+        )
 
-        # Sort by combined score
-        sorted_recommendations = sorted(recommendation_scores.items(), key=lambda x: x[1], reverse=True)
+    def get_content_based_recommendations(self, user_id, n_recommendations=5):
+        """Get content-based recommendations"""
+        return self._single_user_ranking(
+            user_id, lambda vectors, positions: self.score_content_based(vectors), n_recommendations,
+            reverse_ties=True
+        )
 
-        # Return top recommendations
-        return [trip_id for trip_id, score in sorted_recommendations[:n_recommendations]]
+    def get_hybrid_recommendations(self, user_id, n_recommendations=5, weights=None):
+        """Get hybrid recommendations combining multiple approaches"""
+        return self.score_users([user_id], n_recommendations, weights)[0]
 
     def get_cold_start_recommendations(self, user_preferences=None, n_recommendations=5):
         """Recommendations for new users without interaction history"""
@@ -486,12 +768,39 @@ class TripRecommendationEngine:
 
         return [trip.id for trip in popular_trips]
 
+    def finalize_recommendations(self, recommendations, n_recommendations=5,
+                                 valid_trip_ids=None, popular_trip_ids=None):
+        """
+        Drop unknown trips and fill up with popular ones
+
+        Batch callers pass ``valid_trip_ids`` (set) and ``popular_trip_ids``
+        (list, most popular first) so the catalogue is queried once per batch
+        instead of twice per user.
+        """
+        # Ensure we have valid trip IDs
+        if valid_trip_ids is None:
+            valid_trip_ids = set(Trip.objects.filter(id__in=recommendations).values_list('id', flat=True))
+        recommendations = [trip_id for trip_id in recommendations if trip_id in valid_trip_ids]
+
+        # Fill with popular trips if needed
+        if len(recommendations) < n_recommendations:
+            if popular_trip_ids is None:
+                popular_trip_ids = [
+                    trip.id for trip in Trip.objects.exclude(id__in=recommendations).annotate(
+                        booking_count=Count('bookings')
+                    ).order_by('-booking_count')[:n_recommendations - len(recommendations)]
+                ]
+            chosen = set(recommendations)
+            recommendations.extend(trip_id for trip_id in popular_trip_ids if trip_id not in chosen)
+
+        return recommendations[:n_recommendations]
+
     def get_personalized_recommendations(self, user_id, user_preferences=None, n_recommendations=5):
         """Main recommendation method with fallback handling"""
         try:
             # Check if user has interaction history
-            has_history = (user_id in self.user_item_matrix.index and
-                          self.user_item_matrix.loc[user_id].sum() > 0)
+            user_vector = self.get_user_vector(user_id)
+            has_history = user_vector is not None and user_vector.sum() > 0
 
             if has_history:
                 # Use hybrid recommendations
@@ -500,19 +809,7 @@ class TripRecommendationEngine:
                 # Cold start recommendations
                 recommendations = self.get_cold_start_recommendations(user_preferences, n_recommendations)
 
-            # Ensure we have valid trip IDs
-            valid_trips = Trip.objects.filter(id__in=recommendations).values_list('id', flat=True)
-            recommendations = [trip_id for trip_id in recommendations if trip_id in valid_trips]
-
-            # Fill with popular trips if needed
-            if len(recommendations) < n_recommendations:
-                popular_trips = Trip.objects.exclude(id__in=recommendations).annotate(
-                    booking_count=Count('bookings')
-                ).order_by('-booking_count')[:n_recommendations - len(recommendations)]
-
-                recommendations.extend([trip.id for trip in popular_trips])
-
-            return recommendations[:n_recommendations]
+            return self.finalize_recommendations(recommendations, n_recommendations)
 
         except Exception as e:
             logger.error(f"Error getting recommendations for user {user_id}: {str(e)}")
@@ -523,16 +820,93 @@ class TripRecommendationEngine:
 
             return [trip.id for trip in popular_trips]
 
-    def train_model(self):
-        """Train the recommendation engine"""
+    def get_batch_recommendations(self, user_ids, n_recommendations=5):
+        """Personalized recommendations for many users with two catalogue queries in total"""
+        valid_trip_ids = set(Trip.objects.values_list('id', flat=True))
+        # Enough popular trips to fill any list after excluding its own entries
+        popular_trip_ids = self.get_cold_start_recommendations(n_recommendations=n_recommendations * 2)
+
+        # Users without history score [] and are filled with popular trips
+        hybrid = self.score_users(list(user_ids), n_recommendations)
+
+        return {
+            user_id: self.finalize_recommendations(
+                recommendations, n_recommendations,
+                valid_trip_ids=valid_trip_ids,
+                popular_trip_ids=popular_trip_ids,
+            )
+            for user_id, recommendations in zip(user_ids, hybrid)
+        }
+
+    def precompute_recommendations(self, user_ids=None, n_recommendations=5, batch_size=1000):
+        """
+        Precompute and cache recommendations for active users
+
+        Active users are the users present in the trained matrix; everyone
+        else is served popular trips and cached on first request.
+        """
+        from core.services import store_user_recommendations
+
+        if user_ids is None:
+            user_ids = self.user_ids.tolist()
+        # Synthetic training ids are strings and have no User row
+        user_ids = [user_id for user_id in user_ids if isinstance(user_id, int)]
+
+        print(f"🗂️ Precomputing recommendations for {len(user_ids)} users...")
+
+        stored = 0
+        for start in range(0, len(user_ids), batch_size):
+            chunk = user_ids[start:start + batch_size]
+            existing = set(DjangoUser.objects.filter(id__in=chunk).values_list('id', flat=True))
+            recommendations = self.get_batch_recommendations(
+                [user_id for user_id in chunk if user_id in existing], n_recommendations
+            )
+            stored += store_user_recommendations(recommendations)
+
+        print(f"✅ Cached recommendations for {stored} users")
+        return stored
+
+    def refresh_user_recommendations(self, user_id, user_preferences=None, n_recommendations=5):
+        """Recompute one user's recommendations from their live interactions and cache them"""
+        from core.services import store_user_recommendations
+
+        self.load_live_user_vector(user_id)
+        try:
+            recommendations = self.get_personalized_recommendations(
+                user_id, user_preferences=user_preferences, n_recommendations=n_recommendations
+            )
+        finally:
+            # The result is cached; don't grow a long-lived (shared) engine
+            self.live_user_vectors.pop(user_id, None)
+        if DjangoUser.objects.filter(id=user_id).exists():
+            store_user_recommendations({user_id: recommendations}, source='on_demand')
+        return recommendations
+
+    def train_model(self, incremental=False):
+        """
+        Train the recommendation engine
+
+        With ``incremental=True`` and a loaded model, only interactions newer
+        than the stored watermark are collected and aggregated with the stored
+        per-pair weight sums and latest timestamps, so the matrix matches a
+        full retrain (up to float rounding) as long as no earlier interaction
+        was edited or deleted since the last run.
+        """
         print("🤖 Training Trip Recommendation Engine...")
 
-        # Collect training data
-        interactions_df = self.collect_training_data()
+        previous_df = None
+        since = None
+        if incremental and self.watermark and self.pair_weight_matrix is not None:
+            previous_df = self.interactions_from_matrix()
+            since = dict(self.watermark)
+            print(f"⏩ Incremental training since watermark {since}")
 
-        # Build matrices
-        self.build_user_item_matrix(interactions_df)
+        # Collect training data (merged with the stored pair aggregates when incremental)
+        interactions_df = self.collect_training_data(since=since, previous=previous_df)
+
+        # Build matrices (trip features first: they define the trip axis)
         self.build_trip_features_matrix()
+        self.build_user_item_matrix(interactions_df)
 
         # Compute similarities
         self.compute_similarities()
@@ -540,53 +914,114 @@ class TripRecommendationEngine:
         print("✅ Recommendation engine trained successfully")
 
     def save_model(self):
-        """Save model and matrices"""
-        print("💾 Saving recommendation engine...")
-
-        os.makedirs('ml_models', exist_ok=True)
+        """Save model and matrices as a single versioned artifact bundle; returns the version"""
+        if self.placeholder_ids:
+            print("⚠️ Trained on placeholder users/trips (none in the database yet), not publishing")
+            return None
 
-        # Save matrices
-        joblib.dump(self.user_item_matrix, self.matrix_path)
-        joblib.dump(self.trip_features_matrix, self.features_path)
+        print("💾 Saving recommendation engine...")
 
-        # Save similarity matrices
-        joblib.dump({
-            'user_similarity': self.user_similarity_matrix,
+        arrays = {
+            'user_ids': np.asarray(self.user_ids, dtype=np.int64),
+            'trip_ids': np.asarray(self.trip_ids, dtype=np.int64),
+            'trip_features': self.trip_features_matrix,
             'trip_similarity': self.trip_similarity_matrix,
-            'scaler': self.scaler,
-            'feature_columns': self.feature_columns
-        }, self.model_path)
+        }
+        # Derived matrices are stored too so loading needs no recomputation
+        arrays.update(sparse_to_arrays('user_item', self.user_item_matrix))
+        arrays.update(sparse_to_arrays('pair_weight', self.pair_weight_matrix))
+        arrays.update(sparse_to_arrays('pair_timestamp', self.pair_timestamp_matrix))
+        arrays.update(sparse_to_arrays('normalized_user', self.normalized_user_matrix))
+        arrays.update(sparse_to_arrays('trip_user', self.trip_user_matrix))
+        if self.scaler is not None:
+            arrays.update(scaler_to_arrays('scaler', self.scaler))
+
+        self.bundle_version = save_bundle(
+            self.BUNDLE_NAME,
+            arrays,
+            metadata={
+                'format_version': self.MODEL_FORMAT_VERSION,
+                'watermark': {source: int(pk) for source, pk in self.watermark.items()},
+                'reference_timestamp': int(self.reference_timestamp) if self.reference_timestamp is not None else None,
+                'feature_columns': list(self.feature_columns),
+            },
+        )
 
-        print("✅ Recommendation engine saved")
+        print(f"✅ Recommendation engine saved (version {self.bundle_version})")
+        return self.bundle_version
 
-    def load_model(self):
-        """Load saved model"""
-        try:
-            # Load matrices
-            self.user_item_matrix = joblib.load(self.matrix_path)
-            self.trip_features_matrix = joblib.load(self.features_path)
-
-            # Load model components
-            model_data = joblib.load(self.model_path)
-            self.user_similarity_matrix = model_data['user_similarity']
-            self.trip_similarity_matrix = model_data['trip_similarity']
-            self.scaler = model_data['scaler']
-            self.feature_columns = model_data['feature_columns']
-
-            print("✅ Recommendation engine loaded")
-            return True
-        except FileNotFoundError:
+    def load_model(self, mmap_mode='r'):
+        """
+        Load the published model bundle
+
+        Arrays are memory-mapped read-only by default, so processes serving
+        the same version share one copy through the page cache.
+        """
+        bundle = load_bundle(self.BUNDLE_NAME, mmap_mode=mmap_mode)
+        if bundle is None:
             print("❌ No saved recommendation engine found")
             return False
+        if bundle.metadata.get('format_version') != self.MODEL_FORMAT_VERSION:
+            print("❌ Saved recommendation engine uses an outdated format, retrain required")
+            return False
 
-    def retrain_model(self):
+        arrays = bundle.arrays
+        self.user_ids = arrays['user_ids']
+        self.trip_ids = arrays['trip_ids']
+        self.user_index = {user_id: idx for idx, user_id in enumerate(self.user_ids.tolist())}
+        self.trip_index = {trip_id: idx for idx, trip_id in enumerate(self.trip_ids.tolist())}
+        self.trip_features_matrix = arrays['trip_features']
+        self.trip_similarity_matrix = arrays['trip_similarity']
+        self.user_item_matrix = arrays_to_sparse(arrays, 'user_item')
+        self.pair_weight_matrix = arrays_to_sparse(arrays, 'pair_weight')
+        self.pair_timestamp_matrix = arrays_to_sparse(arrays, 'pair_timestamp')
+        self.normalized_user_matrix = arrays_to_sparse(arrays, 'normalized_user')
+        self.trip_user_matrix = arrays_to_sparse(arrays, 'trip_user')
+        self.scaler = arrays_to_scaler(arrays, 'scaler')
+        self.watermark = bundle.metadata.get('watermark', {})
+        self.reference_timestamp = bundle.metadata.get('reference_timestamp')
+        self.feature_columns = bundle.metadata.get('feature_columns', [])
+        self.prepare_scoring(transpose=False)
+        self.bundle_version = bundle.version
+
+        print(f"✅ Recommendation engine loaded (version {bundle.version})")
+        return True
+
+    def retrain_model(self, incremental=False):
         """Retrain the recommendation engine with latest data"""
         print("🔄 Retraining recommendation engine...")
-        self.train_model()
-        self.save_model()
+        if incremental:
+            self.load_model()
+        self.train_model(incremental=incremental)
+        if self.save_model():
+            self.precompute_recommendations()
         print("✅ Recommendation engine retrained")
 
 
+_shared_engine = None
+_shared_engine_lock = threading.Lock()
+
+
+def get_shared_engine():
+    """
+    Process-wide engine for serving, or None if no model is published
+
+    The engine is loaded once per process and reloaded only when a newer
+    bundle version has been published by a retrain.
+    """
+    global _shared_engine
+    version = current_version(TripRecommendationEngine.BUNDLE_NAME)
+    if version is None:
+        return None
+    with _shared_engine_lock:
+        if _shared_engine is None or _shared_engine.bundle_version != version:
+            engine = TripRecommendationEngine()
+            if not engine.load_model():
+                return None
+            _shared_engine = engine
+        return _shared_engine
+
+
 def main():
     """Main function to train and save the recommendation engine"""
     print("🚀 Starting Trip Recommendation Engine Training")
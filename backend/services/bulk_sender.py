@@ -0,0 +1,242 @@
+"""
+Rate-Limited Concurrent Bulk Sender
+===================================
+
+Shared engine behind every WhatsApp bulk path (CustomWhatsAppProvider.send_bulk,
+CustomWhatsAppService.send_bulk_messages, WhatsAppAPI.send_bulk_messages and
+SmartWhatsAppAgent.auto_reply_campaign).
+
+- TokenBucket: thread-safe rate limiter (messages/second with a burst)
+- BulkSender: sends on a bounded thread pool, each send waits for a token,
+  failed recipients are retried with backoff, results keep input order.
+  A send whose retry is already queued on the delayed-retry queue is
+  'pending': it is not retried here and a resumed run skips it, since the
+  queued retry delivers it (or reports it) on its own
+- BulkSendCheckpoint: per-recipient progress of a job in the shared Django
+  cache (Redis in production, so any container can resume it); each record
+  expires WHATSAPP_BULK_CHECKPOINT_TTL_HOURS after it is written. A run records
+  progress always but skips recipients only when asked to resume; otherwise
+  it starts the job afresh, so sending the same message to the same list
+  again later reaches everyone
+
+Usage:
+    sender = BulkSender(
+        send=lambda phone: provider.send_message(phone, text),
+        is_success=lambda response: response.success,
+        rate_per_second=5,
+        checkpoint=BulkSendCheckpoint(bulk_job_id('provider', text, phones)),
+        resume=resume,
+    )
+    responses = sender.run(phones)
+"""
+
+import os
+import json
+import time
+import random
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_TTL_SECONDS = int(float(os.getenv('WHATSAPP_BULK_CHECKPOINT_TTL_HOURS', '24')) * 3600)
+DEFAULT_MAX_WORKERS = int(os.getenv('WHATSAPP_BULK_MAX_WORKERS', '8'))
+
+
+def rate_from_delay(delay_seconds: float) -> Optional[float]:
+    """Translate the legacy 'delay between messages' into a send rate (None = unlimited)"""
+    return 1.0 / delay_seconds if delay_seconds and delay_seconds > 0 else None
+
+
+def bulk_job_id(prefix: str, message: str, recipients: List[Any]) -> str:
+    """Deterministic job id: resuming the same campaign finds the same checkpoint"""
+    digest = hashlib.sha1()
+    digest.update(message.encode('utf-8'))
+    for recipient in recipients:
+        digest.update(b'\0')
+        digest.update(json.dumps(recipient, sort_keys=True, default=str).encode('utf-8'))
+    return f"{prefix}_{digest.hexdigest()[:16]}"
+
+
+class TokenBucket:
+    """Thread-safe token bucket: ``rate`` tokens per second, bursts of up to ``capacity``"""
+
+    def __init__(self, rate: Optional[float], capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        """Block until ``tokens`` are available, then take them"""
+        if not self.rate:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class BulkSendCheckpoint:
+    """
+    Per-recipient state of one bulk job, kept in the Django cache for ``ttl`` seconds
+
+    States are 'sent', 'pending' (a queued retry owns the send) and 'failed'.
+    """
+
+    def __init__(self, job_id: str, ttl: int = CHECKPOINT_TTL_SECONDS, cache_alias: str = 'default'):
+        self.job_id = job_id
+        self.ttl = ttl
+        self.cache_alias = cache_alias
+
+    @property
+    def cache(self):
+        from django.core.cache import caches
+        return caches[self.cache_alias]
+
+    def _key(self, index: int) -> str:
+        return f"whatsapp_bulk:{self.job_id}:{index}"
+
+    def load(self, total: int) -> Dict[int, Dict]:
+        """Record per recipient position, for the positions still within the TTL"""
+        keys = {self._key(index): index for index in range(total)}
+        return {keys[key]: record for key, record in self.cache.get_many(list(keys)).items()}
+
+    def record(self, index: int, state: str, data: Dict):
+        self.cache.set(self._key(index), {'index': index, 'state': state, **data}, self.ttl)
+
+    def clear(self, total: int):
+        self.cache.delete_many([self._key(index) for index in range(total)])
+
+
+class BulkSender:
+    """
+    Send one message per recipient on a bounded thread pool under a shared rate limit
+
+    Args:
+        send: callable(recipient) -> result
+        is_success: callable(result) -> bool
+        is_pending: callable(result) -> bool; True when a queued retry now owns the send
+        rate_per_second: sustained send rate across all workers (None = unlimited)
+        burst: sends allowed back-to-back before the rate applies
+        max_workers: concurrent in-flight sends
+        max_retries: extra attempts per failed recipient (exponential backoff)
+        checkpoint: BulkSendCheckpoint to record progress into
+        resume: skip recipients the checkpoint has as sent or pending; otherwise
+            the checkpoint is cleared and every recipient is sent again
+        to_record / from_record: serialise a result into the checkpoint and back
+        on_exception: callable(recipient, exc) -> result for sends that raised
+        should_retry: callable(result) -> bool; False for permanent failures
+    """
+
+    def __init__(
+        self,
+        send: Callable[[Any], Any],
+        is_success: Callable[[Any], bool],
+        is_pending: Callable[[Any], bool] = lambda result: False,
+        rate_per_second: Optional[float] = None,
+        burst: float = 1.0,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        max_retries: int = 2,
+        retry_backoff: float = 1.0,
+        checkpoint: Optional[BulkSendCheckpoint] = None,
+        resume: bool = False,
+        to_record: Callable[[Any], Dict] = lambda result: {},
+        from_record: Callable[[Dict], Any] = lambda record: record,
+        on_exception: Optional[Callable[[Any, Exception], Any]] = None,
+        should_retry: Callable[[Any], bool] = lambda result: True,
+        progress_every: int = 50,
+    ):
+        self.send = send
+        self.is_success = is_success
+        self.is_pending = is_pending
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.max_workers = max(1, max_workers)
+        self.max_retries = max(0, max_retries)
+        self.retry_backoff = retry_backoff
+        self.checkpoint = checkpoint
+        self.resume = resume
+        self.to_record = to_record
+        self.from_record = from_record
+        self.on_exception = on_exception
+        self.should_retry = should_retry
+        self.progress_every = progress_every
+        self._done = 0
+        self._done_lock = threading.Lock()
+
+    def _send_one(self, recipient):
+        result = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                # Exponential backoff with jitter before retrying this recipient
+                time.sleep(self.retry_backoff * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5))
+            self.bucket.acquire()
+            try:
+                result = self.send(recipient)
+            except Exception as e:
+                logger.warning(f"Bulk send to {recipient} raised (attempt {attempt + 1}): {e}")
+                if self.on_exception is None:
+                    raise
+                result = self.on_exception(recipient, e)
+            if self.is_success(result) or self.is_pending(result) or not self.should_retry(result):
+                break
+        return result
+
+    def _state(self, result) -> str:
+        if self.is_success(result):
+            return 'sent'
+        return 'pending' if self.is_pending(result) else 'failed'
+
+    def _run_one(self, index, recipient, total):
+        result = self._send_one(recipient)
+        if self.checkpoint is not None:
+            self.checkpoint.record(index, self._state(result), self.to_record(result))
+        with self._done_lock:
+            self._done += 1
+            if self._done % self.progress_every == 0 or self._done == total:
+                logger.info(f"Bulk send progress: {self._done}/{total}")
+        return result
+
+    def run(self, recipients: List[Any]) -> List[Any]:
+        """Send to every recipient; returns results in the same order as ``recipients``"""
+        recipients = list(recipients)
+        results: List[Any] = [None] * len(recipients)
+
+        pending = list(range(len(recipients)))
+        if self.checkpoint is not None and not self.resume:
+            self.checkpoint.clear(len(recipients))
+        elif self.checkpoint is not None:
+            finished = self.checkpoint.load(len(recipients))
+            resumed = [i for i in pending if finished.get(i, {}).get('state') in ('sent', 'pending')]
+            for index in resumed:
+                results[index] = self.from_record(finished[index])
+            skipped = set(resumed)
+            pending = [i for i in pending if i not in skipped]
+            if resumed:
+                logger.info(f"Resuming bulk job {self.checkpoint.job_id}: {len(resumed)} already sent or in flight")
+
+        if pending:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(pending))) as pool:
+                futures = {
+                    index: pool.submit(self._run_one, index, recipients[index], len(pending))
+                    for index in pending
+                }
+                for index, future in futures.items():
+                    results[index] = future.result()
+
+        successful = sum(1 for result in results if self.is_success(result))
+        in_flight = sum(1 for result in results if not self.is_success(result) and self.is_pending(result))
+        logger.info(f"Bulk send complete: {successful}/{len(recipients)} successful, {in_flight} pending retry")
+
+        # The checkpoint is kept until its TTL, so resuming a finished job sends nothing twice
+        return results
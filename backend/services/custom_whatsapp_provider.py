@@ -41,12 +41,17 @@ import logging
 import hashlib
 import hmac
 import time
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 from datetime import datetime
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, fields
 from enum import Enum
 import requests
 
+from services.bulk_sender import (
+    BulkSender, BulkSendCheckpoint, DEFAULT_MAX_WORKERS, bulk_job_id, rate_from_delay
+)
+from services.retry_scheduler import backoff_delay, get_retry_queue, parse_retry_after
+
 logger = logging.getLogger(__name__)
 
 # ============================================================
@@ -122,7 +127,8 @@ class CustomWhatsAppProvider:
         - api_endpoint: Your backend API URL (required)
         - api_key: Authentication key for your API (required)
         - timeout: Request timeout in seconds (default: 30)
-        - retry_count: Number of retries on failure (default: 3)
+        - retry_count: Number of retries on failure (default: 3); retries run
+          later on the delayed-retry queue, the caller gets status "pending"
         - max_retries: Maximum retries for bulk operations (default: 5)
     
     Example:
@@ -150,7 +156,8 @@ class CustomWhatsAppProvider:
         timeout: int = 30,
         retry_count: int = 3,
         max_retries: int = 5,
-        webhook_secret: Optional[str] = None
+        webhook_secret: Optional[str] = None,
+        on_retry_result: Optional[Callable[[bool, Dict, Optional[Dict]], None]] = None
     ):
         """
         Initialize Custom WhatsApp Provider
@@ -162,6 +169,8 @@ class CustomWhatsAppProvider:
             retry_count: Number of retries for single messages
             max_retries: Maximum retries for bulk operations
             webhook_secret: Secret for webhook verification (env: CUSTOM_WHATSAPP_WEBHOOK_SECRET)
+            on_retry_result: Called as (success, response_data, payload) when a
+                queued retry finally succeeds or gives up
         """
         self.api_endpoint = api_endpoint or os.getenv(
             'CUSTOM_WHATSAPP_API_ENDPOINT',
@@ -181,6 +190,7 @@ class CustomWhatsAppProvider:
         self.timeout = timeout
         self.retry_count = retry_count
         self.max_retries = max_retries
+        self.on_retry_result = on_retry_result
         self.session = requests.Session()
         
         # Setup headers
@@ -259,6 +269,13 @@ class CustomWhatsAppProvider:
         """
         Make HTTP request to custom API endpoint
         
+        Never sleeps in the calling thread. When a write (POST/PUT) hits a
+        rate limit, server error, timeout or connection error, the retry is
+        handed to the delayed-retry queue (jittered exponential backoff, or
+        the server's Retry-After) and the call returns at once with
+        ``{"status": "pending", ...}``. Reads fail fast with a ``retry_after``
+        hint instead, since their caller needs the answer now.
+        
         Args:
             method: HTTP method (GET, POST, PUT, DELETE)
             endpoint: API endpoint path (relative to base URL)
@@ -301,19 +318,14 @@ class CustomWhatsAppProvider:
                 except ValueError:
                     return True, {"message": response.text}
             
-            elif response.status_code == 429 and retry < self.retry_count:
-                # Rate limited - retry with backoff
-                wait_time = (2 ** retry) + 1
-                logger.warning(f"Rate limited. Retrying in {wait_time}s...")
-                time.sleep(wait_time)
-                return self._make_request(method, endpoint, data, retry + 1)
-            
-            elif response.status_code >= 500 and retry < self.retry_count:
-                # Server error - retry
-                wait_time = (2 ** retry) + 1
-                logger.warning(f"Server error. Retrying in {wait_time}s...")
-                time.sleep(wait_time)
-                return self._make_request(method, endpoint, data, retry + 1)
+            elif response.status_code == 429 or response.status_code >= 500:
+                reason = "Rate limited" if response.status_code == 429 else "Server error"
+                return self._schedule_retry(
+                    method, endpoint, data, retry,
+                    error=f"API error {response.status_code}: {response.text}",
+                    reason=reason,
+                    retry_after=parse_retry_after(response.headers.get('Retry-After'))
+                )
             
             else:
                 error_msg = f"API error {response.status_code}: {response.text}"
@@ -321,22 +333,64 @@ class CustomWhatsAppProvider:
                 return False, {"error": error_msg}
         
         except requests.Timeout:
-            if retry < self.retry_count:
-                logger.warning(f"Timeout. Retrying...")
-                return self._make_request(method, endpoint, data, retry + 1)
-            return False, {"error": "Request timeout"}
+            return self._schedule_retry(method, endpoint, data, retry, error="Request timeout", reason="Timeout")
         
         except requests.ConnectionError as e:
-            if retry < self.retry_count:
-                logger.warning(f"Connection error. Retrying...")
-                time.sleep(2 ** retry)
-                return self._make_request(method, endpoint, data, retry + 1)
-            return False, {"error": f"Connection failed: {str(e)}"}
+            return self._schedule_retry(
+                method, endpoint, data, retry, error=f"Connection failed: {str(e)}", reason="Connection error"
+            )
         
         except Exception as e:
             logger.error(f"Request error: {str(e)}")
             return False, {"error": str(e)}
     
+    def _schedule_retry(
+        self,
+        method: str,
+        endpoint: str,
+        data: Optional[Dict],
+        retry: int,
+        error: str,
+        reason: str,
+        retry_after: Optional[float] = None
+    ) -> Tuple[bool, Dict]:
+        """Queue a retry of a failed request, or give up once retries are exhausted"""
+        delay = backoff_delay(retry, retry_after)
+        
+        if retry >= self.retry_count:
+            logger.error(f"{reason}, giving up after {retry} retries: {error}")
+            if retry:
+                self._notify_retry_result(False, {"error": error}, data)
+            return False, {"error": error}
+        
+        if method.upper() == 'GET':
+            logger.warning(f"{reason} on {endpoint}; not retrying read")
+            return False, {"error": error, "retry_after": round(delay, 2)}
+        
+        due = get_retry_queue().schedule(delay, self._run_retry, method, endpoint, data, retry + 1)
+        logger.warning(f"{reason}. Retry {retry + 1}/{self.retry_count} queued in {delay:.1f}s")
+        return False, {
+            "status": MessageStatus.PENDING.value,
+            "error": error,
+            "attempt": retry + 1,
+            "retry_at": datetime.fromtimestamp(due).isoformat()
+        }
+    
+    def _run_retry(self, method: str, endpoint: str, data: Optional[Dict], retry: int):
+        """Executed on the retry queue's pool when a queued retry falls due"""
+        success, response_data = self._make_request(method, endpoint, data, retry)
+        if success:
+            logger.info(f"Retry {retry} of {method} {endpoint} succeeded")
+            self._notify_retry_result(True, response_data, data)
+    
+    def _notify_retry_result(self, success: bool, response_data: Dict, payload: Optional[Dict]):
+        if self.on_retry_result is None:
+            return
+        try:
+            self.on_retry_result(success, response_data, payload)
+        except Exception as e:
+            logger.error(f"Retry result callback failed: {str(e)}")
+    
     # ============================================================
     # MESSAGE SENDING
     # ============================================================
@@ -420,11 +474,12 @@ class CustomWhatsAppProvider:
                     cost=response_data.get("cost")
                 )
             else:
+                # "pending" means a retry is queued with the same message_id
                 return MessageResponse(
                     success=False,
                     message_id=message_id,
                     phone_number=phone,
-                    status="failed",
+                    status=response_data.get("status", "failed"),
                     timestamp=datetime.now().isoformat(),
                     error=response_data.get("error", "Unknown error")
                 )
@@ -446,20 +501,32 @@ class CustomWhatsAppProvider:
         message_text: str,
         message_type: str = "text",
         media_url: Optional[str] = None,
-        delay_between_messages: int = 1
+        delay_between_messages: float = 1,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        max_retries: int = 2,
+        resume: bool = False
     ) -> List[MessageResponse]:
         """
         Send bulk messages to multiple recipients
         
+        Sends run concurrently on ``max_workers`` threads under a shared
+        token-bucket rate of one message per ``delay_between_messages``
+        seconds; failed recipients are retried and progress is checkpointed,
+        so calling again with ``resume=True`` finishes a crashed run.
+        
         Args:
             phone_numbers: List of phone numbers
             message_text: Message to send to all (max 4096 chars)
             message_type: "text", "image", etc.
             media_url: Media URL if applicable
-            delay_between_messages: Seconds to wait between messages (recommended: 1-2)
+            delay_between_messages: Seconds per message across all workers (recommended: 1-2)
+            max_workers: Concurrent in-flight sends
+            max_retries: Extra attempts per failed recipient
+            resume: Skip recipients already sent by a previous run of this job
+                (default: send to everyone)
         
         Returns:
-            List of MessageResponse objects
+            List of MessageResponse objects (same order as phone_numbers)
         
         Example:
             phones = ["919876543210", "919876543211", "919876543212"]
@@ -471,31 +538,26 @@ class CustomWhatsAppProvider:
             successful = sum(1 for r in responses if r.success)
             print(f"Sent {successful}/{len(phones)} messages")
         """
-        responses = []
-        
-        for idx, phone in enumerate(phone_numbers):
-            # Send message
-            response = self.send_message(
+        sender = BulkSender(
+            send=lambda phone: self.send_message(
                 phone_number=phone,
                 message_text=message_text,
                 message_type=message_type,
                 media_url=media_url
-            )
-            responses.append(response)
-            
-            # Log progress
-            if (idx + 1) % 10 == 0:
-                logger.info(f"Bulk send progress: {idx + 1}/{len(phone_numbers)}")
-            
-            # Add delay between messages (except after last)
-            if idx < len(phone_numbers) - 1 and delay_between_messages > 0:
-                time.sleep(delay_between_messages)
-        
-        # Log summary
-        successful = sum(1 for r in responses if r.success)
-        logger.info(f"Bulk send complete: {successful}/{len(phone_numbers)} successful")
-        
-        return responses
+            ),
+            is_success=lambda response: response.success,
+            # A pending response already has a retry queued; sending again would duplicate it
+            is_pending=lambda response: response.status == MessageStatus.PENDING.value,
+            should_retry=lambda response: response.error != "Invalid phone number format",
+            rate_per_second=rate_from_delay(delay_between_messages),
+            max_workers=max_workers,
+            max_retries=max_retries,
+            checkpoint=BulkSendCheckpoint(bulk_job_id("provider", message_text, phone_numbers)),
+            resume=resume,
+            to_record=lambda response: response.to_dict(),
+            from_record=lambda record: MessageResponse(**{f.name: record.get(f.name) for f in fields(MessageResponse)}),
+        )
+        return sender.run(phone_numbers)
     
     # ============================================================
     # WEBHOOK HANDLING
@@ -16,9 +16,13 @@ import requests
 import logging
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict, fields
 from enum import Enum
 
+from services.bulk_sender import (
+    BulkSender, BulkSendCheckpoint, DEFAULT_MAX_WORKERS, bulk_job_id, rate_from_delay
+)
+
 logger = logging.getLogger(__name__)
 
 # ============================================================
@@ -234,18 +238,28 @@ class CustomWhatsAppService:
         self,
         phone_numbers: List[str],
         message_text: str,
-        delay_between_messages: int = 2
+        delay_between_messages: float = 2,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        resume: bool = False
     ) -> List[MessageResponse]:
         """
         Send bulk messages to multiple numbers
         
+        Uses the shared rate-limited concurrent sender: one message per
+        ``delay_between_messages`` seconds across ``max_workers`` threads,
+        per-recipient retry, and a checkpoint so a rerun with ``resume=True``
+        finishes a crashed run.
+        
         Args:
             phone_numbers: List of phone numbers
             message_text: Message to send to all
-            delay_between_messages: Seconds to wait between messages
+            delay_between_messages: Seconds per message across all workers
+            max_workers: Concurrent in-flight sends
+            resume: Skip recipients already sent by a previous run of this job
+                (default: send to everyone)
         
         Returns:
-            List of MessageResponse objects
+            List of MessageResponse objects (same order as phone_numbers)
         
         Example:
             responses = service.send_bulk_messages(
@@ -258,23 +272,21 @@ class CustomWhatsAppService:
             for response in responses:
                 print(f"{response.message_id}: {response.status}")
         """
-        import time
-        
-        responses = []
         logger.info(f"Sending bulk messages to {len(phone_numbers)} numbers")
         
-        for idx, phone in enumerate(phone_numbers, 1):
-            response = self.send_message(phone, message_text)
-            responses.append(response)
-            
-            logger.info(f"[{idx}/{len(phone_numbers)}] Sent to {phone}: {response.status}")
-            
-            # Delay before next message
-            if idx < len(phone_numbers):
-                time.sleep(delay_between_messages)
-        
-        logger.info(f"Bulk send complete. Success: {sum(1 for r in responses if r.success)}/{len(responses)}")
-        return responses
+        sender = BulkSender(
+            send=lambda phone: self.send_message(phone, message_text),
+            is_success=lambda response: response.success,
+            is_pending=lambda response: response.status == "pending",
+            should_retry=lambda response: response.error != "Invalid phone number",
+            rate_per_second=rate_from_delay(delay_between_messages),
+            max_workers=max_workers,
+            checkpoint=BulkSendCheckpoint(bulk_job_id("service", message_text, phone_numbers)),
+            resume=resume,
+            to_record=asdict,
+            from_record=lambda record: MessageResponse(**{f.name: record.get(f.name) for f in fields(MessageResponse)}),
+        )
+        return sender.run(phone_numbers)
     
     def send_scheduled_message(
         self,
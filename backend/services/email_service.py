@@ -1,11 +1,34 @@
 """
 Email notification service with SendGrid integration
 Handles all transactional emails for Trek & Stay
+
+Emails can be sent inline or queued: ``queue=True`` (or ``queue_email``)
+hands the email to a background EmailWorker once the current transaction
+commits, so request latency never includes the SendGrid call. The worker
+batches queued emails per template into one request of up to
+MAX_PERSONALIZATIONS SendGrid personalizations. A failed batch is split in
+half and resent down to single emails, so one rejected address cannot fail
+the rest; emails that still fail alone are retried with backoff. Bulk sends
+are queued to the same worker, so they are batched, split and retried the
+same way and never block the caller.
+
+Queued emails live in memory: anything not yet sent (or waiting for a
+retry) when the process exits is lost.
+
+Backends (settings.EMAIL_SERVICE_BACKEND):
+- 'sendgrid': SendGrid v3 API (requires SENDGRID_API_KEY)
+- 'stub': records messages in ``StubEmailBackend.outbox``, for tests and local runs
 """
 
-from typing import Dict, List, Optional
+import json
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
 import logging
+import threading
+import time
+from queue import Empty, Queue
 from django.conf import settings
+from django.db import connection, transaction
 
 # Email templates for different events
 EMAIL_TEMPLATES = {
@@ -53,6 +76,59 @@ EMAIL_TEMPLATES = {
 
 logger = logging.getLogger(__name__)
 
+# SendGrid accepts up to 1,000 personalizations per request
+MAX_PERSONALIZATIONS = 1000
+MAX_SEND_ATTEMPTS = 3
+
+
+class SendGridEmailBackend:
+    """Delivers batched messages through the SendGrid v3 API"""
+
+    def __init__(self, api_key: str):
+        from sendgrid import SendGridAPIClient
+        self.client = SendGridAPIClient(api_key)
+
+    def send(self, message: Dict) -> bool:
+        from sendgrid.helpers.mail import Mail, Personalization, To, Cc
+
+        mail = Mail(from_email=message['from_email'], subject=message['subject'])
+        mail.template_id = message['template_id']
+        for item in message['personalizations']:
+            personalization = Personalization()
+            personalization.add_to(To(item['to']))
+            for cc_email in item.get('cc') or []:
+                personalization.add_cc(Cc(cc_email))
+            personalization.dynamic_template_data = item['dynamic_template_data']
+            mail.add_personalization(personalization)
+
+        response = self.client.send(mail)
+        if response.status_code in [200, 201, 202]:
+            return True
+        logger.error(f"SendGrid rejected batch of {len(message['personalizations'])}: {response.status_code}")
+        return False
+
+
+class StubEmailBackend:
+    """Keeps sent messages in memory instead of calling SendGrid"""
+
+    outbox: List[Dict] = []
+
+    def send(self, message: Dict) -> bool:
+        # The SendGrid client JSON-encodes the request, so fail the same way on unencodable data
+        json.dumps(message)
+        StubEmailBackend.outbox.append(message)
+        return True
+
+
+@dataclass
+class EmailJob:
+    """One queued email"""
+    template_name: str
+    recipient_email: str
+    dynamic_data: Dict
+    on_sent: Optional[Callable[[], None]] = None
+    attempts: int = 0
+
 
 class EmailService:
     """Handles email operations with SendGrid"""
@@ -61,18 +137,27 @@ class EmailService:
         """Initialize SendGrid service"""
         self.api_key = getattr(settings, 'SENDGRID_API_KEY', None)
         self.from_email = getattr(settings, 'SENDGRID_FROM_EMAIL', 'noreply@trekandstay.com')
-        self.enabled = bool(self.api_key)
+        self.backend = None
+        self._worker = None
+        self._worker_lock = threading.Lock()
         
-        if self.enabled:
+        if getattr(settings, 'EMAIL_SERVICE_BACKEND', 'sendgrid') == 'stub':
+            self.backend = StubEmailBackend()
+        elif self.api_key:
             try:
-                from sendgrid import SendGridAPIClient
-                self.client = SendGridAPIClient(self.api_key)
+                self.backend = SendGridEmailBackend(self.api_key)
             except ImportError:
                 logger.warning("SendGrid client not installed. Email functionality disabled.")
-                self.enabled = False
+        self.enabled = self.backend is not None
     
-    def send_booking_confirmation(self, user_email: str, booking_data: Dict) -> bool:
-        """Send booking confirmation email"""
+    def send_booking_confirmation(
+        self,
+        user_email: str,
+        booking_data: Dict,
+        queue: bool = False,
+        on_sent: Optional[Callable[[], None]] = None
+    ) -> bool:
+        """Send booking confirmation email (``queue=True``: send after commit, in the background)"""
         return self._send_email(
             template_name='booking_confirmation',
             recipient_email=user_email,
@@ -85,11 +170,19 @@ class EmailService:
                 'seats_booked': booking_data.get('seats_booked'),
                 'trip_details_url': booking_data.get('trip_details_url'),
                 'contact_whatsapp': getattr(settings, 'WHATSAPP_BUSINESS_NUMBER', ''),
-            }
+            },
+            queue=queue,
+            on_sent=on_sent
         )
     
-    def send_payment_received(self, user_email: str, payment_data: Dict) -> bool:
-        """Send payment received email"""
+    def send_payment_received(
+        self,
+        user_email: str,
+        payment_data: Dict,
+        queue: bool = False,
+        on_sent: Optional[Callable[[], None]] = None
+    ) -> bool:
+        """Send payment received email (``queue=True``: send after commit, in the background)"""
         return self._send_email(
             template_name='payment_received',
             recipient_email=user_email,
@@ -100,7 +193,9 @@ class EmailService:
                 'payment_method': payment_data.get('payment_method'),
                 'transaction_id': payment_data.get('transaction_id'),
                 'trip_title': payment_data.get('trip_title'),
-            }
+            },
+            queue=queue,
+            on_sent=on_sent
         )
     
     def send_trip_reminder(self, user_email: str, trip_data: Dict) -> bool:
@@ -199,7 +294,9 @@ class EmailService:
         template_name: str,
         recipient_email: str,
         dynamic_data: Dict,
-        cc_emails: Optional[List[str]] = None
+        cc_emails: Optional[List[str]] = None,
+        queue: bool = False,
+        on_sent: Optional[Callable[[], None]] = None
     ) -> bool:
         """
         Send email using SendGrid with dynamic template
@@ -209,9 +306,11 @@ class EmailService:
             recipient_email: Recipient email address
             dynamic_data: Template variables
             cc_emails: Optional CC email addresses
+            queue: Queue for the background worker after commit instead of sending now
+            on_sent: Called once the email has been accepted
             
         Returns:
-            True if email sent successfully, False otherwise
+            True if email sent (or queued) successfully, False otherwise
         """
         if not self.enabled:
             logger.warning(f"Email service disabled. Skipping email to {recipient_email}")
@@ -221,82 +320,170 @@ class EmailService:
             logger.error(f"Unknown email template: {template_name}")
             return False
         
+        if queue:
+            return self.queue_email(template_name, recipient_email, dynamic_data, on_sent=on_sent)
+        
+        sent = self._deliver(template_name, [{
+            'to': recipient_email,
+            'cc': cc_emails or [],
+            'dynamic_template_data': dynamic_data,
+        }])
+        if sent:
+            logger.info(f"Email sent successfully to {recipient_email}", extra={'template': template_name})
+            if on_sent:
+                on_sent()
+        return sent
+    
+    def _deliver(self, template_name: str, personalizations: List[Dict]) -> bool:
+        """Send one request carrying up to MAX_PERSONALIZATIONS recipients"""
+        template_config = EMAIL_TEMPLATES[template_name]
+        message = {
+            'from_email': self.from_email,
+            'subject': template_config['subject'],
+            'template_id': template_config['template_id'],
+            'personalizations': personalizations,
+        }
         try:
-            from sendgrid.helpers.mail import Mail, To, Cc
-            
-            template_config = EMAIL_TEMPLATES[template_name]
-            
-            mail = Mail(
-                from_email=self.from_email,
-                to_emails=To(recipient_email),
-                subject=template_config['subject'],
-                is_multiple=False
-            )
-            
-            # Set dynamic template
-            mail.template_id = template_config['template_id']
-            
-            # Add dynamic template data
-            mail.dynamic_template_data = dynamic_data
-            
-            # Add CC recipients if provided
-            if cc_emails:
-                for cc_email in cc_emails:
-                    mail.add_cc(Cc(cc_email))
-            
-            # Send email
-            response = self.client.send(mail)
-            
-            if response.status_code in [200, 201, 202]:
-                logger.info(
-                    f"Email sent successfully to {recipient_email}",
-                    extra={'template': template_name, 'status': response.status_code}
-                )
-                return True
-            else:
-                logger.error(
-                    f"Failed to send email to {recipient_email}: {response.status_code}",
-                    extra={'template': template_name}
-                )
-                return False
-                
+            return self.backend.send(message)
         except Exception as e:
             logger.error(
-                f"Exception sending email to {recipient_email}: {str(e)}",
+                f"Exception sending {len(personalizations)} email(s): {str(e)}",
                 extra={'template': template_name},
                 exc_info=True
             )
             return False
     
+    def queue_email(
+        self,
+        template_name: str,
+        recipient_email: str,
+        dynamic_data: Dict,
+        on_sent: Optional[Callable[[], None]] = None
+    ) -> bool:
+        """Hand an email to the background worker once the current transaction commits"""
+        if not self.enabled or template_name not in EMAIL_TEMPLATES:
+            return False
+        job = EmailJob(template_name, recipient_email, dynamic_data, on_sent)
+        transaction.on_commit(lambda: self.worker.submit(job))
+        return True
+    
+    @property
+    def worker(self) -> 'EmailWorker':
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = EmailWorker(self)
+            return self._worker
+    
     def send_bulk_emails(
         self,
         template_name: str,
         recipients: List[Dict]
     ) -> Dict[str, int]:
         """
-        Send emails to multiple recipients
+        Queue emails to multiple recipients
+        
+        Each recipient is queued to the EmailWorker (after the current
+        transaction commits), which sends them in batches of
+        MAX_PERSONALIZATIONS, halves a rejected batch to isolate the bad
+        address and retries it with backoff in the background.
         
         Args:
             template_name: Email template to use
             recipients: List of dicts with 'email' and 'dynamic_data' keys
             
         Returns:
-            Dict with 'sent' and 'failed' counts
+            Dict with 'queued' and 'failed' counts ('failed' counts recipients
+            that could not be queued)
         """
-        results = {'sent': 0, 'failed': 0}
+        results = {'queued': 0, 'failed': 0}
+        if not self.enabled or template_name not in EMAIL_TEMPLATES:
+            results['failed'] = len(recipients)
+            return results
         
         for recipient in recipients:
-            email = recipient.get('email')
-            data = recipient.get('dynamic_data', {})
-            
-            if self._send_email(template_name, email, data):
-                results['sent'] += 1
+            if self.queue_email(template_name, recipient.get('email'), recipient.get('dynamic_data', {})):
+                results['queued'] += 1
             else:
                 results['failed'] += 1
         
         return results
 
 
+class EmailWorker:
+    """
+    Background sender for queued emails
+    
+    Waits up to ``linger`` seconds to collect a batch, groups it by template
+    and sends each group as one request. A failed request is split in half
+    until the failing emails are isolated; those are resubmitted through the
+    delayed-retry queue with exponential backoff.
+    """
+    
+    def __init__(self, service: EmailService, linger: float = 0.5):
+        self.service = service
+        self.linger = linger
+        self._queue = Queue()
+        self._thread = threading.Thread(target=self._run, name='email-worker', daemon=True)
+        self._thread.start()
+    
+    def submit(self, job: EmailJob):
+        self._queue.put(job)
+    
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.linger
+            while len(batch) < MAX_PERSONALIZATIONS:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except Empty:
+                    break
+            try:
+                by_template = {}
+                for job in batch:
+                    by_template.setdefault(job.template_name, []).append(job)
+                for template_name, jobs in by_template.items():
+                    self._send_batch(template_name, jobs)
+            except Exception as e:
+                logger.error(f"Email worker batch failed: {str(e)}", exc_info=True)
+            finally:
+                # The worker thread owns its DB connection (used by on_sent callbacks)
+                connection.close()
+    
+    def _send_batch(self, template_name: str, jobs: List[EmailJob]):
+        from services.retry_scheduler import backoff_delay, get_retry_queue
+        
+        for job in self._deliver_jobs(template_name, jobs):
+            job.attempts += 1
+            if job.attempts >= MAX_SEND_ATTEMPTS:
+                logger.error(f"Giving up on '{template_name}' email to {job.recipient_email}")
+                continue
+            get_retry_queue().schedule(backoff_delay(job.attempts), self.submit, job)
+    
+    def _deliver_jobs(self, template_name: str, jobs: List[EmailJob]) -> List[EmailJob]:
+        """Send ``jobs`` as one request, halving a failed request down to single emails; returns the failures"""
+        sent = self.service._deliver(template_name, [
+            {'to': job.recipient_email, 'dynamic_template_data': job.dynamic_data} for job in jobs
+        ])
+        if not sent:
+            if len(jobs) == 1:
+                return jobs
+            middle = len(jobs) // 2
+            return self._deliver_jobs(template_name, jobs[:middle]) + self._deliver_jobs(template_name, jobs[middle:])
+        
+        logger.info(f"Sent {len(jobs)} queued '{template_name}' email(s)")
+        for job in jobs:
+            if job.on_sent:
+                try:
+                    job.on_sent()
+                except Exception as e:
+                    logger.error(f"Email on_sent callback failed: {str(e)}")
+        return []
+
+
 # Singleton instance
 email_service = EmailService()
 
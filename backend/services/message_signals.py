@@ -0,0 +1,334 @@
+"""
+Single-Pass WhatsApp Message Signals
+====================================
+
+One scan of an inbound message yields everything WhatsAppMessageParser and
+WhatsAppSafety need: language, intents, sentiment, entities, unsubscribe
+keywords and the ban-risk counters.
+
+- SCAN_RE: one precompiled alternation over the lowercased text. Every
+  keyword, sentiment word, negator and month is folded into a character
+  trie, so each position costs one branch on its first letter instead of
+  one regex per intent; dates, numbers, emojis, currency marks and
+  Devanagari / accented runs are alternatives of the same pattern
+- a term carries every keyword it contains ("best time" also counts as
+  "time"), and keywords keep the substring semantics of the old
+  per-intent regexes ("booking" matches "book"); sentiment words, negators
+  and months only count as whole words
+- analyze_message() is cached per text, so parsing, unsubscribe detection
+  and ban-risk analysis of the same webhook message share one scan
+
+Case and word repetition (ban risk) come from C-level str helpers on the
+same lowercased copy rather than from the regex.
+
+Usage:
+    signals = analyze_message(text)
+    signals.intent()     # {"primary_intent": ..., "secondary_intents": [...], "confidence": ...}
+    signals.sentiment()  # {"sentiment": ..., "polarity": ..., "subjectivity": ...}
+    signals.entities()   # {"trek_names": [...], "numbers": [...], "dates": [...], "prices": [...]}
+
+See benchmark_message_signals.py for timings against the previous parser.
+"""
+
+import re
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+# ============================================================================
+# KEYWORD TABLES
+# ============================================================================
+
+INTENT_KEYWORDS = {
+    "price_inquiry": ("how much", "price", "cost", "budget", "expensive", "₹", "rupee", "charge"),
+    "booking": ("book", "reserve", "confirm", "register", "want", "interested", "keen"),
+    "objection": ("but", "however", "afraid", "worried", "concerned", "scared", "risk", "problem", "issue", "doubt"),
+    "timing": ("when", "date", "month", "time", "best time", "duration", "how long", "days needed"),
+    "refund": ("cancel", "refund", "return", "money back", "compensation"),
+    "feedback": ("review", "feedback", "experience", "great", "amazing", "terrible", "bad", "good"),
+    "objection_safety": ("safe", "dangerous", "risk", "altitude", "sickness", "health", "emergency"),
+    "objection_ability": ("difficult", "easy", "can i", "am i", "fit", "fitness", "experience", "beginner"),
+}
+
+# Primary intent is the detected intent with the highest priority
+INTENT_PRIORITY = {
+    "price_inquiry": 3,
+    "booking": 4,
+    "objection_safety": 3,
+    "objection_ability": 3,
+    "refund": 5,
+    "timing": 2,
+}
+
+TREK_NAMES = ("everest", "manali", "kedarnath", "dudhsagar", "kumbhe", "maharashtra", "himalayas")
+
+UNSUBSCRIBE_KEYWORDS = ("stop", "unsubscribe", "remove", "no more", "quit", "exit", "don't contact")
+
+PROMOTIONAL_KEYWORDS = (
+    "limited time", "act now", "don't miss", "urgent", "click here",
+    "buy now", "exclusive offer", "sign up now", "limited offer",
+)
+
+CLICKBAIT_KEYWORDS = (
+    "you won't believe", "shocking", "unbelievable", "doctors hate", "this one trick", "what happens next",
+)
+
+LINK_MARKERS = ("http://", "https://", "www.")
+
+# Whole-word sentiment lexicon
+POSITIVE_WORDS = frozenset({
+    "good", "great", "awesome", "amazing", "excellent", "love", "perfect", "interested", "yes", "sure",
+    "nice", "thanks", "thank", "happy", "excited", "wonderful", "beautiful", "best",
+})
+NEGATIVE_WORDS = frozenset({
+    "bad", "terrible", "awful", "hate", "problem", "issue", "no", "don't want", "cancel",
+    "worst", "disappointed", "poor", "angry", "worried",
+})
+# A negator flips the sentiment word right after it ("not good", "no problem")
+NEGATORS = frozenset({"not", "no", "never", "don't", "dont", "didn't", "isn't", "wasn't", "won't"})
+
+MONTHS = frozenset({
+    "january", "february", "march", "april", "may", "june", "july", "august",
+    "september", "october", "november", "december",
+    "jan", "feb", "mar", "apr", "jun", "jul", "aug", "sep", "oct", "nov", "dec",
+})
+
+# ============================================================================
+# SCANNER
+# ============================================================================
+
+_KEYWORDS = frozenset(
+    keyword
+    for group in (*INTENT_KEYWORDS.values(), TREK_NAMES, UNSUBSCRIBE_KEYWORDS, PROMOTIONAL_KEYWORDS, CLICKBAIT_KEYWORDS)
+    for keyword in group
+)
+_KEYWORD_INTENTS: Dict[str, Tuple[str, ...]] = {}
+for _intent, _group in INTENT_KEYWORDS.items():
+    for _keyword in _group:
+        _KEYWORD_INTENTS[_keyword] = _KEYWORD_INTENTS.get(_keyword, ()) + (_intent,)
+
+
+class Term(NamedTuple):
+    keywords: Tuple[str, ...]  # keywords contained in the term, itself included
+    intents: Tuple[str, ...]   # intents those keywords signal
+    polarity: int              # +1 / -1 for sentiment words, 0 otherwise
+    negator: bool
+    month: bool
+    link: bool
+
+
+def _build_terms() -> Dict[str, Term]:
+    terms = {}
+    for term in _KEYWORDS | POSITIVE_WORDS | NEGATIVE_WORDS | NEGATORS | MONTHS | set(LINK_MARKERS):
+        contained = tuple(sorted(keyword for keyword in _KEYWORDS if keyword in term))
+        terms[term] = Term(
+            keywords=contained,
+            intents=tuple({intent for keyword in contained for intent in _KEYWORD_INTENTS.get(keyword, ())}),
+            polarity=1 if term in POSITIVE_WORDS else -1 if term in NEGATIVE_WORDS else 0,
+            negator=term in NEGATORS,
+            month=term in MONTHS,
+            link=term in LINK_MARKERS,
+        )
+    return terms
+
+
+def _trie_pattern(words) -> str:
+    """Regex alternation of ``words`` factored by common prefix; longer words win"""
+    trie: Dict[str, dict] = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def emit(node) -> str:
+        branches = [re.escape(ch) + emit(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            return (body if len(branches) == 1 and len(body) == 1 else "(?:" + body + ")") + "?"
+        return body
+
+    return emit(trie)
+
+
+TERMS = _build_terms()
+
+SCAN_RE = re.compile(
+    r"(?P<term>" + _trie_pattern(TERMS) + r")"
+    r"|(?P<date>\d{1,2}[-/]\d{1,2}[-/]\d{2,4})"
+    r"|(?P<number>\d+(?:,\d+)*(?:\.\d+)?(?:k(?![a-z]))?)"
+    r"|(?P<emoji>[\U0001F600-\U0001F64F\U0001F300-\U0001F5FF])"
+    r"|(?P<script>[ऀ-ॿ]+|[¿¡áéíóúñàâäæçèêëïîôùûüœ])"
+)
+_PRICE_PREFIX_RE = re.compile(r"(?:₹|\brs\.?|\binr)\s*$")
+_PRICE_SUFFIX_RE = re.compile(r"\s*(?:/-|rupees?\b|rs\b|inr\b)")
+
+
+def _is_word(text: str, start: int, end: int) -> bool:
+    return (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum())
+
+
+# ============================================================================
+# SIGNALS
+# ============================================================================
+
+@dataclass
+class MessageSignals:
+    """Everything one scan learns about a message (shared through the cache; read-only)"""
+    text: str
+    language: str
+    keywords: frozenset  # every keyword found
+    intents: Tuple[str, ...]  # in INTENT_KEYWORDS order
+    positive: int
+    negative: int
+    sentiment_words: int
+    numbers: Tuple[str, ...]
+    dates: Tuple[str, ...]
+    prices: Tuple[str, ...]
+    emoji_count: int
+    upper_count: int
+    link_count: int
+    max_word_repeat: int
+    word_count: int
+
+    @property
+    def trek_names(self) -> List[str]:
+        return [trek.capitalize() for trek in TREK_NAMES if trek in self.keywords]
+
+    @property
+    def unsubscribe_keywords(self) -> List[str]:
+        return [keyword for keyword in UNSUBSCRIBE_KEYWORDS if keyword in self.keywords]
+
+    @property
+    def promotional_count(self) -> int:
+        return sum(1 for keyword in PROMOTIONAL_KEYWORDS if keyword in self.keywords)
+
+    @property
+    def has_clickbait(self) -> bool:
+        return not self.keywords.isdisjoint(CLICKBAIT_KEYWORDS)
+
+    @property
+    def caps_ratio(self) -> float:
+        return self.upper_count / len(self.text) if self.text else 0.0
+
+    def intent(self) -> Dict[str, Any]:
+        if not self.intents:
+            return {"primary_intent": "general_inquiry", "secondary_intents": [], "confidence": 0.5}
+        primary = max(self.intents, key=lambda intent: INTENT_PRIORITY.get(intent, 1))
+        return {
+            "primary_intent": primary,
+            "secondary_intents": [intent for intent in self.intents if intent != primary],
+            "confidence": min(len(self.intents) * 0.25, 0.95),
+        }
+
+    def sentiment(self) -> Dict[str, Any]:
+        hits = self.positive + self.negative
+        polarity = (self.positive - self.negative) / hits if hits else 0.0
+        if polarity > 0.1:
+            sentiment = "positive"
+        elif polarity < -0.1:
+            sentiment = "negative"
+        else:
+            sentiment = "neutral"
+        return {
+            "sentiment": sentiment,
+            "polarity": round(polarity, 3),
+            "subjectivity": round(min(self.sentiment_words / self.word_count, 1.0), 3) if self.word_count else 0.0,
+        }
+
+    def entities(self) -> Dict[str, List[str]]:
+        return {
+            "trek_names": self.trek_names,
+            "numbers": list(self.numbers),
+            "dates": list(self.dates),
+            "prices": list(self.prices),
+        }
+
+
+def scan_message(text: str) -> MessageSignals:
+    """Collect every signal for ``text`` in one pass of SCAN_RE (uncached)"""
+    text = text or ""
+    lower = text.lower().replace("’", "'")
+    keywords = set()
+    intents = set()
+    numbers, dates, prices = [], [], []
+    language = "en"
+    positive = negative = sentiment_words = 0
+    emoji_count = link_count = 0
+    negator = None  # (end, Term) of a whole-word negator
+
+    for match in SCAN_RE.finditer(lower):
+        kind = match.lastgroup
+        if kind == "term":
+            start, end = match.span()
+            term = TERMS[match.group()]
+            keywords.update(term.keywords)
+            intents.update(term.intents)
+            if term.link:
+                link_count += 1
+            if not (term.polarity or term.negator or term.month) or not _is_word(lower, start, end):
+                continue
+            if term.month:
+                dates.append(match.group())
+            polarity = term.polarity
+            if polarity:
+                sentiment_words += 1
+                if negator is not None and not lower[negator[0]:start].strip():
+                    # "no problem": the negator flips the word instead of counting on its own
+                    if negator[1].polarity > 0:
+                        positive -= 1
+                    elif negator[1].polarity < 0:
+                        negative -= 1
+                    polarity = -polarity
+                if polarity > 0:
+                    positive += 1
+                else:
+                    negative += 1
+            negator = (end, term) if term.negator else None
+        elif kind == "number":
+            start, end = match.span()
+            token = match.group()
+            prefix = _PRICE_PREFIX_RE.search(lower, max(0, start - 6), start)
+            if prefix:
+                prices.append(lower[prefix.start():end])
+            elif token.endswith("k") or _PRICE_SUFFIX_RE.match(lower, end):
+                prices.append(token)
+            else:
+                numbers.append(token)
+        elif kind == "date":
+            dates.append(match.group())
+        elif kind == "emoji":
+            emoji_count += 1
+        else:  # script
+            ch = match.group()[0]
+            found = "hi" if "ऀ" <= ch <= "ॿ" else "es" if ch in "¿¡áéíóúñ" else "fr"
+            if language == "en" or (found == "hi") or (found == "es" and language == "fr"):
+                language = found
+
+    words = lower.split()
+    return MessageSignals(
+        text=text,
+        language=language,
+        keywords=frozenset(keywords),
+        intents=tuple(intent for intent in INTENT_KEYWORDS if intent in intents),
+        positive=max(positive, 0),
+        negative=max(negative, 0),
+        sentiment_words=sentiment_words,
+        numbers=tuple(numbers),
+        dates=tuple(dates),
+        prices=tuple(prices),
+        emoji_count=emoji_count,
+        upper_count=0 if text.islower() else sum(map(str.isupper, text)),
+        link_count=link_count,
+        max_word_repeat=max(Counter(words).values()) if len(set(words)) < len(words) else min(len(words), 1),
+        word_count=len(words),
+    )
+
+
+@lru_cache(maxsize=1024)
+def analyze_message(text: str) -> MessageSignals:
+    """Signals for ``text``, shared by every caller that looks at the same message"""
+    return scan_message(text)
@@ -3,7 +3,6 @@ import json
 import requests
 from typing import List, Dict, Any, Optional
 from datetime import datetime
-from django.core.cache import cache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -429,25 +428,28 @@ Respond with just the message text."""
         return False
     
     def cache_conversation(self, phone: str, user_msg: str, bot_msg: str, metadata: Dict = None):
-        """Cache conversation for history and analysis"""
+        """Record a conversation turn in the shared conversation store"""
+        from core.conversation_store import get_conversation_store
         
-        cache_key = f'whatsapp_conversation_{phone}'
-        history = cache.get(cache_key, [])
-        
-        entry = {
-            'user': user_msg,
-            'bot': bot_msg,
-            'timestamp': datetime.now().isoformat(),
-            'metadata': metadata or {}
-        }
-        
-        history.append(entry)
-        history = history[-100:]  # Keep last 100 messages
-        
-        cache.set(cache_key, history, 86400 * 30)  # 30 days
+        store = get_conversation_store()
+        store.append(phone, 'user', user_msg)
+        store.append(phone, 'assistant', bot_msg, metadata)
     
     def get_conversation_history(self, phone: str) -> List[Dict]:
-        """Get cached conversation history"""
-        
-        cache_key = f'whatsapp_conversation_{phone}'
-        return cache.get(cache_key, [])
+        """Get recent conversation turns as {user, bot, timestamp, metadata}"""
+        from core.conversation_store import get_conversation_store
+        
+        turns = []
+        pending_user = None
+        for msg in get_conversation_store().history(phone):
+            if msg['role'] == 'user':
+                pending_user = msg
+                continue
+            turns.append({
+                'user': pending_user['content'] if pending_user else '',
+                'bot': msg['content'],
+                'timestamp': (pending_user or msg)['timestamp'].isoformat(),
+                'metadata': msg['metadata'],
+            })
+            pending_user = None
+        return turns
@@ -0,0 +1,124 @@
+"""
+Delayed Retry Queue
+===================
+
+In-process scheduler for retrying failed provider calls without sleeping in
+the caller's thread. Jobs sit in a min-heap ordered by due time; a single
+timer thread waits on a condition variable until the earliest job is due
+and hands it to a small thread pool, so a slow retry never delays others.
+
+Retries live in memory: anything still queued when the process exits is
+lost. Durable delivery is the job of the OutboundMessage queue.
+
+Usage:
+    queue = get_retry_queue()
+    queue.schedule(backoff_delay(attempt, retry_after), send_again, payload)
+"""
+
+import os
+import heapq
+import random
+import logging
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_CAP_SECONDS = 60.0
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """
+    Delay before retry number ``attempt`` (0-based)
+
+    Honours the server's Retry-After when given, otherwise exponential
+    backoff with equal jitter: half the window fixed, half random.
+    """
+    if retry_after is not None:
+        return retry_after
+    window = min(BACKOFF_CAP_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt))
+    return window / 2 + random.uniform(0, window / 2)
+
+
+class DelayedRetryQueue:
+    """Min-heap of due-time ordered jobs drained by one timer thread"""
+
+    def __init__(self, max_workers: int = 4):
+        self._heap = []
+        self._sequence = 0
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='retry')
+        self._thread = None
+
+    def schedule(self, delay: float, func: Callable[..., Any], *args, **kwargs) -> float:
+        """Run ``func(*args, **kwargs)`` after ``delay`` seconds; returns the due time (epoch)"""
+        due = datetime.now(timezone.utc).timestamp() + max(0.0, delay)
+        with self._condition:
+            self._sequence += 1
+            heapq.heappush(self._heap, (due, self._sequence, func, args, kwargs))
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='retry-timer', daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return due
+
+    def pending(self) -> int:
+        with self._condition:
+            return len(self._heap)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._heap:
+                    self._condition.wait()
+                due, _, func, args, kwargs = self._heap[0]
+                wait = due - datetime.now(timezone.utc).timestamp()
+                if wait > 0:
+                    # Woken early if a sooner job is scheduled
+                    self._condition.wait(timeout=wait)
+                    continue
+                heapq.heappop(self._heap)
+            self._executor.submit(self._execute, func, args, kwargs)
+
+    @staticmethod
+    def _execute(func, args, kwargs):
+        try:
+            func(*args, **kwargs)
+        except Exception as e:
+            logger.error(f"Scheduled retry failed: {e}")
+
+
+_retry_queue = None
+_retry_queue_lock = threading.Lock()
+
+
+def get_retry_queue() -> DelayedRetryQueue:
+    """Process-wide retry queue"""
+    global _retry_queue
+    with _retry_queue_lock:
+        if _retry_queue is None:
+            _retry_queue = DelayedRetryQueue(
+                max_workers=int(os.getenv('WHATSAPP_RETRY_WORKERS', '4'))
+            )
+        return _retry_queue
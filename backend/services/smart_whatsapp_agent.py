@@ -19,6 +19,7 @@ from typing import Dict, Optional, List, Tuple
 from dataclasses import dataclass
 import asyncio
 
+from services.bulk_sender import BulkSender, BulkSendCheckpoint, DEFAULT_MAX_WORKERS, bulk_job_id, rate_from_delay
 from services.custom_whatsapp_service import (
     CustomWhatsAppService, 
     WhatsAppMessage, 
@@ -441,15 +442,24 @@ class SmartWhatsAppAgent:
         self,
         customers: List[Dict],
         message_template: str,
-        delay_between_messages: int = 3
+        delay_between_messages: float = 3,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        resume: bool = False
     ) -> List[Dict]:
         """
         Send personalized auto-reply campaign to multiple customers
         
+        Uses the shared rate-limited concurrent sender (one message per
+        ``delay_between_messages`` seconds overall, per-recipient retry,
+        resumable checkpoint).
+        
         Args:
             customers: List of {"phone": "...", "name": "..."}
             message_template: Template with {name}, {trek}, etc
-            delay_between_messages: Seconds between sends
+            delay_between_messages: Seconds per message across all workers
+            max_workers: Concurrent in-flight sends
+            resume: Skip customers already sent by a previous run of this campaign
+                (default: send to everyone)
         
         Returns:
             List of results
@@ -466,34 +476,34 @@ class SmartWhatsAppAgent:
                 delay_between_messages=5
             )
         """
-        import time
-        
-        results = []
         logger.info(f"Starting auto-reply campaign for {len(customers)} customers")
         
-        for idx, customer in enumerate(customers, 1):
+        def send(customer: Dict) -> Dict:
             phone = customer.get("phone")
             name = customer.get("name", "Friend")
             
             # Personalize message
             personalized_msg = message_template.format(name=name)
-            
-            # Send
             response = self.whatsapp.send_message(phone, personalized_msg)
-            
-            result = {
+            return {
                 "phone": phone,
                 "name": name,
                 "status": response.status,
                 "message_id": response.message_id
             }
-            results.append(result)
-            
-            logger.info(f"[{idx}/{len(customers)}] Sent to {name}: {response.status}")
-            
-            # Delay before next
-            if idx < len(customers):
-                time.sleep(delay_between_messages)
+        
+        sender = BulkSender(
+            send=send,
+            is_success=lambda result: result["status"] == "sent",
+            is_pending=lambda result: result["status"] == "pending",
+            rate_per_second=rate_from_delay(delay_between_messages),
+            max_workers=max_workers,
+            checkpoint=BulkSendCheckpoint(bulk_job_id("campaign", message_template, customers)),
+            resume=resume,
+            to_record=lambda result: result,
+            from_record=lambda record: {key: record.get(key) for key in ("phone", "name", "status", "message_id")},
+        )
+        results = sender.run(customers)
         
         logger.info(f"Campaign complete. Success: {sum(1 for r in results if r['status'] == 'sent')}/{len(customers)}")
         return results
@@ -11,6 +11,8 @@ from datetime import datetime
 import requests
 from django.conf import settings
 
+from .bulk_sender import BulkSender, BulkSendCheckpoint, DEFAULT_MAX_WORKERS, bulk_job_id, rate_from_delay
+
 logger = logging.getLogger(__name__)
 
 
@@ -163,15 +165,24 @@ class WhatsAppAPI:
             return {"status": "failed", "error": str(e)}
 
     def send_bulk_messages(
-        self, phone_numbers: List[str], message_text: str, delay_ms: int = 1000
+        self, phone_numbers: List[str], message_text: str, delay_ms: int = 1000,
+        max_workers: int = DEFAULT_MAX_WORKERS, resume: bool = False
     ) -> Dict[str, Any]:
         """
         Send message to multiple customers
         
+        Sends run concurrently under a shared rate of one message per
+        ``delay_ms``, with per-recipient retry; the campaign id is derived
+        from the recipients and message, so rerunning a crashed campaign
+        with ``resume=True`` finishes it.
+        
         Args:
             phone_numbers: List of phone numbers
             message_text: Message to send
-            delay_ms: Delay between messages (default 1000ms)
+            delay_ms: Milliseconds per message across all workers (default 1000ms)
+            max_workers: Concurrent in-flight sends
+            resume: Skip recipients already sent by a previous run of this campaign
+                (default: send to everyone)
         
         Returns:
             {
@@ -181,28 +192,31 @@ class WhatsAppAPI:
                 "failed": 2
             }
         """
-        import time
-        from uuid import uuid4
+        campaign_id = bulk_job_id("camp", message_text, phone_numbers)
+        sender = BulkSender(
+            send=lambda phone: self.send_message(phone, message_text),
+            is_success=lambda result: result["status"] == "sent",
+            rate_per_second=rate_from_delay(delay_ms / 1000),
+            max_workers=max_workers,
+            checkpoint=BulkSendCheckpoint(campaign_id),
+            resume=resume,
+            to_record=lambda result: {"status": result["status"], "message_id": result.get("message_id")},
+        )
+        sent_results = sender.run(phone_numbers)
 
-        campaign_id = f"camp_{uuid4().hex[:8]}"
         results = {"campaign_id": campaign_id, "total": len(phone_numbers), "sent": 0, "failed": 0, "messages": []}
-
-        for phone in phone_numbers:
-            result = self.send_message(phone, message_text)
+        for phone, result in zip(phone_numbers, sent_results):
             if result["status"] == "sent":
                 results["sent"] += 1
             else:
                 results["failed"] += 1
-            
+
             results["messages"].append({
                 "phone": phone,
                 "status": result["status"],
                 "message_id": result.get("message_id"),
             })
 
-            # Add delay between messages
-            time.sleep(delay_ms / 1000)
-
         logger.info(
             f"Bulk send complete: {results['sent']}/{results['total']} sent, {results['failed']} failed"
         )
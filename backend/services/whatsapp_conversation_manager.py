@@ -1,12 +1,21 @@
 """
 WhatsApp Conversation Manager
 Manages conversation history and context windows
+
+History and dialogue state live in the shared conversation store
+(core.conversation_store): bounded per phone, persisted to
+WhatsAppMessage / WhatsAppConversation, and the same in every worker.
 """
 
 import logging
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 
+from django.utils import timezone
+
+from core.conversation_store import get_conversation_store
+from core.models import WhatsAppConversation
+
 logger = logging.getLogger(__name__)
 
 
@@ -17,9 +26,8 @@ class WhatsAppConversationManager:
     """
 
     def __init__(self):
-        # In-memory storage (use database in production)
-        self.conversations = {}
-        self.max_history = 20  # Keep last 20 messages
+        self.store = get_conversation_store()
+        self.max_history = self.store.history_size
         self.context_window = 10  # Use last 10 messages for context
 
     def create_conversation(
@@ -44,22 +52,15 @@ class WhatsAppConversationManager:
         """
         conversation_id = f"conv_{phone_number}_{datetime.now().timestamp()}"
 
-        self.conversations[phone_number] = {
-            "conversation_id": conversation_id,
-            "phone_number": phone_number,
-            "created_at": datetime.now(),
-            "updated_at": datetime.now(),
-            "messages": [
-                {
-                    "role": "user",
-                    "content": initial_message,
-                    "timestamp": datetime.now(),
-                }
-            ],
-            "sentiment_trend": "neutral",
-            "conversation_stage": "initial",
-            "requires_human_review": False,
-        }
+        self.store.reset(phone_number)
+        self.store.update_state(
+            phone_number,
+            conversation_id=conversation_id,
+            sentiment_trend="neutral",
+            conversation_stage="initial",
+            requires_human_review=False,
+        )
+        self.store.append(phone_number, "user", initial_message)
 
         logger.info(f"Conversation created: {conversation_id}")
         return {
@@ -84,15 +85,7 @@ class WhatsAppConversationManager:
         Returns:
             List of messages
         """
-        if phone_number not in self.conversations:
-            return []
-
-        messages = self.conversations[phone_number]["messages"]
-
-        if limit:
-            messages = messages[-limit:]
-
-        return messages
+        return self.store.history(phone_number, limit=limit)
 
     def add_to_history(
         self,
@@ -114,26 +107,11 @@ class WhatsAppConversationManager:
             True if successful
         """
         try:
-            if phone_number not in self.conversations:
+            if not self.store.exists(phone_number):
                 self.create_conversation(phone_number, message)
                 return True
 
-            conv = self.conversations[phone_number]
-
-            # Add message
-            conv["messages"].append({
-                "role": role,
-                "content": message,
-                "timestamp": datetime.now(),
-                "metadata": metadata,
-            })
-
-            # Trim history if too long
-            if len(conv["messages"]) > self.max_history:
-                conv["messages"] = conv["messages"][-self.max_history:]
-
-            # Update conversation timestamp
-            conv["updated_at"] = datetime.now()
+            self.store.append(phone_number, role, message, metadata)
 
             logger.info(f"Message added to conversation {phone_number}")
             return True
@@ -183,7 +161,7 @@ class WhatsAppConversationManager:
         Returns:
             Stage: initial, inquiry, negotiation, decision, completed, escalated
         """
-        if phone_number not in self.conversations:
+        if not self.store.exists(phone_number):
             return "unknown"
 
         history = self.get_conversation_history(phone_number)
@@ -253,8 +231,7 @@ class WhatsAppConversationManager:
             stage = self.detect_conversation_stage(phone_number)
 
             # Update stage in conversation
-            if phone_number in self.conversations:
-                self.conversations[phone_number]["conversation_stage"] = stage
+            self.store.update_state(phone_number, conversation_stage=stage)
 
             return {
                 "turn_id": f"turn_{len(self.get_conversation_history(phone_number))}",
@@ -279,20 +256,22 @@ class WhatsAppConversationManager:
                 "requires_review": False
             }
         """
-        if phone_number not in self.conversations:
+        if not self.store.exists(phone_number):
             return {"error": "Conversation not found"}
 
-        conv = self.conversations[phone_number]
-        history = conv["messages"]
+        state = self.store.state(phone_number)
+        history = self.store.history(phone_number)
+        first_at = history[0]["timestamp"] if history else None
+        last_at = history[-1]["timestamp"] if history else None
 
         return {
-            "conversation_id": conv["conversation_id"],
+            "conversation_id": state.get("conversation_id"),
             "total_messages": len(history),
-            "created_at": conv["created_at"].isoformat(),
-            "updated_at": conv["updated_at"].isoformat(),
+            "created_at": first_at.isoformat() if first_at else None,
+            "updated_at": last_at.isoformat() if last_at else None,
             "conversation_stage": self.detect_conversation_stage(phone_number),
-            "sentiment_trend": conv["sentiment_trend"],
-            "requires_human_review": conv["requires_human_review"],
+            "sentiment_trend": state.get("sentiment_trend", "neutral"),
+            "requires_human_review": state.get("requires_human_review", False),
             "first_message": history[0]["content"] if history else None,
             "last_message": history[-1]["content"] if history else None,
         }
@@ -300,9 +279,8 @@ class WhatsAppConversationManager:
     def mark_for_human_review(self, phone_number: str, reason: str) -> bool:
         """Mark conversation for human agent review"""
         try:
-            if phone_number in self.conversations:
-                self.conversations[phone_number]["requires_human_review"] = True
-                self.conversations[phone_number]["review_reason"] = reason
+            if self.store.exists(phone_number):
+                self.store.update_state(phone_number, requires_human_review=True, review_reason=reason)
                 logger.info(f"Conversation marked for review: {reason}")
                 return True
             return False
@@ -313,8 +291,8 @@ class WhatsAppConversationManager:
     def close_conversation(self, phone_number: str) -> bool:
         """Close conversation"""
         try:
-            if phone_number in self.conversations:
-                self.conversations[phone_number]["closed_at"] = datetime.now()
+            if self.store.exists(phone_number):
+                self.store.update_state(phone_number, closed_at=timezone.now().isoformat())
                 logger.info(f"Conversation closed: {phone_number}")
                 return True
             return False
@@ -323,12 +301,10 @@ class WhatsAppConversationManager:
             return False
 
     def get_active_conversations(self, max_age_hours: int = 24) -> List[str]:
-        """Get list of active conversations"""
-        active = []
-        cutoff_time = datetime.now() - timedelta(hours=max_age_hours)
-
-        for phone, conv in self.conversations.items():
-            if conv["updated_at"] > cutoff_time and not conv.get("closed_at"):
-                active.append(phone)
-
-        return active
+        """Get list of active conversations (across all workers)"""
+        self.store.flush()
+        cutoff_time = timezone.now() - timedelta(hours=max_age_hours)
+        return list(
+            WhatsAppConversation.objects.filter(status='active', last_message_at__gt=cutoff_time)
+            .values_list('phone_number', flat=True)
+        )
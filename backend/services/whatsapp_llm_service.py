@@ -276,37 +276,29 @@ Use this information to answer the customer's questions accurately.
 class ConversationMemory:
     """
     Manages multi-turn conversation memory
-    Stores conversation history for context
+    Stores conversation history for context (shared conversation store)
     """
     
     def __init__(self, max_history: int = 10):
         """Initialize conversation memory"""
-        self.conversations: Dict[str, List[Dict]] = {}
+        from core.conversation_store import get_conversation_store
+        self.store = get_conversation_store()
         self.max_history = max_history
 
     def add_message(self, phone: str, role: str, content: str):
         """Add message to conversation history"""
-        if phone not in self.conversations:
-            self.conversations[phone] = []
-        
-        self.conversations[phone].append({
-            "role": role,
-            "content": content,
-            "timestamp": datetime.now().isoformat(),
-        })
-        
-        # Keep only last N messages
-        if len(self.conversations[phone]) > self.max_history:
-            self.conversations[phone] = self.conversations[phone][-self.max_history:]
+        self.store.append(phone, role, content)
 
     def get_history(self, phone: str) -> List[Dict]:
         """Get conversation history for a customer"""
-        return self.conversations.get(phone, [])
+        return [
+            {"role": msg["role"], "content": msg["content"], "timestamp": msg["timestamp"].isoformat()}
+            for msg in self.store.history(phone, limit=self.max_history)
+        ]
 
     def clear_history(self, phone: str):
         """Clear conversation history"""
-        if phone in self.conversations:
-            del self.conversations[phone]
+        self.store.reset(phone)
 
     def get_context_summary(self, phone: str) -> str:
         """Get summary of conversation for context"""
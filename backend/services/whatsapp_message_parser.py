@@ -5,8 +5,9 @@ Parses incoming messages for intent, sentiment, language, and entities
 
 import logging
 from typing import Dict, Any, List, Optional
-from textblob import TextBlob
-import re
+
+from . import message_signals
+from .message_signals import analyze_message
 
 logger = logging.getLogger(__name__)
 
@@ -20,53 +21,11 @@ class WhatsAppMessageParser:
     - Entities (trek names, dates, prices, etc)
     """
 
-    # Intent patterns
-    INTENT_PATTERNS = {
-        "price_inquiry": r"(how much|price|cost|budget|expensive|₹|rupee|charge)",
-        "booking": r"(book|reserve|confirm|register|want|interested|keen)",
-        "objection": r"(but|however|afraid|worried|concerned|scared|risk|problem|issue|doubt)",
-        "timing": r"(when|date|month|time|best time|duration|how long|days needed)",
-        "refund": r"(cancel|refund|return|money back|compensation)",
-        "feedback": r"(review|feedback|experience|great|amazing|terrible|bad|good)",
-        "objection_safety": r"(safe|dangerous|risk|altitude|sickness|health|emergency)",
-        "objection_ability": r"(difficult|easy|can i|am i|fit|fitness|experience|beginner)",
-    }
-
-    # Trek name patterns
-    TREK_NAMES = [
-        "everest",
-        "manali",
-        "kedarnath",
-        "dudhsagar",
-        "kumbhe",
-        "maharashtra",
-        "himalayas",
-    ]
-
-    # Sentiment keywords
-    POSITIVE_WORDS = [
-        "good",
-        "great",
-        "awesome",
-        "amazing",
-        "excellent",
-        "love",
-        "perfect",
-        "interested",
-        "yes",
-        "sure",
-    ]
-    NEGATIVE_WORDS = [
-        "bad",
-        "terrible",
-        "awful",
-        "hate",
-        "problem",
-        "issue",
-        "no",
-        "don't want",
-        "cancel",
-    ]
+    # Keyword tables live in services.message_signals (one scan feeds every method)
+    INTENT_KEYWORDS = message_signals.INTENT_KEYWORDS
+    TREK_NAMES = message_signals.TREK_NAMES
+    POSITIVE_WORDS = message_signals.POSITIVE_WORDS
+    NEGATIVE_WORDS = message_signals.NEGATIVE_WORDS
 
     @staticmethod
     def detect_language(text: str) -> str:
@@ -77,18 +36,7 @@ class WhatsAppMessageParser:
         Returns:
             Language code (en, hi, es, etc)
         """
-        # Check for Hindi characters
-        if re.search(r"[\u0900-\u097F]", text):
-            return "hi"
-        # Check for Spanish characters
-        elif re.search(r"[¿áéíóúñ¡]", text):
-            return "es"
-        # Check for French characters
-        elif re.search(r"[àâäæçéèêëïîôùûüœ]", text):
-            return "fr"
-        # Default to English
-        else:
-            return "en"
+        return analyze_message(text).language
 
     @staticmethod
     def classify_intent(text: str) -> Dict[str, Any]:
@@ -102,44 +50,13 @@ class WhatsAppMessageParser:
                 "confidence": 0.95
             }
         """
-        text_lower = text.lower()
-        detected_intents = []
-
-        # Check patterns
-        for intent, pattern in WhatsAppMessageParser.INTENT_PATTERNS.items():
-            if re.search(pattern, text_lower):
-                detected_intents.append(intent)
-
-        if not detected_intents:
-            return {
-                "primary_intent": "general_inquiry",
-                "secondary_intents": [],
-                "confidence": 0.5,
-            }
-
-        # Weighted scoring for primary intent
-        intent_scores = {
-            "price_inquiry": 3,
-            "booking": 4,
-            "objection_safety": 3,
-            "objection_ability": 3,
-            "refund": 5,
-            "timing": 2,
-        }
-
-        # Sort by priority
-        primary = max(detected_intents, key=lambda x: intent_scores.get(x, 1))
-
-        return {
-            "primary_intent": primary,
-            "secondary_intents": [i for i in detected_intents if i != primary],
-            "confidence": min(len(detected_intents) * 0.25, 0.95),
-        }
+        return analyze_message(text).intent()
 
     @staticmethod
     def detect_sentiment(text: str) -> Dict[str, Any]:
         """
         Analyze sentiment of message
+        Lexicon score from the same scan; a negator flips the next word
         
         Returns:
             {
@@ -148,33 +65,7 @@ class WhatsAppMessageParser:
                 "subjectivity": 0.5
             }
         """
-        try:
-            # Use TextBlob for sentiment analysis
-            blob = TextBlob(text)
-            polarity = blob.sentiment.polarity  # -1 to 1
-            subjectivity = blob.sentiment.subjectivity  # 0 to 1
-
-            # Classify sentiment
-            if polarity > 0.1:
-                sentiment = "positive"
-            elif polarity < -0.1:
-                sentiment = "negative"
-            else:
-                sentiment = "neutral"
-
-            return {
-                "sentiment": sentiment,
-                "polarity": polarity,
-                "subjectivity": subjectivity,
-            }
-
-        except Exception as e:
-            logger.error(f"Error detecting sentiment: {str(e)}")
-            return {
-                "sentiment": "neutral",
-                "polarity": 0,
-                "subjectivity": 0.5,
-            }
+        return analyze_message(text).sentiment()
 
     @staticmethod
     def extract_entities(text: str) -> Dict[str, List[str]]:
@@ -184,44 +75,12 @@ class WhatsAppMessageParser:
         Returns:
             {
                 "trek_names": ["Everest", "Manali"],
-                "numbers": ["40000", "5"],
-                "dates": ["next month", "December"],
+                "numbers": ["5"],
+                "dates": ["december", "12/10/2025"],
                 "prices": ["₹40k", "40000"]
             }
         """
-        text_lower = text.lower()
-        entities = {
-            "trek_names": [],
-            "numbers": [],
-            "dates": [],
-            "prices": [],
-        }
-
-        # Extract trek names
-        for trek in WhatsAppMessageParser.TREK_NAMES:
-            if trek in text_lower:
-                entities["trek_names"].append(trek.capitalize())
-
-        # Extract numbers
-        numbers = re.findall(r"\b\d+\b", text)
-        entities["numbers"] = numbers
-
-        # Extract prices (₹xxx or xxx rupee)
-        prices = re.findall(r"[₹Rs.]*\s*\d+[kK]?", text)
-        entities["prices"] = prices
-
-        # Extract dates
-        date_patterns = [
-            r"\b(january|february|march|april|may|june|july|august|september|october|november|december)\b",
-            r"\b(jan|feb|mar|apr|jun|jul|aug|sep|oct|nov|dec)\b",
-            r"(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})",
-        ]
-
-        for pattern in date_patterns:
-            dates = re.findall(pattern, text_lower)
-            entities["dates"].extend(dates)
-
-        return entities
+        return analyze_message(text).entities()
 
     @staticmethod
     def parse_message(text: str, phone_number: str = "") -> Dict[str, Any]:
@@ -255,38 +114,37 @@ class WhatsAppMessageParser:
                 "parsed_at": "2025-01-15T10:30:00Z"
             }
         """
+        signals = analyze_message(text)
         return {
             "original_text": text,
             "phone_number": phone_number,
-            "language": WhatsAppMessageParser.detect_language(text),
-            "intent": WhatsAppMessageParser.classify_intent(text),
-            "sentiment": WhatsAppMessageParser.detect_sentiment(text),
-            "entities": WhatsAppMessageParser.extract_entities(text),
+            "language": signals.language,
+            "intent": signals.intent(),
+            "sentiment": signals.sentiment(),
+            "entities": signals.entities(),
             "parsed_at": __import__("datetime").datetime.now().isoformat() + "Z",
             "length": len(text),
-            "word_count": len(text.split()),
+            "word_count": signals.word_count,
         }
 
     @staticmethod
     def is_unsubscribe_request(text: str) -> bool:
         """Check if message is unsubscribe request"""
-        unsubscribe_keywords = ["stop", "remove", "unsubscribe", "no more", "quit", "exit"]
-        text_lower = text.lower().strip()
-
-        return any(keyword in text_lower for keyword in unsubscribe_keywords)
+        return bool(analyze_message(text).unsubscribe_keywords)
 
     @staticmethod
     def get_conversation_context(text: str) -> str:
         """Get summary context of message for system prompt"""
-        intent_result = WhatsAppMessageParser.classify_intent(text)
-        sentiment_result = WhatsAppMessageParser.detect_sentiment(text)
+        signals = analyze_message(text)
+        intent_result = signals.intent()
+        sentiment_result = signals.sentiment()
 
         context = f"""
 Customer Message Analysis:
 - Intent: {intent_result['primary_intent']}
 - Sentiment: {sentiment_result['sentiment']}
 - Message Length: {len(text)} characters
-- Language: {WhatsAppMessageParser.detect_language(text)}
+- Language: {signals.language}
 
 This message requires a response that addresses the {intent_result['primary_intent']}.
 Tone should match their {sentiment_result['sentiment']} sentiment.
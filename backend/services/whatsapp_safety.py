@@ -7,6 +7,9 @@ import logging
 import re
 from typing import Dict, Any, Optional
 
+from . import message_signals
+from .message_signals import analyze_message
+
 logger = logging.getLogger(__name__)
 
 
@@ -16,104 +19,47 @@ class WhatsAppSafety:
     Protects against bans and regulatory issues
     """
 
-    # Ban risk triggers and their weights
+    # Ban risk triggers and their weights; checks read the message's single-pass signals
     BAN_RISK_FACTORS = {
         "emoji_count_high": {
-            "check": lambda text: len(re.findall(r"[😀-🙏🌀-🗿]", text)) > 8,
+            "check": lambda signals: signals.emoji_count > 8,
             "weight": 15,
             "message": "Too many emojis (>8)",
         },
         "all_caps": {
-            "check": lambda text: len([c for c in text if c.isupper()]) / len(text) > 0.3 if text else False,
+            "check": lambda signals: signals.caps_ratio > 0.3,
             "weight": 15,
             "message": "Too much CAPS (>30%)",
         },
         "repeated_keywords": {
-            "check": lambda text: WhatsAppSafety._check_keyword_repetition(text),
+            "check": lambda signals: signals.max_word_repeat > 3,
             "weight": 12,
             "message": "Repeated keywords detected",
         },
         "excessive_links": {
-            "check": lambda text: len(re.findall(r"http[s]?://|www\.", text)) > 2,
+            "check": lambda signals: signals.link_count > 2,
             "weight": 18,
             "message": "Too many links (>2)",
         },
         "promotional_spam": {
-            "check": lambda text: WhatsAppSafety._check_promotional_spam(text),
+            "check": lambda signals: signals.promotional_count >= 3,
             "weight": 20,
             "message": "Highly promotional language",
         },
         "clickbait": {
-            "check": lambda text: WhatsAppSafety._check_clickbait(text),
+            "check": lambda signals: signals.has_clickbait,
             "weight": 15,
             "message": "Clickbait language detected",
         },
         "unsubscribe_ignored": {
-            "check": lambda text: False,  # Handled separately
+            "check": lambda signals: False,  # Handled separately
             "weight": 50,
             "message": "Customer unsubscribe ignored",
         },
     }
 
     # Unsubscribe keywords
-    UNSUBSCRIBE_KEYWORDS = [
-        "stop",
-        "unsubscribe",
-        "remove",
-        "no more",
-        "quit",
-        "exit",
-        "don't contact",
-    ]
-
-    @staticmethod
-    def _check_keyword_repetition(text: str) -> bool:
-        """Check if keywords are repeated too much"""
-        words = text.lower().split()
-        if not words:
-            return False
-
-        # Count word frequencies
-        word_freq = {}
-        for word in words:
-            word_freq[word] = word_freq.get(word, 0) + 1
-
-        # Check if any word appears more than 3 times
-        return any(count > 3 for count in word_freq.values())
-
-    @staticmethod
-    def _check_promotional_spam(text: str) -> bool:
-        """Check for promotional spam indicators"""
-        promotional_keywords = [
-            "limited time",
-            "act now",
-            "don't miss",
-            "urgent",
-            "click here",
-            "buy now",
-            "exclusive offer",
-            "sign up now",
-            "limited offer",
-        ]
-
-        text_lower = text.lower()
-        count = sum(1 for keyword in promotional_keywords if keyword in text_lower)
-
-        return count >= 3
-
-    @staticmethod
-    def _check_clickbait(text: str) -> bool:
-        """Check for clickbait language"""
-        clickbait_patterns = [
-            r"you won't believe",
-            r"shocking",
-            r"unbelievable",
-            r"doctors hate",
-            r"this one trick",
-            r"what happens next",
-        ]
-
-        return any(re.search(pattern, text.lower()) for pattern in clickbait_patterns)
+    UNSUBSCRIBE_KEYWORDS = message_signals.UNSUBSCRIBE_KEYWORDS
 
     @staticmethod
     def analyze_ban_risk(message: str) -> Dict[str, Any]:
@@ -136,12 +82,13 @@ class WhatsAppSafety:
                 ]
             }
         """
+        signals = analyze_message(message)
         risk_score = 0
         triggered_factors = []
         suggestions = []
 
         for factor_name, factor_data in WhatsAppSafety.BAN_RISK_FACTORS.items():
-            if factor_data["check"](message):
+            if factor_data["check"](signals):
                 risk_score += factor_data["weight"]
                 triggered_factors.append({
                     "factor": factor_name,
@@ -189,15 +136,13 @@ class WhatsAppSafety:
                 "confidence": 0.99
             }
         """
-        message_lower = message.lower().strip()
-
-        for keyword in WhatsAppSafety.UNSUBSCRIBE_KEYWORDS:
-            if keyword in message_lower:
-                return {
-                    "is_unsubscriber": True,
-                    "keyword_matched": keyword,
-                    "confidence": 0.95,
-                }
+        matched = analyze_message(message).unsubscribe_keywords
+        if matched:
+            return {
+                "is_unsubscriber": True,
+                "keyword_matched": matched[0],
+                "confidence": 0.95,
+            }
 
         return {
             "is_unsubscriber": False,
@@ -6,6 +6,7 @@ Main orchestration flow for incoming WhatsApp messages
 import logging
 from typing import Dict, Any, Optional
 
+from core.message_dedup import claim_message_id, release_message_id
 from .whatsapp_api import WhatsAppAPI
 from .whatsapp_message_parser import WhatsAppMessageParser
 from .whatsapp_safety import WhatsAppSafety
@@ -262,12 +263,27 @@ class WhatsAppWebhookOrchestrator:
             parsed_event = self.api.parse_webhook(webhook_data)
 
             if parsed_event["type"] == "message":
+                # Drop provider redeliveries before any RAG/LLM work
+                if not claim_message_id(parsed_event["message_id"], source="orchestrator"):
+                    return {
+                        "status": "duplicate",
+                        "message_id": parsed_event["message_id"],
+                    }
+
                 # Process new message
-                return self.process_incoming_message(
-                    phone_number=parsed_event["phone"],
-                    message_text=parsed_event["message"],
-                    message_id=parsed_event["message_id"],
-                )
+                try:
+                    result = self.process_incoming_message(
+                        phone_number=parsed_event["phone"],
+                        message_text=parsed_event["message"],
+                        message_id=parsed_event["message_id"],
+                    )
+                except Exception:
+                    release_message_id(parsed_event["message_id"])
+                    raise
+                if result.get("status") == "error":
+                    # Let the provider's retry be processed again
+                    release_message_id(parsed_event["message_id"])
+                return result
 
             elif parsed_event["type"] == "status":
                 # Handle delivery/read status
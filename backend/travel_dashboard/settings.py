@@ -114,6 +114,23 @@ else:
     }
 
 
+# Cache: Redis when REDIS_URL is set (shared by all workers), else per-process memory
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'trekandstay',
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -167,6 +184,24 @@ if CLOUDINARY_CLOUD_NAME and CLOUDINARY_API_KEY and CLOUDINARY_API_SECRET:
         secure=True,
     )
 
+# Precomputed per-user trip recommendations are served for this long before recompute
+RECOMMENDATION_CACHE_TTL_HOURS = int(os.getenv('RECOMMENDATION_CACHE_TTL_HOURS', '24'))
+
+# Cached trip catalogue pages expire after this long even without a Trip/Booking write
+TRIP_CATALOGUE_CACHE_SECONDS = int(os.getenv('TRIP_CATALOGUE_CACHE_SECONDS', '300'))
+
+# Per-user dashboard summary/booking stats are cached this long unless a booking or wishlist write drops them
+DASHBOARD_CACHE_SECONDS = int(os.getenv('DASHBOARD_CACHE_SECONDS', '60'))
+
+# Admin dashboard stats snapshot: refresh_admin_stats --loop period, and the age past which it is reported stale
+ADMIN_STATS_REFRESH_SECONDS = int(os.getenv('ADMIN_STATS_REFRESH_SECONDS', '60'))
+ADMIN_STATS_MAX_AGE_SECONDS = int(os.getenv('ADMIN_STATS_MAX_AGE_SECONDS', '300'))
+
+# Transactional email (services.email_service): 'sendgrid' or 'stub' (in-memory outbox)
+EMAIL_SERVICE_BACKEND = os.getenv('EMAIL_SERVICE_BACKEND', 'sendgrid')
+SENDGRID_API_KEY = os.getenv('SENDGRID_API_KEY', '')
+SENDGRID_FROM_EMAIL = os.getenv('SENDGRID_FROM_EMAIL', 'noreply@trekandstay.com')
+
 OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY', '')
 OPENROUTER_MODEL = os.getenv('OPENROUTER_MODEL', 'qwen/qwen-2.5-32b-instruct')
 
@@ -174,6 +209,17 @@ OPENROUTER_MODEL = os.getenv('OPENROUTER_MODEL', 'qwen/qwen-2.5-32b-instruct')
 WHATSAPP_API_URL = os.getenv('WHATSAPP_API_URL', 'http://localhost:4001')
 WHATSAPP_API_KEY = os.getenv('WHATSAPP_API_KEY', 'change-me')  
 WHATSAPP_WEBHOOK_SECRET = os.getenv('WHATSAPP_WEBHOOK_SECRET', 'shared-secret')
+# Inbound message-id deduplication (webhook redeliveries)
+WHATSAPP_DEDUP_CACHE_SIZE = int(os.getenv('WHATSAPP_DEDUP_CACHE_SIZE', '10000'))
+WHATSAPP_DEDUP_RETENTION_DAYS = int(os.getenv('WHATSAPP_DEDUP_RETENTION_DAYS', '7'))
+# Outbound coalescing: per-recipient buffer window and per-number send limit
+WHATSAPP_COALESCE_WINDOW_SECONDS = float(os.getenv('WHATSAPP_COALESCE_WINDOW_SECONDS', '3'))
+WHATSAPP_PER_NUMBER_MAX_MESSAGES = int(os.getenv('WHATSAPP_PER_NUMBER_MAX_MESSAGES', '5'))
+WHATSAPP_PER_NUMBER_WINDOW_SECONDS = int(os.getenv('WHATSAPP_PER_NUMBER_WINDOW_SECONDS', '60'))
+# Shared conversation store: messages kept per phone, cached conversations, idle eviction
+CONVERSATION_STORE_HISTORY = int(os.getenv('CONVERSATION_STORE_HISTORY', '50'))
+CONVERSATION_STORE_MAX_CONVERSATIONS = int(os.getenv('CONVERSATION_STORE_MAX_CONVERSATIONS', '5000'))
+CONVERSATION_STORE_IDLE_SECONDS = int(os.getenv('CONVERSATION_STORE_IDLE_SECONDS', '1800'))
 
 # WhatsApp Sessions Configuration
 WHATSAPP_SESSIONS = {